@@ -2,29 +2,31 @@
 
 import os
 import sys
-from unittest.mock import MagicMock
 
 # Adicionar o diretório raiz ao path para imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # --- HACK PARA RODAR LOCAL NO WINDOWS SEM O WEASYPRINT ---
 if os.environ.get('FLASK_ENV') == 'development' or os.name == 'nt':
+    from unittest.mock import MagicMock
     sys.modules['weasyprint'] = MagicMock()
 # ---------------------------------------------------------
 
 import click
-import firebase_admin
 from flask import Flask, render_template, g, session, send_from_directory
 from flask_login import LoginManager, current_user
-from flask_migrate import Migrate
 from flask_babel import Babel
-from firebase_admin import credentials
 
 from backend.config import Config
 from backend.extensions import limiter, csrf
 from backend.models.database import db
 from backend.models.user import User
 from backend.services.asset_service import AssetService
+from backend.services.image_pipeline_service import ImagePipelineService
+from backend.services.upload_store_service import UploadStoreService
+from backend.services.static_assets_service import StaticAssetsService
+from backend.services.response_compression import ResponseCompression
+from backend.services.template_cache_service import TemplateCacheService
 
 # --- Importações de TODOS os modelos para o Flask-Migrate ---
 from backend.models.aluno import Aluno
@@ -58,10 +60,13 @@ from backend.models.frequencia import FrequenciaAluno
 from backend.models.elogio import Elogio
 from backend.models.edicao import Edicao
 from backend.models.chamado_suporte import ChamadoSuporte
+from backend.models.upload_blob import UploadBlob
+from backend.models.email_outbox import EmailOutbox
+from backend.models.resultado_questionario import ResultadoQuestionario
 # --- NOVO MÓDULO: DESLIGAMENTOS ---
 from backend.models.desligamento import RegistroDesligamento
 # --- NOVO MÓDULO: BANCO DE QUESTÕES E PROVAS ---
-from backend.models.banco_questoes import QuestaoBanco, DelegacaoProva, RascunhoProva, ConfiguracaoEnvio
+from backend.models.banco_questoes import QuestaoBanco, QuestaoBancoBanda, DelegacaoProva, RascunhoProva, ConfiguracaoEnvio
 # --- NOVO MÓDULO: RECURSOS ---
 from backend.models.recurso import ProvaRecurso, Recurso, DisciplinaHabilitada
 from backend.models.background_job import BackgroundJob
@@ -72,10 +77,18 @@ try:
 except ImportError:
     from backports.zoneinfo import ZoneInfo
 
-def create_app(config_class=Config):
+def create_app(config_class=Config, slim=None):
     """
     Fábrica de aplicação: cria e configura a instância do Flask.
+
+    slim=True (ou SISGEN_SLIM_APP=1) monta só a configuração, o banco e os comandos
+    CLI, sem blueprints, login, CSRF, compressão nem manifesto de estáticos: é o
+    modo do worker e dos comandos de manutenção ('flask db upgrade', 'build-static').
+    Bibliotecas pesadas (Firebase, WeasyPrint, pandas, Google API, Flask-Migrate)
+    são importadas no primeiro uso.
     """
+    if slim is None:
+        slim = os.environ.get('SISGEN_SLIM_APP', '').lower() in ('1', 'true', 'yes')
     project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
     template_dir = os.path.join(project_root, 'templates')
     static_dir = os.path.join(project_root, 'static')
@@ -85,21 +98,13 @@ def create_app(config_class=Config):
 
     config_class.init_app(app)
 
-    # --- INICIALIZAÇÃO DO FIREBASE ---
-    try:
-        cred_path = os.path.join(os.path.dirname(__file__), 'credentials.json')
-        if os.path.exists(cred_path):
-            if not firebase_admin._apps:
-                cred = credentials.Certificate(cred_path)
-                firebase_admin.initialize_app(cred)
-                app.logger.info("Firebase Admin SDK inicializado com sucesso.")
-        else:
-                 app.logger.warning(f"Arquivo 'credentials.json' não encontrado em {cred_path}. Funcionalidades do Firebase não estarão disponíveis.")
-    except ValueError:
-       pass # App já inicializado
-    except Exception as e:
-        app.logger.error(f"ERRO ao inicializar o Firebase Admin SDK: {e}")
-    # --- FIM DA INICIALIZAÇÃO ---
+    # --- FIREBASE ---
+    # O SDK é inicializado no primeiro push enviado (backend.extensions.get_firebase_messaging)
+    cred_path = os.path.join(os.path.dirname(__file__), 'credentials.json')
+    app.config.setdefault('FIREBASE_CREDENTIALS_PATH', cred_path)
+    if not slim and not os.path.exists(app.config['FIREBASE_CREDENTIALS_PATH']):
+        app.logger.warning(f"Arquivo 'credentials.json' não encontrado em {cred_path}. Funcionalidades do Firebase não estarão disponíveis.")
+    # --- FIM DO FIREBASE ---
 
     # ### FILTRO DE FUSO HORÁRIO ###
     @app.template_filter('br_time')
@@ -122,7 +127,17 @@ def create_app(config_class=Config):
     # ### PWA ###
     @app.route('/sw.js')
     def service_worker():
-        return send_from_directory(app.static_folder, 'sw.js', mimetype='application/javascript')
+        # no-cache: o navegador revalida o worker (ETag) e recebe a versão nova logo após o deploy
+        response = send_from_directory(app.static_folder, 'sw.js', mimetype='application/javascript', max_age=0)
+        response.cache_control.no_cache = True
+        return response
+
+    @app.route('/offline.html')
+    def offline():
+        # Página pré-carregada pelo service worker: resposta das navegações sem rede
+        response = send_from_directory(app.static_folder, 'offline.html', mimetype='text/html', max_age=0)
+        response.cache_control.no_cache = True
+        return response
 
     @app.route('/manifest.json')
     def manifest():
@@ -130,7 +145,15 @@ def create_app(config_class=Config):
     # ### FIM PWA ###
 
     db.init_app(app)
-    Migrate(app, db)
+    if click.get_current_context(silent=True) is not None:
+        # Flask-Migrate (e o alembic) só fazem falta nos comandos 'flask db ...'
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+    if slim:
+        register_cli_commands(app)
+        return app
+
     csrf.init_app(app)
     limiter.init_app(app) # <-- CORRIGIDO AQUI (era limter)
     Babel(app)
@@ -167,6 +190,18 @@ def create_app(config_class=Config):
 
     # ALTERAÇÃO: Injetando timedelta globalmente para uso nos templates
     app.jinja_env.globals.update(timedelta=timedelta)
+    # Imagens responsivas (<picture> com srcset WebP/JPEG dos derivados gerados pelo worker)
+    app.jinja_env.globals.update(
+        responsive_image=ImagePipelineService.responsive_image,
+        image_variant_url=ImagePipelineService.variant_url
+    )
+    # Arquivos estáticos versionados pelo conteúdo (manifesto gerado por 'flask build-static')
+    StaticAssetsService.init_app(app)
+    app.jinja_env.globals.update(static_url=StaticAssetsService.static_url)
+    # Bytecode dos templates em disco e fragmentos do base.html em cache ({% cache %})
+    TemplateCacheService.init_app(app)
+    # Brotli/gzip nas respostas dinâmicas grandes (registrado antes de add_header, roda depois dele)
+    ResponseCompression(app)
 
     with app.app_context():
         AssetService.initialize_upload_folder(app)
@@ -260,7 +295,10 @@ def register_handlers_and_processors(app):
         
         # --- FILTRO DE DESEMPENHO EM PRODUÇÃO ---
         # Evita consultas pesadas ao banco de dados para assets visuais e PWA
-        if request.path.startswith('/static/') or request.path in ['/sw.js', '/manifest.json', '/favicon.ico']:
+        if request.path.startswith('/static/') or request.path in ['/sw.js', '/offline.html', '/manifest.json', '/favicon.ico']:
+            return
+        # Agenda ICS: consultada pelos calendários sem sessão, não usa as globais dos templates
+        if request.path.startswith('/horario/agenda/'):
             return
         # -----------------------------------------
 
@@ -353,7 +391,11 @@ def register_handlers_and_processors(app):
     def add_header(response):
         # Controle de Cache (Evita que páginas sensíveis fiquem gravadas no navegador)
         from flask import request
-        if request.path.startswith('/static/') or request.path in ['/sw.js', '/manifest.json', '/favicon.ico']:
+        if request.endpoint == 'static':
+            pass # StaticAssetsService.send_static define o cache (imutável só para nomes com hash)
+        elif response.cache_control.no_cache and response.get_etag()[0]:
+            pass # etag_json / catálogo de cursos: o navegador guarda a resposta, mas revalida (304) a cada uso
+        elif request.path.startswith('/static/') or request.path in ['/sw.js', '/offline.html', '/manifest.json', '/favicon.ico']:
             response.headers["Cache-Control"] = "public, max-age=31536000" # 1 ano de cache
         else:
             response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
@@ -449,6 +491,67 @@ def register_cli_commands(app):
             popular_questionario_db()
         print("Comando de popular questionário executado.")
 
+    @app.cli.command("reprocess-images")
+    @click.option('--pendentes', is_flag=True, help='Processa apenas as imagens ainda sem derivados.')
+    def reprocess_images_command(pendentes):
+        """Gera os derivados WebP/JPEG das imagens já enviadas (static/uploads)."""
+        with app.app_context():
+            totals = ImagePipelineService.reprocess_all(
+                only_pending=pendentes,
+                progress_callback=lambda done, total: print(f"{done}/{total}", end='\r')
+            )
+        print(f"\nConcluído: {totals}")
+
+    @app.cli.command("migrar-uploads")
+    @click.option('--aplicar', is_flag=True, help='Executa a migração (sem a opção, apenas simula).')
+    def migrar_uploads_command(aplicar):
+        """Move assinaturas, fotos e anexos antigos para o armazenamento por conteúdo (sha256)."""
+        with app.app_context():
+            stats = UploadStoreService.migrar_legado(
+                aplicar=aplicar,
+                progress_callback=lambda done, total: print(f"{done}/{total} colunas", end='\r')
+            )
+        economia = (stats['bytes_antes'] - stats['bytes_depois']) / (1024 * 1024)
+        print(f"\n{'Migrado' if aplicar else 'Simulação'}: {stats['arquivos']} arquivo(s) em {stats['referencias']} "
+              f"valor(es) referenciado(s), {stats['ausentes']} ausente(s); economia estimada de {economia:.1f} MB.")
+
+    @app.cli.command("limpar-uploads")
+    @click.option('--aplicar', is_flag=True, help='Apaga os arquivos (sem a opção, apenas lista as contagens).')
+    @click.option('--carencia', type=int, default=None, help='Horas mínimas sem referência antes de apagar.')
+    def limpar_uploads_command(aplicar, carencia):
+        """Recalcula as referências e remove uploads órfãos do armazenamento por conteúdo."""
+        with app.app_context():
+            stats = UploadStoreService.coletar_lixo(aplicar=aplicar, carencia_horas=carencia)
+        print(f"{'Removidos' if aplicar else 'A remover'}: {stats['blobs']} blob(s) sem referência, "
+              f"{stats['orfaos']} órfão(s), {stats['legados']} arquivo(s) antigo(s); {stats['bytes'] / (1024 * 1024):.1f} MB.")
+
+    @app.cli.command("build-static")
+    @click.option('--sem-compressao', is_flag=True, help='Gera apenas o manifesto, sem os arquivos .br/.gz.')
+    def build_static_command(sem_compressao):
+        """Gera o manifesto de static/ com hash do conteúdo e os irmãos pré-comprimidos (.br/.gz)."""
+        stats = StaticAssetsService.build(app.static_folder, compress=not sem_compressao)
+        print(f"Manifesto com {stats['arquivos']} arquivo(s); {stats['comprimidos']} versão(ões) comprimida(s) gerada(s).")
+
+    @app.cli.command("enviar-emails")
+    def enviar_emails_command():
+        """Envia imediatamente os e-mails prontos da fila (o worker faz isso continuamente)."""
+        from backend.services.email_outbox_service import EmailOutboxService
+        with app.app_context():
+            stats = EmailOutboxService.process_pending(limit=1000)
+        print(f"{stats['enviados']} enviado(s), {stats['reagendados']} reagendado(s), {stats['falhas']} falha(s) em {stats['chamadas']} chamada(s).")
+
+    @app.cli.command("email-stub")
+    @click.option('--porta', default=8025, show_default=True, help='Porta do stub local da API da Brevo.')
+    def email_stub_command(porta):
+        """Sobe um stub local da API da Brevo (use BREVO_API_HOST=http://127.0.0.1:<porta>/v3)."""
+        from backend.services.email_outbox_service import BrevoStubServer
+        stub = BrevoStubServer(porta=porta)
+        print(f"Stub da Brevo em {stub.url} (Ctrl+C para encerrar).")
+        try:
+            stub.serve_forever()
+        except KeyboardInterrupt:
+            stub.stop()
+
     @app.cli.command("seed-npccal")
     def seed_npccal_command():
         """Popula o banco de dados com as regras de disciplina (NPCCAL)."""
@@ -40,6 +40,17 @@ class Config:
     # --- CONFIGURAÇÕES DE E-MAIL (Brevo) ---
     BREVO_API_KEY = os.environ.get('BREVO_API_KEY')
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER')
+    # Endpoint da API (ex.: http://127.0.0.1:8025/v3 para o stub local de 'flask email-stub')
+    BREVO_API_HOST = os.environ.get('BREVO_API_HOST')
+    # Envio pelo worker: chamadas por segundo e destinatários por chamada (messageVersions)
+    EMAIL_RATE_PER_SECOND = float(os.environ.get('EMAIL_RATE_PER_SECOND', 5))
+    EMAIL_BATCH_SIZE = int(os.environ.get('EMAIL_BATCH_SIZE', 50))
+
+    # --- TEMPLATES ---
+    # Bytecode compilado do Jinja em disco, compartilhado pelos workers (padrão: <instance>/jinja-cache, criado com permissão 0700)
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR')
+    # Fragmentos do base.html ({% cache %}) em memória; desligado também em modo debug
+    TEMPLATE_FRAGMENT_CACHE = os.environ.get('TEMPLATE_FRAGMENT_CACHE', '1').lower() not in ('0', 'false', 'no')
 
     # --- INICIALIZAÇÃO DO APP ---
     @staticmethod
@@ -1,14 +1,20 @@
 # backend/controllers/admin_tools_controller.py
 
-from flask import Blueprint, render_template, request, flash, redirect, url_for, send_file
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, current_app
 from flask_login import login_required, current_user
 import io
+import os
 import json
+import uuid
+import tempfile
 from datetime import datetime, timedelta
 
 from utils.decorators import admin_or_programmer_required, admin_escola_required
+from ..models.database import db
+from ..models.background_job import BackgroundJob
 from ..services.user_service import UserService
 from ..services.admin_tools_service import AdminToolsService
+from ..services.backup_service import BackupService, BackupError
 from ..services.mail_merge_service import MailMergeService
 from ..services.log_service import LogService
 
@@ -25,75 +31,102 @@ def index():
 @login_required
 @admin_or_programmer_required
 def mail_merge():
+    """Recebe template e planilha e enfileira a geração dos documentos no worker."""
     if request.method == 'POST':
         template_file = request.files.get('template_file')
         data_file = request.files.get('data_file')
         output_format = request.form.get('output_format', 'docx')
 
         if not template_file or not data_file:
-            flash('Ambos os arquivos (template e dados) são obrigatórios.', 'danger')
-            return redirect(url_for('tools.mail_merge'))
+            return jsonify({'success': False, 'error': 'Ambos os arquivos (template e dados) são obrigatórios.'}), 400
+        if output_format == 'pdf' and not MailMergeService.pdf_converter_available():
+            return jsonify({'success': False, 'error': 'A conversão para PDF não está disponível neste servidor.'}), 400
 
-        zip_buffer, error = MailMergeService.generate_documents(template_file, data_file, output_format)
+        job_id = str(uuid.uuid4())
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        extension = 'pdf' if output_format == 'pdf' else 'zip'
 
-        if error:
-            flash(f'Ocorreu um erro ao gerar os documentos: {error}', 'danger')
-            return redirect(url_for('tools.mail_merge'))
+        try:
+            # Os arquivos vão para uma pasta do job; o worker a remove ao terminar
+            input_dir = os.path.join(current_app.root_path, '..', 'static', 'downloads', f"mailmerge_{job_id}")
+            os.makedirs(input_dir, exist_ok=True)
+            template_path = os.path.join(input_dir, 'template.docx')
+            data_path = os.path.join(input_dir, 'dados.xlsx')
+            template_file.save(template_path)
+            data_file.save(data_path)
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        # --- ESPIÃO: MAIL MERGE ---
-        school_id = UserService.get_current_school_id()
-        LogService.log(
-            action="Utilizou Mail Merge",
-            details=f"O administrador gerou um lote de documentos (formato: {output_format}).",
-            school_id=school_id
-        )
-        # --------------------------
-        
-        return send_file(
-            zip_buffer,
-            as_attachment=True,
-            download_name=f'certificados_gerados_{timestamp}.zip',
-            mimetype='application/zip'
-        )
+            job = BackgroundJob(
+                id=job_id,
+                task_type='mail_merge',
+                meta_data=json.dumps({
+                    "filename": f"certificados_gerados_{timestamp}.{extension}",
+                    "template_path": template_path,
+                    "data_path": data_path,
+                    "output_format": output_format,
+                    "progress": 0
+                }),
+                user_id=current_user.id
+            )
+            db.session.add(job)
 
-    return render_template('ferramentas/mail_merge.html')
+            # --- ESPIÃO: MAIL MERGE ---
+            school_id = UserService.get_current_school_id()
+            LogService.log(
+                action="Utilizou Mail Merge",
+                details=f"O administrador gerou um lote de documentos (formato: {output_format}).",
+                school_id=school_id,
+                commit=False
+            )
+            # --------------------------
+            db.session.commit()
+            return jsonify({'success': True, 'job_id': job_id})
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'success': False, 'error': str(e)}), 500
 
-@tools_bp.route('/backup')
+    return render_template('ferramentas/mail_merge.html', pdf_disponivel=MailMergeService.pdf_converter_available())
+
+@tools_bp.route('/backup', methods=['GET', 'POST'])
 @login_required
 @admin_or_programmer_required
 def backup_escola():
-    """Gera e faz o download de um snapshot completo da edição atual da escola em formato JSON."""
+    """Enfileira a exportação do backup completo da escola (ZIP com seções NDJSON) no worker."""
     school_id = UserService.get_current_school_id()
     if not school_id:
+        if request.method == 'POST':
+            return jsonify({'success': False, 'error': 'Nenhuma escola selecionada.'}), 400
         flash("Nenhuma escola selecionada.", "warning")
         return redirect(url_for('tools.index'))
 
+    if request.method == 'GET':
+        return render_template('ferramentas/backup_escola.html')
+
     try:
-        backup_data = AdminToolsService.generate_school_backup(school_id)
-        json_str = json.dumps(backup_data, ensure_ascii=False, indent=4)
-        buffer = io.BytesIO(json_str.encode('utf-8'))
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"backup_escola_{school_id}_edicao_{timestamp}.json"
-        
+        filename = f"backup_escola_{school_id}_edicao_{timestamp}.zip"
+        job_id = str(uuid.uuid4())
+        job = BackgroundJob(
+            id=job_id,
+            task_type='school_backup',
+            meta_data=json.dumps({"filename": filename, "school_id": school_id, "progress": 0}),
+            user_id=current_user.id
+        )
+        db.session.add(job)
+
         # --- ESPIÃO: BACKUP DA ESCOLA ---
         LogService.log(
             action="Gerou Backup",
-            details=f"Um arquivo de backup completo da escola foi gerado e baixado ({filename}).",
-            school_id=school_id
+            details=f"Um arquivo de backup completo da escola foi solicitado ({filename}).",
+            school_id=school_id,
+            commit=False
         )
         # --------------------------------
-        
-        return send_file(
-            buffer,
-            as_attachment=True,
-            download_name=filename,
-            mimetype='application/json'
-        )
+        db.session.commit()
+
+        return jsonify({'success': True, 'job_id': job_id})
     except Exception as e:
-        flash(f"Ocorreu um erro ao gerar o backup da escola: {str(e)}", "danger")
-        return redirect(url_for('tools.index'))
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
 
 @tools_bp.route('/reset')
 @login_required
@@ -102,6 +135,23 @@ def reset_escola():
     """Exibe a página com as opções de reset da escola."""
     return render_template('ferramentas/reset_escola.html')
 
+def _render_clear_preview(school_id, opcoes_selecionadas, instrutores_to_delete_ids, password):
+    """Dry-run: mostra quantas linhas cada tabela perderá (e o que impede a limpeza) antes de enfileirá-la."""
+    try:
+        previa = AdminToolsService.preview_clear_school_data(school_id, list(opcoes_selecionadas), instrutores_to_delete_ids)
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Não foi possível calcular a prévia da limpeza: {str(e)}', 'danger')
+        return redirect(url_for('tools.reset_escola'))
+
+    return render_template('ferramentas/confirmar_limpeza.html',
+                           previa=[item for item in previa if item['action'] != 'block'],
+                           bloqueios=[item for item in previa if item['action'] == 'block'],
+                           total_linhas=sum(item['rows'] for item in previa if item['action'] != 'block'),
+                           opcoes=opcoes_selecionadas,
+                           instrutores_to_delete_ids=instrutores_to_delete_ids or [],
+                           password=password)
+
 @tools_bp.route('/limpar', methods=['POST'])
 @login_required
 @admin_or_programmer_required
@@ -135,27 +185,15 @@ def clear_data():
                                    instrutores=instrutores,
                                    password=password) # Passando a senha silenciosamente para o próximo form
 
-    # Se não selecionou instrutores, executa a limpeza direto
-    success, message = AdminToolsService.custom_clear_school_data(school_id, opcoes_selecionadas)
-    
-    # --- ESPIÃO: RESETOU DADOS ---
-    if success:
-        LogService.log(
-            action="Reset/Limpeza da Escola",
-            details=f"O administrador realizou a exclusão em massa dos seguintes dados: {', '.join(opcoes_selecionadas)}.",
-            school_id=school_id
-        )
-    # -----------------------------
-    
-    flash(message, 'success' if success else 'danger')
-    return redirect(url_for('tools.reset_escola'))
+    # Se não selecionou instrutores, segue direto para a prévia (dry-run)
+    return _render_clear_preview(school_id, opcoes_selecionadas, None, password)
 
-# --- NOVA ROTA PARA PROCESSAR A TELA INTERMEDIÁRIA ---
-@tools_bp.route('/limpar_confirmado', methods=['POST'])
+# --- ROTA DA TELA INTERMEDIÁRIA DE INSTRUTORES ---
+@tools_bp.route('/limpar/previa', methods=['POST'])
 @login_required
 @admin_or_programmer_required
-def clear_data_confirmado():
-    """Executa a limpeza final usando a lista filtrada de instrutores."""
+def clear_data_previa():
+    """Recebe a lista filtrada de instrutores e exibe a prévia da limpeza."""
     password = request.form.get('password')
     if not password or not current_user.check_password(password):
         flash('Sessão expirada ou senha inválida.', 'danger')
@@ -163,25 +201,49 @@ def clear_data_confirmado():
 
     school_id = UserService.get_current_school_id()
     opcoes_selecionadas = request.form.getlist('opcoes')
-    
+
     # Pega apenas os IDs dos instrutores que PERMANECERAM marcados na tela intermediária
-    instrutores_marcados = request.form.getlist('instrutores_to_delete')
-    instrutores_to_delete_ids = [int(i) for i in instrutores_marcados]
+    instrutores_to_delete_ids = [int(i) for i in request.form.getlist('instrutores_to_delete')]
+    return _render_clear_preview(school_id, opcoes_selecionadas, instrutores_to_delete_ids, password)
 
-    # Chama o service passando a lista exata de quem deve sair
-    success, message = AdminToolsService.custom_clear_school_data(school_id, opcoes_selecionadas, instructors_to_delete_ids=instrutores_to_delete_ids)
+@tools_bp.route('/limpar_confirmado', methods=['POST'])
+@login_required
+@admin_or_programmer_required
+def clear_data_confirmado():
+    """Enfileira a limpeza confirmada na prévia; o worker executa em lotes e reporta o progresso."""
+    password = request.form.get('password')
+    if not password or not current_user.check_password(password):
+        return jsonify({'success': False, 'error': 'Sessão expirada ou senha inválida.'}), 403
 
-    # --- ESPIÃO: RESETOU DADOS (COM INSTRUTORES) ---
-    if success:
-        LogService.log(
-            action="Reset/Limpeza da Escola",
-            details=f"O administrador realizou a exclusão em massa: {', '.join(opcoes_selecionadas)} (incluindo {len(instrutores_to_delete_ids)} instrutor(es) removido(s)).",
-            school_id=school_id
-        )
-    # -----------------------------------------------
+    school_id = UserService.get_current_school_id()
+    if not school_id:
+        return jsonify({'success': False, 'error': 'Não foi possível identificar a sua escola.'}), 400
+
+    opcoes_selecionadas = request.form.getlist('opcoes')
+    if not opcoes_selecionadas:
+        return jsonify({'success': False, 'error': 'Nenhuma categoria de dados foi selecionada para exclusão.'}), 400
+
+    instrutores_to_delete_ids = [int(i) for i in request.form.getlist('instrutores_to_delete')]
 
-    flash(message, 'success' if success else 'danger')
-    return redirect(url_for('tools.reset_escola'))
+    try:
+        job_id = str(uuid.uuid4())
+        job = BackgroundJob(
+            id=job_id,
+            task_type='clear_school_data',
+            meta_data=json.dumps({
+                "school_id": school_id,
+                "options": opcoes_selecionadas,
+                "instructors_to_delete_ids": instrutores_to_delete_ids,
+                "progress": 0
+            }),
+            user_id=current_user.id
+        )
+        db.session.add(job)
+        db.session.commit()
+        return jsonify({'success': True, 'job_id': job_id})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
 
 @tools_bp.route('/logs')
 @login_required
@@ -240,17 +302,39 @@ def preview_backup():
             flash('Nenhum arquivo selecionado.', 'error')
             return redirect(request.url)
             
-        if file and file.filename.endswith('.json'):
+        filename = file.filename.lower()
+        if filename.endswith('.zip'):
+            # Backup em seções: o upload é copiado para um arquivo temporário em disco
+            # e lido seção a seção, sem carregar o arquivo inteiro em memória.
+            try:
+                with tempfile.TemporaryFile() as tmp:
+                    file.save(tmp)
+                    tmp.seek(0)
+                    backup_data, manifest, problems = BackupService.build_preview(tmp)
+
+                for problem in problems:
+                    flash(f'Integridade do backup: {problem}', 'warning')
+                counts = BackupService.section_counts(manifest)
+                return render_template('ferramentas/preview_backup.html', data=backup_data, counts=counts,
+                                       manifest=manifest, file_name=file.filename)
+            except BackupError as e:
+                flash(str(e), 'error')
+            except Exception as e:
+                flash(f'Ocorreu um erro ao processar o arquivo de backup: {str(e)}', 'error')
+        elif filename.endswith('.json'):
+            # Backups legados (JSON único)
             try:
-                file_content = file.read().decode('utf-8')
-                backup_data = json.loads(file_content)
-                return render_template('ferramentas/preview_backup.html', data=backup_data, file_name=file.filename)
-            except json.JSONDecodeError:
+                backup_data = json.load(io.TextIOWrapper(file.stream, encoding='utf-8'))
+                justica = backup_data.get('justica', {})
+                counts = {key: len(backup_data.get(key) or []) for key in ('turmas', 'usuarios', 'disciplinas', 'diarios_classe')}
+                counts['justica_processos'] = len(justica.get('processos') or [])
+                return render_template('ferramentas/preview_backup.html', data=backup_data, counts=counts, file_name=file.filename)
+            except (json.JSONDecodeError, UnicodeDecodeError):
                 flash('O arquivo enviado não é um JSON válido ou está corrompido.', 'error')
             except Exception as e:
                 flash(f'Ocorreu um erro ao processar o arquivo de backup: {str(e)}', 'error')
         else:
-            flash('Por favor, envie um arquivo .json válido.', 'error')
+            flash('Por favor, envie um arquivo de backup .zip (ou .json legado) válido.', 'error')
             
         return redirect(request.url)
         
@@ -1,13 +1,13 @@
-import os
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
-from werkzeug.utils import secure_filename
 
 from ..models.database import db
 from ..models.image_asset import ImageAsset
 # --- PERMISSÃO ALTERADA AQUI ---
 from utils.decorators import admin_or_programmer_required
-from utils.image_utils import allowed_file, generate_unique_filename, optimize_image, get_file_hash
+from utils.image_utils import allowed_file
+from ..services.asset_service import AssetService
+from ..services.image_pipeline_service import ImagePipelineService
 
 assets_bp = Blueprint('assets', __name__, url_prefix='/assets')
 
@@ -45,38 +45,11 @@ def upload_asset():
             flash('Tipo de arquivo não permitido. Use: PNG, JPG, JPEG, GIF, SVG, WEBP', 'error')
             return redirect(request.url)
         
-        try:
-            upload_folder = os.path.join(current_app.root_path, '..', 'static', 'uploads')
-            os.makedirs(upload_folder, exist_ok=True)
-            
-            original_filename = secure_filename(file.filename)
-            unique_filename = generate_unique_filename(original_filename)
-            file_path = os.path.join(upload_folder, unique_filename)
-            
-            file.save(file_path)
-            
-            if not unique_filename.lower().endswith('.svg'):
-                optimize_image(file_path)
-            
-            new_asset = ImageAsset(
-                filename=unique_filename,
-                original_filename=original_filename,
-                asset_type=asset_type,
-                category=category,
-                description=description,
-                uploaded_by=current_user.id
-            )
-            
-            db.session.add(new_asset)
-            db.session.commit()
-            
-            flash(f'Asset "{original_filename}" enviado com sucesso!', 'success')
+        success, message = AssetService.upload_asset(file, asset_type, category, description, current_user.id)
+        flash(message, 'success' if success else 'error')
+        if success:
             return redirect(url_for('assets.manage_assets'))
-            
-        except Exception as e:
-            db.session.rollback()
-            flash(f'Erro ao fazer upload: {str(e)}', 'error')
-            return redirect(request.url)
+        return redirect(request.url)
     
     return render_template('upload_asset.html')
 
@@ -85,26 +58,20 @@ def upload_asset():
 @admin_or_programmer_required
 def delete_asset(asset_id):
     """Deletar asset"""
-    asset = db.session.get(ImageAsset, asset_id)
-    if not asset:
-        flash('Asset não encontrado.', 'error')
-        return redirect(url_for('assets.manage_assets'))
-    
-    try:
-        file_path = os.path.join(current_app.root_path, '..', 'static', 'uploads', asset.filename)
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        
-        db.session.delete(asset)
-        db.session.commit()
-        
-        flash('Asset deletado com sucesso!', 'success')
-    except Exception as e:
-        db.session.rollback()
-        flash(f'Erro ao deletar asset: {str(e)}', 'error')
-    
+    success, message = AssetService.delete_asset(asset_id)
+    flash(message, 'success' if success else 'error')
     return redirect(url_for('assets.manage_assets'))
 
+@assets_bp.route('/reprocess', methods=['POST'])
+@login_required
+@admin_or_programmer_required
+def reprocess_assets():
+    """Enfileira a (re)geração dos derivados responsivos de todas as imagens enviadas"""
+    only_pending = request.form.get('only_pending') == '1'
+    job = ImagePipelineService.enqueue('reprocess_images', current_user.id, only_pending=only_pending)
+    db.session.commit()
+    return jsonify({'success': True, 'job_id': job.id})
+
 @assets_bp.route('/toggle/<int:asset_id>', methods=['POST'])
 @login_required
 @admin_or_programmer_required
@@ -71,7 +71,7 @@ def enforce_2fa_setup():
         return
         
     if current_user.is_authenticated and not getattr(current_user, 'is_totp_enabled', False):
-        allowed_endpoints = ['auth.configurar_2fa', 'auth.logout', 'static']
+        allowed_endpoints = ['auth.configurar_2fa', 'auth.logout', 'static', 'service_worker', 'offline', 'manifest']
 
         if request.endpoint and request.endpoint not in allowed_endpoints and not request.endpoint.startswith('static'):
             flash("A Autenticação em Duas Etapas (2FA) é obrigatória. Configure para liberar seu acesso ao sistema.", "warning")
@@ -1,10 +1,10 @@
 # backend/controllers/cursos_controller.py
 import os
-import json
 from flask import Blueprint, send_from_directory, request, jsonify, session, redirect, render_template_string
 from backend.models.database import db
 from backend.models.curso_video import CursoVideo
 from backend.extensions import csrf
+from backend.services.cursos_catalog_service import CursosCatalogService
 
 # Mantém a API original do SQL caso seja utilizada externamente
 cursos_api_bp = Blueprint('cursos_api', __name__, url_prefix='/api/cursos')
@@ -106,57 +106,17 @@ DEFAULT_DATA = {
 }
 
 def get_cursos_data():
-    data_file = os.path.join(PROJECT_ROOT, 'static', 'uploads', 'cursos_data.json')
-    fallback_file = os.path.join(CURSOS_DIR, 'cursos_data.json')
-    
-    if not os.path.exists(data_file):
-        os.makedirs(os.path.dirname(data_file), exist_ok=True)
-        if os.path.exists(fallback_file):
-            try:
-                import shutil
-                shutil.copy(fallback_file, data_file)
-            except Exception:
-                pass
-        if not os.path.exists(data_file):
-            with open(data_file, 'w', encoding='utf-8') as f:
-                json.dump(DEFAULT_DATA, f, indent=4, ensure_ascii=False)
-    else:
-        # Recuperação automática: se o arquivo do disco persistente tiver os vídeos padrão (v1)
-        # e o arquivo vindo do Git (fallback) tiver os vídeos reais já cadastrados
-        try:
-            with open(data_file, 'r', encoding='utf-8') as f:
-                current = json.load(f)
-            if os.path.exists(fallback_file):
-                with open(fallback_file, 'r', encoding='utf-8') as f:
-                    fallback = json.load(f)
-                
-                has_defaults = any(v.get('id') == 'v1' for v in current.get('videos', []))
-                fallback_has_custom = not any(v.get('id') == 'v1' for v in fallback.get('videos', []))
-                
-                if has_defaults and fallback_has_custom:
-                    import shutil
-                    shutil.copy(fallback_file, data_file)
-        except Exception:
-            pass
-
-    try:
-        with open(data_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception:
-        return DEFAULT_DATA
+    # Cópia do catálogo em cache (recarregado quando o arquivo muda no disco)
+    return CursosCatalogService.get(PROJECT_ROOT, DEFAULT_DATA)
 
 def save_cursos_data(data):
-    data_file = os.path.join(PROJECT_ROOT, 'static', 'uploads', 'cursos_data.json')
-    os.makedirs(os.path.dirname(data_file), exist_ok=True)
-    with open(data_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+    CursosCatalogService.update(PROJECT_ROOT, DEFAULT_DATA, lambda _atual: data)
 
 @cursos_bp.route('/cursos/api.php', methods=['GET', 'POST'])
 @csrf.exempt
 def api_php():
-    current_data = get_cursos_data()
     if request.method == 'GET':
-        return jsonify(current_data)
+        return CursosCatalogService.json_response(PROJECT_ROOT, DEFAULT_DATA)
     
     # POST
     if not session.get('cursos_authenticated'):
@@ -169,17 +129,18 @@ def api_php():
     action = input_data.get('action')
     if action:
         if action == 'save_videos':
-            current_data['videos'] = input_data.get('videos', [])
+            alterar = lambda dados: {**dados, 'videos': input_data.get('videos', [])}
         elif action == 'save_logo':
-            current_data['logo'] = input_data.get('logo', {})
+            alterar = lambda dados: {**dados, 'logo': input_data.get('logo', {})}
         elif action == 'save_intro':
-            current_data['intro'] = input_data.get('intro', {})
+            alterar = lambda dados: {**dados, 'intro': input_data.get('intro', {})}
         elif action == 'restore_defaults':
-            current_data = DEFAULT_DATA
+            alterar = lambda dados: DEFAULT_DATA
         else:
             return jsonify({'error': 'Nenhuma ação válida especificada.'}), 400
             
-        save_cursos_data(current_data)
+        # Lê, altera e grava sob o lock: edições simultâneas de seções diferentes não se sobrescrevem
+        CursosCatalogService.update(PROJECT_ROOT, DEFAULT_DATA, alterar)
         return jsonify({'success': True})
         
     return jsonify({'error': 'Nenhuma ação válida especificada.'}), 400
@@ -235,6 +196,5 @@ def serve_cursos_static(filename='index.html'):
     if filename == 'admin_painel.php':
         return admin_painel_php()
     if filename == 'cursos_data.json':
-        uploads_dir = os.path.join(PROJECT_ROOT, 'static', 'uploads')
-        return send_from_directory(uploads_dir, 'cursos_data.json')
+        return CursosCatalogService.json_response(PROJECT_ROOT, DEFAULT_DATA)
     return send_from_directory(CURSOS_DIR, filename)
@@ -6,7 +6,6 @@ from datetime import date, datetime, timedelta
 from flask_wtf import FlaskForm
 from wtforms import HiddenField, SubmitField
 from wtforms.validators import DataRequired
-from weasyprint import HTML
 from urllib.parse import quote
 import json
 import traceback
@@ -29,8 +28,11 @@ from ..services.horario_service import HorarioService
 from ..services.user_service import UserService
 from ..services.turma_service import TurmaService
 from ..services.semana_service import SemanaService
+from ..services.gerador_horario_service import GeradorHorarioService
 from ..services.instrutor_service import InstrutorService
 from ..services.log_service import LogService # <--- ESPIÃO IMPORTADO AQUI
+from ..services.response_compression import etag_json
+from ..services.agenda_service import AgendaService
 
 horario_bp = Blueprint('horario', __name__, url_prefix='/horario')
 
@@ -329,6 +331,7 @@ def index():
 
     tempos, intervalos = _get_horario_context_data()
     all_disciplinas = []
+    agenda_urls = AgendaService.urls(current_user, turma_selecionada_nome, school_id)
 
     return render_template('quadro_horario.html',
                            horario_matrix=horario_matrix,
@@ -347,7 +350,8 @@ def index():
                            all_disciplinas=all_disciplinas,
                            priority_active=priority_active,
                            priority_allowed_names=priority_allowed_names,
-                           all_materias_names=all_materias_names)
+                           all_materias_names=all_materias_names,
+                           agenda_urls=agenda_urls)
 
 @horario_bp.route('/dashboard-instrutor', methods=['GET'])
 @login_required
@@ -449,6 +453,42 @@ def dashboard_instrutor():
         print(traceback.format_exc())
         return f"ERRO INTERNO: {str(e)}", 500
 
+@horario_bp.route('/api/minha-semana', methods=['GET'])
+@login_required
+@etag_json
+def api_minha_semana():
+    """
+    Semana atual do usuário logado (aluno: seu pelotão; instrutor: suas aulas) para o
+    service worker: é a única resposta autenticada que ele guarda, e a página
+    offline monta a semana a partir dela.
+    """
+    dados = HorarioService.semana_do_usuario(
+        current_user, UserService.get_current_school_id(), session.get('active_edicao_id')
+    )
+    tempos, _ = _get_horario_context_data()
+    dados['tempos'] = {str(i): horario for i, (_, horario) in enumerate(tempos, start=1)}
+    return jsonify(dados)
+
+@horario_bp.route('/agenda/<token>.ics', methods=['GET'])
+def agenda_ics(token):
+    """
+    Agenda ICS das aulas aprovadas, para assinatura no calendário do celular. Sem
+    login: o acesso vem do token assinado. O calendário revalida pelo ETag ou pelo
+    Last-Modified e recebe 304 enquanto nenhuma aula do pelotão/instrutor mudar.
+    """
+    feed = AgendaService.feed_do_token(token)
+    if not feed:
+        return "Agenda não encontrada.", 404
+
+    conteudo, etag, modificado = AgendaService.agenda(feed)
+    response = Response(conteudo, mimetype='text/calendar')
+    response.headers['Content-Disposition'] = 'inline; filename="horario.ics"'
+    response.set_etag(etag)
+    response.last_modified = modificado
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
 @horario_bp.route('/save-priority-config', methods=['POST'])
 @login_required
 @admin_or_programmer_required
@@ -507,6 +547,13 @@ def exportar_pdf():
         return jsonify({'success': False, 'error': str(e)})
 
 
+def _nome_arquivo_semana(semana):
+    semana_nome = semana.nome.replace(' ', '_').replace('/', '-').replace('\\', '-') if (semana and semana.nome) else 'semana'
+    for char in [':', '*', '?', '"', '<', '>', '|']:
+        semana_nome = semana_nome.replace(char, '')
+    return semana_nome
+
+
 # ==========================================
 # NOVA ROTA EXCLUSIVA PARA EXCEL
 # ==========================================
@@ -532,27 +579,22 @@ def exportar_excel():
     tempos, intervalos = _get_horario_context_data()
     
     try:
-        from ..services.xlsx_service import gerar_quadro_horario_xlsx
-        
-        xlsx_bytes = gerar_quadro_horario_xlsx(
-            pelotao=pelotao,
-            semana=semana,
-            horario_matrix=horario_matrix,
-            datas_semana=datas_semana,
-            tempos=tempos,
-            intervalos=intervalos
-        )
-        
-        semana_nome = semana.nome.replace(' ', '_').replace('/', '-').replace('\\', '-') if (semana and semana.nome) else 'semana'
-        for char in [':', '*', '?', '"', '<', '>', '|']:
-            semana_nome = semana_nome.replace(char, '')
-        filename = f"quadro_horario_{pelotao.replace(' ', '_')}_{semana_nome}.xlsx"
-        
-        return send_file(
-            io.BytesIO(xlsx_bytes),
-            as_attachment=True,
-            download_name=filename,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        from ..services.xlsx_service import gerar_quadro_horario_xlsx, resposta_xlsx
+
+        filename = f"quadro_horario_{pelotao.replace(' ', '_')}_{_nome_arquivo_semana(semana)}.xlsx"
+
+        # Planilha gravada em modo write-only num arquivo temporário, enviado em streaming
+        return resposta_xlsx(
+            lambda caminho: gerar_quadro_horario_xlsx(
+                pelotao=pelotao,
+                semana=semana,
+                horario_matrix=horario_matrix,
+                datas_semana=datas_semana,
+                tempos=tempos,
+                intervalos=intervalos,
+                destino=caminho
+            ),
+            filename
         )
     except Exception as e:
         current_app.logger.error(f"Erro ao gerar Excel: {str(e)}\n{traceback.format_exc()}")
@@ -560,6 +602,67 @@ def exportar_excel():
         return redirect(url_for('horario.index'))
 
 
+@horario_bp.route('/exportar-excel-semana')
+@login_required
+@admin_or_programmer_required
+def exportar_excel_semana():
+    """Uma planilha com todos os pelotões da semana (uma aba por pelotão)."""
+    semana_id = request.args.get('semana_id', type=int)
+    semana = db.session.get(Semana, semana_id) if semana_id else None
+    active_school = UserService.get_current_school_id()
+
+    if not semana or (active_school and semana.ciclo.school_id != active_school):
+        flash('Semana não encontrada ou permissão negada.', 'danger')
+        return redirect(url_for('horario.index'))
+
+    pelotoes = db.session.scalars(
+        select(Turma.nome)
+        .where(Turma.school_id == semana.ciclo.school_id, Turma.edicao_id == semana.ciclo.edicao_id)
+        .order_by(Turma.nome)
+    ).all()
+
+    # Uma única consulta de horários para todos os pelotões
+    matrizes = HorarioService.construir_matrizes_semana(semana.id, current_user, pelotoes)
+    datas_semana = HorarioService.get_datas_da_semana(semana)
+    tempos, intervalos = _get_horario_context_data()
+
+    try:
+        from ..services.xlsx_service import gerar_quadro_semana_xlsx, resposta_xlsx
+
+        return resposta_xlsx(
+            lambda caminho: gerar_quadro_semana_xlsx(semana, matrizes, datas_semana, tempos, intervalos, destino=caminho),
+            f"quadro_horario_todos_{_nome_arquivo_semana(semana)}.xlsx"
+        )
+    except Exception as e:
+        current_app.logger.error(f"Erro ao gerar Excel da semana: {str(e)}\n{traceback.format_exc()}")
+        flash(f'Erro ao gerar documento Excel: {str(e)}', 'danger')
+        return redirect(url_for('horario.index'))
+
+
+@horario_bp.route('/gerar-rascunho', methods=['POST'])
+@login_required
+@admin_or_programmer_required
+def gerar_rascunho():
+    """Prévia (ou gravação, com aplicar) do rascunho automático da semana. Aulas entram como pendentes."""
+    data = request.get_json(silent=True) or {}
+    pelotao = data.get('pelotao')
+    pelotoes = None if not pelotao or pelotao == 'todos' else [pelotao]
+    aplicar = bool(data.get('aplicar'))
+
+    success, message, relatorio = GeradorHorarioService.gerar(
+        data.get('semana_id'), pelotoes=pelotoes, aplicar=aplicar, completar=bool(data.get('completar'))
+    )
+
+    if success and aplicar and relatorio['aplicado']:
+        LogService.log(
+            action="Gerou Rascunho de Horário",
+            details=f"Rascunho automático da semana ID {relatorio['semana_id']} ({pelotao or 'todos'}). Sistema: {message}",
+            school_id=UserService.get_current_school_id()
+        )
+
+    return jsonify({'success': success, 'message': message, 'relatorio': relatorio}), 200 if success else 400
+
+
 @horario_bp.route('/editar/<path:pelotao>/<int:semana_id>/<int:ciclo_id>')
 @login_required
 @can_schedule_classes_required
@@ -592,6 +695,7 @@ def editar_horario_grid(pelotao, semana_id, ciclo_id):
 
 @horario_bp.route('/get-aula/<int:horario_id>')
 @login_required
+@etag_json
 def get_aula_details(horario_id):
     aula_details = HorarioService.get_aula_details(horario_id, current_user)
     if not aula_details:
@@ -1,15 +1,17 @@
 from flask import Blueprint, jsonify, send_file, abort
 from flask_login import login_required, current_user
 import os
-import json
+import mimetypes
 
 from backend.models.database import db
 from backend.models.background_job import BackgroundJob
+from backend.services.response_compression import etag_json
 
 jobs_bp = Blueprint('jobs', __name__, url_prefix='/api/jobs')
 
 @jobs_bp.route('/<string:job_id>/status', methods=['GET'])
 @login_required
+@etag_json
 def get_job_status(job_id):
     job = BackgroundJob.query.get(job_id)
     if not job:
@@ -27,8 +29,13 @@ def download_job_result(job_id):
     job = BackgroundJob.query.get(job_id)
     if not job:
         return abort(404, description="Job not found")
-        
-    if job.user_id != current_user.id and current_user.role not in ['super_admin', 'admin_escola']:
+
+    if job.task_type == 'school_backup':
+        # Backup completo da escola: só quem pediu, e enquanto ainda for staff daquela escola
+        school_id = job.get_meta().get('school_id')
+        if job.user_id != current_user.id or not school_id or not current_user.is_staff_in_school(int(school_id)):
+            return abort(403, description="Acesso negado")
+    elif job.user_id != current_user.id and current_user.role not in ['super_admin', 'admin_escola']:
         return abort(403, description="Acesso negado")
 
     if job.status != 'completed' or not job.result_path:
@@ -37,18 +44,12 @@ def download_job_result(job_id):
     if not os.path.exists(job.result_path):
         return abort(404, description="File not found on disk")
 
-    download_filename = os.path.basename(job.result_path)
-    if job.meta_data:
-        try:
-            meta = json.loads(job.meta_data)
-            if isinstance(meta, dict) and meta.get('filename'):
-                download_filename = meta['filename']
-        except Exception:
-            pass
+    download_filename = job.get_meta().get('filename') or os.path.basename(job.result_path)
+    mimetype = mimetypes.guess_type(download_filename)[0] or 'application/octet-stream'
 
     return send_file(
         job.result_path,
         as_attachment=True,
         download_name=download_filename,
-        mimetype='application/pdf'
+        mimetype=mimetype
     )
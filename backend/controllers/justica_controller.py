@@ -2,7 +2,6 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, g, Response, session
 from flask_login import login_required, current_user
 from urllib.parse import quote
-from weasyprint import HTML
 from sqlalchemy import select, or_
 from sqlalchemy.orm import joinedload
 from datetime import datetime, timedelta
@@ -72,84 +71,32 @@ def index():
 
         school_id = current_user.aluno_profile.turma.school_id
         g.active_school = current_user.aluno_profile.turma.school
-        aluno_id = current_user.aluno_profile.id
-
-        stmt_andamento = select(ProcessoDisciplina).options(
-            joinedload(ProcessoDisciplina.aluno).joinedload(Aluno.user),
-            joinedload(ProcessoDisciplina.aluno).joinedload(Aluno.turma)
-        ).where(
-            ProcessoDisciplina.aluno_id == aluno_id,
-            ProcessoDisciplina.status != StatusProcesso.FINALIZADO.value,
-            ProcessoDisciplina.status != StatusProcesso.ARQUIVADO.value
-        ).order_by(ProcessoDisciplina.data_ocorrencia.desc())
-
-        stmt_finalizados = select(ProcessoDisciplina).options(
-            joinedload(ProcessoDisciplina.aluno).joinedload(Aluno.user),
-            joinedload(ProcessoDisciplina.aluno).joinedload(Aluno.turma)
-        ).where(
-            ProcessoDisciplina.aluno_id == aluno_id,
-            or_(ProcessoDisciplina.status == StatusProcesso.FINALIZADO.value, ProcessoDisciplina.status == StatusProcesso.ARQUIVADO.value)
-        )
-
-        # Filtro de pesquisa para o aluno
-        if search_query:
-            search_filter = ProcessoDisciplina.fato_constatado.ilike(f'%{search_query}%')
-            if search_query.isdigit():
-                search_filter = or_(search_filter, ProcessoDisciplina.id == int(search_query))
-            stmt_finalizados = stmt_finalizados.where(search_filter)
 
-        stmt_finalizados = stmt_finalizados.order_by(ProcessoDisciplina.data_decisao.desc())
+        # Alunos veem só os próprios processos (sem filtro de escola/edição)
+        filtros = {}
 
     else:
         if not school_id:
             flash("Nenhuma escola selecionada.", "warning")
             return redirect(url_for('main.dashboard'))
 
-        active_edicao = session.get('active_edicao_id')
-        edicao_filter = or_(Turma.edicao_id == active_edicao, Turma.edicao_id.is_(None)) if active_edicao else True
-
-        stmt_andamento = select(ProcessoDisciplina).join(Aluno).join(Turma).options(
-            joinedload(ProcessoDisciplina.aluno).joinedload(Aluno.user),
-            joinedload(ProcessoDisciplina.aluno).joinedload(Aluno.turma)
-        ).where(
-            Turma.school_id == school_id,
-            edicao_filter,
-            ProcessoDisciplina.status != StatusProcesso.FINALIZADO.value,
-            ProcessoDisciplina.status != StatusProcesso.ARQUIVADO.value
-        ).order_by(ProcessoDisciplina.data_ocorrencia.desc())
-
-        # CORREÇÃO CRUCIAL AQUI: Ordem exata das tabelas para o banco não se perder
-        stmt_finalizados = select(ProcessoDisciplina).join(Aluno, ProcessoDisciplina.aluno_id == Aluno.id).join(User, Aluno.user_id == User.id).join(Turma, Aluno.turma_id == Turma.id).options(
-            joinedload(ProcessoDisciplina.aluno).joinedload(Aluno.user),
-            joinedload(ProcessoDisciplina.aluno).joinedload(Aluno.turma)
-        ).where(
-            Turma.school_id == school_id,
-            edicao_filter,
-            or_(ProcessoDisciplina.status == StatusProcesso.FINALIZADO.value, ProcessoDisciplina.status == StatusProcesso.ARQUIVADO.value)
-        )
-
-        # Filtra em todo o banco de dados antes de criar as páginas
-        if search_query:
-            search_filter = or_(
-                User.nome_completo.ilike(f'%{search_query}%'),
-                ProcessoDisciplina.fato_constatado.ilike(f'%{search_query}%'),
-                User.matricula.ilike(f'%{search_query}%')
-            )
-            # Permite buscar pelo número exato do processo
-            if search_query.isdigit():
-                search_filter = or_(search_filter, ProcessoDisciplina.id == int(search_query))
-
-            stmt_finalizados = stmt_finalizados.where(search_filter)
+        filtros = {'school_id': school_id, 'edicao_id': session.get('active_edicao_id')}
 
-        stmt_finalizados = stmt_finalizados.order_by(ProcessoDisciplina.data_decisao.desc())
+    # Visibilidade, aba, pesquisa, ordenação e carga de aluno/usuário/turma numa consulta só por aba
+    stmt_andamento = JusticaService.query_processos(current_user, aba='andamento', **filtros)
+    stmt_finalizados = JusticaService.query_processos(current_user, aba='finalizados', busca=search_query, **filtros)
 
     page_andamento = request.args.get('page_andamento', 1, type=int)
-    em_andamento_paginados = db.paginate(stmt_andamento, page=page_andamento, per_page=50, error_out=False)
+    em_andamento_paginados = db.paginate(stmt_andamento, page=page_andamento, per_page=50, error_out=False, count=False)
     
     houve_alteracao = JusticaService.verificar_e_atualizar_prazos(em_andamento_paginados.items)
 
     if houve_alteracao:
-        em_andamento_paginados = db.paginate(stmt_andamento, page=page_andamento, per_page=50, error_out=False)
+        em_andamento_paginados = db.paginate(stmt_andamento, page=page_andamento, per_page=50, error_out=False, count=False)
+
+    # Totais das abas num único GROUP BY (depois dos prazos, que podem encerrar processos)
+    contagens = JusticaService.contar_por_aba(current_user, **filtros)
+    em_andamento_paginados.total = contagens['andamento']
         
     em_andamento = em_andamento_paginados.items
 
@@ -165,7 +112,10 @@ def index():
                 pass
 
     # Aqui o sistema "pica" os resultados da pesquisa global em páginas
-    finalizados_paginados = db.paginate(stmt_finalizados, page=page, per_page=50, error_out=False)
+    # (com pesquisa o total muda, então a paginação conta; sem ela, vale o GROUP BY)
+    finalizados_paginados = db.paginate(stmt_finalizados, page=page, per_page=50, error_out=False, count=bool(search_query))
+    if not search_query:
+        finalizados_paginados.total = contagens['finalizados']
 
     active_edicao_id = g.active_edicao.id if g.get('active_edicao') else session.get('active_edicao_id')
     turmas = TurmaService.get_turmas_by_school(school_id, edicao_id=active_edicao_id) if school_id else []
@@ -189,6 +139,7 @@ def index():
     return render_template('justica/index.html',
                            em_andamento=em_andamento,
                            em_andamento_paginados=em_andamento_paginados,
+                           contagens=contagens,
                            finalizados=finalizados_paginados,
                            active_tab=active_tab,
                            turmas=turmas,
@@ -219,6 +170,7 @@ def registrar_em_massa():
         flash("Nenhum aluno selecionado.", "warning")
         return redirect(url_for('justica.index'))
 
+    school_id = UserService.get_current_school_id()
     count = 0
     processos_criados = []
 
@@ -238,51 +190,53 @@ def registrar_em_massa():
                 pontos_iniciais = regra.pontos
                 codigo_final = regra.codigo
 
-        for aid in alunos_ids:
-            try:
-                novo_processo = ProcessoDisciplina(
-                    aluno_id=int(aid),
-                    relator_id=current_user.id,
-                    regra_id=int(regra_id) if (regra_id and origem_punicao == 'NPCCAL') else None,
-                    codigo_infracao=codigo_final,
-                    fato_constatado=descricao,
-                    observacao=observacao,
-                    data_ocorrencia=data_completa,
-                    data_registro=datetime.now().astimezone(),
-                    status=StatusProcesso.AGUARDANDO_CIENCIA.value,
-                    origem_punicao=origem_punicao,
-                    is_crime=is_crime,
-                    pontos=pontos_iniciais
-                )
-                db.session.add(novo_processo)
-                db.session.flush()
-                processos_criados.append(novo_processo)
-                count += 1
-            except Exception as e:
-                logger.error(f"Erro ao criar processo aluno {aid}: {e}")
+        # Um único INSERT para todos os alunos e um único lote de notificações
+        processos_criados = JusticaService.registrar_processos_em_lote(
+            alunos_ids,
+            relator_id=current_user.id,
+            school_id=school_id,
+            notificacao_url=url_for('justica.index', _external=True),
+            regra_id=int(regra_id) if (regra_id and origem_punicao == 'NPCCAL') else None,
+            codigo_infracao=codigo_final,
+            fato_constatado=descricao,
+            observacao=observacao,
+            data_ocorrencia=data_completa,
+            origem_punicao=origem_punicao,
+            is_crime=is_crime,
+            pontos=pontos_iniciais
+        )
+        count = len(processos_criados)
 
     elif tipo == 'elogio':
-        for aid in alunos_ids:
-            try:
-                novo_elogio = Elogio(aluno_id=int(aid), registrado_por_id=current_user.id,
-                                     data_elogio=data_completa, descricao=descricao, pontos=0.5)
-                db.session.add(novo_elogio)
-                count += 1
-            except Exception as e:
-                logger.error(f"Erro no elogio: {e}")
+        count = JusticaService.registrar_elogios_em_lote(
+            alunos_ids, current_user.id, data_completa, descricao, school_id=school_id
+        )
 
-    db.session.commit()
-    
     # --- ESPIÃO: REGISTRO EM MASSA ---
-    school_id = UserService.get_current_school_id()
+    # Registros, notificações, job de push e log gravados numa transação só
+    detalhes = f"O usuário gerou {count} registro(s) do tipo '{tipo}'."
+    if processos_criados:
+        detalhes += f" Processos: {', '.join(map(str, processos_criados))}."
     LogService.log(
         action="Registro em Massa (Justiça)",
-        details=f"O usuário gerou {count} registro(s) do tipo '{tipo}'.",
-        school_id=school_id
+        details=detalhes,
+        school_id=school_id,
+        commit=False
     )
     # ---------------------------------
+
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Erro no registro em massa: {e}")
+        flash("Erro ao gravar os registros. Nenhum registro foi criado.", "danger")
+        return redirect(url_for('justica.index'))
     
     flash(f"{count} registros criados.", "success")
+    ignorados = len(dict.fromkeys(alunos_ids)) - count
+    if tipo in ('infracao', 'elogio') and ignorados > 0:
+        flash(f"{ignorados} aluno(s) selecionado(s) não receberam o registro: não pertencem à escola ativa ou não foram encontrados.", "warning")
     return redirect(url_for('justica.index'))
 
 def _check_processo_permission(processo):
@@ -746,10 +700,23 @@ def imprimir_lote():
         flash("Nenhum processo selecionado para impressão.", "warning")
         return redirect(url_for('justica.index'))
 
+    ids = []
+    for pid in ids_selecionados:
+        if str(pid).isdigit() and int(pid) not in ids:
+            ids.append(int(pid))
+
+    # Processos, alunos e usuários numa consulta só (em vez de um get por processo)
+    carregados = {
+        p.id: p for p in db.session.scalars(
+            select(ProcessoDisciplina)
+            .options(joinedload(ProcessoDisciplina.aluno).joinedload(Aluno.user))
+            .where(ProcessoDisciplina.id.in_(ids))
+        ).unique()
+    }
     processos_para_imprimir = []
 
-    for pid in ids_selecionados:
-        proc = db.session.get(ProcessoDisciplina, int(pid))
+    for pid in ids:
+        proc = carregados.get(pid)
         if proc:
             if num_boletim:
                 msg_pub = f" | Publicado em Boletim Nº {num_boletim} em {datetime.now().strftime('%d/%m/%Y')}."
@@ -763,18 +730,21 @@ def imprimir_lote():
                     proc.observacao_decisao = msg_pub
             processos_para_imprimir.append(proc)
 
-    db.session.commit()
-    
     # --- ESPIÃO: IMPRIMIU EM LOTE ---
     school_id = UserService.get_current_school_id()
     LogService.log(
         action="Imprimiu Lote de Processos",
         details=f"O usuário gerou a impressão/boletim para {len(processos_para_imprimir)} processos.",
-        school_id=school_id
+        school_id=school_id,
+        commit=False
     )
     # --------------------------------
-    
-    return render_template('justica/imprimir_lote.html', processos=processos_para_imprimir, num_boletim=num_boletim)
+
+    # Renderiza antes do commit: depois dele os processos expiram e cada um seria recarregado
+    html = render_template('justica/imprimir_lote.html', processos=processos_para_imprimir, num_boletim=num_boletim)
+    db.session.commit()
+
+    return html
 
 # --- ROTAS FADA ---
 @justica_bp.route('/fada/boletim')
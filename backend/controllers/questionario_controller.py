@@ -1,4 +1,5 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort
+from collections import Counter
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort, Response
 from flask_login import login_required, current_user
 from sqlalchemy import select, func, distinct
 
@@ -7,7 +8,9 @@ from ..models.questionario import Questionario
 from ..models.pergunta import Pergunta
 from ..models.opcao_resposta import OpcaoResposta
 from ..models.resposta import Resposta
+from ..models.resultado_questionario import ResultadoQuestionario
 from ..models.user import User
+from ..services.questionario_service import QuestionarioService
 
 questionario_bp = Blueprint('questionario', __name__, url_prefix='/questionario')
 
@@ -115,20 +118,19 @@ def resultado(id):
         
     dados_graficos = {}
     respostas_texto = {}
-    
-    # Lógica simplificada de contagem
-    for pergunta in questionario.perguntas:
-        if pergunta.tipo == 'texto_livre':
-            respostas = db.session.scalars(select(Resposta).where(Resposta.pergunta_id == pergunta.id, Resposta.texto_livre.isnot(None))).all()
-            if respostas:
-                respostas_texto[pergunta.id] = {'texto': pergunta.texto, 'respostas': [r.texto_livre for r in respostas]}
+
+    # Totais vêm do resumo materializado; textos livres numa consulta só
+    textos = QuestionarioService.respostas_texto(id)
+    for pergunta in QuestionarioService.resultados(id):
+        if pergunta['tipo'] == 'texto_livre':
+            if textos.get(pergunta['id']):
+                respostas_texto[pergunta['id']] = {'texto': pergunta['texto'], 'respostas': textos[pergunta['id']]}
         else:
-            labels = [opcao.texto for opcao in pergunta.opcoes]
-            dados = []
-            for opcao in pergunta.opcoes:
-                count = db.session.query(func.count(Resposta.id)).filter_by(opcao_resposta_id=opcao.id).scalar()
-                dados.append(count or 0)
-            dados_graficos[pergunta.id] = {'labels': labels, 'dados': dados, 'texto': pergunta.texto}
+            dados_graficos[pergunta['id']] = {
+                'labels': [opcao['texto'] for opcao in pergunta['opcoes']],
+                'dados': [opcao['total'] for opcao in pergunta['opcoes']],
+                'texto': pergunta['texto'],
+            }
 
     return render_template(
         'questionario/resultado.html', 
@@ -137,6 +139,39 @@ def resultado(id):
         respostas_texto=respostas_texto
     )
 
+@questionario_bp.route('/resultado/<int:id>/exportar')
+@login_required
+def exportar_resultado(id):
+    if not (current_user.is_cal or current_user.is_sens or current_user.is_staff):
+        flash('Permissão negada.', 'danger')
+        return redirect(url_for('questionario.index'))
+
+    questionario = db.session.get(Questionario, id)
+    if not questionario:
+        flash('Questionário não encontrado.', 'danger')
+        return redirect(url_for('questionario.index'))
+
+    # Lê do resumo, não das respostas
+    resultados = QuestionarioService.resultados(id)
+    nome_arquivo = f"resultado_questionario_{questionario.id}"
+
+    if request.args.get('formato') == 'xlsx':
+        from ..services.xlsx_service import gerar_resultado_questionario_xlsx, resposta_xlsx
+
+        linhas = QuestionarioService.linhas_exportacao(resultados)
+        return resposta_xlsx(
+            lambda caminho: gerar_resultado_questionario_xlsx(
+                questionario.titulo, QuestionarioService.CABECALHO_EXPORTACAO, linhas, destino=caminho
+            ),
+            f"{nome_arquivo}.xlsx"
+        )
+
+    return Response(
+        QuestionarioService.exportar_csv(resultados),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={nome_arquivo}.csv'}
+    )
+
 @questionario_bp.route('/realizar/<int:id>', methods=['GET', 'POST'])
 @login_required
 def realizar(id):
@@ -152,6 +187,7 @@ def realizar(id):
         return redirect(url_for('questionario.index'))
 
     if request.method == 'POST':
+        contagem = Counter()
         for pergunta in questionario.perguntas:
             if pergunta.tipo == 'texto_livre':
                 texto = request.form.get(f'texto_livre_{pergunta.id}')
@@ -163,7 +199,10 @@ def realizar(id):
                 
                 for op_id in opcoes_ids:
                     db.session.add(Resposta(questionario_id=id, pergunta_id=pergunta.id, opcao_resposta_id=int(op_id), user_id=current_user.id, texto_livre=texto_outro))
-        
+                    contagem[(pergunta.id, int(op_id))] += 1
+
+        # Resumo atualizado na mesma transação das respostas
+        QuestionarioService.registrar_no_resumo(id, contagem)
         db.session.commit()
         flash('Respostas enviadas com sucesso!', 'success')
         return redirect(url_for('questionario.index'))
@@ -201,6 +240,7 @@ def excluir(id):
     
     q = db.session.get(Questionario, id)
     if q:
+        db.session.query(ResultadoQuestionario).filter_by(questionario_id=id).delete()
         db.session.query(Resposta).filter_by(questionario_id=id).delete()
         db.session.delete(q)
         db.session.commit()
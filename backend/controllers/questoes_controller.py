@@ -1,15 +1,21 @@
 import re
 import json
-import random
+import uuid
+from datetime import datetime
 from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, session, g
 from flask_login import login_required, current_user
 from markupsafe import escape
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
 
 from utils.decorators import super_admin_required
 from backend.models.database import db
 from backend.models import QuestaoBanco, DelegacaoProva, Disciplina, School, Instrutor, Turma, User
-from backend.models.banco_questoes import ConfiguracaoEnvio
+from backend.models.banco_questoes import ConfiguracaoEnvio, RascunhoProva
+from backend.models.background_job import BackgroundJob
 from backend.models.disciplina_turma import DisciplinaTurma
+from backend.services.questao_similaridade_service import QuestaoSimilaridadeService
+from backend.services.sorteio_questoes_service import SorteioQuestoesService
 
 questoes_bp = Blueprint('questoes', __name__, url_prefix='/questoes')
 
@@ -173,13 +179,47 @@ def ver_banco_disciplina(school_id, materia):
         Disciplina.materia == materia,
         QuestaoBanco.ativo == True
     ).all()
+    # Quase-duplicatas salvas no envio, aguardando aprovação ou descarte
+    pendentes = QuestaoBanco.query.join(Disciplina).options(joinedload(QuestaoBanco.similar_a)).filter(
+        QuestaoBanco.escola_id == school_id,
+        Disciplina.materia == materia,
+        QuestaoBanco.em_revisao == True
+    ).all()
 
     return render_template(
         'super_admin/questoes_banco_lista.html',
         escola=escola,
         materia=materia,
-        questoes=questoes
+        questoes=questoes,
+        pendentes=pendentes
+    )
+
+
+@questoes_bp.route('/api/duplicatas/<int:school_id>/<string:materia>', methods=['POST'])
+@login_required
+@super_admin_required
+def analisar_duplicatas(school_id, materia):
+    """
+    Enfileira a varredura de quase-duplicatas da matéria/escola no worker.
+    O resultado é um CSV com os grupos de questões parecidas para revisão.
+    """
+    School.query.get_or_404(school_id)
+    job_id = str(uuid.uuid4())
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    job = BackgroundJob(
+        id=job_id,
+        task_type='questoes_duplicadas',
+        meta_data=json.dumps({
+            "filename": f"duplicatas_{re.sub(r'[^A-Za-z0-9]+', '_', materia)}_{timestamp}.csv",
+            "school_id": school_id,
+            "materia": materia,
+            "progress": 0
+        }),
+        user_id=current_user.id
     )
+    db.session.add(job)
+    db.session.commit()
+    return jsonify({'success': True, 'job_id': job_id})
 
 
 @questoes_bp.route('/api/delegar-prova', methods=['POST'])
@@ -257,6 +297,23 @@ def remover_questao_banco(id):
     return jsonify({'success': True, 'message': 'Questão removida com sucesso.'})
 
 
+@questoes_bp.route('/api/questao/revisao/<int:id>', methods=['POST'])
+@login_required
+@super_admin_required
+def revisar_questao_banco(id):
+    """
+    Aprova (ativa) ou descarta uma questão salva em revisão por ser muito
+    parecida com outra já cadastrada. Descartada, ela continua inativa.
+    """
+    questao = QuestaoBanco.query.filter_by(id=id, em_revisao=True).first_or_404()
+    aprovar = bool((request.get_json(silent=True) or {}).get('aprovar'))
+    questao.em_revisao = False
+    questao.ativo = aprovar
+    db.session.commit()
+    msg = 'Questão aprovada e incluída no banco.' if aprovar else 'Questão descartada.'
+    return jsonify({'success': True, 'message': msg})
+
+
 # =========================================================================
 # ROTAS DO INSTRUTOR (ENVIO E MOTOR INTELIGENTE)
 # =========================================================================
@@ -353,24 +410,48 @@ def salvar_questoes():
             return jsonify({'success': False, 'message': 'Você já enviou questões para esta disciplina. Solicite liberação ao Super Admin.'}), 403
 
         # === NOVA REGRA 2: Filtro Anti-Duplicidade ===
-        # Puxa apenas os textos (enunciados) que já existem no banco para esta matéria
-        existentes = QuestaoBanco.query.filter_by(disciplina_id=disciplina.id).with_entities(QuestaoBanco.enunciado).all()
-        enunciados_db = {q[0].strip().lower() for q in existentes}
-
-        salvas_count = 0
-        duplicadas_count = 0
-
+        # Cópias exatas e reescritas leves são detectadas pelo índice MinHash/LSH:
+        # só as questões que colidem em alguma banda são consultadas, sem carregar
+        # todos os enunciados da matéria.
+        questoes_validas = []
+        vistos = set()
         for q_data in questoes_lista:
             enunciado_limpo = q_data['enunciado'].strip()
+            chave = QuestaoSimilaridadeService.normalizar(enunciado_limpo)
+            # Evita que o instrutor cole a mesma questão 2x no mesmo envio
+            if chave in vistos:
+                continue
+            vistos.add(chave)
+            questoes_validas.append((enunciado_limpo, chave, q_data))
+
+        duplicadas_count = len(questoes_lista) - len(questoes_validas)
+
+        # Questões antigas ainda sem assinatura entram no índice antes da busca
+        QuestaoSimilaridadeService.indexar_pendentes([disciplina.id])
+
+        # A busca inclui questões removidas e em revisão: reenviar uma delas não pode
+        # desfazer a remoção ou a decisão da revisão
+        assinaturas = [QuestaoSimilaridadeService.assinatura(e) for e, _, _ in questoes_validas]
+        similares = QuestaoSimilaridadeService.buscar_similares(disciplina.id, assinaturas, incluir_inativas=True)
+
+        # Enunciado igual (após normalizar) gera a mesma assinatura, então toda cópia
+        # exata aparece entre as candidatas com similaridade 1.0
+        ids_identicos = {qid for encontradas in similares for qid, sim in encontradas if sim >= 1.0}
+        exatas = {
+            QuestaoSimilaridadeService.normalizar(e) for e in db.session.scalars(
+                select(QuestaoBanco.enunciado).where(QuestaoBanco.id.in_(ids_identicos))
+            )
+        } if ids_identicos else set()
 
-            # Se o texto já existe no banco, pula essa questão
-            if enunciado_limpo.lower() in enunciados_db:
+        salvas_count = 0
+        quase_duplicadas = []
+        novas = []
+
+        for (enunciado_limpo, chave, q_data), assinatura, encontradas in zip(questoes_validas, assinaturas, similares):
+            if chave in exatas:
                 duplicadas_count += 1
                 continue
 
-            # Adiciona na lista temporária para evitar que o instrutor cole a mesma questão 2x no mesmo envio
-            enunciados_db.add(enunciado_limpo.lower())
-
             nova_questao = QuestaoBanco(
                 disciplina_id=disciplina.id,
                 escola_id=escola_id,
@@ -381,17 +462,47 @@ def salvar_questoes():
                 assunto="Geral",
                 ativo=True
             )
+
+            # Quase-duplicata (de uma questão do banco ou de outra deste mesmo envio):
+            # é salva inativa e marcada para revisão do Super Admin, não descartada
+            similaridade = None
+            if encontradas:
+                questao_id, similaridade = encontradas[0]
+                nova_questao.similar_a_id = questao_id
+            else:
+                for outra, outra_assinatura in novas:
+                    valor = QuestaoSimilaridadeService.similaridade(assinatura, outra_assinatura)
+                    if valor >= QuestaoSimilaridadeService.LIMIAR_DUPLICATA:
+                        nova_questao.similar_a, similaridade = outra, valor
+                        break
+
+            if similaridade is not None:
+                nova_questao.ativo = False
+                nova_questao.em_revisao = True
+                quase_duplicadas.append((nova_questao, enunciado_limpo[:120], round(similaridade, 2)))
+            else:
+                novas.append((nova_questao, assinatura))
+                salvas_count += 1
+
+            QuestaoSimilaridadeService.indexar(nova_questao, assinatura)
             db.session.add(nova_questao)
-            salvas_count += 1
 
         db.session.commit()
+        quase_duplicadas = [{
+            'enunciado': enunciado,
+            'questao_id': questao.id,
+            'similar_a_id': questao.similar_a_id,
+            'similaridade': similaridade,
+        } for questao, enunciado, similaridade in quase_duplicadas]
 
         # Monta a mensagem inteligente que aparecerá na tela final do seu colega
         msg_final = f'{salvas_count} questões inéditas salvas com sucesso no banco!'
         if duplicadas_count > 0:
             msg_final += f' (Atenção: {duplicadas_count} questões foram ignoradas por já existirem no banco).'
+        if quase_duplicadas:
+            msg_final += f' {len(quase_duplicadas)} questão(ões) muito parecidas com outras já cadastradas foram salvas para revisão do Super Admin.'
 
-        return jsonify({'success': True, 'message': msg_final})
+        return jsonify({'success': True, 'message': msg_final, 'quase_duplicadas': quase_duplicadas})
 
     except Exception as e:
         db.session.rollback()
@@ -456,8 +567,11 @@ def minhas_provas():
 @questoes_bp.route('/gerar-rascunho/<int:delegacao_id>', methods=['POST'])
 @login_required
 def gerar_rascunho(delegacao_id):
-    """Realiza o sorteio aleatório das questões e cria/atualiza o Rascunho."""
+    """Realiza o sorteio estratificado das questões e cria/atualiza o Rascunho."""
     qtd = request.form.get('qtd_questoes', type=int, default=30)
+    modo = request.form.get('distribuicao', 'proporcional')
+    semente = request.form.get('semente', type=int)
+    evitar_recentes = bool(request.form.get('evitar_recentes'))
     delegacao = DelegacaoProva.query.get_or_404(delegacao_id)
 
     # 1. Trava de Segurança (IDOR): Garante que o usuário logado é o dono desta delegação
@@ -466,33 +580,42 @@ def gerar_rascunho(delegacao_id):
         flash("Acesso negado. Esta delegação pertence a outro instrutor.", "danger")
         return redirect(url_for('questoes.minhas_provas'))
 
-    # 2. Busca TODAS as questões ATIVAS desta disciplina no banco
-    todas_questoes = QuestaoBanco.query.filter_by(
-        disciplina_id=delegacao.disciplina_id,
-        ativo=True
-    ).all()
-
-    # 3. Valida se há questões suficientes para o sorteio
-    if len(todas_questoes) < qtd:
-        flash(f"Erro: O banco possui apenas {len(todas_questoes)} questões cadastradas para esta matéria. Peça aos instrutores para enviarem mais ou diminua a quantidade da prova.", "warning")
+    # 2. Sorteio por estratos (assunto x escola de origem) feito sobre os IDs;
+    # só as questões sorteadas são carregadas depois, no rascunho
+    try:
+        cotas_assunto = SorteioQuestoesService.interpretar_cotas(request.form.get('cotas_assunto'))
+        SorteioQuestoesService.gerar_rascunho(
+            delegacao, qtd, modo=modo, cotas_assunto=cotas_assunto,
+            semente=semente, evitar_recentes=evitar_recentes
+        )
+    except ValueError as e:
+        flash(f"Erro: {e}", "warning")
         return redirect(url_for('questoes.minhas_provas'))
 
-    # 4. A Mágica do Sorteio Aleatório
-    questoes_sorteadas = random.sample(todas_questoes, k=qtd)
-    ids_sorteados = [q.id for q in questoes_sorteadas] # Salva apenas os IDs numéricos (ocupa menos espaço no banco)
-
-    # 5. Salva no banco de dados (Cria novo rascunho ou atualiza se já existir)
-    rascunho = RascunhoProva.query.filter_by(delegacao_id=delegacao.id).first()
-    if rascunho:
-        rascunho.questoes_selecionadas = ids_sorteados
-    else:
-        rascunho = RascunhoProva(delegacao_id=delegacao.id, questoes_selecionadas=ids_sorteados)
-        db.session.add(rascunho)
-
     db.session.commit()
 
     flash("Rascunho gerado com sucesso! Você já pode conferir a prova.", "success")
-    # Redirecionará para a tela do rascunho (que criaremos no próximo passo)
+    return redirect(url_for('questoes.ver_rascunho', delegacao_id=delegacao.id))
+
+@questoes_bp.route('/rascunho/<int:delegacao_id>/refazer', methods=['POST'])
+@login_required
+def refazer_rascunho(delegacao_id):
+    """Refaz o sorteio com a semente guardada, reproduzindo a mesma seleção de questões."""
+    delegacao = DelegacaoProva.query.get_or_404(delegacao_id)
+
+    instrutor = Instrutor.query.filter_by(user_id=current_user.id).first()
+    if not instrutor or delegacao.instrutor_id != instrutor.id:
+        flash("Acesso negado.", "danger")
+        return redirect(url_for('questoes.minhas_provas'))
+
+    try:
+        SorteioQuestoesService.regerar_rascunho(delegacao)
+    except ValueError as e:
+        flash(f"Erro: {e}", "warning")
+        return redirect(url_for('questoes.ver_rascunho', delegacao_id=delegacao.id))
+
+    db.session.commit()
+    flash("Rascunho refeito a partir da semente registrada.", "success")
     return redirect(url_for('questoes.ver_rascunho', delegacao_id=delegacao.id))
 
 @questoes_bp.route('/rascunho/<int:delegacao_id>', methods=['GET'])
@@ -513,11 +636,7 @@ def ver_rascunho(delegacao_id):
         flash("Nenhum rascunho gerado ainda. Sorteie as questões primeiro.", "info")
         return redirect(url_for('questoes.minhas_provas'))
 
-    # Carrega as questões reais do banco baseadas na lista de IDs sorteados
-    questoes = []
-    for qid in rascunho.questoes_selecionadas:
-        q = QuestaoBanco.query.get(qid)
-        if q and q.ativo:
-            questoes.append(q)
+    # Carrega as questões reais do banco (uma consulta) na ordem sorteada
+    questoes = SorteioQuestoesService.carregar_questoes(rascunho.questoes_selecionadas)
 
-    return render_template('instrutor/rascunho_prova.html', delegacao=delegacao, questoes=questoes)
\ No newline at end of file
+    return render_template('instrutor/rascunho_prova.html', delegacao=delegacao, questoes=questoes, rascunho=rascunho)
\ No newline at end of file
@@ -9,20 +9,18 @@ from backend.models.disciplina import Disciplina
 from backend.models.turma import Turma
 from backend.models.user import User  # Necessário para listar instrutores/comandantes
 from backend.services.asset_service import AssetService
+from backend.services.upload_store_service import UploadStoreService
 from werkzeug.utils import secure_filename
 import base64
-import uuid
-import shutil
 
 def process_signature(user, tipo, dados, salvar_padrao=False):
-    """Processa e salva assinatura para um Recurso, atualizando o User se salvar_padrao=True"""
+    """
+    Processa e salva assinatura para um Recurso, atualizando o User se salvar_padrao=True.
+    Retorna o caminho no armazenamento por conteúdo; quem grava o caminho numa coluna
+    deve registrar a referência (UploadStoreService.swap/acquire).
+    """
     base_path = current_app.static_folder
-    upload_folder = os.path.join(base_path, 'uploads', 'signatures')
-    os.makedirs(upload_folder, exist_ok=True)
-    
-    filename = f"sig_recurso_{user.id}_{uuid.uuid4().hex[:8]}.jpg"
-    filepath = os.path.join(upload_folder, filename)
-    db_path = f"uploads/signatures/{filename}"
+    bucket = UploadStoreService.BUCKET_ASSINATURAS
     
     try:
         if tipo == 'padrao':
@@ -41,36 +39,34 @@ def process_signature(user, tipo, dados, salvar_padrao=False):
                 # Assinatura corrompida ou vazia (provável resquício do bug antigo)
                 return None
                 
-            shutil.copy2(full_padrao_path, filepath)
+            db_path = padrao_path
         elif tipo == 'canvas':
             if not dados or not isinstance(dados, str) or len(dados) < 100:
                 return None
             encoded = dados.split(',', 1)[1] if ',' in dados else dados
-            with open(filepath, 'wb') as f: f.write(base64.b64decode(encoded))
+            db_path = UploadStoreService.put(base64.b64decode(encoded), 'jpg', bucket).path
         elif tipo == 'upload':
             if not dados or not hasattr(dados, 'save') or not dados.filename:
                 return None
-            dados.save(filepath)
+            db_path = UploadStoreService.put(dados, 'jpg', bucket).path
         else:
             return None
             
         if salvar_padrao and tipo != 'padrao':
-            if user.assinatura_padrao_path:
-                old_path = os.path.join(base_path, user.assinatura_padrao_path)
-                if os.path.exists(old_path):
-                    try: os.remove(old_path)
-                    except: pass
-            
-            filename_padrao = f"user_padrao_{user.id}.jpg"
-            filepath_padrao = os.path.join(upload_folder, filename_padrao)
-            shutil.copy2(filepath, filepath_padrao)
-            user.assinatura_padrao_path = f"uploads/signatures/{filename_padrao}"
+            UploadStoreService.swap(user.assinatura_padrao_path, db_path)
+            user.assinatura_padrao_path = db_path
             
         return db_path
     except Exception as e:
         print(f"Erro processando assinatura: {e}")
         return None
 
+def _liberar_uploads(recurso):
+    """Libera as referências do recurso no armazenamento de uploads antes de excluí-lo."""
+    for caminho in (recurso.assinatura_aluno, recurso.assinatura_instrutor, recurso.assinatura_comandante):
+        UploadStoreService.release(caminho)
+    UploadStoreService.release(recurso.arquivo_anexo, base='uploads/recursos_anexos')
+
 recursos_bp = Blueprint('recursos', __name__, url_prefix='/recursos')
 
 @recursos_bp.route('/')
@@ -374,12 +370,14 @@ def salvar_parecer(recurso_id):
         if tipo_acao == 'parecer_instrutor':
             if current_user.id == recurso.instrutor_id:
                 recurso.parecer_instrutor = request.form.get('conteudo_texto')
+                UploadStoreService.swap(recurso.assinatura_instrutor, assinatura_path)
                 recurso.assinatura_instrutor = assinatura_path
             elif current_user.id == recurso.instrutor2_id:
                 recurso.parecer_instrutor2 = request.form.get('conteudo_texto')
                 # Por simplicidade o segundo instrutor também pode salvar aqui se não houver um campo assinatura_instrutor2 (só sobrescreve ou ignora)
                 # Assumindo que a principal é do instrutor_id, se for o 2 a gente poderia salvar em um assinatura_instrutor2. Como não existe, vamos salvar na mesma se estiver vazia
                 if not recurso.assinatura_instrutor:
+                    UploadStoreService.acquire(assinatura_path)
                     recurso.assinatura_instrutor = assinatura_path
             
             # Verifica se ainda falta algum instrutor dar o parecer
@@ -392,6 +390,7 @@ def salvar_parecer(recurso_id):
                 recurso.status = "Com Instrutor"
         else:
             recurso.decisao_comandante = request.form.get('conteudo_texto')
+            UploadStoreService.swap(recurso.assinatura_comandante, assinatura_path)
             recurso.assinatura_comandante = assinatura_path
             recurso.status = request.form.get('status_final')
             # A resposta final que o aluno vê na lista dele
@@ -443,6 +442,7 @@ def novo_recurso():
                     argumentacao_texto=argumentacoes[i] if i < len(argumentacoes) else "",
                     assinatura_aluno=assinatura_path
                 )
+                UploadStoreService.acquire(assinatura_path)
                 if i < len(arquivos) and arquivos[i].filename != '':
                     filename = AssetService.save_file(arquivos[i], folder='recursos_anexos')
                     novo.arquivo_anexo = filename
@@ -585,6 +585,7 @@ def excluir_recurso_aluno(recurso_id):
         return redirect(url_for('recursos.index'))
         
     try:
+        _liberar_uploads(recurso)
         db.session.delete(recurso)
         db.session.commit()
         flash("Recurso excluído com sucesso.", "success")
@@ -607,6 +608,7 @@ def excluir_recurso_admin(recurso_id):
     recurso = Recurso.query.get_or_404(recurso_id)
     
     try:
+        _liberar_uploads(recurso)
         db.session.delete(recurso)
         db.session.commit()
         flash(f"Recurso #{recurso.id} excluído com sucesso.", "success")
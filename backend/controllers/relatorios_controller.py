@@ -1,14 +1,12 @@
 # backend/controllers/relatorios_controller.py
 
-from flask import Blueprint, render_template, request, flash, redirect, url_for, send_file, jsonify
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
 from flask_login import login_required, current_user
 from datetime import datetime
 from typing import Optional
-import io
 import locale
 import json
 
-from weasyprint import HTML
 from werkzeug.utils import secure_filename
 import uuid
 
@@ -18,7 +16,6 @@ from ..models.database import db
 from ..services.instrutor_service import InstrutorService
 from ..services.site_config_service import SiteConfigService
 from ..services.user_service import UserService
-from ..services.xlsx_service import gerar_mapa_gratificacao_xlsx
 from utils.decorators import admin_or_programmer_required
 
 relatorios_bp = Blueprint('relatorios', __name__, url_prefix='/relatorios')
@@ -238,10 +235,32 @@ def processar_exportacao_final(form_data):
             # Retorna JSON para a tela indicando sucesso e o ID do job
             return jsonify({'success': True, 'job_id': job_id})
 
+        elif action == 'google_sheets':
+            # Upload para o Drive feito pelo worker; a URL da planilha volta em /api/jobs/<id>/status (result_url)
+            export_ctx = dict(
+                contexto,
+                data_emissao=data_fim.isoformat(),
+                data_fim=data_fim.isoformat(),
+                digitador_nome=(getattr(current_user, 'nome_completo', None) or current_user.username),
+            )
+            job_id = str(uuid.uuid4())
+            job = BackgroundJob(
+                id=job_id,
+                task_type='export_google_sheets',
+                meta_data=json.dumps({"contexto": export_ctx}, ensure_ascii=False),
+                user_id=current_user.id
+            )
+            db.session.add(job)
+            db.session.commit()
+            return jsonify({'success': True, 'job_id': job_id})
+
         elif action == 'download_xlsx':
+            from ..services.xlsx_service import gerar_mapa_gratificacao_xlsx, resposta_xlsx
+
+            xlsx_name = _build_filename('relatorio_horas_aula', contexto.get("nome_mes_ano"), 'xlsx')
             try:
-                xlsx_bytes = gerar_mapa_gratificacao_xlsx(
-                    dados=dados_editados, 
+                return resposta_xlsx(lambda caminho: gerar_mapa_gratificacao_xlsx(
+                    dados=dados_editados,
                     valor_hora_aula=valor_hora_aula, 
                     nome_mes_ano=contexto["nome_mes_ano"] or '',
                     titulo_curso=contexto["titulo_curso"] or '',
@@ -255,15 +274,13 @@ def processar_exportacao_final(form_data):
                     auxiliar_funcao=contexto["auxiliar_funcao"] or '',
                     comandante_funcao=contexto["comandante_funcao"] or '',
                     data_fim=data_fim,
-                    cidade_assinatura=contexto["cidade"] or 'Santa Maria'
-                )
+                    cidade_assinatura=contexto["cidade"] or 'Santa Maria',
+                    destino=caminho
+                ), xlsx_name)
             except Exception as e:
                 flash(f'Erro ao gerar XLSX: {str(e)}', 'danger')
                 return redirect(url_for('relatorios.index'))
 
-            xlsx_name = _build_filename('relatorio_horas_aula', contexto.get("nome_mes_ano"), 'xlsx')
-            return send_file(io.BytesIO(xlsx_bytes), as_attachment=True, download_name=xlsx_name, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-
         return render_template('relatorios/editar_mapa_horas.html', **contexto)
     except Exception as e:
         db.session.rollback()
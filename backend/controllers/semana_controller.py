@@ -169,6 +169,33 @@ def deletar_semana(semana_id):
     flash('Ocorreu um erro ao tentar deletar.', 'danger')
     return redirect(url_for('semana.gerenciar_semanas'))
 
+@semana_bp.route('/clonar/<int:semana_id>', methods=['POST'])
+@login_required
+@school_admin_or_programmer_required
+def clonar_semana(semana_id):
+    form = DeleteForm()
+    semana = db.session.get(Semana, semana_id)
+    if not form.validate_on_submit() or not semana:
+        flash('Ocorreu um erro ao tentar clonar a semana.', 'danger')
+        return redirect(url_for('semana.gerenciar_semanas'))
+
+    status = 'confirmado' if request.form.get('confirmar_aulas') else 'pendente'
+    success, message, relatorio = SemanaService.clonar_semana(semana_id, request.form.get('quantidade'), status)
+    flash(message, 'success' if success else 'danger')
+
+    if success and relatorio['conflitos']:
+        conflitos = relatorio['conflitos']
+        linhas = [
+            f"{c['semana']} / {c['pelotao']} / {c['dia_semana']} {c['periodo']}º: "
+            f"{c['instrutor']} já tem aula em {c['pelotao_conflito']} ({c['escola']})"
+            for c in conflitos[:10]
+        ]
+        if len(conflitos) > 10:
+            linhas.append(f"... e mais {len(conflitos) - 10} conflito(s).")
+        flash("⚠️ CONFLITOS DE AGENDA nas semanas criadas: " + "; ".join(linhas), 'warning')
+
+    return redirect(url_for('semana.gerenciar_semanas', ciclo_id=semana.ciclo_id))
+
 @semana_bp.route('/ciclo/adicionar', methods=['POST'])
 @login_required
 @admin_or_programmer_required
@@ -232,6 +259,24 @@ def deletar_ciclo(ciclo_id):
     flash(message, category)
     return redirect(url_for('semana.gerenciar_semanas'))
 
+@semana_bp.route('/ciclo/previa-exclusao/<int:ciclo_id>', methods=['GET'])
+@login_required
+@admin_or_programmer_required
+def previa_exclusao_ciclo(ciclo_id):
+    success, message, contagens = SemanaService.previa_exclusao_ciclo(ciclo_id)
+    if not success:
+        return jsonify({'success': False, 'message': message}), 404
+    return jsonify({'success': True, 'contagens': contagens})
+
+@semana_bp.route('/previa-exclusao/<int:semana_id>', methods=['GET'])
+@login_required
+@school_admin_or_programmer_required
+def previa_exclusao_semana(semana_id):
+    success, message, contagens = SemanaService.previa_exclusao_semana(semana_id)
+    if not success:
+        return jsonify({'success': False, 'message': message}), 404
+    return jsonify({'success': True, 'contagens': contagens})
+
 @semana_bp.route('/<int:semana_id>/salvar-prioridade', methods=['POST'])
 @login_required
 @school_admin_or_programmer_required
@@ -1,4 +1,3 @@
-import os
 from datetime import datetime
 from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify
 from flask_login import login_required, current_user
@@ -6,7 +5,8 @@ from werkzeug.utils import secure_filename
 
 from ..models.database import db
 from ..models.chamado_suporte import ChamadoSuporte
-from utils.image_utils import allowed_file, generate_unique_filename
+from ..services.upload_store_service import UploadStoreService
+from utils.image_utils import allowed_file
 
 suporte_bp = Blueprint('suporte', __name__, url_prefix='/suporte')
 
@@ -31,15 +31,10 @@ def novo_chamado():
         if file and file.filename != '':
             ALLOWED_ASSET_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp', 'pdf', 'doc', 'docx'}
             if allowed_file(file.filename, file.stream, ALLOWED_ASSET_EXTENSIONS):
-                upload_folder = os.path.join(current_app.root_path, '..', 'static', 'uploads')
-                os.makedirs(upload_folder, exist_ok=True)
-                
                 original_filename = secure_filename(file.filename)
-                unique_filename = generate_unique_filename(original_filename)
-                file_path = os.path.join(upload_folder, unique_filename)
-                
-                file.stream.seek(0)
-                file.save(file_path)
+                ext = original_filename.rsplit('.', 1)[1] if '.' in original_filename else 'bin'
+                # Caminho relativo a static/uploads, como o template espera (suporte/ab/cd/<sha256>.ext)
+                unique_filename = UploadStoreService.save(file, ext, UploadStoreService.BUCKET_SUPORTE, base='uploads')
             else:
                 flash('Tipo de arquivo não permitido.', 'error')
                 return redirect(request.url)
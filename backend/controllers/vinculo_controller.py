@@ -155,6 +155,12 @@ def editar_vinculo(vinculo_id):
     form.disciplina_id.choices = [(d.id, d.materia) for d in turma_real.disciplinas]
     
     if form.validate_on_submit():
+        # Prévia: mostra quantas aulas serão reatribuídas/mantidas, sem salvar
+        if request.form.get('acao') == 'previa':
+            previa = VinculoService.preview_edit_vinculo(vinculo_id)
+            return render_template('editar_vinculo.html', form=form, vinculo=vinculo, turma=turma_real,
+                                   previa=previa, motivos=VinculoService.MOTIVOS_IGNORADOS)
+
         success, message = VinculoService.edit_vinculo(vinculo_id, form.data)
         
         # --- ESPIÃO: EDITOU VÍNCULO ---
@@ -1,5 +1,9 @@
 # backend/extensions.py
 
+import logging
+import os
+import threading
+
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_wtf.csrf import CSRFProtect
@@ -10,4 +14,35 @@ limiter = Limiter(
     storage_uri="memory://", # Define explicitamente a memória para remover o aviso do log
 )
 
-csrf = CSRFProtect()
\ No newline at end of file
+csrf = CSRFProtect()
+
+
+# --- FIREBASE (carregado no primeiro uso) ---
+# firebase_admin puxa google-auth/requests/grpc: importar só quando um push for enviado
+_firebase_lock = threading.Lock()
+
+
+def get_firebase_messaging():
+    """
+    Inicializa o Firebase Admin SDK na primeira chamada e retorna o módulo
+    firebase_admin.messaging (None se as credenciais não estiverem disponíveis).
+    """
+    from flask import current_app
+
+    cred_path = current_app.config.get('FIREBASE_CREDENTIALS_PATH')
+    if not cred_path or not os.path.exists(cred_path):
+        return None
+    with _firebase_lock:
+        import firebase_admin
+        from firebase_admin import credentials, messaging
+
+        if not firebase_admin._apps:
+            try:
+                firebase_admin.initialize_app(credentials.Certificate(cred_path))
+                current_app.logger.info("Firebase Admin SDK inicializado com sucesso.")
+            except ValueError:
+                pass  # App já inicializado
+            except Exception as e:
+                logging.getLogger(__name__).error(f"ERRO ao inicializar o Firebase Admin SDK: {e}")
+                return None
+    return messaging
@@ -31,7 +31,7 @@ from .elogio import Elogio
 
 # --- NOVO MÓDULO: BANCO DE QUESTÕES E PROVAS ---
 # CORREÇÃO AQUI: Adicionado ConfiguracaoEnvio
-from .banco_questoes import QuestaoBanco, DelegacaoProva, RascunhoProva, ConfiguracaoEnvio
+from .banco_questoes import QuestaoBanco, QuestaoBancoBanda, DelegacaoProva, RascunhoProva, ConfiguracaoEnvio
 
 # --- NOVO MÓDULO: RECURSOS ---
 from .recurso import ProvaRecurso, Recurso, DisciplinaHabilitada
@@ -39,6 +39,15 @@ from .recurso import ProvaRecurso, Recurso, DisciplinaHabilitada
 # --- SUPORTE ---
 from .chamado_suporte import ChamadoSuporte
 
+# --- UPLOADS ENDEREÇADOS POR CONTEÚDO ---
+from .upload_blob import UploadBlob
+
+# --- FILA DE E-MAILS ---
+from .email_outbox import EmailOutbox
+
+# --- RESUMO DOS QUESTIONÁRIOS ---
+from .resultado_questionario import ResultadoQuestionario
+
 __all__ = [
     "db", "User", "School", "UserSchool", "Turma", "Aluno", "Disciplina",
     "HistoricoAluno", "HistoricoDisciplina", "TurmaCargo", "Semana", "Horario",
@@ -48,8 +57,8 @@ __all__ = [
     "FadaAvaliacao", "Ciclo", "Questionario", "Pergunta", "OpcaoResposta",
     "Resposta", "Elogio", 
     # CORREÇÃO AQUI: Adicionado ConfiguracaoEnvio
-    "QuestaoBanco", "DelegacaoProva", "RascunhoProva", "ConfiguracaoEnvio",
+    "QuestaoBanco", "QuestaoBancoBanda", "DelegacaoProva", "RascunhoProva", "ConfiguracaoEnvio",
     # MÓDULO DE RECURSOS
     "ProvaRecurso", "Recurso", "DisciplinaHabilitada",
-    "ChamadoSuporte"
+    "ChamadoSuporte", "UploadBlob", "EmailOutbox", "ResultadoQuestionario"
 ]
\ No newline at end of file
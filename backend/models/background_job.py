@@ -1,5 +1,6 @@
 from .database import db
 from datetime import datetime
+import json
 
 class BackgroundJob(db.Model):
     __tablename__ = 'background_jobs'
@@ -24,13 +25,33 @@ class BackgroundJob(db.Model):
     started_at = db.Column(db.DateTime, nullable=True)
     finished_at = db.Column(db.DateTime, nullable=True)
 
+    def get_meta(self) -> dict:
+        """Retorna o meta_data decodificado (dict vazio se ausente ou inválido)."""
+        if not self.meta_data:
+            return {}
+        try:
+            meta = json.loads(self.meta_data)
+            return meta if isinstance(meta, dict) else {}
+        except (TypeError, ValueError):
+            return {}
+
+    def update_meta(self, **values):
+        """Mescla valores no meta_data (ex: progresso reportado pelo worker)."""
+        meta = self.get_meta()
+        meta.update(values)
+        self.meta_data = json.dumps(meta, ensure_ascii=False)
+
     def to_dict(self):
+        meta = self.get_meta()
         return {
             'id': self.id,
             'task_type': self.task_type,
             'status': self.status,
             'result_path': self.result_path,
             'error_message': self.error_message,
+            'progress': meta.get('progress'),
+            'progress_message': meta.get('progress_message'),
+            'result_url': meta.get('result_url'),
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'started_at': self.started_at.isoformat() if self.started_at else None,
             'finished_at': self.finished_at.isoformat() if self.finished_at else None
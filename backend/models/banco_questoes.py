@@ -20,11 +20,33 @@ class QuestaoBanco(db.Model):
     criado_em = db.Column(db.DateTime, default=datetime.utcnow)
     ativo = db.Column(db.Boolean, default=True)
 
+    # Assinatura MinHash do enunciado (lista de inteiros), usada na detecção de quase-duplicatas
+    assinatura_minhash = db.Column(db.JSON, nullable=True)
+
+    # Quase-duplicata recebida no envio: fica inativa até o Super Admin aprovar ou descartar,
+    # apontando para a questão parecida que motivou a revisão
+    em_revisao = db.Column(db.Boolean, default=False, server_default=db.false(), nullable=False)
+    similar_a_id = db.Column(db.Integer, db.ForeignKey('questoes_banco.id', ondelete='SET NULL'), nullable=True)
+
     # Relacionamentos com Cascade para garantir que se a disciplina/escola/instrutor sumir, as questões somem
     disciplina = db.relationship('Disciplina', backref=db.backref('questoes_banco', cascade='all, delete-orphan'))
     escola = db.relationship('School', backref=db.backref('questoes_banco', cascade='all, delete-orphan'))
     instrutor = db.relationship('Instrutor', backref=db.backref('questoes_enviadas', cascade='all, delete-orphan'))
     edicao = db.relationship('Edicao', backref='questoes_banco')
+    bandas_lsh = db.relationship('QuestaoBancoBanda', backref='questao', cascade='all, delete-orphan', passive_deletes=True)
+    similar_a = db.relationship('QuestaoBanco', remote_side=[id])
+
+class QuestaoBancoBanda(db.Model):
+    """Índice LSH: um hash por banda da assinatura MinHash de cada questão"""
+    __tablename__ = 'questoes_banco_bandas'
+
+    id = db.Column(db.Integer, primary_key=True)
+    questao_id = db.Column(db.Integer, db.ForeignKey('questoes_banco.id', ondelete='CASCADE'), nullable=False, index=True)
+    disciplina_id = db.Column(db.Integer, nullable=False)
+    banda = db.Column(db.SmallInteger, nullable=False)
+    hash = db.Column(db.BigInteger, nullable=False)
+
+    __table_args__ = (db.Index('ix_questoes_banco_bandas_busca', 'disciplina_id', 'hash', 'banda'),)
 
 class ConfiguracaoEnvio(db.Model):
     """Tabela que salva se o envio está aberto ou fechado"""
@@ -64,6 +86,9 @@ class RascunhoProva(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     delegacao_id = db.Column(db.Integer, db.ForeignKey('delegacoes_prova.id'), nullable=False)
     questoes_selecionadas = db.Column(db.JSON, nullable=False)
+    # Semente e parâmetros do sorteio, para refazer a mesma prova
+    semente = db.Column(db.BigInteger, nullable=True)
+    parametros = db.Column(db.JSON, nullable=True)
     atualizado_em = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relacionamentos com Cascade (se a delegacao sumir, o rascunho some)
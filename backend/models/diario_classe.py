@@ -23,7 +23,7 @@ class DiarioClasse(db.Model):
 
     # Vínculos Originais
     turma_id: Mapped[int] = mapped_column(ForeignKey('turmas.id'), nullable=False)
-    disciplina_id: Mapped[int] = mapped_column(ForeignKey('disciplinas.id'), nullable=False)
+    disciplina_id: Mapped[int] = mapped_column(ForeignKey('disciplinas.id'), nullable=False, index=True)
     responsavel_id: Mapped[int] = mapped_column(ForeignKey('users.id'), nullable=False)
     
     # Conteúdo
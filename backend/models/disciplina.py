@@ -27,7 +27,7 @@ class Disciplina(db.Model):
     turma_id: Mapped[int] = mapped_column(db.ForeignKey('turmas.id'), nullable=False)
     turma: Mapped["Turma"] = relationship(back_populates="disciplinas")
     
-    ciclo_id: Mapped[int] = mapped_column(db.ForeignKey('ciclos.id'), nullable=False)
+    ciclo_id: Mapped[int] = mapped_column(db.ForeignKey('ciclos.id'), nullable=False, index=True)
     ciclo: Mapped["Ciclo"] = relationship(back_populates="disciplinas")
     
     historico_disciplinas: Mapped[list["HistoricoDisciplina"]] = relationship(back_populates="disciplina", cascade="all, delete-orphan")
@@ -14,7 +14,7 @@ class DisciplinaTurma(db.Model):
     
     pelotao: Mapped[str] = mapped_column(db.String(50), nullable=False)
     
-    disciplina_id: Mapped[int] = mapped_column(db.ForeignKey('disciplinas.id'), nullable=False)
+    disciplina_id: Mapped[int] = mapped_column(db.ForeignKey('disciplinas.id'), nullable=False, index=True)
     
     instrutor_id_1: Mapped[t.Optional[int]] = mapped_column(db.ForeignKey('instrutores.id'), nullable=True)
     instrutor_id_2: Mapped[t.Optional[int]] = mapped_column(db.ForeignKey('instrutores.id'), nullable=True)
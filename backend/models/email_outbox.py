@@ -0,0 +1,36 @@
+# backend/models/email_outbox.py
+
+from __future__ import annotations
+import typing as t
+from datetime import datetime
+from .database import db
+from sqlalchemy.orm import Mapped, mapped_column
+
+
+class EmailOutbox(db.Model):
+    """
+    Fila de saída de e-mails transacionais. O processo web só insere a linha
+    (EmailService); o worker envia pela API da Brevo (EmailOutboxService),
+    com retry e backoff até MAX_TENTATIVAS.
+    """
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_proxima', 'status', 'next_attempt_at'),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    to_email: Mapped[str] = mapped_column(db.String(255), nullable=False)
+    to_name: Mapped[t.Optional[str]] = mapped_column(db.String(255), nullable=True)
+    subject: Mapped[str] = mapped_column(db.String(255), nullable=False)
+    html_content: Mapped[str] = mapped_column(db.Text, nullable=False)
+    # pending, sending, sent, failed
+    status: Mapped[str] = mapped_column(db.String(20), nullable=False, default='pending', server_default='pending')
+    attempts: Mapped[int] = mapped_column(db.Integer, nullable=False, default=0, server_default='0')
+    next_attempt_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+    last_error: Mapped[t.Optional[str]] = mapped_column(db.Text, nullable=True)
+    message_id: Mapped[t.Optional[str]] = mapped_column(db.String(255), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+    sent_at: Mapped[t.Optional[datetime]] = mapped_column(nullable=True)
+
+    def __repr__(self):
+        return f"<EmailOutbox {self.id} {self.to_email} {self.status}>"
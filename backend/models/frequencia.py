@@ -12,7 +12,7 @@ class FrequenciaAluno(db.Model):
     __tablename__ = 'frequencias_alunos'
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    diario_id: Mapped[int] = mapped_column(ForeignKey('diarios_classe.id'), nullable=False)
+    diario_id: Mapped[int] = mapped_column(ForeignKey('diarios_classe.id'), nullable=False, index=True)
     aluno_id: Mapped[int] = mapped_column(ForeignKey('alunos.id'), nullable=False)
     
     # True = Presente, False = Falta
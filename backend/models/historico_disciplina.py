@@ -21,7 +21,7 @@ class HistoricoDisciplina(db.Model):
     nota_p2: Mapped[t.Optional[float]] = mapped_column(db.Float)
     nota_rec: Mapped[t.Optional[float]] = mapped_column(db.Float)
 
-    disciplina_id: Mapped[int] = mapped_column(db.ForeignKey('disciplinas.id'))
+    disciplina_id: Mapped[int] = mapped_column(db.ForeignKey('disciplinas.id'), index=True)
     disciplina: Mapped["Disciplina"] = relationship(back_populates="historico_disciplinas")
 
     aluno_id: Mapped[int] = mapped_column(db.ForeignKey('alunos.id'))
@@ -1,6 +1,8 @@
 # backend/models/horario.py
 from __future__ import annotations
 import typing as t
+from datetime import datetime, timezone
+import sqlalchemy as sa
 from .database import db
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -23,9 +25,9 @@ class Horario(db.Model):
 
     observacao: Mapped[t.Optional[str]] = mapped_column(db.Text, nullable=True)
 
-    semana_id: Mapped[int] = mapped_column(db.ForeignKey('semanas.id'), nullable=False)
+    semana_id: Mapped[int] = mapped_column(db.ForeignKey('semanas.id'), nullable=False, index=True)
 
-    disciplina_id: Mapped[int] = mapped_column(db.ForeignKey('disciplinas.id'), nullable=False)
+    disciplina_id: Mapped[int] = mapped_column(db.ForeignKey('disciplinas.id'), nullable=False, index=True)
     instrutor_id: Mapped[int] = mapped_column(db.ForeignKey('instrutores.id'), nullable=False)
     
     instrutor_id_2: Mapped[t.Optional[int]] = mapped_column(db.ForeignKey('instrutores.id'), nullable=True)
@@ -34,6 +36,16 @@ class Horario(db.Model):
     
     group_id: Mapped[t.Optional[str]] = mapped_column(db.String(36), nullable=True, index=True)
 
+    # Gravado pelo SQLAlchemy (com microssegundos) também nos update(Horario) em massa;
+    # é o marcador de alteração da agenda ICS (AgendaService._assinatura)
+    updated_at: Mapped[datetime] = mapped_column(
+        db.DateTime(),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+        server_default=sa.text("CURRENT_TIMESTAMP"),
+        nullable=False,
+    )
+
     # Relacionamentos
     semana: Mapped["Semana"] = relationship()
     
@@ -19,6 +19,11 @@ class ImageAsset(db.Model):
     created_at: Mapped[datetime] = mapped_column(default=lambda: datetime.now(timezone.utc)) # <-- CORRIGIDO
     uploaded_by: Mapped[int] = mapped_column(db.ForeignKey('users.id'))
 
+    # Derivados responsivos gerados pelo worker: {tamanho: {width, height, webp, fallback}}
+    variants: Mapped[t.Optional[dict]] = mapped_column(db.JSON, nullable=True)
+    # pending -> ready | original (svg/gif) | missing | failed
+    processing_status: Mapped[str] = mapped_column(db.String(20), default='pending', server_default='pending', nullable=False)
+
     def __init__(self, filename: str, original_filename: str, asset_type: str, 
                  category: str, uploaded_by: int, description: t.Optional[str] = None, **kw: t.Any) -> None:
         super().__init__(filename=filename, original_filename=original_filename, 
@@ -5,6 +5,10 @@ from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 class Resposta(db.Model):
     __tablename__ = 'respostas'
+    __table_args__ = (
+        # Cobre o GROUP BY do resumo (QuestionarioService) e a contagem por questionário
+        db.Index('ix_respostas_questionario_opcao', 'questionario_id', 'pergunta_id', 'opcao_resposta_id'),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     
@@ -0,0 +1,28 @@
+# backend/models/resultado_questionario.py
+
+from __future__ import annotations
+import typing as t
+from .database import db
+from sqlalchemy.orm import Mapped, mapped_column
+
+
+class ResultadoQuestionario(db.Model):
+    """
+    Resumo materializado das respostas de um questionário: uma linha por
+    (pergunta, opção) com o total de respostas. É incrementado a cada envio
+    (QuestionarioService.registrar_no_resumo) e recalculado por um único
+    GROUP BY quando deixa de bater com as respostas. Opção sem linha = zero.
+    """
+    __tablename__ = 'resultados_questionario'
+    __table_args__ = (
+        db.UniqueConstraint('pergunta_id', 'opcao_resposta_id', name='uq_resultados_questionario_opcao'),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    questionario_id: Mapped[int] = mapped_column(db.ForeignKey('questionarios.id'), nullable=False, index=True)
+    pergunta_id: Mapped[int] = mapped_column(db.ForeignKey('perguntas.id'), nullable=False)
+    opcao_resposta_id: Mapped[int] = mapped_column(db.ForeignKey('opcoes_respostas.id'), nullable=False)
+    total: Mapped[int] = mapped_column(db.Integer, nullable=False, default=0, server_default='0')
+
+    def __repr__(self):
+        return f"<ResultadoQuestionario pergunta={self.pergunta_id} opcao={self.opcao_resposta_id} total={self.total}>"
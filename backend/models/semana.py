@@ -18,7 +18,7 @@ class Semana(db.Model):
     data_fim: Mapped[date] = mapped_column(db.Date, nullable=False)
 
     # Relação com Ciclo (O Ciclo contém o school_id)
-    ciclo_id: Mapped[int] = mapped_column(db.ForeignKey('ciclos.id'), nullable=False)
+    ciclo_id: Mapped[int] = mapped_column(db.ForeignKey('ciclos.id'), nullable=False, index=True)
     ciclo: Mapped["Ciclo"] = relationship(back_populates="semanas")
 
     # Configurações de exibição de períodos
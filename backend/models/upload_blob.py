@@ -0,0 +1,34 @@
+# backend/models/upload_blob.py
+
+from __future__ import annotations
+import typing as t
+from datetime import datetime
+from .database import db
+from sqlalchemy.orm import Mapped, mapped_column
+
+
+class UploadBlob(db.Model):
+    """
+    Arquivo do armazenamento endereçado por conteúdo (static/uploads/<bucket>/ab/cd/<sha256>.<ext>).
+    O mesmo conteúdo enviado várias vezes vira um único arquivo; ref_count conta
+    quantas colunas apontam para ele e o GC remove os que chegam a zero.
+    """
+    __tablename__ = 'upload_blobs'
+    __table_args__ = (
+        db.UniqueConstraint('bucket', 'sha256', 'ext', name='uq_upload_blobs_conteudo'),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    bucket: Mapped[str] = mapped_column(db.String(50), nullable=False)
+    sha256: Mapped[str] = mapped_column(db.String(64), nullable=False)
+    ext: Mapped[str] = mapped_column(db.String(10), nullable=False)
+    # Caminho relativo a static/ (ex.: uploads/signatures/ab/cd/<sha256>.jpg)
+    path: Mapped[str] = mapped_column(db.String(255), nullable=False, unique=True)
+    size: Mapped[int] = mapped_column(db.Integer, nullable=False, default=0)
+    ref_count: Mapped[int] = mapped_column(db.Integer, nullable=False, default=0, server_default='0')
+    created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+    # Quando o contador chegou a zero (o GC espera uma carência antes de apagar)
+    released_at: Mapped[t.Optional[datetime]] = mapped_column(nullable=True)
+
+    def __repr__(self):
+        return f"<UploadBlob {self.path} refs={self.ref_count}>"
@@ -0,0 +1,312 @@
+# backend/services/agenda_service.py
+
+import hashlib
+import re
+import threading
+from datetime import date, datetime, time, timedelta, timezone
+
+import pytz
+from cachetools import LRUCache
+from flask import current_app, url_for
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import select, func, or_
+from sqlalchemy.orm import joinedload
+
+from ..models.database import db
+from ..models.horario import Horario
+from ..models.disciplina import Disciplina
+from ..models.instrutor import Instrutor
+from ..models.semana import Semana
+from ..models.ciclo import Ciclo
+from ..models.user import User
+from .site_config_service import SiteConfigService
+
+
+class AgendaService:
+    """
+    Agenda (ICS) das aulas aprovadas para o calendário do celular: do pelotão do
+    aluno (ou de um pelotão visto pela equipe) e das aulas do instrutor. O endereço
+    leva um token assinado no lugar do login, invalidado quando o usuário troca a
+    senha. O arquivo fica em cache por processo e é validado a cada consulta por um
+    marcador barato (quantidade e último updated_at das aulas, datas das semanas e
+    nomes das matérias e instrutores), então só é refeito quando muda uma aula daquele
+    pelotão ou instrutor, ou o nome de uma matéria ou instrutor; o ETag e o
+    Last-Modified permitem ao calendário revalidar com 304.
+    """
+
+    # Semanas passadas mantidas na agenda (as futuras entram todas)
+    DIAS_PASSADOS = 28
+    FUSO = pytz.timezone('America/Sao_Paulo')
+    DIAS = ['segunda', 'terca', 'quarta', 'quinta', 'sexta', 'sabado', 'domingo']
+
+    _cache = LRUCache(maxsize=512)
+    _lock = threading.Lock()
+
+    # --- Tokens ---
+
+    @staticmethod
+    def _serializer() -> URLSafeSerializer:
+        return URLSafeSerializer(current_app.config['SECRET_KEY'], salt='agenda-ics')
+
+    @staticmethod
+    def _impressao(user) -> str:
+        return hashlib.sha1((user.password_hash or '').encode('utf-8')).hexdigest()[:10]
+
+    @staticmethod
+    def token_pelotao(user, pelotao: str, school_id: int) -> str:
+        return AgendaService._serializer().dumps(
+            {'u': user.id, 'p': pelotao, 's': school_id, 'h': AgendaService._impressao(user)}
+        )
+
+    @staticmethod
+    def token_instrutor(user) -> str:
+        return AgendaService._serializer().dumps(
+            {'u': user.id, 'i': 1, 'h': AgendaService._impressao(user)}
+        )
+
+    @staticmethod
+    def urls(user, pelotao: str = None, school_id: int = None) -> dict:
+        """Endereços https das agendas que o usuário pode assinar: {'pelotao': ..., 'instrutor': ...}."""
+        cls = AgendaService
+        urls = {'pelotao': None, 'instrutor': None}
+        if pelotao and school_id and cls._acesso_pelotao(user, pelotao, school_id):
+            urls['pelotao'] = url_for('horario.agenda_ics', token=cls.token_pelotao(user, pelotao, school_id), _external=True)
+        if db.session.scalar(select(Instrutor.id).where(Instrutor.user_id == user.id).limit(1)):
+            urls['instrutor'] = url_for('horario.agenda_ics', token=cls.token_instrutor(user), _external=True)
+        return urls
+
+    @staticmethod
+    def feed_do_token(token: str):
+        """
+        Valida o token e devolve a agenda que ele dá acesso:
+        ('pelotao', school_id, nome) ou ('instrutor', (ids de Instrutor...)). None se inválido.
+        """
+        cls = AgendaService
+        try:
+            dados = cls._serializer().loads(token)
+        except BadSignature:
+            return None
+        if not isinstance(dados, dict):
+            return None
+
+        user = db.session.get(User, dados.get('u'))
+        if not user or not user.is_active or dados.get('h') != cls._impressao(user):
+            return None
+
+        if dados.get('i'):
+            ids = tuple(db.session.scalars(
+                select(Instrutor.id).where(Instrutor.user_id == user.id).order_by(Instrutor.id)
+            ).all())
+            return ('instrutor', ids) if ids else None
+
+        pelotao, school_id = dados.get('p'), dados.get('s')
+        if not pelotao or not school_id or not cls._acesso_pelotao(user, pelotao, school_id):
+            return None
+        return ('pelotao', school_id, pelotao)
+
+    @staticmethod
+    def _acesso_pelotao(user, pelotao: str, school_id: int) -> bool:
+        """Conferido a cada consulta: o aluno segue na turma, ou o usuário segue vinculado à escola."""
+        aluno = user.aluno_profile
+        if str(user.role).lower().strip() == 'aluno' and aluno:
+            return bool(aluno.turma) and aluno.turma.nome == pelotao and aluno.turma.school_id == school_id
+        return any(us.school_id == school_id for us in user.user_schools)
+
+    # --- Agenda ---
+
+    @staticmethod
+    def _filtros(feed) -> list:
+        inicio = date.today() - timedelta(days=AgendaService.DIAS_PASSADOS)
+        filtros = [Semana.data_fim >= inicio]
+        if feed[0] == 'instrutor':
+            filtros.append(or_(Horario.instrutor_id.in_(feed[1]), Horario.instrutor_id_2.in_(feed[1])))
+        else:
+            filtros += [Ciclo.school_id == feed[1], Horario.pelotao == feed[2]]
+        return filtros
+
+    @staticmethod
+    def _assinatura(feed) -> tuple:
+        """
+        Marcador do que entra no arquivo, sem ler as aulas: quantidade e último updated_at
+        das aulas confirmadas (inserção, exclusão, aprovação e UPDATEs no lugar mudam um
+        dos dois) e, em consultas DISTINCT de poucas linhas, as datas das semanas e os
+        nomes das matérias e dos instrutores usados por elas (renomeações).
+        """
+        aulas = (
+            select(Horario.id, Horario.updated_at, Horario.semana_id, Horario.disciplina_id,
+                   Horario.instrutor_id, Horario.instrutor_id_2)
+            .join(Semana, Semana.id == Horario.semana_id)
+            .join(Ciclo, Ciclo.id == Semana.ciclo_id)
+            .where(Horario.status == 'confirmado', *AgendaService._filtros(feed))
+            .subquery()
+        )
+        total, ultima = db.session.execute(select(func.count(aulas.c.id), func.max(aulas.c.updated_at))).one()
+        if not total:
+            return (0,)
+
+        semanas = db.session.execute(
+            select(Semana.id, Semana.data_inicio)
+            .where(Semana.id.in_(select(aulas.c.semana_id))).order_by(Semana.id)
+        ).all()
+        materias = db.session.execute(
+            select(Disciplina.id, Disciplina.materia)
+            .where(Disciplina.id.in_(select(aulas.c.disciplina_id))).order_by(Disciplina.id)
+        ).all()
+        instrutores = db.session.execute(
+            select(Instrutor.id, User.posto_graduacao, User.nome_de_guerra, User.username)
+            .join(User, User.id == Instrutor.user_id)
+            .where(or_(Instrutor.id.in_(select(aulas.c.instrutor_id)), Instrutor.id.in_(select(aulas.c.instrutor_id_2))))
+            .order_by(Instrutor.id)
+        ).all()
+        return (
+            total, ultima,
+            tuple(tuple(row) for row in semanas),
+            tuple(tuple(row) for row in materias),
+            tuple(tuple(row) for row in instrutores),
+        )
+
+    @staticmethod
+    def agenda(feed):
+        """(conteúdo ICS em bytes, ETag, Last-Modified) da agenda, refeita só quando as aulas mudam."""
+        cls = AgendaService
+        chave = (SiteConfigService.versao(),) + tuple(feed)
+        assinatura = cls._assinatura(feed)
+        with cls._lock:
+            entrada = cls._cache.get(chave)
+        if entrada is not None and entrada[0] == assinatura:
+            return entrada[1]
+
+        conteudo = cls._gerar_ics(feed)
+        resultado = (
+            conteudo,
+            hashlib.sha1(conteudo).hexdigest(),
+            datetime.now(timezone.utc).replace(microsecond=0),
+        )
+        with cls._lock:
+            cls._cache[chave] = (assinatura, resultado)
+        return resultado
+
+    @staticmethod
+    def _horarios_periodos(school_id) -> dict:
+        """{periodo: (início, fim)} a partir de 'horario_periodo_NN' ('07:30-08:15'); fim pode ser None."""
+        periodos = {}
+        for i in range(1, 16):
+            valor = SiteConfigService.get_config(f"horario_periodo_{i:02d}", '', school_id=school_id) or ''
+            horas = [time(int(h), int(m)) for h, m in re.findall(r'(\d{1,2})\s*[:hH]\s*(\d{2})', valor) if int(h) < 24 and int(m) < 60]
+            if horas:
+                periodos[i] = (horas[0], horas[1] if len(horas) > 1 else None)
+        return periodos
+
+    @staticmethod
+    def _texto(valor) -> str:
+        return (str(valor or '').replace('\\', '\\\\').replace(';', '\\;')
+                .replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n'))
+
+    @staticmethod
+    def _dobrar(linha: str) -> list:
+        """Quebra a linha em partes de até 75 octetos (RFC 5545, 3.1)."""
+        partes, atual = [], ''
+        for caractere in linha:
+            limite = 75 if not partes else 74
+            if len((atual + caractere).encode('utf-8')) > limite:
+                partes.append(atual)
+                atual = caractere
+            else:
+                atual += caractere
+        partes.append(atual)
+        return [partes[0]] + [' ' + parte for parte in partes[1:]]
+
+    @staticmethod
+    def _utc(dia: date, hora: time) -> str:
+        local = AgendaService.FUSO.localize(datetime.combine(dia, hora))
+        return local.astimezone(pytz.utc).strftime('%Y%m%dT%H%M%SZ')
+
+    @staticmethod
+    def _gerar_ics(feed) -> bytes:
+        cls = AgendaService
+        aulas = db.session.execute(
+            select(Horario, Semana.data_inicio, Ciclo.school_id)
+            .join(Semana, Semana.id == Horario.semana_id)
+            .join(Ciclo, Ciclo.id == Semana.ciclo_id)
+            .options(
+                joinedload(Horario.disciplina),
+                joinedload(Horario.instrutor).joinedload(Instrutor.user),
+                joinedload(Horario.instrutor_2).joinedload(Instrutor.user),
+            )
+            .where(Horario.status == 'confirmado', *cls._filtros(feed))
+            .order_by(Semana.data_inicio, Horario.id)
+        ).unique().all()
+
+        if feed[0] == 'instrutor':
+            nome_agenda = 'Minhas aulas'
+        else:
+            nome_agenda = f"Horário {feed[2]}"
+
+        linhas = [
+            'BEGIN:VCALENDAR',
+            'VERSION:2.0',
+            'PRODID:-//SisGEn//Quadro Horario//PT-BR',
+            'CALSCALE:GREGORIAN',
+            'METHOD:PUBLISH',
+            f"X-WR-CALNAME:{cls._texto(nome_agenda)}",
+            'X-WR-TIMEZONE:America/Sao_Paulo',
+            'REFRESH-INTERVAL;VALUE=DURATION:PT1H',
+            'X-PUBLISHED-TTL:PT1H',
+        ]
+
+        periodos_por_escola = {}
+        for aula, data_inicio, school_id in aulas:
+            dia = str(aula.dia_semana).lower().replace('-feira', '').strip()
+            if dia not in cls.DIAS:
+                continue
+            data_aula = data_inicio + timedelta(days=cls.DIAS.index(dia))
+            if school_id not in periodos_por_escola:
+                periodos_por_escola[school_id] = cls._horarios_periodos(school_id)
+            periodos = periodos_por_escola[school_id]
+
+            ultimo = aula.periodo + (aula.duracao or 1) - 1
+            inicio = periodos.get(aula.periodo, (None, None))[0]
+            fim_ultimo = periodos.get(ultimo, (None, None))
+            fim = fim_ultimo[1]
+            if fim is None and fim_ultimo[0]:
+                # Período configurado só com o início ('08:00'): tempo de aula de 45 minutos
+                fim = (datetime.combine(data_aula, fim_ultimo[0]) + timedelta(minutes=45)).time()
+
+            materia = aula.disciplina.materia if aula.disciplina else 'Aula'
+            resumo = f"{materia} ({aula.pelotao})" if feed[0] == 'instrutor' else materia
+            instrutores = [
+                f"{i.user.posto_graduacao or ''} {i.user.nome_de_guerra or i.user.username}".strip()
+                for i in (aula.instrutor, aula.instrutor_2) if i and i.user
+            ]
+            tempos = f"{aula.periodo}º ao {ultimo}º tempo" if ultimo > aula.periodo else f"{aula.periodo}º tempo"
+            descricao = '\n'.join(filter(None, [tempos, ' / '.join(instrutores), aula.observacao]))
+
+            linhas += [
+                'BEGIN:VEVENT',
+                f"UID:horario-{aula.id}@sisgen",
+                # DTSTAMP fixo por aula: o arquivo (e o ETag) só muda quando as aulas mudam
+                f"DTSTAMP:{data_inicio.strftime('%Y%m%d')}T000000Z",
+            ]
+            if inicio and fim and fim > inicio:
+                linhas += [f"DTSTART:{cls._utc(data_aula, inicio)}", f"DTEND:{cls._utc(data_aula, fim)}"]
+            else:
+                linhas += [
+                    f"DTSTART;VALUE=DATE:{data_aula.strftime('%Y%m%d')}",
+                    f"DTEND;VALUE=DATE:{(data_aula + timedelta(days=1)).strftime('%Y%m%d')}",
+                ]
+            linhas += [
+                f"SUMMARY:{cls._texto(resumo)}",
+                f"DESCRIPTION:{cls._texto(descricao)}",
+                'END:VEVENT',
+            ]
+        linhas.append('END:VCALENDAR')
+
+        dobradas = []
+        for linha in linhas:
+            dobradas += cls._dobrar(linha)
+        return ('\r\n'.join(dobradas) + '\r\n').encode('utf-8')
+
+    @staticmethod
+    def invalidar():
+        with AgendaService._lock:
+            AgendaService._cache.clear()
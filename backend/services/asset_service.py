@@ -1,11 +1,13 @@
 import os
-from flask import current_app
+from flask import current_app, url_for
 from werkzeug.utils import secure_filename
 from sqlalchemy import select
 
 from ..models.database import db
 from ..models.image_asset import ImageAsset
-from utils.image_utils import allowed_file, generate_unique_filename, optimize_image
+from utils.image_utils import allowed_file, generate_unique_filename
+from .image_pipeline_service import ImagePipelineService
+from .upload_store_service import UploadStoreService
 
 class AssetService:
     ALLOWED_EXTENSIONS = ['png', 'jpg', 'jpeg', 'gif', 'svg', 'webp']
@@ -17,20 +19,20 @@ class AssetService:
 
     @staticmethod
     def save_file(file, folder=''):
-        """Salva um arquivo genérico (pdf, word, etc) em uma subpasta especificada."""
+        """
+        Salva um arquivo genérico (pdf, word, etc) no armazenamento por conteúdo, no
+        bucket 'folder', já contando uma referência. Retorna o caminho relativo a
+        static/uploads/<folder> (ex.: 'ab/cd/<sha256>.pdf'), como os templates esperam.
+        """
         if not file or file.filename == '':
             return None
             
         try:
-            target_folder = os.path.join(AssetService.UPLOAD_FOLDER, folder)
-            os.makedirs(target_folder, exist_ok=True)
-            
             original_filename = secure_filename(file.filename)
-            unique_filename = generate_unique_filename(original_filename)
-            file_path = os.path.join(target_folder, unique_filename)
-            
-            file.save(file_path)
-            return unique_filename
+            ext = original_filename.rsplit('.', 1)[1] if '.' in original_filename else 'bin'
+            bucket = folder or 'arquivos'
+            base = f'uploads/{folder}' if folder else 'uploads'
+            return UploadStoreService.save(file, ext, bucket, base=base)
         except Exception as e:
             if current_app:
                 current_app.logger.error(f"Erro ao salvar arquivo: {e}")
@@ -72,9 +74,6 @@ class AssetService:
             
             file.save(file_path)
             
-            if not unique_filename.lower().endswith('.svg'):
-                optimize_image(file_path)
-            
             new_asset = ImageAsset(
                 filename=unique_filename,
                 original_filename=original_filename,
@@ -85,9 +84,14 @@ class AssetService:
             )
             
             db.session.add(new_asset)
+            db.session.flush()
+
+            # Os derivados (thumb/medium/full em WebP + JPEG) são gerados pelo worker;
+            # até lá, as páginas servem o arquivo original.
+            ImagePipelineService.enqueue('process_image', uploaded_by_user_id, asset_id=new_asset.id)
             db.session.commit()
             
-            return True, f'Asset "{original_filename}" enviado com sucesso!'
+            return True, f'Asset "{original_filename}" enviado com sucesso! As versões otimizadas serão geradas em instantes.'
             
         except Exception as e:
             db.session.rollback()
@@ -104,9 +108,11 @@ class AssetService:
             file_path = os.path.join(AssetService.UPLOAD_FOLDER, asset.filename)
             if os.path.exists(file_path):
                 os.remove(file_path)
+            ImagePipelineService.remove_variants(asset, AssetService.UPLOAD_FOLDER)
             
             db.session.delete(asset)
             db.session.commit()
+            ImagePipelineService.invalidate_cache()
             
             return True, 'Asset deletado com sucesso!'
         except Exception as e:
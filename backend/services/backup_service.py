@@ -0,0 +1,313 @@
+# backend/services/backup_service.py
+
+import enum
+import hashlib
+import io
+import json
+import zipfile
+from datetime import datetime, date, time
+from decimal import Decimal
+
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+from ..models.database import db
+from ..models.school import School
+from ..models.user import User
+from ..models.user_school import UserSchool
+from ..models.aluno import Aluno
+from ..models.turma import Turma
+from ..models.disciplina import Disciplina
+from ..models.disciplina_turma import DisciplinaTurma
+from ..models.ciclo import Ciclo
+from ..models.semana import Semana
+from ..models.horario import Horario
+from ..models.diario_classe import DiarioClasse
+from ..models.frequencia import FrequenciaAluno
+from ..models.historico import HistoricoAluno
+from ..models.processo_disciplina import ProcessoDisciplina
+from ..models.elogio import Elogio
+from ..models.fada_avaliacao import FadaAvaliacao
+
+
+class BackupError(Exception):
+    """Arquivo de backup inválido, incompleto ou corrompido."""
+
+
+class BackupService:
+    """
+    Exportação e leitura de backups da escola em formato ZIP.
+
+    Cada tabela vira uma seção NDJSON (uma linha JSON por registro) comprimida
+    dentro do ZIP, lida do banco com cursor do lado do servidor (yield_per).
+    O arquivo 'manifest.json' registra a contagem de linhas e o SHA-256 de
+    cada seção, permitindo verificar e ler o backup sem carregá-lo inteiro.
+    """
+
+    FORMAT_VERSION = 2
+    MANIFEST_NAME = 'manifest.json'
+    CHUNK_SIZE = 1000
+
+    # Colunas que NUNCA devem ir para o arquivo de backup
+    EXCLUDE_COLUMNS = {'password_hash', 'reset_token', 'reset_token_expiration', 'totp_secret'}
+
+    # Ordem das seções: tabelas "pai" antes das "filhas" (útil para restauração).
+    # O nome com ponto indica aninhamento na estrutura legada (ex: justica.processos).
+    SECTIONS = [
+        'escola', 'turmas', 'usuarios', 'alunos', 'disciplinas', 'vinculos_disciplinas',
+        'ciclos', 'semanas', 'horarios', 'diarios_classe', 'frequencias', 'historicos',
+        'justica.processos', 'justica.elogios', 'justica.fadas',
+    ]
+
+    # --- Consultas por seção ---------------------------------------------
+
+    @staticmethod
+    def _columns(model):
+        return [c for c in model.__table__.columns if c.name not in BackupService.EXCLUDE_COLUMNS]
+
+    @staticmethod
+    def _section_queries(school_id: int) -> dict:
+        """Monta um SELECT por seção, escopado à escola via subconsultas (sem listas de IDs em memória)."""
+        turma_ids = select(Turma.id).where(Turma.school_id == school_id)
+        user_ids = select(UserSchool.user_id).where(UserSchool.school_id == school_id)
+        aluno_ids = select(Aluno.id).where(Aluno.user_id.in_(user_ids))
+        disciplina_ids = select(Disciplina.id).where(Disciplina.turma_id.in_(turma_ids))
+        ciclo_ids = select(Ciclo.id).where(Ciclo.school_id == school_id)
+        semana_ids = select(Semana.id).where(Semana.ciclo_id.in_(ciclo_ids))
+        diario_ids = select(DiarioClasse.id).where(DiarioClasse.turma_id.in_(turma_ids))
+
+        cols = BackupService._columns
+        nome_usuario = db.func.coalesce(User.nome_completo, User.nome_de_guerra, User.username, 'Sem Nome')
+        relator = aliased(User)
+
+        return {
+            'escola': select(*cols(School)).where(School.id == school_id),
+            'turmas': select(*cols(Turma)).where(Turma.school_id == school_id).order_by(Turma.id),
+            'usuarios': select(*cols(User)).where(User.id.in_(user_ids)).order_by(User.id),
+            'alunos': select(*cols(Aluno)).where(Aluno.id.in_(aluno_ids)).order_by(Aluno.id),
+            'disciplinas': select(*cols(Disciplina)).where(Disciplina.id.in_(disciplina_ids)).order_by(Disciplina.id),
+            'vinculos_disciplinas': select(*cols(DisciplinaTurma))
+                .where(DisciplinaTurma.disciplina_id.in_(disciplina_ids)).order_by(DisciplinaTurma.id),
+            'ciclos': select(*cols(Ciclo)).where(Ciclo.school_id == school_id).order_by(Ciclo.id),
+            'semanas': select(*cols(Semana)).where(Semana.id.in_(semana_ids)).order_by(Semana.id),
+            'horarios': select(*cols(Horario)).where(Horario.semana_id.in_(semana_ids)).order_by(Horario.id),
+            'diarios_classe': select(
+                    *cols(DiarioClasse),
+                    Turma.nome.label('injected_turma_nome'),
+                    Disciplina.materia.label('injected_disciplina_nome'),
+                )
+                .outerjoin(Turma, Turma.id == DiarioClasse.turma_id)
+                .outerjoin(Disciplina, Disciplina.id == DiarioClasse.disciplina_id)
+                .where(DiarioClasse.id.in_(diario_ids)).order_by(DiarioClasse.id),
+            'frequencias': select(
+                    *cols(FrequenciaAluno),
+                    nome_usuario.label('injected_aluno_nome'),
+                    User.matricula.label('injected_aluno_matricula'),
+                )
+                .outerjoin(Aluno, Aluno.id == FrequenciaAluno.aluno_id)
+                .outerjoin(User, User.id == Aluno.user_id)
+                .where(FrequenciaAluno.diario_id.in_(diario_ids)).order_by(FrequenciaAluno.id),
+            'historicos': select(*cols(HistoricoAluno))
+                .where(HistoricoAluno.aluno_id.in_(aluno_ids)).order_by(HistoricoAluno.id),
+            'justica.processos': select(
+                    *cols(ProcessoDisciplina),
+                    nome_usuario.label('injected_aluno_nome'),
+                    User.matricula.label('injected_aluno_matricula'),
+                    db.func.coalesce(relator.nome_completo, relator.nome_de_guerra, relator.username).label('injected_relator_nome'),
+                )
+                .outerjoin(Aluno, Aluno.id == ProcessoDisciplina.aluno_id)
+                .outerjoin(User, User.id == Aluno.user_id)
+                .outerjoin(relator, relator.id == ProcessoDisciplina.relator_id)
+                .where(ProcessoDisciplina.aluno_id.in_(aluno_ids)).order_by(ProcessoDisciplina.id),
+            'justica.elogios': select(
+                    *cols(Elogio),
+                    nome_usuario.label('injected_aluno_nome'),
+                    User.matricula.label('injected_aluno_matricula'),
+                )
+                .outerjoin(Aluno, Aluno.id == Elogio.aluno_id)
+                .outerjoin(User, User.id == Aluno.user_id)
+                .where(Elogio.aluno_id.in_(aluno_ids)).order_by(Elogio.id),
+            'justica.fadas': select(*cols(FadaAvaliacao))
+                .where(FadaAvaliacao.aluno_id.in_(aluno_ids)).order_by(FadaAvaliacao.id),
+        }
+
+    # --- Exportação -------------------------------------------------------
+
+    @staticmethod
+    def _json_default(val):
+        if isinstance(val, (datetime, date, time)):
+            return val.isoformat()
+        if isinstance(val, Decimal):
+            return float(val)
+        if isinstance(val, enum.Enum):
+            return val.value
+        if isinstance(val, bytes):
+            return val.decode('utf-8', errors='replace')
+        return str(val)
+
+    @staticmethod
+    def _entry_name(section: str) -> str:
+        return f"secoes/{section.replace('.', '_')}.ndjson"
+
+    @staticmethod
+    def export_to_zip(school_id: int, dest_path: str, progress_callback=None) -> dict:
+        """
+        Grava o backup da escola em 'dest_path' seção por seção.
+        Nenhuma tabela é materializada em memória: as linhas vêm do cursor em
+        blocos de CHUNK_SIZE e são escritas direto na entrada comprimida do ZIP.
+        'progress_callback(secao, concluidas, total)' é chamado ao fim de cada seção,
+        quando nenhum cursor está aberto (o chamador pode fazer commit com segurança).
+        Retorna o manifesto gravado.
+        """
+        queries = BackupService._section_queries(school_id)
+        manifest = {
+            'format': 'sisgen-backup',
+            'version': BackupService.FORMAT_VERSION,
+            'generated_at': datetime.now().isoformat(),
+            'school_id': school_id,
+            'sections': {},
+        }
+
+        try:
+            with zipfile.ZipFile(dest_path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+                for index, section in enumerate(BackupService.SECTIONS, start=1):
+                    entry = BackupService._entry_name(section)
+                    digest = hashlib.sha256()
+                    rows = 0
+
+                    stmt = queries[section].execution_options(yield_per=BackupService.CHUNK_SIZE)
+                    result = db.session.execute(stmt)
+                    with zf.open(entry, 'w', force_zip64=True) as out:
+                        for partition in result.mappings().partitions():
+                            buf = io.BytesIO()
+                            for row in partition:
+                                line = json.dumps(dict(row), ensure_ascii=False, default=BackupService._json_default)
+                                buf.write(line.encode('utf-8'))
+                                buf.write(b'\n')
+                            chunk = buf.getvalue()
+                            digest.update(chunk)
+                            out.write(chunk)
+                            rows += len(partition)
+                    result.close()
+
+                    manifest['sections'][section] = {
+                        'file': entry,
+                        'rows': rows,
+                        'sha256': digest.hexdigest(),
+                    }
+                    if progress_callback:
+                        progress_callback(section, index, len(BackupService.SECTIONS))
+
+                zf.writestr(BackupService.MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=2))
+            return manifest
+
+        except Exception as e:
+            current_app.logger.error(f"Falha ao gerar backup da escola {school_id}: {e}")
+            raise
+
+    # --- Leitura / Restauração -------------------------------------------
+
+    @staticmethod
+    def read_manifest(zf: zipfile.ZipFile) -> dict:
+        try:
+            with zf.open(BackupService.MANIFEST_NAME) as fh:
+                manifest = json.load(fh)
+        except KeyError:
+            raise BackupError("O arquivo não contém o manifesto do backup (manifest.json).")
+        except json.JSONDecodeError:
+            raise BackupError("O manifesto do backup está corrompido.")
+
+        if manifest.get('format') != 'sisgen-backup':
+            raise BackupError("O arquivo enviado não é um backup do Sisgen.")
+        if int(manifest.get('version', 0)) > BackupService.FORMAT_VERSION:
+            raise BackupError("Este backup foi gerado por uma versão mais nova do sistema.")
+        return manifest
+
+    @staticmethod
+    def iter_section(zf: zipfile.ZipFile, manifest: dict, section: str):
+        """Gera os registros (dicts) de uma seção, lendo a entrada do ZIP linha a linha."""
+        info = manifest['sections'].get(section)
+        if not info:
+            return
+        with zf.open(info['file']) as raw:
+            for line in io.TextIOWrapper(raw, encoding='utf-8'):
+                if line.strip():
+                    yield json.loads(line)
+
+    @staticmethod
+    def verify(zf: zipfile.ZipFile, manifest: dict) -> list:
+        """
+        Recalcula contagem e SHA-256 de cada seção em streaming.
+        Retorna a lista de problemas encontrados (vazia quando o backup está íntegro).
+        """
+        problems = []
+        for section, info in manifest.get('sections', {}).items():
+            digest = hashlib.sha256()
+            rows = 0
+            try:
+                with zf.open(info['file']) as raw:
+                    for line in raw:
+                        digest.update(line)
+                        rows += 1
+            except KeyError:
+                problems.append(f"Seção '{section}' ausente no arquivo.")
+                continue
+            except (zipfile.BadZipFile, OSError) as e:
+                problems.append(f"Seção '{section}' ilegível: {e}")
+                continue
+
+            if rows != info.get('rows'):
+                problems.append(f"Seção '{section}': {rows} linhas encontradas, {info.get('rows')} esperadas.")
+            if digest.hexdigest() != info.get('sha256'):
+                problems.append(f"Seção '{section}': checksum não confere.")
+        return problems
+
+    @staticmethod
+    def build_preview(fileobj, max_rows_per_section: int = 2000):
+        """
+        Lê um backup ZIP e devolve (data, manifest, problems).
+        'data' segue a estrutura do backup legado consumida pela tela de auditoria,
+        com no máximo 'max_rows_per_section' registros por seção; as contagens
+        completas estão no manifesto.
+        """
+        try:
+            zf = zipfile.ZipFile(fileobj)
+        except zipfile.BadZipFile:
+            raise BackupError("O arquivo enviado não é um ZIP válido ou está corrompido.")
+
+        with zf:
+            manifest = BackupService.read_manifest(zf)
+            problems = BackupService.verify(zf, manifest)
+
+            data = {
+                'meta': {
+                    'generated_at': manifest.get('generated_at', ''),
+                    'school_id': manifest.get('school_id'),
+                },
+                'justica': {},
+            }
+            for section in BackupService.SECTIONS:
+                rows = []
+                for row in BackupService.iter_section(zf, manifest, section):
+                    if len(rows) >= max_rows_per_section:
+                        break
+                    rows.append(row)
+
+                if section == 'escola':
+                    data['escola'] = rows[0] if rows else {}
+                elif '.' in section:
+                    parent, child = section.split('.', 1)
+                    data[parent][child] = rows
+                else:
+                    data[section] = rows
+
+        return data, manifest, problems
+
+    @staticmethod
+    def section_counts(manifest: dict) -> dict:
+        """Contagem de linhas por seção, com as chaves aninhadas achatadas (justica.processos -> justica_processos)."""
+        return {
+            section.replace('.', '_'): info.get('rows', 0)
+            for section, info in manifest.get('sections', {}).items()
+        }
@@ -0,0 +1,207 @@
+# backend/services/cursos_catalog_service.py
+
+import copy
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from flask import request, make_response
+
+try:
+    import fcntl
+except ImportError:  # Windows (desenvolvimento local)
+    fcntl = None
+    import msvcrt
+
+
+class CursosCatalogService:
+    """
+    Catálogo da plataforma de cursos (static/uploads/cursos_data.json).
+
+    O JSON é lido uma vez e mantido em memória junto com o corpo da resposta já
+    serializado, a ETag e a versão gzip; o cache é invalidado quando o mtime ou o
+    tamanho do arquivo mudam (edição por outro processo do gunicorn, restauração
+    manual). As gravações pegam um lock de arquivo (entre processos), relêem o
+    catálogo atual, aplicam a alteração e trocam o arquivo com os.replace, então um
+    leitor nunca vê um JSON pela metade e duas edições simultâneas não se perdem.
+    """
+
+    _lock = threading.Lock()
+    _cache = None  # {'chave': (mtime_ns, size), 'dados', 'corpo', 'gzip', 'etag'}
+
+    # --- Caminhos ---------------------------------------------------------
+
+    @staticmethod
+    def _paths(project_root: str):
+        data_file = os.path.join(project_root, 'static', 'uploads', 'cursos_data.json')
+        fallback_file = os.path.join(project_root, 'cursos', 'cursos_data.json')
+        return data_file, fallback_file
+
+    @staticmethod
+    @contextmanager
+    def _file_lock(data_file: str):
+        """Lock exclusivo entre processos (arquivo .lock ao lado do catálogo)."""
+        os.makedirs(os.path.dirname(data_file), exist_ok=True)
+        with open(data_file + '.lock', 'a+b') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    @staticmethod
+    def _write_atomic(data_file: str, data: dict):
+        fd, tmp_path = tempfile.mkstemp(prefix='.cursos_data.', suffix='.tmp', dir=os.path.dirname(data_file))
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=4, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, data_file)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def _read(data_file: str):
+        with open(data_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    # --- Inicialização / recuperação --------------------------------------
+
+    @staticmethod
+    def _bootstrap(data_file: str, fallback_file: str, default_data: dict):
+        """
+        Cria o catálogo no disco persistente a partir do arquivo versionado (ou dos
+        padrões) e, se o disco ainda tiver os vídeos de exemplo (v1) enquanto o
+        arquivo versionado já tem vídeos reais, restaura o versionado.
+        Executado só quando o cache precisa ser recarregado.
+        """
+        cls = CursosCatalogService
+        if not os.path.exists(data_file):
+            with cls._file_lock(data_file):
+                if not os.path.exists(data_file):
+                    try:
+                        cls._write_atomic(data_file, cls._read(fallback_file))
+                    except Exception:
+                        cls._write_atomic(data_file, default_data)
+            return
+
+        try:
+            if not os.path.exists(fallback_file):
+                return
+            current = cls._read(data_file)
+            fallback = cls._read(fallback_file)
+            has_defaults = any(v.get('id') == 'v1' for v in current.get('videos', []))
+            fallback_has_custom = not any(v.get('id') == 'v1' for v in fallback.get('videos', []))
+            if has_defaults and fallback_has_custom:
+                with cls._file_lock(data_file):
+                    tmp_path = data_file + '.restore'
+                    shutil.copyfile(fallback_file, tmp_path)
+                    os.replace(tmp_path, data_file)
+        except Exception:
+            pass
+
+    # --- Cache ------------------------------------------------------------
+
+    @staticmethod
+    def _stat_key(data_file: str):
+        try:
+            st = os.stat(data_file)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    @staticmethod
+    def _build_entry(chave, dados: dict) -> dict:
+        corpo = json.dumps(dados, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        return {
+            'chave': chave,
+            'dados': dados,
+            'corpo': corpo,
+            'gzip': gzip.compress(corpo, compresslevel=9, mtime=0),
+            'etag': hashlib.sha1(corpo).hexdigest(),
+        }
+
+    @staticmethod
+    def _entry(project_root: str, default_data: dict) -> dict:
+        cls = CursosCatalogService
+        data_file, fallback_file = cls._paths(project_root)
+        cache = cls._cache
+        if cache is not None and cache['chave'] == cls._stat_key(data_file):
+            return cache
+
+        with cls._lock:
+            cache = cls._cache
+            chave = cls._stat_key(data_file)
+            if cache is not None and cache['chave'] == chave:
+                return cache
+            cls._bootstrap(data_file, fallback_file, default_data)
+            chave = cls._stat_key(data_file)
+            try:
+                dados = cls._read(data_file)
+            except Exception:
+                dados = default_data
+            cls._cache = cls._build_entry(chave, dados)
+            return cls._cache
+
+    @staticmethod
+    def get(project_root: str, default_data: dict) -> dict:
+        """Cópia do catálogo atual (pode ser alterada pelo chamador)."""
+        return copy.deepcopy(CursosCatalogService._entry(project_root, default_data)['dados'])
+
+    @staticmethod
+    def update(project_root: str, default_data: dict, alterar) -> dict:
+        """
+        Lê o catálogo sob o lock de arquivo, aplica alterar(dados) -> dados e grava
+        atomicamente. Retorna o catálogo gravado.
+        """
+        cls = CursosCatalogService
+        data_file, _ = cls._paths(project_root)
+        cls._entry(project_root, default_data)  # garante que o arquivo existe
+        with cls._file_lock(data_file):
+            try:
+                dados = cls._read(data_file)
+            except Exception:
+                dados = copy.deepcopy(default_data)
+            dados = alterar(dados)
+            cls._write_atomic(data_file, dados)
+            with cls._lock:
+                cls._cache = cls._build_entry(cls._stat_key(data_file), dados)
+        return dados
+
+    # --- Resposta HTTP ----------------------------------------------------
+
+    @staticmethod
+    def json_response(project_root: str, default_data: dict):
+        """
+        Catálogo como JSON com ETag; o navegador guarda e revalida a cada uso (304
+        sem corpo se nada mudou). Sai em gzip quando o cliente aceita.
+        """
+        entry = CursosCatalogService._entry(project_root, default_data)
+        usar_gzip = 'gzip' in request.headers.get('Accept-Encoding', '').lower()
+
+        response = make_response(entry['gzip'] if usar_gzip else entry['corpo'])
+        response.mimetype = 'application/json'
+        if usar_gzip:
+            response.headers['Content-Encoding'] = 'gzip'
+        response.vary.add('Accept-Encoding')
+        # Fraca: a mesma ETag vale para a versão gzip e a sem compressão
+        response.set_etag(entry['etag'], weak=True)
+        response.cache_control.public = True
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
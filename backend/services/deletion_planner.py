@@ -0,0 +1,236 @@
+# backend/services/deletion_planner.py
+
+from sqlalchemy import select, delete, update, func, or_, and_
+
+from ..models.database import db
+
+
+class DeletionBlockedError(Exception):
+    """Há registros dependentes fora das tabelas que a exclusão tem permissão de apagar."""
+
+
+class DeletionPlanner:
+    """
+    Planeja exclusões em massa a partir dos metadados dos modelos.
+
+    Cada "raiz" é uma tabela com um predicado SQL (subconsulta) e a lista explícita
+    de tabelas em que a exclusão pode seguir em cascata. O planejador segue as chaves
+    estrangeiras do db.metadata: filhos com FK obrigatória (NOT NULL) dentro da lista
+    também são excluídos, os de fora viram etapas de bloqueio (se tiverem linhas, nada
+    é executado) e FKs opcionais (NULL) apenas são desvinculadas.
+
+    As raízes são executadas na ordem em que foram adicionadas, em lotes de IDs lidos
+    do próprio predicado; cada etapa do lote roda como
+    'DELETE ... WHERE id IN (SELECT id ... LIMIT n)', com commit por lote.
+    """
+
+    DEFAULT_CHUNK_SIZE = 2000
+
+    def __init__(self, metadata=None):
+        self.metadata = metadata if metadata is not None else db.metadata
+        self.roots = []   # dicts {'table', 'where', 'cascade'}, na ordem de execução
+
+    def add_root(self, table_name: str, where, cascade=()):
+        """
+        Marca as linhas de 'table_name' que satisfazem 'where' para exclusão.
+        'cascade' lista as tabelas filhas (por nome) que podem ser apagadas junto.
+        """
+        self.roots.append({
+            'table': self.metadata.tables[table_name],
+            'where': where,
+            'cascade': frozenset(cascade),
+        })
+        return self
+
+    # --- Montagem do plano -----------------------------------------------
+
+    def _children(self, table):
+        """FKs de outras tabelas apontando para 'table' (lista de (tabela_filha, coluna))."""
+        refs = []
+        for child in self.metadata.sorted_tables:
+            for fk in child.foreign_keys:
+                if fk.column.table is table:
+                    refs.append((child, fk.parent))
+        return refs
+
+    def _root_steps(self, root: dict, root_where) -> list:
+        """Etapas de uma raiz ('block', 'nullify' e 'delete'), com o predicado da raiz dado."""
+        root_table = root['table']
+        deleted = {root_table: []}   # tabela -> lista de (coluna FK, tabela pai) que a alcançam
+        blocked = []                 # (tabela filha, coluna, tabela pai) fora da cascata permitida
+        seen_edges = set()
+        pending = [root_table]
+
+        while pending:
+            parent = pending.pop()
+            for child, column in self._children(parent):
+                if child is parent or column.nullable:
+                    continue
+                edge = (child.name, column.name, parent.name)
+                if edge in seen_edges:
+                    continue
+                seen_edges.add(edge)
+                if child is not root_table and child.name not in root['cascade']:
+                    blocked.append((child, column, parent))
+                    continue
+                if child not in deleted:
+                    pending.append(child)
+                deleted.setdefault(child, []).append((column, parent))
+
+        predicates = {}
+
+        def predicate(table, visiting=()):
+            if table in predicates:
+                return predicates[table]
+            clauses = [root_where] if table is root_table else []
+            for column, parent in deleted[table]:
+                if parent in visiting:
+                    continue
+                parent_pred = predicate(parent, visiting + (table,))
+                clauses.append(column.in_(select(parent.c.id).where(parent_pred)))
+            predicates[table] = or_(*clauses) if len(clauses) > 1 else clauses[0]
+            return predicates[table]
+
+        for table in deleted:
+            predicate(table)
+
+        steps = []
+        for child, column, parent in blocked:
+            steps.append({
+                'action': 'block',
+                'table': child,
+                'column': column,
+                'where': column.in_(select(parent.c.id).where(predicates[parent])),
+            })
+
+        # FKs opcionais que apontam para linhas excluídas são desvinculadas antes de tudo
+        for parent in deleted:
+            for child, column in self._children(parent):
+                if not column.nullable:
+                    continue
+                steps.append({
+                    'action': 'nullify',
+                    'table': child,
+                    'column': column,
+                    'where': column.in_(select(parent.c.id).where(predicates[parent])),
+                })
+
+        # sorted_tables vem com pais antes dos filhos; invertida, dá a ordem segura de exclusão
+        for table in reversed(self.metadata.sorted_tables):
+            if table in deleted:
+                steps.append({'action': 'delete', 'table': table, 'column': None, 'where': predicates[table]})
+        return steps
+
+    def build(self) -> list:
+        """
+        Retorna as etapas de todas as raízes, na ordem de execução.
+        Cada etapa é um dict: {'action': 'block'|'nullify'|'delete', 'table', 'column', 'where', 'root'}.
+        Um bloqueio não conta as linhas que uma raiz anterior já terá excluído.
+        """
+        steps = []
+        removed = {}   # tabela -> predicados de exclusão das raízes anteriores
+        for index, root in enumerate(self.roots):
+            root_steps = self._root_steps(root, root['where'])
+            for step in root_steps:
+                table = step['table']
+                if step['action'] == 'block' and table in removed:
+                    already = select(table.c.id).where(or_(*removed[table]))
+                    step['where'] = and_(step['where'], table.c.id.not_in(already))
+                step['root'] = index
+                steps.append(step)
+            for step in root_steps:
+                if step['action'] == 'delete':
+                    removed.setdefault(step['table'], []).append(step['where'])
+        return steps
+
+    # --- Prévia e execução ------------------------------------------------
+
+    @staticmethod
+    def preview(steps: list) -> list:
+        """
+        Dry-run: conta as linhas afetadas sem alterar nada. Etapas de raízes diferentes
+        sobre a mesma tabela e ação são somadas uma única vez (predicados unidos com OR).
+        """
+        merged = {}
+        for step in steps:
+            key = (step['action'], step['table'], step['column'])
+            merged.setdefault(key, []).append(step['where'])
+
+        result = []
+        for (action, table, column), wheres in merged.items():
+            rows = db.session.scalar(select(func.count()).select_from(table).where(or_(*wheres)))
+            result.append({
+                'action': action,
+                'table': table.name,
+                'column': column.name if column is not None else None,
+                'rows': rows or 0,
+            })
+        return result
+
+    def blockers(self) -> list:
+        """Itens da prévia que impedem a execução (dependentes fora da cascata permitida)."""
+        steps = [step for step in self.build() if step['action'] == 'block']
+        return [item for item in self.preview(steps) if item['rows']]
+
+    @staticmethod
+    def _run_step(step: dict, chunk_size: int) -> int:
+        table = step['table']
+        affected = 0
+        while True:
+            chunk = select(table.c.id).where(step['where']).limit(chunk_size)
+            if step['action'] == 'nullify':
+                stmt = update(table).where(table.c.id.in_(chunk)).values({step['column'].name: None})
+            else:
+                stmt = delete(table).where(table.c.id.in_(chunk))
+            rowcount = db.session.execute(stmt.execution_options(synchronize_session=False)).rowcount
+            db.session.commit()
+
+            affected += rowcount
+            if rowcount < chunk_size:
+                return affected
+
+    def execute(self, chunk_size: int = None, progress_callback=None) -> dict:
+        """
+        Executa o plano em lotes com commit por lote, para não segurar locks por muito tempo.
+        Levanta DeletionBlockedError (sem apagar nada) se houver bloqueios com linhas.
+
+        Cada raiz é processada em lotes de IDs lidos do seu predicado: as dependências do
+        lote saem primeiro e o lote por último. Assim o predicado pode depender de tabelas
+        que a própria cascata esvazia (ex.: alunos da escola via user_schools).
+        'progress_callback(indice_raiz, total_raizes, tabela, linhas_da_raiz)' é chamado após cada lote.
+        Retorna o total de linhas afetadas por tabela.
+        """
+        blockers = self.blockers()
+        if blockers:
+            detalhes = ', '.join(f"{item['table']}.{item['column']} ({item['rows']})" for item in blockers)
+            raise DeletionBlockedError(f"Existem registros dependentes que esta limpeza não pode excluir: {detalhes}.")
+
+        chunk_size = chunk_size or DeletionPlanner.DEFAULT_CHUNK_SIZE
+        totals = {}
+
+        for index, root in enumerate(self.roots, start=1):
+            table = root['table']
+            removed = 0
+            while True:
+                ids = db.session.scalars(
+                    select(table.c.id).where(root['where']).order_by(table.c.id).limit(chunk_size)
+                ).all()
+                if not ids:
+                    break
+
+                deleted_roots = 0
+                for step in self._root_steps(root, table.c.id.in_(ids)):
+                    if step['action'] == 'block':
+                        continue
+                    affected = self._run_step(step, chunk_size)
+                    key = step['table'].name if step['action'] == 'delete' else f"{step['table'].name}.{step['column'].name}"
+                    totals[key] = totals.get(key, 0) + affected
+                    if step['action'] == 'delete' and step['table'] is table:
+                        deleted_roots = affected
+
+                removed += deleted_roots
+                if progress_callback:
+                    progress_callback(index, len(self.roots), table.name, removed)
+                if len(ids) < chunk_size or not deleted_roots:
+                    break
+        return totals
@@ -1,8 +1,6 @@
 # backend/services/diario_service.py
 import os
 import base64
-import uuid
-import shutil
 import re
 from datetime import datetime, time, timedelta
 import pytz
@@ -19,6 +17,7 @@ from sqlalchemy import select, and_, or_, distinct
 
 # IMPORTAÇÃO PARA LER OS HORÁRIOS DINÂMICOS DA ESCOLA
 from .site_config_service import SiteConfigService
+from .upload_store_service import UploadStoreService
 
 class DiarioService:
     
@@ -283,38 +282,23 @@ class DiarioService:
         if not diario_pai:
             return False, "Permissão negada."
 
-        base_path = current_app.static_folder
-        upload_folder = os.path.join(base_path, 'uploads', 'signatures')
-        os.makedirs(upload_folder, exist_ok=True)
-        
-        filename = f"sig_diario_{diario_pai.id}_{uuid.uuid4().hex[:8]}.jpg"
-        filepath = os.path.join(upload_folder, filename)
-        db_path = f"uploads/signatures/{filename}"
-
         try:
+            # Assinaturas ficam no armazenamento por conteúdo: a assinatura padrão é
+            # referenciada diretamente pelos diários, sem uma cópia por bloco assinado
             if tipo_assinatura == 'padrao':
                 if not instrutor.assinatura_padrao_path: return False, "Sem assinatura padrão."
-                shutil.copy2(os.path.join(base_path, instrutor.assinatura_padrao_path), filepath)
+                db_path = instrutor.assinatura_padrao_path
             elif tipo_assinatura == 'canvas':
                 encoded = dados_assinatura.split(',', 1)[1] if ',' in dados_assinatura else dados_assinatura
-                with open(filepath, 'wb') as f: f.write(base64.b64decode(encoded))
+                db_path = UploadStoreService.put(base64.b64decode(encoded), 'jpg', UploadStoreService.BUCKET_ASSINATURAS).path
             elif tipo_assinatura == 'upload':
-                if hasattr(dados_assinatura, 'save'):
-                    dados_assinatura.save(filepath)
-                else:
-                    with open(filepath, 'wb') as f: f.write(dados_assinatura)
+                db_path = UploadStoreService.put(dados_assinatura, 'jpg', UploadStoreService.BUCKET_ASSINATURAS).path
+            else:
+                return False, "Tipo de assinatura inválido."
 
             if salvar_padrao and tipo_assinatura != 'padrao':
-                if instrutor.assinatura_padrao_path:
-                    old_path = os.path.join(base_path, instrutor.assinatura_padrao_path)
-                    if os.path.exists(old_path):
-                        try: os.remove(old_path)
-                        except: pass
-                
-                filename_padrao = f"instrutor_padrao_{instrutor.id}.jpg"
-                filepath_padrao = os.path.join(upload_folder, filename_padrao)
-                shutil.copy2(filepath, filepath_padrao)
-                instrutor.assinatura_padrao_path = f"uploads/signatures/{filename_padrao}"
+                UploadStoreService.swap(instrutor.assinatura_padrao_path, db_path)
+                instrutor.assinatura_padrao_path = db_path
 
             bloco_completo = db.session.scalars(
                 select(DiarioClasse).where(
@@ -344,6 +328,7 @@ class DiarioService:
             timestamp = DiarioService.get_agora_brasilia()
             for d in bloco_completo:
                 if d.status == 'pendente':
+                    UploadStoreService.swap(d.assinatura_path, db_path)
                     d.assinatura_path = db_path
                     d.status = 'assinado'
                     d.data_assinatura = timestamp
@@ -370,6 +355,7 @@ class DiarioService:
             )).all()
             for d in siblings:
                 d.status = 'pendente'
+                UploadStoreService.release(d.assinatura_path)
                 d.assinatura_path = None
                 d.data_assinatura = None
                 d.instrutor_assinante_id = None
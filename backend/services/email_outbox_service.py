@@ -0,0 +1,292 @@
+# backend/services/email_outbox_service.py
+
+from __future__ import annotations
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from flask import current_app
+from sqlalchemy import select, delete, update
+
+from ..models.database import db
+from ..models.email_outbox import EmailOutbox
+
+log = logging.getLogger(__name__)
+
+
+class EmailOutboxService:
+    """
+    Envio da fila email_outbox pela API transacional da Brevo, executado no worker.
+
+    - Um único ApiClient (pool de conexões HTTP) por processo.
+    - E-mails pendentes com o mesmo HTML são agrupados numa só chamada, um
+      messageVersion por destinatário (o assunto pode variar por versão), até
+      EMAIL_BATCH_SIZE destinatários. E-mails com conteúdo próprio (links com
+      token) seguem um por chamada.
+    - No máximo EMAIL_RATE_PER_SECOND chamadas por segundo.
+    - Falhas transitórias (429, 5xx, rede) voltam para a fila com backoff
+      exponencial; erros definitivos (4xx) ou MAX_TENTATIVAS esgotadas marcam 'failed'.
+    """
+
+    SENDER = {"name": "SisGEn", "email": "projetoesfasbm@gmail.com"}
+
+    MAX_TENTATIVAS = 6
+    BACKOFF_INICIAL = 30       # segundos
+    BACKOFF_MAXIMO = 3600
+    # Linhas em 'sending' há mais que isso (worker reiniciado no meio do envio) voltam para a fila
+    SENDING_TIMEOUT = timedelta(minutes=10)
+    RETENCAO_DIAS = 7
+
+    _api = None
+    _lock = threading.Lock()
+    _ultimo_envio = 0.0
+    # Substituível em testes para não esperar o limite de taxa
+    sleep = staticmethod(time.sleep)
+
+    # --- Cliente ----------------------------------------------------------
+
+    @staticmethod
+    def get_api():
+        """TransactionalEmailsApi do processo (construído na primeira chamada)."""
+        cls = EmailOutboxService
+        if cls._api is None:
+            with cls._lock:
+                if cls._api is None:
+                    import sib_api_v3_sdk
+
+                    api_key = current_app.config.get('BREVO_API_KEY')
+                    if not api_key:
+                        raise RuntimeError("BREVO_API_KEY não encontrada nas variáveis de ambiente (.env).")
+                    configuration = sib_api_v3_sdk.Configuration()
+                    configuration.api_key['api-key'] = api_key
+                    if current_app.config.get('BREVO_API_HOST'):
+                        configuration.host = current_app.config['BREVO_API_HOST']
+                    cls._api = sib_api_v3_sdk.TransactionalEmailsApi(sib_api_v3_sdk.ApiClient(configuration))
+        return cls._api
+
+    @staticmethod
+    def set_api(api):
+        """Injeta o cliente a ser usado (None volta a construir o cliente real na próxima chamada)."""
+        EmailOutboxService._api = api
+
+    # --- Fila -------------------------------------------------------------
+
+    @staticmethod
+    def _claim(limit: int) -> list:
+        """Marca como 'sending' e retorna até 'limit' e-mails prontos para envio."""
+        cls = EmailOutboxService
+        agora = datetime.utcnow()
+
+        db.session.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.status == 'sending', EmailOutbox.next_attempt_at < agora - cls.SENDING_TIMEOUT)
+            .values(status='pending')
+        )
+        emails = db.session.scalars(
+            select(EmailOutbox)
+            .where(EmailOutbox.status == 'pending', EmailOutbox.next_attempt_at <= agora)
+            .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ).all()
+        for email in emails:
+            email.status = 'sending'
+            email.next_attempt_at = agora
+        db.session.commit()
+        return emails
+
+    @staticmethod
+    def _lotes(emails: list, tamanho: int):
+        """Agrupa por HTML idêntico, preservando a ordem da fila; cada lote tem até 'tamanho' e-mails."""
+        grupos = OrderedDict()
+        for email in emails:
+            chave = hashlib.sha1(email.html_content.encode('utf-8')).hexdigest()
+            grupos.setdefault(chave, []).append(email)
+        for grupo in grupos.values():
+            for i in range(0, len(grupo), tamanho):
+                yield grupo[i:i + tamanho]
+
+    @staticmethod
+    def _destinatario(email) -> dict:
+        return {"email": email.to_email, "name": email.to_name} if email.to_name else {"email": email.to_email}
+
+    @staticmethod
+    def _aguardar_taxa():
+        cls = EmailOutboxService
+        intervalo = 1.0 / max(float(current_app.config.get('EMAIL_RATE_PER_SECOND') or 5), 0.01)
+        espera = cls._ultimo_envio + intervalo - time.monotonic()
+        if espera > 0:
+            cls.sleep(espera)
+        cls._ultimo_envio = time.monotonic()
+
+    @staticmethod
+    def _enviar_lote(lote: list) -> list:
+        """Uma chamada à API para o lote. Retorna os message ids (um por e-mail, quando a API informa)."""
+        import sib_api_v3_sdk
+
+        cls = EmailOutboxService
+        primeiro = lote[0]
+        if len(lote) == 1:
+            mensagem = sib_api_v3_sdk.SendSmtpEmail(
+                sender=cls.SENDER,
+                to=[cls._destinatario(primeiro)],
+                subject=primeiro.subject,
+                html_content=primeiro.html_content,
+            )
+        else:
+            mensagem = sib_api_v3_sdk.SendSmtpEmail(
+                sender=cls.SENDER,
+                subject=primeiro.subject,
+                html_content=primeiro.html_content,
+                message_versions=[{"to": [cls._destinatario(email)], "subject": email.subject} for email in lote],
+            )
+        cls._aguardar_taxa()
+        resposta = cls.get_api().send_transac_email(mensagem)
+        ids = getattr(resposta, 'message_ids', None) or []
+        if not ids and getattr(resposta, 'message_id', None):
+            ids = [resposta.message_id] * len(lote)
+        return ids
+
+    @staticmethod
+    def _transitorio(erro: Exception) -> bool:
+        status = getattr(erro, 'status', None)
+        if status is not None:
+            try:
+                status = int(status)
+            except (TypeError, ValueError):
+                return True
+            return status == 429 or status >= 500 or status == 0
+        try:
+            from urllib3.exceptions import HTTPError as Urllib3Error
+            if isinstance(erro, Urllib3Error):
+                return True
+        except ImportError:
+            pass
+        return isinstance(erro, OSError)
+
+    @staticmethod
+    def _registrar_falha(lote: list, erro: Exception):
+        cls = EmailOutboxService
+        transitorio = cls._transitorio(erro)
+        detalhe = str(getattr(erro, 'body', None) or erro)[:2000]
+        agora = datetime.utcnow()
+        for email in lote:
+            email.attempts += 1
+            email.last_error = detalhe
+            if transitorio and email.attempts < cls.MAX_TENTATIVAS:
+                email.status = 'pending'
+                email.next_attempt_at = agora + timedelta(seconds=min(cls.BACKOFF_MAXIMO, cls.BACKOFF_INICIAL * 2 ** (email.attempts - 1)))
+            else:
+                email.status = 'failed'
+        log.error(f"Falha ao enviar {len(lote)} e-mail(s) pela Brevo ({'nova tentativa agendada' if transitorio else 'definitiva'}): {detalhe}")
+
+    @staticmethod
+    def process_pending(limit: int = 200) -> dict:
+        """Envia os e-mails prontos da fila. Retorna {'enviados', 'reagendados', 'falhas', 'chamadas'}."""
+        cls = EmailOutboxService
+        stats = {'enviados': 0, 'reagendados': 0, 'falhas': 0, 'chamadas': 0}
+        emails = cls._claim(limit)
+        if not emails:
+            return stats
+
+        tamanho = max(1, int(current_app.config.get('EMAIL_BATCH_SIZE') or 1))
+        for lote in cls._lotes(emails, tamanho):
+            stats['chamadas'] += 1
+            try:
+                ids = cls._enviar_lote(lote)
+            except Exception as e:
+                cls._registrar_falha(lote, e)
+                for email in lote:
+                    stats['reagendados' if email.status == 'pending' else 'falhas'] += 1
+            else:
+                agora = datetime.utcnow()
+                for i, email in enumerate(lote):
+                    email.status = 'sent'
+                    email.attempts += 1
+                    email.sent_at = agora
+                    email.last_error = None
+                    email.message_id = ids[i] if i < len(ids) else None
+                    # O corpo já foi entregue à Brevo: não precisa ficar guardado
+                    email.html_content = ''
+                stats['enviados'] += len(lote)
+            # Commit por lote: um lote enviado nunca volta para a fila se o worker cair depois
+            db.session.commit()
+
+        log.info(f"Fila de e-mails: {stats}")
+        return stats
+
+    @staticmethod
+    def purge(dias: int = None) -> int:
+        """Remove os e-mails enviados há mais de 'dias' dias (falhas ficam para consulta)."""
+        limite = datetime.utcnow() - timedelta(days=dias or EmailOutboxService.RETENCAO_DIAS)
+        result = db.session.execute(
+            delete(EmailOutbox).where(EmailOutbox.status == 'sent', EmailOutbox.sent_at < limite)
+        )
+        db.session.commit()
+        return result.rowcount or 0
+
+
+class BrevoStubServer:
+    """
+    Stub HTTP local da API transacional da Brevo, para testes e desenvolvimento sem
+    enviar e-mails de verdade. Aceita POST /v3/smtp/email, guarda o JSON recebido
+    em 'recebidos' e responde como a API (messageId / messageIds).
+
+        stub = BrevoStubServer(porta=8025).start()   # BREVO_API_HOST=http://127.0.0.1:8025/v3
+        ...
+        stub.stop()
+
+    'falhas' = lista de status HTTP a devolver nas próximas chamadas (ex.: [503, 429]).
+    """
+
+    def __init__(self, host: str = '127.0.0.1', porta: int = 8025, falhas=None):
+        self.recebidos = []
+        self.falhas = list(falhas or [])
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                corpo = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                if self.path.rstrip('/') != '/v3/smtp/email':
+                    return self._responder(404, {'code': 'not_found', 'message': 'Rota inexistente no stub'})
+                if stub.falhas:
+                    return self._responder(stub.falhas.pop(0), {'code': 'stub_error', 'message': 'Falha simulada'})
+                dados = json.loads(corpo or b'{}')
+                stub.recebidos.append(dados)
+                versoes = dados.get('messageVersions') or []
+                if versoes:
+                    return self._responder(201, {'messageIds': [f"<{uuid.uuid4().hex}@stub>" for _ in versoes]})
+                return self._responder(201, {'messageId': f"<{uuid.uuid4().hex}@stub>"})
+
+            def _responder(self, status, dados):
+                corpo = json.dumps(dados).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def log_message(self, format, *args):
+                log.info("brevo-stub: " + format % args)
+
+        self.server = ThreadingHTTPServer((host, porta), Handler)
+        self.url = f"http://{host}:{self.server.server_address[1]}/v3"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -1,63 +1,30 @@
 # backend/services/email_service.py
 
 import logging
-import os
-from threading import Thread
-from flask import current_app, render_template
-import sib_api_v3_sdk
-from sib_api_v3_sdk.rest import ApiException
+from flask import render_template
 
-log = logging.getLogger(__name__)
-
-def send_async_email_brevo(app, to_email, subject, html_content):
-    """
-    Função auxiliar que executa o envio de e-mail usando a API da Brevo
-    dentro de uma thread separada para não travar a aplicação principal.
-    """
-    with app.app_context():
-        # 1. Configuração da API Key da Brevo
-        configuration = sib_api_v3_sdk.Configuration()
-        # A chave continua vindo do .env por segurança
-        configuration.api_key['api-key'] = os.environ.get('BREVO_API_KEY')
-
-        if not configuration.api_key.get('api-key'):
-            log.error("ERRO CRÍTICO DE E-MAIL: BREVO_API_KEY não encontrada nas variáveis de ambiente (.env).")
-            return
-
-        # 2. Inicializa o cliente da API
-        api_instance = sib_api_v3_sdk.TransactionalEmailsApi(sib_api_v3_sdk.ApiClient(configuration))
-
-        # 3. Configura o Remetente (Sender) - FIXO conforme solicitado
-        # Isso garante que use exatamente o e-mail que funcionou no seu teste.
-        sender = {"name": "SisGEn", "email": "projetoesfasbm@gmail.com"}
-
-        # Configura o destinatário
-        to = [{"email": to_email}]
-
-        # 4. Prepara o objeto de envio
-        send_smtp_email = sib_api_v3_sdk.SendSmtpEmail(
-            to=to,
-            sender=sender,
-            subject=subject,
-            html_content=html_content
-        )
+from ..models.database import db
+from ..models.email_outbox import EmailOutbox
 
-        # 5. Tenta enviar
-        try:
-            api_response = api_instance.send_transac_email(send_smtp_email)
-            log.info(f"SUCESSO: E-mail enviado via Brevo para {to_email}. ID: {api_response.message_id}")
-        except ApiException as e:
-            log.error(f"FALHA AO ENVIAR E-MAIL BREVO para {to_email}.")
-            log.error(f"Status Code: {e.status}")
-            log.error(f"Detalhe do Erro: {e.body}")
-        except Exception as e:
-            log.exception(f"ERRO INESPERADO ao tentar enviar e-mail para {to_email}: {str(e)}")
+log = logging.getLogger(__name__)
 
 class EmailService:
     """
     Serviço centralizado para envio de e-mails transacionais do sistema.
+
+    Os e-mails são apenas enfileirados (um INSERT em email_outbox); o envio pela
+    API da Brevo é feito pelo worker (EmailOutboxService), com retry e backoff.
     """
 
+    @staticmethod
+    def enqueue(to_email, subject, html_content, to_name=None, commit=True):
+        """Coloca o e-mail na fila de saída e retorna a linha criada."""
+        email = EmailOutbox(to_email=to_email, to_name=to_name, subject=subject, html_content=html_content)
+        db.session.add(email)
+        if commit:
+            db.session.commit()
+        return email
+
     @staticmethod
     def send_password_reset_email(user, token):
         """Envia e-mail de redefinição de senha com o token gerado."""
@@ -65,8 +32,7 @@ class EmailService:
             log.warning(f"Tentativa de envio de e-mail de senha para usuário sem e-mail: {user.matricula}")
             return None
 
-        log.info(f"Iniciando processo de envio de e-mail de SENHA para: {user.email}")
-        app = current_app._get_current_object()
+        log.info(f"Enfileirando e-mail de SENHA para: {user.email}")
 
         # Renderiza o template HTML com os dados necessários
         html_content = render_template(
@@ -77,10 +43,7 @@ class EmailService:
 
         subject = 'Redefinição de Senha - SisGEn'
 
-        # Inicia a thread para envio assíncrono
-        thr = Thread(target=send_async_email_brevo, args=[app, user.email, subject, html_content])
-        thr.start()
-        return thr
+        return EmailService.enqueue(user.email, subject, html_content)
 
     @staticmethod
     def send_2fa_reset_email(user, token):
@@ -89,8 +52,7 @@ class EmailService:
             log.warning(f"Tentativa de envio de e-mail 2FA para usuário sem e-mail: {user.matricula}")
             return None
 
-        log.info(f"Iniciando processo de envio de e-mail de RESET 2FA para: {user.email}")
-        app = current_app._get_current_object()
+        log.info(f"Enfileirando e-mail de RESET 2FA para: {user.email}")
 
         html_content = render_template(
             'email/reset_2fa.html',
@@ -100,9 +62,7 @@ class EmailService:
 
         subject = 'Recuperação de 2FA - SisGEn'
 
-        thr = Thread(target=send_async_email_brevo, args=[app, user.email, subject, html_content])
-        thr.start()
-        return thr
+        return EmailService.enqueue(user.email, subject, html_content)
 
     @staticmethod
     def send_justice_notification_email(user, processo, url):
@@ -111,8 +71,7 @@ class EmailService:
             log.warning(f"Usuário {user.matricula} sem e-mail cadastrado para notificação de justiça.")
             return None
 
-        log.info(f"Iniciando processo de envio de notificação de JUSTIÇA (Abertura) para: {user.email}")
-        app = current_app._get_current_object()
+        log.info(f"Enfileirando notificação de JUSTIÇA (Abertura) para: {user.email}")
 
         html_content = render_template(
             'email/notificacao_justica.html',
@@ -123,9 +82,7 @@ class EmailService:
 
         subject = f'Notificação de Processo Disciplinar - Nº {processo.id}'
 
-        thr = Thread(target=send_async_email_brevo, args=[app, user.email, subject, html_content])
-        thr.start()
-        return thr
+        return EmailService.enqueue(user.email, subject, html_content)
 
     @staticmethod
     def send_justice_verdict_email(user, processo):
@@ -134,8 +91,7 @@ class EmailService:
              log.warning(f"Usuário {user.matricula} sem e-mail cadastrado para veredito de justiça.")
              return None
 
-        log.info(f"Iniciando processo de envio de notificação de JUSTIÇA (Veredito) para: {user.email}")
-        app = current_app._get_current_object()
+        log.info(f"Enfileirando notificação de JUSTIÇA (Veredito) para: {user.email}")
 
         html_content = render_template(
             'email/veredito_justica.html',
@@ -145,6 +101,4 @@ class EmailService:
 
         subject = f'Decisão de Processo Disciplinar - Nº {processo.id}'
 
-        thr = Thread(target=send_async_email_brevo, args=[app, user.email, subject, html_content])
-        thr.start()
-        return thr
\ No newline at end of file
+        return EmailService.enqueue(user.email, subject, html_content)
\ No newline at end of file
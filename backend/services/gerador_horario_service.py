@@ -0,0 +1,429 @@
+# backend/services/gerador_horario_service.py
+
+import json
+import math
+import time
+import uuid
+
+from sqlalchemy import select, func, case, insert
+from sqlalchemy.orm import aliased
+
+from ..models.database import db
+from ..models.horario import Horario
+from ..models.semana import Semana
+from ..models.disciplina import Disciplina
+from ..models.disciplina_turma import DisciplinaTurma
+from ..models.instrutor import Instrutor
+from ..models.turma import Turma
+
+from .grade_ocupacao_service import GradeOcupacaoService, DIAS, PERIODOS, mascara, posicoes, inicios_livres
+from .site_config_service import SiteConfigService
+from .user_service import UserService
+
+MATERIA_DISPOSICAO = 'A DISPOSIÇÃO DO C AL /S ENS'
+
+_MASCARA_DIA = [mascara(dia, 1, PERIODOS) for dia in DIAS]
+_DIA_IDX = {dia: i for i, dia in enumerate(DIAS)}
+
+
+class _Unidade:
+    """
+    Uma disciplina de um pelotão a ser distribuída na semana (a variável do problema).
+    'fila' guarda as durações dos blocos que faltam colocar, a maior no fim.
+    """
+
+    __slots__ = ('pelotao', 'disciplina_id', 'materia', 'instrutor_id_1', 'instrutor_id_2', 'user_ids',
+                 'prioridade', 'demanda', 'alocado', 'carga_dia', 'fila', 'ordem', 'candidatos')
+
+    def __init__(self, pelotao, disciplina_id, materia, instrutor_id_1, instrutor_id_2, user_ids, prioridade, demanda):
+        self.pelotao = pelotao
+        self.disciplina_id = disciplina_id
+        self.materia = materia
+        self.instrutor_id_1 = instrutor_id_1
+        self.instrutor_id_2 = instrutor_id_2
+        self.user_ids = user_ids
+        self.prioridade = prioridade
+        self.demanda = demanda
+        self.alocado = 0
+        self.carga_dia = [0] * len(DIAS)
+        self.fila = []
+        self.ordem = 0
+        self.candidatos = None  # inícios possíveis do próximo bloco da fila; None = recalcular
+
+
+class _Bloco:
+    """Aula de 'duracao' períodos consecutivos colocada pelo gerador."""
+
+    __slots__ = ('unidade', 'duracao', 'dia', 'periodo')
+
+    def __init__(self, unidade, duracao):
+        self.unidade = unidade
+        self.duracao = duracao
+        self.dia = None
+        self.periodo = None
+
+
+class _Solver:
+    """
+    Busca gulosa: prioritárias primeiro, depois a unidade com a menor fração da
+    demanda já atendida (quando faltam instrutores, a falta é dividida entre os
+    pelotões em vez de zerar os últimos) e, no empate, MRV (menos inícios
+    possíveis para o próximo bloco). Reparo de um nível: quando um bloco
+    fica sem lugar, tenta mover um bloco já colocado pelo gerador no mesmo pelotão
+    ou com os mesmos instrutores. Se ainda assim um bloco de 2 períodos não cabe,
+    os blocos maiores da unidade viram blocos de 1; se um de 1 não cabe, a unidade
+    para (os demais também não caberiam) e o que faltou vai para o relatório.
+    """
+
+    def __init__(self, ocupacao, inicios_permitidos, reservas, limite_diario, max_reparos):
+        self.ocupacao = ocupacao
+        self.inicios_permitidos = inicios_permitidos
+        self.reservas = reservas
+        self.limite_diario = limite_diario
+        self.max_reparos = max_reparos
+        self.pendentes = set()
+        self.colocados = []
+        self.por_pelotao = {}
+        self.por_instrutor = {}
+        self._ordem = 0
+
+    # --- Estrutura ---
+
+    def adicionar(self, unidade, duracoes):
+        unidade.fila = sorted(duracoes)
+        unidade.ordem = self._ordem
+        self._ordem += 1
+        if unidade.fila:
+            self.pendentes.add(unidade)
+        self.por_pelotao.setdefault(unidade.pelotao, []).append(unidade)
+        for user_id in unidade.user_ids:
+            self.por_instrutor.setdefault(user_id, []).append(unidade)
+
+    def _sujar_vizinhos(self, unidade):
+        for vizinha in self.por_pelotao.get(unidade.pelotao, ()):
+            vizinha.candidatos = None
+        for user_id in unidade.user_ids:
+            for vizinha in self.por_instrutor.get(user_id, ()):
+                vizinha.candidatos = None
+
+    # --- Domínio e valor ---
+
+    def _calcular_candidatos(self, u, duracao) -> int:
+        livre = self.ocupacao.livres(u.pelotao, u.user_ids)
+        if not u.prioridade:
+            livre &= ~self.reservas.get(u.pelotao.strip().upper(), 0)
+        dias = 0
+        for i, carga in enumerate(u.carga_dia):
+            if carga + duracao <= self.limite_diario:
+                dias |= _MASCARA_DIA[i]
+        return inicios_livres(livre, duracao) & self.inicios_permitidos[duracao] & dias
+
+    def candidatos(self, u) -> int:
+        if u.candidatos is None:
+            u.candidatos = self._calcular_candidatos(u, u.fila[-1])
+        return u.candidatos
+
+    def _melhor_inicio(self, u, candidatos):
+        """Dia com menos aulas da disciplina, depois dia mais leve do pelotão, depois o período mais cedo."""
+        ocupado = self.ocupacao.pelotao(u.pelotao)
+        carga_pelotao = {}
+        melhor = None
+        for dia, periodo in posicoes(candidatos):
+            i = _DIA_IDX[dia]
+            if i not in carga_pelotao:
+                carga_pelotao[i] = (ocupado & _MASCARA_DIA[i]).bit_count()
+            chave = (u.carga_dia[i], carga_pelotao[i], periodo, i)
+            if melhor is None or chave < melhor[0]:
+                melhor = (chave, dia, periodo)
+        return melhor[1], melhor[2]
+
+    # --- Colocação ---
+
+    def _colocar(self, bloco, dia, periodo):
+        u = bloco.unidade
+        self.ocupacao.ocupar(u.pelotao, dia, periodo, periodo + bloco.duracao - 1, u.user_ids)
+        u.carga_dia[_DIA_IDX[dia]] += bloco.duracao
+        u.alocado += bloco.duracao
+        bloco.dia, bloco.periodo = dia, periodo
+
+    def _retirar(self, bloco):
+        u = bloco.unidade
+        self.ocupacao.liberar(u.pelotao, bloco.dia, bloco.periodo, bloco.periodo + bloco.duracao - 1, u.user_ids)
+        u.carga_dia[_DIA_IDX[bloco.dia]] -= bloco.duracao
+        u.alocado -= bloco.duracao
+        bloco.dia = bloco.periodo = None
+
+    def _reparar(self, bloco) -> bool:
+        u = bloco.unidade
+        vizinhos = [
+            c for c in reversed(self.colocados)
+            if c.unidade.pelotao == u.pelotao or not u.user_ids.isdisjoint(c.unidade.user_ids)
+        ][:self.max_reparos]
+
+        for outro in vizinhos:
+            dia_antigo, periodo_antigo = outro.dia, outro.periodo
+            self._retirar(outro)
+            livres = self._calcular_candidatos(u, bloco.duracao)
+            if livres:
+                self._colocar(bloco, *self._melhor_inicio(u, livres))
+                livres_outro = (
+                    self._calcular_candidatos(outro.unidade, outro.duracao)
+                    & ~(mascara(dia_antigo, periodo_antigo) or 0)
+                )
+                if livres_outro:
+                    self._colocar(outro, *self._melhor_inicio(outro.unidade, livres_outro))
+                    self._sujar_vizinhos(outro.unidade)
+                    return True
+                self._retirar(bloco)
+            self._colocar(outro, dia_antigo, periodo_antigo)
+        return False
+
+    def resolver(self):
+        while self.pendentes:
+            u = min(
+                self.pendentes,
+                key=lambda x: (
+                    not x.prioridade, x.alocado / x.demanda, self.candidatos(x).bit_count(), -x.fila[-1], x.ordem
+                )
+            )
+            livres = self.candidatos(u)
+            bloco = _Bloco(u, u.fila.pop())
+            if livres:
+                self._colocar(bloco, *self._melhor_inicio(u, livres))
+            elif not self._reparar(bloco):
+                # O domínio só depende da unidade e da duração: os outros blocos iguais também não cabem
+                u.fila = [1] * (bloco.duracao + sum(u.fila)) if bloco.duracao > 1 else []
+                bloco = None
+
+            if bloco is not None:
+                self.colocados.append(bloco)
+                self._sujar_vizinhos(u)
+            else:
+                u.candidatos = None
+            if not u.fila:
+                self.pendentes.discard(u)
+        return self.colocados
+
+
+class GeradorHorarioService:
+    """
+    Gera um rascunho da semana: distribui a carga horária restante das disciplinas
+    de cada pelotão respeitando a ocupação dos pelotões e dos instrutores (em todas
+    as escolas), os bloqueios do administrador, os intervalos e as disciplinas
+    prioritárias. As aulas propostas entram como 'pendente' para revisão.
+    """
+
+    BLOCO_PADRAO = 2
+    LIMITE_DIARIO = 4
+    MAX_REPAROS = 12
+
+    @staticmethod
+    def _inicios_permitidos(school_id) -> dict:
+        """{duração: bits de início} sem atravessar os intervalos configurados (como no save_aula)."""
+        try:
+            break_points = {
+                int(float(SiteConfigService.get_config('posicao_intervalo_manha', '3', school_id=school_id))),
+                int(float(SiteConfigService.get_config('posicao_intervalo_almoco', '6', school_id=school_id))),
+                int(float(SiteConfigService.get_config('posicao_intervalo_tarde', '9', school_id=school_id))),
+            }
+        except (ValueError, TypeError):
+            break_points = {3, 6, 9}
+
+        permitidos = {}
+        for duracao in range(1, GeradorHorarioService.BLOCO_PADRAO + 1):
+            bits = 0
+            for inicio in range(1, PERIODOS - duracao + 2):
+                if not break_points.intersection(range(inicio, inicio + duracao - 1)):
+                    for dia in DIAS:
+                        bits |= mascara(dia, inicio)
+            permitidos[duracao] = bits
+        return permitidos
+
+    @staticmethod
+    def _disciplinas_prioritarias(semana) -> set:
+        if not semana.priority_active:
+            return set()
+        try:
+            nomes = json.loads(semana.priority_disciplines or '[]')
+        except ValueError:
+            return set()
+        return set(nomes) if isinstance(nomes, list) else set()
+
+    @staticmethod
+    def _carregar_unidades(semana, turmas, completar):
+        """Unidades com a demanda da semana e as disciplinas sem instrutor vinculado."""
+        turma_por_id = {t.id: t.nome for t in turmas}
+        disciplinas = db.session.execute(
+            select(Disciplina.id, Disciplina.materia, Disciplina.carga_horaria_prevista, Disciplina.turma_id)
+            .where(Disciplina.ciclo_id == semana.ciclo_id, Disciplina.turma_id.in_(list(turma_por_id)))
+            .order_by(Disciplina.turma_id, Disciplina.materia)
+        ).all()
+        disciplinas = [d for d in disciplinas if (d.materia or '').strip().upper() != MATERIA_DISPOSICAO]
+        if not disciplinas:
+            return [], []
+        disciplina_ids = [d.id for d in disciplinas]
+
+        # Horas já agendadas (no total e nesta semana) por disciplina/pelotão numa consulta só
+        agendado = {
+            (disciplina_id, pelotao): (total or 0, nesta or 0)
+            for disciplina_id, pelotao, total, nesta in db.session.execute(
+                select(
+                    Horario.disciplina_id, Horario.pelotao,
+                    func.sum(Horario.duracao),
+                    func.sum(case((Horario.semana_id == semana.id, Horario.duracao), else_=0)),
+                )
+                .where(Horario.disciplina_id.in_(disciplina_ids))
+                .group_by(Horario.disciplina_id, Horario.pelotao)
+            )
+        }
+
+        instrutor_1 = aliased(Instrutor)
+        instrutor_2 = aliased(Instrutor)
+        vinculos = {}
+        for disciplina_id, pelotao, id_1, id_2, user_1, user_2 in db.session.execute(
+            select(
+                DisciplinaTurma.disciplina_id, DisciplinaTurma.pelotao,
+                DisciplinaTurma.instrutor_id_1, DisciplinaTurma.instrutor_id_2,
+                instrutor_1.user_id, instrutor_2.user_id.label('user_id_2'),
+            )
+            .outerjoin(instrutor_1, instrutor_1.id == DisciplinaTurma.instrutor_id_1)
+            .outerjoin(instrutor_2, instrutor_2.id == DisciplinaTurma.instrutor_id_2)
+            .where(DisciplinaTurma.disciplina_id.in_(disciplina_ids))
+            .order_by(DisciplinaTurma.id)
+        ):
+            if id_1 is None and id_2 is None:
+                continue
+            vinculos.setdefault(disciplina_id, []).append((pelotao, id_1, id_2, user_1, user_2))
+
+        semanas_restantes = db.session.scalar(
+            select(func.count(Semana.id))
+            .where(Semana.ciclo_id == semana.ciclo_id, Semana.data_inicio >= semana.data_inicio)
+        ) or 1
+
+        prioritarias = GeradorHorarioService._disciplinas_prioritarias(semana)
+        unidades, sem_instrutor = [], []
+        for d in disciplinas:
+            pelotao = turma_por_id[d.turma_id]
+            total, nesta = agendado.get((d.id, pelotao), (0, 0))
+            restante = max((d.carga_horaria_prevista or 0) - total, 0)
+            if completar:
+                demanda = restante
+            else:
+                demanda = math.ceil((restante + nesta) / semanas_restantes) - nesta
+                demanda = min(max(demanda, 0), restante)
+            if demanda <= 0:
+                continue
+
+            opcoes = vinculos.get(d.id)
+            if not opcoes:
+                sem_instrutor.append({'pelotao': pelotao, 'disciplina': d.materia, 'horas': demanda})
+                continue
+            _, id_1, id_2, user_1, user_2 = next((v for v in opcoes if v[0] == pelotao), opcoes[0])
+            if id_1 is None:
+                id_1, id_2, user_1, user_2 = id_2, None, user_2, None
+
+            unidades.append(_Unidade(
+                pelotao, d.id, d.materia, id_1, id_2,
+                frozenset(u for u in (user_1, user_2) if u is not None),
+                d.materia in prioritarias, demanda,
+            ))
+        return unidades, sem_instrutor
+
+    @staticmethod
+    def gerar(semana_id, pelotoes=None, aplicar=False, completar=False):
+        """
+        Propõe (ou grava, com aplicar=True) as aulas da semana para os pelotões
+        informados (None = todos da edição do ciclo). Por padrão cada disciplina
+        recebe a sua parte da carga restante dividida pelas semanas que faltam no
+        ciclo; com completar=True tenta encaixar toda a carga restante.
+        Retorna (sucesso, mensagem, relatorio).
+        """
+        inicio = time.perf_counter()
+        semana = db.session.get(Semana, semana_id) if semana_id else None
+        if not semana:
+            return False, 'Semana não encontrada.', None
+
+        school_id = semana.ciclo.school_id
+        active_school_id = UserService.get_current_school_id()
+        if active_school_id and school_id != active_school_id:
+            return False, 'Permissão negada: Semana pertence a outra escola.', None
+
+        query_turmas = select(Turma).where(Turma.school_id == school_id).order_by(Turma.nome)
+        if semana.ciclo.edicao_id:
+            query_turmas = query_turmas.where(Turma.edicao_id == semana.ciclo.edicao_id)
+        if pelotoes:
+            query_turmas = query_turmas.where(Turma.nome.in_(list(pelotoes)))
+        turmas = db.session.scalars(query_turmas).all()
+        if not turmas:
+            return False, 'Nenhum pelotão encontrado para esta semana.', None
+
+        unidades, sem_instrutor = GeradorHorarioService._carregar_unidades(semana, turmas, completar)
+
+        ocupacao = GradeOcupacaoService.get(semana, school_id).copia()
+        solver = _Solver(
+            ocupacao,
+            GeradorHorarioService._inicios_permitidos(school_id),
+            GradeOcupacaoService.mascaras_bloqueio(semana.priority_blocks) if semana.priority_active else {},
+            GeradorHorarioService.LIMITE_DIARIO,
+            GeradorHorarioService.MAX_REPAROS,
+        )
+        bloco = GeradorHorarioService.BLOCO_PADRAO
+        for u in unidades:
+            solver.adicionar(u, [bloco] * (u.demanda // bloco) + [1] * (u.demanda % bloco))
+        colocados = sorted(
+            solver.resolver(),
+            key=lambda b: (b.unidade.pelotao, _DIA_IDX[b.dia], b.periodo)
+        )
+
+        aulas = [
+            {
+                'pelotao': b.unidade.pelotao, 'semana_id': semana.id, 'dia_semana': b.dia,
+                'periodo': b.periodo, 'duracao': b.duracao, 'disciplina_id': b.unidade.disciplina_id,
+                'instrutor_id': b.unidade.instrutor_id_1, 'instrutor_id_2': b.unidade.instrutor_id_2,
+                'status': 'pendente', 'group_id': str(uuid.uuid4()) if b.duracao > 1 else None,
+            }
+            for b in colocados
+        ]
+
+        if aplicar and aulas:
+            try:
+                db.session.execute(insert(Horario), aulas)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                return False, f'Erro ao gravar o rascunho: {str(e)}', None
+
+        por_pelotao = {t.nome: {'pelotao': t.nome, 'demanda': 0, 'alocado': 0, 'pendencias': []} for t in turmas}
+        for u in unidades:
+            item = por_pelotao[u.pelotao]
+            item['demanda'] += u.demanda
+            item['alocado'] += u.alocado
+            if u.alocado < u.demanda:
+                item['pendencias'].append({'disciplina': u.materia, 'faltam': u.demanda - u.alocado})
+        for item in por_pelotao.values():
+            item['preenchimento'] = round(item['alocado'] / item['demanda'], 3) if item['demanda'] else 1.0
+
+        demanda = sum(u.demanda for u in unidades)
+        alocado = sum(u.alocado for u in unidades)
+        materias = {u.disciplina_id: u.materia for u in unidades}
+        relatorio = {
+            'semana_id': semana.id,
+            'aplicado': bool(aplicar and aulas),
+            'demanda': demanda,
+            'alocado': alocado,
+            'preenchimento': round(alocado / demanda, 3) if demanda else 1.0,
+            'pelotoes': list(por_pelotao.values()),
+            'sem_instrutor': sem_instrutor,
+            'aulas': [
+                {k: a[k] for k in ('pelotao', 'dia_semana', 'periodo', 'duracao', 'disciplina_id', 'instrutor_id', 'instrutor_id_2')}
+                | {'disciplina': materias[a['disciplina_id']]}
+                for a in aulas
+            ],
+            'tempo_ms': round((time.perf_counter() - inicio) * 1000, 1),
+        }
+
+        if aplicar:
+            msg = f'{len(aulas)} aula(s) pendentes criadas ({alocado} de {demanda} horas).'
+        else:
+            msg = f'Rascunho com {len(aulas)} aula(s): {alocado} de {demanda} horas alocadas.'
+        return True, msg, relatorio
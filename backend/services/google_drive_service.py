@@ -0,0 +1,195 @@
+# backend/services/google_drive_service.py
+
+from __future__ import annotations
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from io import BytesIO
+
+logger = logging.getLogger(__name__)
+
+
+class GoogleDriveService:
+    """
+    Upload de planilhas para o Google Drive (convertidas em Google Sheets).
+
+    Usado pelo worker (task 'export_google_sheets'), fora do ciclo da requisição.
+    O cliente do Drive é construído uma única vez por processo e reaproveitado;
+    set_service() permite injetar um substituto (ex.: FakeDriveService) em testes
+    offline. Cada chamada à API é refeita com backoff exponencial em erros
+    transitórios (429, 5xx, limite de taxa, falhas de rede).
+    """
+
+    SCOPES = ["https://www.googleapis.com/auth/drive.file"]
+    XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    SHEET_MIMETYPE = 'application/vnd.google-apps.spreadsheet'
+
+    MAX_TENTATIVAS = 5
+    BACKOFF_INICIAL = 1.0
+    BACKOFF_MAXIMO = 32.0
+    STATUS_TRANSITORIOS = (408, 429, 500, 502, 503, 504)
+    MOTIVOS_LIMITE = (b'rateLimitExceeded', b'userRateLimitExceeded')
+
+    _service = None
+    _lock = threading.Lock()
+    # Substituível em testes para não esperar o backoff
+    sleep = staticmethod(time.sleep)
+
+    # --- Cliente ----------------------------------------------------------
+
+    @staticmethod
+    def _get_credentials():
+        from google.oauth2.service_account import Credentials
+
+        credentials_json = os.environ.get("GA_CREDENTIALS_JSON")
+        if not credentials_json:
+            raise RuntimeError("A variável de ambiente GA_CREDENTIALS_JSON não foi configurada.")
+        try:
+            return Credentials.from_service_account_info(json.loads(credentials_json), scopes=GoogleDriveService.SCOPES)
+        except Exception as e:
+            raise RuntimeError(f"Erro ao carregar credenciais do Google: {e}")
+
+    @staticmethod
+    def get_service():
+        """Cliente do Drive v3 do processo (construído na primeira chamada)."""
+        cls = GoogleDriveService
+        if cls._service is None:
+            with cls._lock:
+                if cls._service is None:
+                    from googleapiclient.discovery import build
+                    # cache_discovery=False: evita o aviso do file_cache com oauth2client ausente
+                    cls._service = build('drive', 'v3', credentials=cls._get_credentials(), cache_discovery=False)
+        return cls._service
+
+    @staticmethod
+    def set_service(service):
+        """Injeta o cliente a ser usado (None volta a construir o cliente real na próxima chamada)."""
+        GoogleDriveService._service = service
+
+    # --- Retry ------------------------------------------------------------
+
+    @staticmethod
+    def _transitorio(erro: Exception) -> bool:
+        cls = GoogleDriveService
+        try:
+            from googleapiclient.errors import HttpError
+        except ImportError:
+            HttpError = None
+        if HttpError is not None and isinstance(erro, HttpError):
+            status = getattr(erro.resp, 'status', None)
+            if status in cls.STATUS_TRANSITORIOS:
+                return True
+            conteudo = erro.content or b''
+            return status == 403 and any(motivo in conteudo for motivo in cls.MOTIVOS_LIMITE)
+        try:
+            from httplib2 import HttpLib2Error
+            if isinstance(erro, HttpLib2Error):
+                return True
+        except ImportError:
+            pass
+        # Timeouts, conexão recusada/resetada etc.
+        return isinstance(erro, OSError)
+
+    @staticmethod
+    def _executar(criar_requisicao, descricao: str):
+        """
+        Executa a requisição criada por criar_requisicao() com retry/backoff.
+        A requisição é recriada a cada tentativa (um upload interrompido recomeça do zero).
+        """
+        cls = GoogleDriveService
+        for tentativa in range(1, cls.MAX_TENTATIVAS + 1):
+            try:
+                return criar_requisicao().execute()
+            except Exception as e:
+                if tentativa == cls.MAX_TENTATIVAS or not cls._transitorio(e):
+                    raise
+                espera = min(cls.BACKOFF_MAXIMO, cls.BACKOFF_INICIAL * 2 ** (tentativa - 1))
+                espera += random.uniform(0, espera / 2)
+                logger.warning(f"Google Drive: falha transitória em '{descricao}' (tentativa {tentativa}): {e}. "
+                               f"Nova tentativa em {espera:.1f}s.")
+                cls.sleep(espera)
+
+    # --- Operações --------------------------------------------------------
+
+    @staticmethod
+    def upload_xlsx_as_sheet(nome: str, xlsx_bytes: bytes, publico: bool = True) -> str:
+        """
+        Envia o .xlsx convertendo para Google Sheets e retorna o webViewLink.
+        Com publico=True, qualquer pessoa com o link pode visualizar.
+        """
+        from googleapiclient.http import MediaIoBaseUpload
+
+        cls = GoogleDriveService
+        service = cls.get_service()
+        metadata = {'name': nome, 'mimeType': cls.SHEET_MIMETYPE}
+
+        arquivo = cls._executar(
+            lambda: service.files().create(
+                body=metadata,
+                media_body=MediaIoBaseUpload(BytesIO(xlsx_bytes), mimetype=cls.XLSX_MIMETYPE, resumable=True),
+                fields='id, webViewLink'
+            ),
+            'upload'
+        )
+        if publico:
+            cls._executar(
+                lambda: service.permissions().create(fileId=arquivo['id'], body={'type': 'anyone', 'role': 'reader'}),
+                'permissão'
+            )
+        return arquivo.get('webViewLink')
+
+
+class FakeDriveService:
+    """
+    Substituto em memória do cliente do Drive, para testes offline:
+
+        fake = FakeDriveService(falhas_transitorias=2)
+        GoogleDriveService.set_service(fake)
+
+    Guarda os arquivos enviados em 'arquivos' e as permissões em 'permissoes'.
+    As primeiras 'falhas_transitorias' chamadas levantam TimeoutError (exercitam o retry).
+    """
+
+    def __init__(self, falhas_transitorias: int = 0):
+        self.falhas_transitorias = falhas_transitorias
+        self.chamadas = 0
+        self.arquivos = {}
+        self.permissoes = []
+
+    class _Requisicao:
+        def __init__(self, fake, acao):
+            self.fake, self.acao = fake, acao
+
+        def execute(self):
+            self.fake.chamadas += 1
+            if self.fake.falhas_transitorias > 0:
+                self.fake.falhas_transitorias -= 1
+                raise TimeoutError("Falha simulada do Drive")
+            return self.acao()
+
+    class _Recurso:
+        def __init__(self, fake, criar):
+            self.fake, self.criar = fake, criar
+
+        def create(self, **kwargs):
+            return FakeDriveService._Requisicao(self.fake, lambda: self.criar(**kwargs))
+
+    def files(self):
+        return self._Recurso(self, self._criar_arquivo)
+
+    def permissions(self):
+        return self._Recurso(self, self._criar_permissao)
+
+    def _criar_arquivo(self, body=None, media_body=None, fields=None):
+        file_id = uuid.uuid4().hex
+        tamanho = media_body.size() if media_body is not None else 0
+        self.arquivos[file_id] = {'body': body, 'tamanho': tamanho}
+        return {'id': file_id, 'webViewLink': f"https://docs.google.com/spreadsheets/d/{file_id}/edit"}
+
+    def _criar_permissao(self, fileId=None, body=None):
+        self.permissoes.append((fileId, body))
+        return {'id': uuid.uuid4().hex}
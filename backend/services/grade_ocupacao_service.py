@@ -0,0 +1,312 @@
+# backend/services/grade_ocupacao_service.py
+
+import json
+import threading
+
+from cachetools import LRUCache
+from sqlalchemy import select, func
+from sqlalchemy.orm import aliased
+
+from ..models.database import db
+from ..models.horario import Horario
+from ..models.semana import Semana
+from ..models.ciclo import Ciclo
+from ..models.instrutor import Instrutor
+from .sql_expressions import hash_linha
+
+# Grade semanal: 15 períodos x 7 dias = 105 bits. O bit de (dia, período) é
+# índice_do_dia * 15 + (período - 1), então os períodos de um dia são contíguos.
+DIAS = ('segunda', 'terca', 'quarta', 'quinta', 'sexta', 'sabado', 'domingo')
+PERIODOS = 15
+GRADE_CHEIA = (1 << (PERIODOS * len(DIAS))) - 1
+
+_DIA_IDX = {dia: i for i, dia in enumerate(DIAS)}
+_DIA_CHEIO = (1 << PERIODOS) - 1
+
+
+def mascara(dia: str, periodo_inicio: int, periodo_fim: int = None):
+    """Bits dos períodos [inicio, fim] do dia, ou None se o intervalo sai da grade."""
+    periodo_fim = periodo_inicio if periodo_fim is None else periodo_fim
+    dia_idx = _DIA_IDX.get(dia)
+    if dia_idx is None or not 1 <= periodo_inicio <= periodo_fim <= PERIODOS:
+        return None
+    n = periodo_fim - periodo_inicio + 1
+    return ((1 << n) - 1) << (dia_idx * PERIODOS + periodo_inicio - 1)
+
+
+def posicoes(bits: int):
+    """(dia, período) de cada bit ligado, em ordem de dia e período."""
+    while bits:
+        menor = bits & -bits
+        indice = menor.bit_length() - 1
+        yield DIAS[indice // PERIODOS], indice % PERIODOS + 1
+        bits ^= menor
+
+
+def _inicios_validos(duracao: int) -> int:
+    """Bits de início de onde cabem 'duracao' períodos sem passar para o dia seguinte."""
+    if not 1 <= duracao <= PERIODOS:
+        return 0
+    por_dia = (1 << (PERIODOS - duracao + 1)) - 1
+    return sum(por_dia << (i * PERIODOS) for i in range(len(DIAS)))
+
+
+_INICIOS = [0] + [_inicios_validos(d) for d in range(1, PERIODOS + 1)]
+
+
+def inicios_livres(livre: int, duracao: int) -> int:
+    """Bits de início de blocos com 'duracao' períodos livres consecutivos no mesmo dia."""
+    if not 1 <= duracao <= PERIODOS:
+        return 0
+    inicios = livre
+    for i in range(1, duracao):
+        inicios &= livre >> i
+    return inicios & _INICIOS[duracao]
+
+
+def mascara_disponivel(semana) -> int:
+    """Períodos liberados pela configuração da semana (13º-15º, sábado e domingo)."""
+    dia_util = (1 << 12) - 1
+    for p, ativo in ((13, semana.mostrar_periodo_13), (14, semana.mostrar_periodo_14), (15, semana.mostrar_periodo_15)):
+        if ativo:
+            dia_util |= 1 << (p - 1)
+
+    bits = 0
+    for i, dia in enumerate(DIAS):
+        permitido = dia_util
+        if dia == 'sabado':
+            if not semana.mostrar_sabado:
+                continue
+            if semana.periodos_sabado:
+                permitido &= (1 << semana.periodos_sabado) - 1
+        elif dia == 'domingo':
+            if not semana.mostrar_domingo:
+                continue
+            if semana.periodos_domingo:
+                permitido &= (1 << semana.periodos_domingo) - 1
+        bits |= (permitido & _DIA_CHEIO) << (i * PERIODOS)
+    return bits
+
+
+class OcupacaoSemana:
+    """
+    Ocupação de uma semana em bitsets: por pelotão (semanas da escola com as
+    mesmas datas), por instrutor (user_id, em todas as escolas, como no save_aula),
+    bloqueios do administrador por pelotão e períodos liberados pela semana.
+
+    Instâncias vindas do cache são compartilhadas entre requisições: use copia()
+    antes de chamar ocupar().
+    """
+
+    __slots__ = ('pelotoes', 'instrutores', 'bloqueios', 'disponivel')
+
+    def __init__(self, pelotoes=None, instrutores=None, bloqueios=None, disponivel=GRADE_CHEIA):
+        self.pelotoes = pelotoes if pelotoes is not None else {}
+        self.instrutores = instrutores if instrutores is not None else {}
+        self.bloqueios = bloqueios if bloqueios is not None else {}
+        self.disponivel = disponivel
+
+    def copia(self):
+        return OcupacaoSemana(dict(self.pelotoes), dict(self.instrutores), self.bloqueios, self.disponivel)
+
+    def pelotao(self, nome: str) -> int:
+        return self.pelotoes.get(nome, 0)
+
+    def bloqueio(self, nome: str) -> int:
+        return self.bloqueios.get(str(nome).strip().upper(), 0)
+
+    def instrutores_ocupados(self, user_ids) -> int:
+        bits = 0
+        for user_id in user_ids:
+            bits |= self.instrutores.get(user_id, 0)
+        return bits
+
+    # --- Checagens pontuais (None = intervalo fora da grade, não dá para responder) ---
+
+    def conflito_pelotao(self, nome: str, dia: str, periodo_inicio: int, periodo_fim: int):
+        bits = mascara(dia, periodo_inicio, periodo_fim)
+        return None if bits is None else self.pelotao(nome) & bits
+
+    def conflito_instrutores(self, user_ids, dia: str, periodo_inicio: int, periodo_fim: int):
+        bits = mascara(dia, periodo_inicio, periodo_fim)
+        return None if bits is None else self.instrutores_ocupados(user_ids) & bits
+
+    def periodos_bloqueados(self, nome: str, dia: str, periodo_inicio: int, periodo_fim: int) -> list:
+        bits = mascara(dia, max(periodo_inicio, 1), min(periodo_fim, PERIODOS))
+        if bits is None:
+            return []
+        return [p for _, p in posicoes(self.bloqueio(nome) & bits)]
+
+    # --- Busca e marcação ---
+
+    def livres(self, nome: str, instrutor_user_ids=(), respeitar_bloqueios: bool = True) -> int:
+        ocupado = self.pelotao(nome) | self.instrutores_ocupados(instrutor_user_ids)
+        if respeitar_bloqueios:
+            ocupado |= self.bloqueio(nome)
+        return self.disponivel & ~ocupado
+
+    def slots_livres(self, nome: str, duracao: int = 1, instrutor_user_ids=(), respeitar_bloqueios: bool = True) -> list:
+        """(dia, período inicial) onde cabe uma aula de 'duracao' períodos para o pelotão e os instrutores."""
+        livre = self.livres(nome, instrutor_user_ids, respeitar_bloqueios)
+        return list(posicoes(inicios_livres(livre, duracao)))
+
+    def ocupar(self, nome: str, dia: str, periodo_inicio: int, periodo_fim: int, instrutor_user_ids=()):
+        bits = mascara(dia, periodo_inicio, periodo_fim)
+        if bits is None:
+            return
+        self.pelotoes[nome] = self.pelotoes.get(nome, 0) | bits
+        for user_id in instrutor_user_ids:
+            if user_id is not None:
+                self.instrutores[user_id] = self.instrutores.get(user_id, 0) | bits
+
+    def liberar(self, nome: str, dia: str, periodo_inicio: int, periodo_fim: int, instrutor_user_ids=()):
+        """Desfaz um ocupar() feito nesta cópia (só vale para períodos que estavam livres antes)."""
+        bits = mascara(dia, periodo_inicio, periodo_fim)
+        if bits is None:
+            return
+        self.pelotoes[nome] = self.pelotoes.get(nome, 0) & ~bits
+        for user_id in instrutor_user_ids:
+            if user_id is not None:
+                self.instrutores[user_id] = self.instrutores.get(user_id, 0) & ~bits
+
+
+class GradeOcupacaoService:
+    """
+    Bitsets de ocupação por semana, em cache por processo. A entrada é validada a
+    cada uso por uma assinatura barata do conteúdo das aulas nas semanas com as
+    mesmas datas (um hash por linha somado no banco, ver sql_expressions.hash_linha)
+    e pela configuração da semana, então aulas gravadas ou alteradas por outro
+    processo do gunicorn invalidam o cache sozinhas.
+
+    A validação agrega todas as aulas da semana em todas as escolas: compensa na
+    busca de horários livres e no gerador de grade, que fazem muitas checagens por
+    obtenção. Checagens pontuais (save_aula) continuam com as consultas indexadas.
+    """
+
+    _cache = LRUCache(maxsize=128)
+    _bloqueios_cache = LRUCache(maxsize=256)
+    _lock = threading.Lock()
+
+    @staticmethod
+    def mascaras_bloqueio(blocked_blocks) -> dict:
+        """
+        {PELOTÃO (maiúsculo): bits bloqueados} a partir do JSON de Semana.blocked_blocks
+        (ou de priority_blocks, que tem o mesmo formato e aceita períodos como "P1").
+        """
+        if not blocked_blocks:
+            return {}
+        cls = GradeOcupacaoService
+        with cls._lock:
+            mascaras = cls._bloqueios_cache.get(blocked_blocks)
+        if mascaras is not None:
+            return mascaras
+
+        mascaras = {}
+        try:
+            raw = json.loads(blocked_blocks)
+            for pelotao, dias in (raw or {}).items():
+                bits = 0
+                for dia, periodos in (dias or {}).items():
+                    for p in periodos or []:
+                        p = str(p).strip().upper().lstrip('P')
+                        if p.isdigit():
+                            bits |= mascara(dia, int(p)) or 0
+                chave = str(pelotao).strip().upper()
+                mascaras[chave] = mascaras.get(chave, 0) | bits
+        except Exception:
+            mascaras = {}
+
+        with cls._lock:
+            cls._bloqueios_cache[blocked_blocks] = mascaras
+        return mascaras
+
+    @staticmethod
+    def _semanas_mesmas_datas(semana):
+        return select(Semana.id).where(
+            Semana.data_inicio == semana.data_inicio,
+            Semana.data_fim == semana.data_fim
+        )
+
+    @staticmethod
+    def _assinatura(semana) -> tuple:
+        """
+        Conteúdo das aulas das semanas com as mesmas datas (por pelotão e dia: quantidade e
+        soma de um hash das colunas que entram na grade) mais a configuração da semana.
+        Muda também com UPDATEs no lugar, como a troca de instrutor e pelotão feita por
+        VinculoService._reatribuir_horarios.
+        """
+        grupos = db.session.execute(
+            select(
+                Horario.pelotao, Horario.dia_semana, func.count(Horario.id),
+                func.sum(hash_linha(
+                    Horario.id, Horario.semana_id, Horario.periodo, Horario.duracao,
+                    Horario.instrutor_id, Horario.instrutor_id_2
+                ))
+            )
+            .where(Horario.semana_id.in_(GradeOcupacaoService._semanas_mesmas_datas(semana)))
+            .group_by(Horario.pelotao, Horario.dia_semana)
+            .order_by(Horario.pelotao, Horario.dia_semana)
+        ).all()
+        return (
+            tuple(tuple(grupo) for grupo in grupos),
+            semana.blocked_blocks,
+            semana.mostrar_periodo_13, semana.mostrar_periodo_14, semana.mostrar_periodo_15,
+            semana.mostrar_sabado, semana.periodos_sabado, semana.mostrar_domingo, semana.periodos_domingo,
+        )
+
+    @staticmethod
+    def _construir(semana, school_id) -> OcupacaoSemana:
+        instrutor_1 = aliased(Instrutor)
+        instrutor_2 = aliased(Instrutor)
+        rows = db.session.execute(
+            select(
+                Horario.pelotao, Horario.dia_semana, Horario.periodo, Horario.duracao,
+                Ciclo.school_id, instrutor_1.user_id, instrutor_2.user_id.label('user_id_2')
+            )
+            .join(Semana, Semana.id == Horario.semana_id)
+            .join(Ciclo, Ciclo.id == Semana.ciclo_id)
+            .outerjoin(instrutor_1, instrutor_1.id == Horario.instrutor_id)
+            .outerjoin(instrutor_2, instrutor_2.id == Horario.instrutor_id_2)
+            .where(Semana.data_inicio == semana.data_inicio, Semana.data_fim == semana.data_fim)
+        ).all()
+
+        pelotoes = {}
+        instrutores = {}
+        for pelotao, dia, periodo, duracao, escola_id, user_id, user_id_2 in rows:
+            inicio = max(periodo, 1)
+            bits = mascara(dia, inicio, min(periodo + (duracao or 1) - 1, PERIODOS))
+            if not bits:
+                continue
+            if escola_id == school_id:
+                pelotoes[pelotao] = pelotoes.get(pelotao, 0) | bits
+            for uid in (user_id, user_id_2):
+                if uid is not None:
+                    instrutores[uid] = instrutores.get(uid, 0) | bits
+
+        return OcupacaoSemana(
+            pelotoes=pelotoes,
+            instrutores=instrutores,
+            bloqueios=GradeOcupacaoService.mascaras_bloqueio(semana.blocked_blocks),
+            disponivel=mascara_disponivel(semana),
+        )
+
+    @staticmethod
+    def get(semana, school_id) -> OcupacaoSemana:
+        """Ocupação da semana vista pela escola 'school_id' (pelotões só dessa escola)."""
+        cls = GradeOcupacaoService
+        chave = (semana.id, school_id)
+        assinatura = cls._assinatura(semana)
+        with cls._lock:
+            entrada = cls._cache.get(chave)
+        if entrada is not None and entrada[0] == assinatura:
+            return entrada[1]
+
+        ocupacao = cls._construir(semana, school_id)
+        with cls._lock:
+            cls._cache[chave] = (assinatura, ocupacao)
+        return ocupacao
+
+    @staticmethod
+    def invalidar():
+        with GradeOcupacaoService._lock:
+            GradeOcupacaoService._cache.clear()
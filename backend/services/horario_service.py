@@ -7,6 +7,7 @@ from datetime import date, timedelta
 from collections import defaultdict
 import uuid
 import json
+import hashlib
 
 from ..models.database import db
 from ..models.horario import Horario
@@ -22,6 +23,8 @@ from .notification_service import NotificationService
 from .instrutor_service import InstrutorService
 from .site_config_service import SiteConfigService
 from .user_service import UserService
+from .semana_service import SemanaService
+from .grade_ocupacao_service import GradeOcupacaoService, OcupacaoSemana, mascara
 
 
 class HorarioService:
@@ -106,45 +109,19 @@ class HorarioService:
 
     @staticmethod
     def construir_matriz_horario(pelotao, semana_id, user):
+        return HorarioService.construir_matrizes_semana(semana_id, user, [pelotao])[pelotao]
+
+    @staticmethod
+    def construir_matrizes_semana(semana_id, user, pelotoes):
+        """
+        Matrizes (15 períodos x 7 dias) de vários pelotões da mesma semana, com uma
+        única consulta às aulas. Retorna {pelotao: matriz}, na ordem de 'pelotoes'.
+        """
         semana = db.session.get(Semana, semana_id)
         school_id = UserService.get_current_school_id()
 
-        a_disposicao = {
-            'materia': 'A disposição do C Al /S Ens',
-            'instrutor': None,
-            'duracao': 1,
-            'is_disposicao': True,
-            'id': None,
-            'status': 'confirmado',
-            'blocked': False
-        }
-
-        # Carrega os bloqueios ignorando divergências de maiúsculas/minúsculas
-        blocked_dict = {}
-        try:
-            if getattr(semana, 'blocked_blocks', None):
-                raw_dict = json.loads(semana.blocked_blocks)
-                blocked_dict = {str(k).strip().upper(): v for k, v in raw_dict.items()}
-        except Exception:
-            pass
-        
-        pelotao_key = str(pelotao).strip().upper()
-        blocked_for_pelotao = blocked_dict.get(pelotao_key, {})
-
-        dias = ['segunda', 'terca', 'quarta', 'quinta', 'sexta', 'sabado', 'domingo']
-
-        horario_matrix = []
-        for p_idx in range(15):
-            row = []
-            for d_idx, dia_nome in enumerate(dias):
-                p_real = p_idx + 1
-                blocked_periods = [str(x) for x in blocked_for_pelotao.get(dia_nome, [])]
-                is_blocked = str(p_real) in blocked_periods
-
-                cell = dict(a_disposicao)
-                cell['blocked'] = is_blocked
-                row.append(cell)
-            horario_matrix.append(row)
+        # Bloqueios por pelotão (maiúsculo) como bitset, decodificados uma vez por versão do JSON
+        bloqueios = GradeOcupacaoService.mascaras_bloqueio(getattr(semana, 'blocked_blocks', None))
 
         # CORREÇÃO: Encontra as semanas que compartilham o mesmo período de data SOMENTE nesta escola
         semanas_sobrepostas = select(Semana.id).join(Ciclo).where(
@@ -160,13 +137,14 @@ class HorarioService:
                 joinedload(Horario.instrutor).joinedload(Instrutor.user),
                 joinedload(Horario.instrutor_2).joinedload(Instrutor.user),
             )
-            .where(Horario.pelotao == pelotao, Horario.semana_id.in_(semanas_sobrepostas))
+            .where(Horario.pelotao.in_(pelotoes), Horario.semana_id.in_(semanas_sobrepostas))
         )
-        all_aulas = db.session.scalars(aulas_query).all()
+        aulas_por_pelotao = defaultdict(list)
+        for aula in db.session.scalars(aulas_query).all():
+            aulas_por_pelotao[aula.pelotao].append(aula)
 
         preloaded_instrutor_ids = []
         if user and not (user.is_sens or user.is_admin_escola):
-            school_id = UserService.get_current_school_id()
             preloaded_instrutor_ids = db.session.scalars(
                 select(Instrutor.id).where(
                     Instrutor.user_id == user.id,
@@ -174,6 +152,38 @@ class HorarioService:
                 )
             ).all()
 
+        return {
+            pelotao: HorarioService._montar_matriz(
+                aulas_por_pelotao.get(pelotao, []),
+                bloqueios.get(str(pelotao).strip().upper(), 0),
+                user, preloaded_instrutor_ids
+            )
+            for pelotao in pelotoes
+        }
+
+    @staticmethod
+    def _montar_matriz(all_aulas, bloqueio, user, preloaded_instrutor_ids):
+        a_disposicao = {
+            'materia': 'A disposição do C Al /S Ens',
+            'instrutor': None,
+            'duracao': 1,
+            'is_disposicao': True,
+            'id': None,
+            'status': 'confirmado',
+            'blocked': False
+        }
+
+        dias = ['segunda', 'terca', 'quarta', 'quinta', 'sexta', 'sabado', 'domingo']
+
+        horario_matrix = []
+        for p_idx in range(15):
+            row = []
+            for d_idx, dia_nome in enumerate(dias):
+                cell = dict(a_disposicao)
+                cell['blocked'] = bool(bloqueio & mascara(dia_nome, p_idx + 1))
+                row.append(cell)
+            horario_matrix.append(row)
+
         for aula in all_aulas:
             try:
                 dia_idx = dias.index(aula.dia_semana)
@@ -197,7 +207,8 @@ class HorarioService:
 
                 instrutor_display = " / ".join(instrutores_display_list) if instrutores_display_list else "N/D"
 
-                aula_is_blocked = str(aula.periodo) in [str(x) for x in blocked_for_pelotao.get(aula.dia_semana, [])]
+                bit_aula = mascara(aula.dia_semana, aula.periodo)
+                aula_is_blocked = bool(bit_aula and bloqueio & bit_aula)
 
                 # Condição especial para Matéria de Disposição
                 is_disposicao_materia = aula.disciplina and aula.disciplina.materia.strip().upper() == 'A DISPOSIÇÃO DO C AL /S ENS'
@@ -259,6 +270,93 @@ class HorarioService:
             datas[dia_nome] = (semana.data_inicio + timedelta(days=i)).strftime('%d/%m')
         return datas
 
+    @staticmethod
+    def semana_do_usuario(user, school_id, edicao_id):
+        """
+        Semana atual do usuário para o app instalado (PWA): as aulas do pelotão, para o
+        aluno, ou as do próprio instrutor, em todos os pelotões. A 'versao' é um hash
+        do conteúdo e muda a cada alteração de aula da semana, inclusive de status na
+        aprovação.
+        """
+        dias = ['segunda', 'terca', 'quarta', 'quinta', 'sexta', 'sabado', 'domingo']
+        pelotao = None
+        instrutor_ids = []
+
+        if user.role == 'aluno' and not user.is_staff:
+            turma = user.aluno_profile.turma if user.aluno_profile else None
+            if turma:
+                pelotao = turma.nome
+                school_id, edicao_id = turma.school_id, turma.edicao_id
+        else:
+            instrutor_ids = db.session.scalars(
+                select(Instrutor.id).where(Instrutor.user_id == user.id)
+            ).all()
+
+        semana = None
+        if school_id and (pelotao or instrutor_ids):
+            semana = SemanaService.get_semana_selecionada(
+                override_school_id=school_id, override_edicao_id=edicao_id
+            )
+
+        aulas = []
+        if semana:
+            # Mesmo critério do quadro: semanas da escola com as mesmas datas, de qualquer ciclo
+            semanas_sobrepostas = select(Semana.id).join(Ciclo).where(
+                Semana.data_inicio == semana.data_inicio,
+                Semana.data_fim == semana.data_fim,
+                Ciclo.school_id == school_id
+            )
+            query = (
+                select(Horario)
+                .options(
+                    joinedload(Horario.disciplina),
+                    joinedload(Horario.instrutor).joinedload(Instrutor.user),
+                    joinedload(Horario.instrutor_2).joinedload(Instrutor.user),
+                )
+                .where(Horario.semana_id.in_(semanas_sobrepostas))
+            )
+            if pelotao:
+                query = query.where(Horario.pelotao == pelotao)
+            else:
+                query = query.where(or_(Horario.instrutor_id.in_(instrutor_ids), Horario.instrutor_id_2.in_(instrutor_ids)))
+
+            for aula in db.session.scalars(query).all():
+                dia = str(aula.dia_semana).lower().replace('-feira', '').strip()
+                if dia not in dias:
+                    continue
+                # O aluno não vê os detalhes de aula pendente (como no quadro)
+                detalhes = aula.status != 'pendente' or not pelotao
+                instrutores = [
+                    f"{i.user.posto_graduacao or ''} {i.user.nome_de_guerra or i.user.username}".strip()
+                    for i in (aula.instrutor, aula.instrutor_2) if i and i.user
+                ]
+                aulas.append({
+                    'id': aula.id,
+                    'data': (semana.data_inicio + timedelta(days=dias.index(dia))).isoformat(),
+                    'dia_semana': dia,
+                    'periodo': aula.periodo,
+                    'duracao': aula.duracao,
+                    'pelotao': aula.pelotao,
+                    'disciplina': aula.disciplina.materia if detalhes and aula.disciplina else 'Aguardando Aprovação',
+                    'instrutor': ' / '.join(instrutores) if detalhes else None,
+                    'observacao': aula.observacao if detalhes else None,
+                    'status': aula.status,
+                })
+            aulas.sort(key=lambda a: (a['data'], a['periodo'], a['pelotao']))
+
+        dados = {
+            'semana': {
+                'id': semana.id,
+                'nome': semana.nome,
+                'data_inicio': semana.data_inicio.isoformat(),
+                'data_fim': semana.data_fim.isoformat(),
+            } if semana else None,
+            'pelotao': pelotao,
+            'aulas': aulas,
+        }
+        dados['versao'] = hashlib.sha1(json.dumps(dados, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+        return dados
+
     @staticmethod
     def get_edit_grid_context(pelotao, semana_id, ciclo_id, user):
         horario_matrix = HorarioService.construir_matriz_horario(pelotao, semana_id, user)
@@ -428,22 +526,13 @@ class HorarioService:
             )
 
             # Trava de Segurança lendo em MAIÚSCULO para evitar as falhas que ocorreram
+            # (bitsets decodificados uma vez por versão do JSON, sem consultar o banco)
             if not is_admin:
-                blocked_dict = {}
-                try:
-                    if getattr(semana, 'blocked_blocks', None):
-                        raw_dict = json.loads(semana.blocked_blocks)
-                        blocked_dict = {str(k).strip().upper(): v for k, v in raw_dict.items()}
-                except Exception:
-                    pass
-                
-                pelotao_key = str(pelotao).strip().upper()
-                blocked_for_pelotao = blocked_dict.get(pelotao_key, {})
-                blocked_periods_for_day = [str(x) for x in blocked_for_pelotao.get(dia, [])]
-                
-                for p in range(periodo_inicio, periodo_fim + 1):
-                    if str(p) in blocked_periods_for_day:
-                        return False, f"⚠️ PERÍODO BLOQUEADO: O administrador bloqueou as marcações para o {p}º período na {dia.capitalize()}.", 403
+                bloqueios = OcupacaoSemana(bloqueios=GradeOcupacaoService.mascaras_bloqueio(semana.blocked_blocks))
+                periodos_bloqueados = bloqueios.periodos_bloqueados(pelotao, dia, periodo_inicio, periodo_fim)
+                if periodos_bloqueados:
+                    p = periodos_bloqueados[0]
+                    return False, f"⚠️ PERÍODO BLOQUEADO: O administrador bloqueou as marcações para o {p}º período na {dia.capitalize()}.", 403
 
             if dia == 'sabado' and not semana.mostrar_sabado:
                 return False, "⚠️ AGENDAMENTO BLOQUEADO: O Sábado não está habilitado nesta semana.", 403
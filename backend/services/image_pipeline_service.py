@@ -0,0 +1,246 @@
+# backend/services/image_pipeline_service.py
+
+import json
+import os
+import time
+import uuid
+
+from flask import current_app, url_for
+from markupsafe import Markup, escape
+from sqlalchemy import select
+
+from ..models.database import db
+from ..models.image_asset import ImageAsset
+from ..models.background_job import BackgroundJob
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+
+class ImagePipelineService:
+    """
+    Derivados responsivos das imagens enviadas (ImageAsset).
+
+    O upload grava apenas o original; o worker gera, para cada tamanho de SIZES,
+    uma versão WebP e uma de fallback (JPEG, ou PNG quando a imagem tem
+    transparência) em static/uploads/derivados e registra tudo em
+    ImageAsset.variants. Os templates usam responsive_image() para emitir
+    <picture> com srcset; enquanto não há derivados, o original é servido.
+    """
+
+    SIZES = {'thumb': 320, 'medium': 960, 'full': 1920}
+    WEBP_QUALITY = 75
+    JPEG_QUALITY = 72
+    DERIVADOS_DIR = 'derivados'
+    # GIF (pode ser animado) e SVG (vetorial) são servidos como estão
+    SKIP_EXTENSIONS = ('.svg', '.gif')
+
+    _cache = {'loaded_at': None, 'by_filename': {}}
+    CACHE_TTL = 60
+
+    # --- Geração ----------------------------------------------------------
+
+    @staticmethod
+    def _upload_folder():
+        return os.path.join(current_app.root_path, '..', 'static', 'uploads')
+
+    @staticmethod
+    def generate_variants(source_path: str, stem: str, upload_folder: str = None) -> dict:
+        """
+        Decodifica o original uma vez e gera os derivados do maior para o menor
+        (cada tamanho é reduzido a partir do anterior). Nunca amplia a imagem.
+        Retorna {tamanho: {'width', 'height', 'webp', 'fallback'}} com caminhos relativos a uploads/.
+        """
+        if Image is None:
+            raise RuntimeError("Pillow não está instalado: não é possível gerar os derivados das imagens.")
+
+        cls = ImagePipelineService
+        upload_folder = upload_folder or cls._upload_folder()
+        dest_dir = os.path.join(upload_folder, cls.DERIVADOS_DIR)
+        os.makedirs(dest_dir, exist_ok=True)
+
+        variants = {}
+        with Image.open(source_path) as original:
+            img = ImageOps.exif_transpose(original)
+            has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+            img = img.convert('RGBA' if has_alpha else 'RGB')
+            fallback_ext = 'png' if has_alpha else 'jpg'
+
+            anterior = None
+            for size, max_width in sorted(cls.SIZES.items(), key=lambda item: -item[1]):
+                if img.width > max_width:
+                    img = img.resize((max_width, round(img.height * max_width / img.width)), Image.Resampling.LANCZOS)
+                elif anterior is not None:
+                    # Original menor que este tamanho: reaproveita o derivado anterior
+                    variants[size] = dict(anterior)
+                    continue
+
+                webp_rel = f"{cls.DERIVADOS_DIR}/{stem}_{size}.webp"
+                fallback_rel = f"{cls.DERIVADOS_DIR}/{stem}_{size}.{fallback_ext}"
+                img.save(os.path.join(upload_folder, webp_rel), 'WEBP', quality=cls.WEBP_QUALITY, method=4)
+                if has_alpha:
+                    img.save(os.path.join(upload_folder, fallback_rel), 'PNG', optimize=True)
+                else:
+                    img.save(os.path.join(upload_folder, fallback_rel), 'JPEG', quality=cls.JPEG_QUALITY, optimize=True, progressive=True)
+
+                variants[size] = anterior = {'width': img.width, 'height': img.height, 'webp': webp_rel, 'fallback': fallback_rel}
+        return variants
+
+    @staticmethod
+    def remove_variants(asset: ImageAsset, upload_folder: str = None):
+        upload_folder = upload_folder or ImagePipelineService._upload_folder()
+        for variant in (asset.variants or {}).values():
+            for key in ('webp', 'fallback'):
+                path = os.path.join(upload_folder, variant.get(key, ''))
+                if variant.get(key) and os.path.exists(path):
+                    os.remove(path)
+
+    @staticmethod
+    def process_asset(asset: ImageAsset, upload_folder: str = None):
+        """Gera (ou refaz) os derivados do asset e atualiza o registro (não faz commit)."""
+        cls = ImagePipelineService
+        upload_folder = upload_folder or cls._upload_folder()
+        source_path = os.path.join(upload_folder, asset.filename)
+
+        if asset.filename.lower().endswith(cls.SKIP_EXTENSIONS):
+            asset.processing_status = 'original'
+            return asset
+        if not os.path.exists(source_path):
+            asset.processing_status = 'missing'
+            return asset
+
+        stem = os.path.splitext(asset.filename)[0]
+        try:
+            new_variants = cls.generate_variants(source_path, stem, upload_folder)
+        except Exception as e:
+            current_app.logger.error(f"Erro ao gerar derivados do asset {asset.id}: {e}")
+            asset.processing_status = 'failed'
+            return asset
+
+        # Remove derivados antigos que não foram sobrescritos (ex.: JPEG -> PNG)
+        novos = {v[k] for v in new_variants.values() for k in ('webp', 'fallback')}
+        for variant in (asset.variants or {}).values():
+            for key in ('webp', 'fallback'):
+                rel = variant.get(key)
+                if rel and rel not in novos and os.path.exists(os.path.join(upload_folder, rel)):
+                    os.remove(os.path.join(upload_folder, rel))
+
+        asset.variants = new_variants
+        asset.processing_status = 'ready'
+        return asset
+
+    @staticmethod
+    def reprocess_all(only_pending: bool = False, progress_callback=None) -> dict:
+        """
+        Reprocessa os assets existentes em static/uploads (commit por asset, para
+        que uma imagem corrompida não desfaça as demais). Retorna a contagem por status.
+        """
+        stmt = select(ImageAsset.id).order_by(ImageAsset.id)
+        if only_pending:
+            stmt = stmt.where((ImageAsset.processing_status != 'ready') | ImageAsset.processing_status.is_(None))
+        ids = db.session.scalars(stmt).all()
+
+        totals = {}
+        for index, asset_id in enumerate(ids, start=1):
+            asset = db.session.get(ImageAsset, asset_id)
+            ImagePipelineService.process_asset(asset)
+            db.session.commit()
+            totals[asset.processing_status] = totals.get(asset.processing_status, 0) + 1
+            if progress_callback:
+                progress_callback(index, len(ids))
+        return totals
+
+    # --- Fila -------------------------------------------------------------
+
+    @staticmethod
+    def enqueue(task_type: str, user_id: int, **meta) -> BackgroundJob:
+        """Cria o BackgroundJob de processamento (não faz commit)."""
+        job = BackgroundJob(
+            id=str(uuid.uuid4()),
+            task_type=task_type,
+            meta_data=json.dumps({**meta, 'progress': 0}),
+            user_id=user_id
+        )
+        db.session.add(job)
+        return job
+
+    # --- Templates --------------------------------------------------------
+
+    @staticmethod
+    def _variants_by_filename() -> dict:
+        """Mapa filename -> variants dos assets processados, com cache curto por processo."""
+        cache = ImagePipelineService._cache
+        if cache['loaded_at'] is None or time.monotonic() - cache['loaded_at'] > ImagePipelineService.CACHE_TTL:
+            rows = db.session.execute(
+                select(ImageAsset.filename, ImageAsset.variants).where(ImageAsset.processing_status == 'ready')
+            ).all()
+            cache['by_filename'] = {filename: variants for filename, variants in rows if variants}
+            cache['loaded_at'] = time.monotonic()
+        return cache['by_filename']
+
+    @staticmethod
+    def invalidate_cache():
+        ImagePipelineService._cache['loaded_at'] = None
+
+    @staticmethod
+    def _resolve(src):
+        """Aceita um ImageAsset ou uma URL/caminho de static/uploads; retorna (url_original, variants)."""
+        if isinstance(src, ImageAsset):
+            return url_for('static', filename=f'uploads/{src.filename}'), src.variants if src.processing_status == 'ready' else None
+        src = str(src or '')
+        marker = '/uploads/'
+        filename = src.split(marker, 1)[1].split('?', 1)[0] if marker in src else None
+        if not filename:
+            return src, None
+        try:
+            return src, ImagePipelineService._variants_by_filename().get(filename)
+        except Exception:
+            # O helper nunca pode derrubar a página: sem banco, serve o original
+            return src, None
+
+    @staticmethod
+    def variant_url(src, size: str = 'full', fmt: str = 'fallback') -> str:
+        """URL de um derivado (ex.: para background-image em CSS); o original se não houver."""
+        original, variants = ImagePipelineService._resolve(src)
+        if not variants or size not in variants:
+            return original
+        return url_for('static', filename=f"uploads/{variants[size][fmt]}")
+
+    @staticmethod
+    def srcset(variants: dict, fmt: str) -> str:
+        ordered = sorted(variants.values(), key=lambda v: v['width'])
+        seen, parts = set(), []
+        for variant in ordered:
+            if variant['width'] in seen:
+                continue
+            seen.add(variant['width'])
+            parts.append(f"{url_for('static', filename='uploads/' + variant[fmt])} {variant['width']}w")
+        return ', '.join(parts)
+
+    @staticmethod
+    def responsive_image(src, alt: str = '', sizes: str = '100vw', css_class: str = '', loading: str = 'lazy', default: str = 'full'):
+        """
+        <picture> com <source type="image/webp" srcset> e <img srcset> no formato de fallback.
+        Sem derivados registrados, devolve um <img> simples apontando para o original.
+        """
+        cls = ImagePipelineService
+        original, variants = cls._resolve(src)
+        attrs = f' alt="{escape(alt)}"'
+        if css_class:
+            attrs += f' class="{escape(css_class)}"'
+        if loading:
+            attrs += f' loading="{escape(loading)}"'
+
+        if not variants:
+            return Markup(f'<img src="{escape(original)}"{attrs}>')
+
+        principal = variants.get(default) or next(iter(variants.values()))
+        return Markup(
+            '<picture>'
+            f'<source type="image/webp" srcset="{escape(cls.srcset(variants, "webp"))}" sizes="{escape(sizes)}">'
+            f'<img src="{escape(url_for("static", filename="uploads/" + principal["fallback"]))}" '
+            f'srcset="{escape(cls.srcset(variants, "fallback"))}" sizes="{escape(sizes)}"{attrs}>'
+            '</picture>'
+        )
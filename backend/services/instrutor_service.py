@@ -1,9 +1,6 @@
 # backend/services/instrutor_service.py
 
-import os
-import uuid
 from flask import current_app
-from werkzeug.utils import secure_filename
 from sqlalchemy import select, or_
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import joinedload
@@ -12,6 +9,7 @@ from backend.models.database import db
 from backend.models.instrutor import Instrutor
 from backend.models.user import User
 from backend.models.user_school import UserSchool
+from .upload_store_service import UploadStoreService
 from utils.image_utils import allowed_file, compress_image_to_memory
 from utils.normalizer import normalize_matricula, normalize_name
 
@@ -35,16 +33,10 @@ def _save_profile_picture(file):
         return None, "Erro ao processar a imagem. O arquivo pode estar corrompido."
 
     try:
-        filename = secure_filename(compressed_file.filename)
-        ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else 'jpg'
-        unique_filename = f"{uuid.uuid4()}.{ext}"
-        
-        upload_folder = os.path.join(current_app.static_folder, 'uploads', 'profile_pics')
-        os.makedirs(upload_folder, exist_ok=True)
-        file_path = os.path.join(upload_folder, unique_filename)
-        
-        # Salva o proxy comprimido
-        compressed_file.save(file_path)
+        # Armazenamento por conteúdo: a mesma foto enviada de novo reaproveita o arquivo
+        unique_filename = UploadStoreService.save(
+            compressed_file, 'jpg', UploadStoreService.BUCKET_FOTOS, base='uploads/profile_pics'
+        )
         
         return unique_filename, "Arquivo salvo com sucesso"
     except Exception as e:
@@ -188,16 +180,10 @@ class InstrutorService:
             return False, "Instrutor não encontrado."
 
         if file:
-            if instrutor.foto_perfil and instrutor.foto_perfil != 'default.png':
-                old_path = os.path.join(current_app.static_folder, 'uploads', 'profile_pics', instrutor.foto_perfil)
-                if os.path.exists(old_path):
-                    try:
-                        os.remove(old_path)
-                    except Exception as e:
-                        current_app.logger.error(f"Não foi possível remover a foto antiga: {e}")
-
             filename, msg = _save_profile_picture(file)
             if filename:
+                # A foto antiga perde a referência; o arquivo sai no GC se ninguém mais usar
+                UploadStoreService.release(instrutor.foto_perfil, base='uploads/profile_pics')
                 instrutor.foto_perfil = filename
                 return True, "Foto de perfil atualizada com sucesso."
             else:
@@ -1,8 +1,8 @@
 # backend/services/justica_service.py
 import logging
 from datetime import datetime, date, timedelta
-from sqlalchemy import select, and_, or_, func
-from sqlalchemy.orm import joinedload
+from sqlalchemy import select, and_, or_, func, case, false, insert, exists
+from sqlalchemy.orm import joinedload, contains_eager
 
 from ..models.database import db
 from ..models.aluno import Aluno
@@ -13,6 +13,10 @@ from ..models.processo_disciplina import ProcessoDisciplina, StatusProcesso
 from ..models.fada_avaliacao import FadaAvaliacao
 from ..models.discipline_rule import DisciplineRule
 from ..models.elogio import Elogio
+from ..models.user import User
+from ..models.user_school import UserSchool
+
+from .notification_service import NotificationService
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +33,9 @@ class JusticaService:
     DESC_FADA_CRIME = 3.00
     BONUS_ELOGIO = 0.50
 
+    # Status que tiram o processo da aba "Em Andamento"
+    STATUS_ENCERRADOS = (StatusProcesso.FINALIZADO.value, StatusProcesso.ARQUIVADO.value)
+
     @staticmethod
     def _ensure_datetime(dt_input):
         if dt_input is None:
@@ -221,25 +228,107 @@ class JusticaService:
         return round(aat, 2), round(ndisc, 2), round(nota_fada, 4)
 
     @staticmethod
-    def get_processos_para_usuario(user, school_id_override=None):
-        query = select(ProcessoDisciplina).join(ProcessoDisciplina.aluno).outerjoin(Aluno.turma)
-        if getattr(user, 'role', '') == 'aluno':
-            if not getattr(user, 'aluno_profile', None): return []
-            query = query.where(ProcessoDisciplina.aluno_id == user.aluno_profile.id)
-        
-        query = query.options(joinedload(ProcessoDisciplina.aluno).joinedload(Aluno.user), joinedload(ProcessoDisciplina.regra))
-        todos_processos = db.session.scalars(query.order_by(ProcessoDisciplina.data_ocorrencia.desc())).all()
-        
-        if school_id_override:
-            processos_filtrados = []
-            for p in todos_processos:
-                if p.aluno.turma and p.aluno.turma.school_id == school_id_override:
-                    processos_filtrados.append(p)
-                elif not p.aluno.turma:
-                    processos_filtrados.append(p)
-            return processos_filtrados
-            
-        return todos_processos
+    def _filtrar_processos(user, school_id=None, aba=None, busca=None, edicao_id=None, incluir_sem_turma=False):
+        """
+        SELECT dos processos visíveis para o usuário, já com os joins de aluno, usuário e turma:
+        - aluno: só os próprios processos;
+        - school_id: processos de alunos de turmas da escola (com incluir_sem_turma,
+          também os de alunos sem turma);
+        - edicao_id: turmas da edição ou sem edição;
+        - aba: 'andamento' ou 'finalizados' (finalizados e arquivados);
+        - busca: número do processo ou texto no fato (para a equipe, também nome e matrícula).
+        Retorna None quando o usuário não enxerga nenhum processo.
+        """
+        eh_aluno = getattr(user, 'role', '') == 'aluno'
+        query = (
+            select(ProcessoDisciplina)
+            .join(Aluno, ProcessoDisciplina.aluno_id == Aluno.id)
+            .outerjoin(User, Aluno.user_id == User.id)
+        )
+
+        if school_id and not incluir_sem_turma:
+            query = query.join(Turma, Aluno.turma_id == Turma.id).where(Turma.school_id == school_id)
+        else:
+            query = query.outerjoin(Turma, Aluno.turma_id == Turma.id)
+            if school_id:
+                query = query.where(or_(Turma.school_id == school_id, Turma.id.is_(None)))
+
+        if eh_aluno:
+            perfil = getattr(user, 'aluno_profile', None)
+            if not perfil:
+                return None
+            query = query.where(ProcessoDisciplina.aluno_id == perfil.id)
+
+        if edicao_id:
+            query = query.where(or_(Turma.edicao_id == edicao_id, Turma.edicao_id.is_(None)))
+
+        if aba == 'andamento':
+            query = query.where(ProcessoDisciplina.status.notin_(JusticaService.STATUS_ENCERRADOS))
+        elif aba == 'finalizados':
+            query = query.where(ProcessoDisciplina.status.in_(JusticaService.STATUS_ENCERRADOS))
+
+        if busca:
+            termo = f'%{busca}%'
+            filtro = ProcessoDisciplina.fato_constatado.ilike(termo)
+            if not eh_aluno:
+                filtro = or_(User.nome_completo.ilike(termo), filtro, User.matricula.ilike(termo))
+            if busca.isdigit():
+                filtro = or_(filtro, ProcessoDisciplina.id == int(busca))
+            query = query.where(filtro)
+
+        return query
+
+    @staticmethod
+    def query_processos(user, school_id=None, aba=None, busca=None, edicao_id=None, incluir_sem_turma=False):
+        """
+        Consulta única (filtros, ordenação e carga de aluno/usuário/turma pelos mesmos joins),
+        pronta para db.paginate. Finalizados saem pela data da decisão; os demais, pela data
+        da ocorrência. Retorna None quando o usuário não enxerga nenhum processo.
+        """
+        query = JusticaService._filtrar_processos(user, school_id, aba, busca, edicao_id, incluir_sem_turma)
+        if query is None:
+            return None
+        ordem = ProcessoDisciplina.data_decisao if aba == 'finalizados' else ProcessoDisciplina.data_ocorrencia
+        return query.options(
+            contains_eager(ProcessoDisciplina.aluno).contains_eager(Aluno.user),
+            contains_eager(ProcessoDisciplina.aluno).contains_eager(Aluno.turma),
+        ).order_by(ordem.desc(), ProcessoDisciplina.id.desc())
+
+    @staticmethod
+    def contar_por_aba(user, school_id=None, edicao_id=None, incluir_sem_turma=False):
+        """{'andamento': n, 'finalizados': n} com um único GROUP BY."""
+        contagens = {'andamento': 0, 'finalizados': 0}
+        query = JusticaService._filtrar_processos(user, school_id, edicao_id=edicao_id, incluir_sem_turma=incluir_sem_turma)
+        if query is None:
+            return contagens
+
+        aba = case(
+            (ProcessoDisciplina.status.in_(JusticaService.STATUS_ENCERRADOS), 'finalizados'),
+            (ProcessoDisciplina.status.isnot(None), 'andamento'),
+        )
+        for nome, total in db.session.execute(
+            query.with_only_columns(aba, func.count(ProcessoDisciplina.id)).group_by(aba)
+        ):
+            if nome in contagens:
+                contagens[nome] = total
+        return contagens
+
+    @staticmethod
+    def get_processos_para_usuario(user, school_id_override=None, aba=None, busca=None, edicao_id=None, page=None, per_page=50):
+        """
+        Processos visíveis para o usuário (com school_id_override, os da escola e os de
+        alunos sem turma). Sem 'page' devolve a lista; com 'page', a paginação do banco.
+        """
+        query = JusticaService.query_processos(
+            user, school_id_override, aba=aba, busca=busca, edicao_id=edicao_id, incluir_sem_turma=True
+        )
+        if query is None:
+            return [] if page is None else db.paginate(select(ProcessoDisciplina).where(false()), page=1, per_page=per_page, error_out=False)
+
+        query = query.options(joinedload(ProcessoDisciplina.regra))
+        if page is not None:
+            return db.paginate(query, page=page, per_page=per_page, error_out=False)
+        return db.session.scalars(query).all()
 
     @staticmethod
     def criar_processo(descricao, observacao, aluno_id, autor_id, pontos=0.0, codigo_infracao=None, regra_id=None, data_ocorrencia=None):
@@ -256,6 +345,90 @@ class JusticaService:
             db.session.add(novo); db.session.commit(); return True, "Sucesso"
         except Exception as e: db.session.rollback(); return False, str(e)
     
+    @staticmethod
+    def _alunos_da_escola(aluno_ids, school_id=None) -> dict:
+        """
+        {aluno_id: user_id} dos ids informados (inválidos ignorados), limitado à escola se houver:
+        alunos de turmas da escola e, sem turma, os vinculados a ela (user_schools).
+        Os descartados ficam registrados no log.
+        """
+        ids = []
+        for aid in aluno_ids:
+            try:
+                ids.append(int(aid))
+            except (TypeError, ValueError):
+                logger.error(f"Id de aluno inválido no registro em massa: {aid!r}")
+        if not ids:
+            return {}
+
+        query = select(Aluno.id, Aluno.user_id).where(Aluno.id.in_(set(ids)))
+        if school_id:
+            vinculado = exists().where(UserSchool.user_id == Aluno.user_id, UserSchool.school_id == school_id)
+            query = query.outerjoin(Turma, Aluno.turma_id == Turma.id).where(
+                or_(Turma.school_id == school_id, and_(Aluno.turma_id.is_(None), vinculado))
+            )
+        encontrados = dict(db.session.execute(query).all())
+
+        descartados = [aid for aid in dict.fromkeys(ids) if aid not in encontrados]
+        if descartados:
+            logger.warning(f"Registro em massa: {len(descartados)} aluno(s) fora da escola {school_id} ou inexistentes ignorados: {descartados}")
+        # Mantém a ordem de seleção do formulário
+        return {aid: encontrados[aid] for aid in dict.fromkeys(ids) if aid in encontrados}
+
+    @staticmethod
+    def registrar_processos_em_lote(aluno_ids, relator_id, school_id=None, notificacao_url=None, **campos):
+        """
+        Abre o mesmo processo (AGUARDANDO_CIENCIA) para vários alunos com um único INSERT
+        de várias linhas e avisa todos de uma vez: notificações num INSERT e os pushes
+        num só job do worker. 'campos' são as colunas comuns (fato_constatado, regra_id,
+        pontos...). Não faz commit. Retorna os ids criados.
+        """
+        alunos = JusticaService._alunos_da_escola(aluno_ids, school_id)
+        if not alunos:
+            return []
+
+        agora = datetime.now().astimezone()
+        linhas = [
+            {
+                **campos,
+                'aluno_id': aluno_id,
+                'relator_id': relator_id,
+                'status': StatusProcesso.AGUARDANDO_CIENCIA.value,
+                'data_registro': agora,
+            }
+            for aluno_id in alunos
+        ]
+        ids = db.session.scalars(
+            insert(ProcessoDisciplina).returning(ProcessoDisciplina.id, sort_by_parameter_order=True),
+            linhas
+        ).all()
+
+        data = campos.get('data_ocorrencia') or agora
+        NotificationService.create_notifications_bulk(
+            [
+                (user_id, f"Novo Processo Nº {pid}/{data.strftime('%Y')} aguardando a sua ciência. Acesse o módulo de Justiça.")
+                for pid, user_id in zip(ids, alunos.values())
+            ],
+            url=notificacao_url
+        )
+        return ids
+
+    @staticmethod
+    def registrar_elogios_em_lote(aluno_ids, registrado_por_id, data_elogio, descricao, school_id=None, pontos=0.5):
+        """Mesmo elogio para vários alunos com um único INSERT. Não faz commit. Retorna quantos foram criados."""
+        alunos = JusticaService._alunos_da_escola(aluno_ids, school_id)
+        if not alunos:
+            return 0
+        if isinstance(data_elogio, datetime):
+            data_elogio = data_elogio.date()
+
+        db.session.execute(insert(Elogio), [
+            {'aluno_id': aluno_id, 'registrado_por_id': registrado_por_id,
+             'data_elogio': data_elogio, 'descricao': descricao, 'pontos': pontos}
+            for aluno_id in alunos
+        ])
+        return len(alunos)
+
     @staticmethod
     def get_pontuacao_config(school):
         if not school: return False, 0.0
@@ -1,101 +1,294 @@
 # backend/services/mail_merge_service.py
 
-import pandas as pd
-from docx import Document
-from io import BytesIO
-import zipfile
+import os
 import re
+import shutil
+import subprocess
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from copy import deepcopy
+from io import BytesIO
+from xml.sax.saxutils import escape, unescape
+
+from lxml import etree
+
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+XML_NS = 'http://www.w3.org/XML/1998/namespace'
+W = f'{{{W_NS}}}'
+
+# O nome do campo não pode conter chaves nem '<'/'>': aplicada ao XML da parte, uma
+# chave sem par nunca casa atravessando tags (outro run, parágrafo ou tabela)
+PLACEHOLDER_RE = re.compile(r'\{\{([^{}<>]*?)\}\}')
+
+# Partes do .docx que podem conter texto com placeholders
+TEXT_PART_RE = re.compile(r'^word/(document|header\d*|footer\d*|footnotes|endnotes)\.xml$')
+
+_XML_ENTITIES = {'&quot;': '"', '&apos;': "'"}
+
+
+class CompiledTemplate:
+    """
+    Template .docx pré-compilado: as partes XML com placeholders viram listas
+    alternando trechos fixos e nomes de campo; as demais entradas do pacote
+    são mantidas como bytes e copiadas sem alteração em cada documento.
+    """
+
+    def __init__(self, entries, parts):
+        self.entries = entries   # lista de (ZipInfo, bytes | None); None = parte compilada
+        self.parts = parts       # nome da parte -> [str, campo, str, campo, ..., str]
+
+    @property
+    def fields(self) -> set:
+        return {name for segments in self.parts.values() for name in segments[1::2]}
+
+    def render(self, record: dict) -> bytes:
+        """Gera os bytes de um .docx preenchido com os valores de 'record'."""
+        out = BytesIO()
+        with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for info, data in self.entries:
+                if data is None:
+                    data = _render_segments(self.parts[info.filename], record)
+                zf.writestr(info, data)
+        return out.getvalue()
+
+
+def _render_value(value) -> str:
+    """Escapa o valor para XML; quebras de linha viram <w:br/> dentro do mesmo run."""
+    text = escape(str(value))
+    if '\n' in text:
+        text = text.replace('\r\n', '\n').replace('\n', '</w:t><w:br/><w:t xml:space="preserve">')
+    return text
+
+
+def _render_segments(segments: list, record: dict) -> bytes:
+    pieces = []
+    for index, segment in enumerate(segments):
+        if index % 2 == 0:
+            pieces.append(segment)
+        elif segment in record:
+            pieces.append(_render_value(record[segment]))
+        else:
+            # Campo sem coluna correspondente: o placeholder permanece no documento
+            pieces.append(escape('{{' + segment + '}}'))
+    return ''.join(pieces).encode('utf-8')
+
+
+def _run_text(run) -> str:
+    parts = []
+    for child in run:
+        if child.tag == W + 't':
+            parts.append(child.text or '')
+        elif child.tag == W + 'tab':
+            parts.append('\t')
+        elif child.tag in (W + 'br', W + 'cr'):
+            parts.append('\n')
+    return ''.join(parts)
+
+
+def _append_text(run, text: str):
+    """Recria o conteúdo textual do run, convertendo \\t e \\n em <w:tab/> e <w:br/>."""
+    for i, line in enumerate(text.split('\n')):
+        if i:
+            etree.SubElement(run, W + 'br')
+        for j, chunk in enumerate(line.split('\t')):
+            if j:
+                etree.SubElement(run, W + 'tab')
+            if chunk:
+                t = etree.SubElement(run, W + 't')
+                t.text = chunk
+                t.set(f'{{{XML_NS}}}space', 'preserve')
+
+
+def _collapse_paragraph(paragraph) -> bool:
+    """
+    Junta os runs de um parágrafo que contém placeholders em um único run,
+    mantendo a formatação do primeiro (mesma regra da substituição original,
+    que o Word exige porque costuma quebrar '{{nome}}' em vários runs).
+    """
+    runs = paragraph.findall(W + 'r')
+    if not runs:
+        return False
+    full_text = ''.join(_run_text(r) for r in runs)
+    if not PLACEHOLDER_RE.search(full_text):
+        return False
+
+    first = runs[0]
+    new_run = etree.Element(W + 'r')
+    rpr = first.find(W + 'rPr')
+    if rpr is not None:
+        new_run.append(deepcopy(rpr))
+    _append_text(new_run, full_text)
+
+    first.addprevious(new_run)
+    for r in runs:
+        paragraph.remove(r)
+    return True
+
+
+def _compile_part(xml_bytes: bytes):
+    """Retorna a parte como lista de segmentos, ou None se não houver placeholders."""
+    if b'{' not in xml_bytes:
+        return None
+    root = etree.fromstring(xml_bytes)
+    for paragraph in root.iter(W + 'p'):
+        _collapse_paragraph(paragraph)
+
+    xml = etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True).decode('utf-8')
+    pieces = PLACEHOLDER_RE.split(xml)
+    if len(pieces) == 1:
+        return None
+    for i in range(1, len(pieces), 2):
+        pieces[i] = unescape(pieces[i], _XML_ENTITIES).strip()
+    return pieces
+
+
+def compile_template(template) -> CompiledTemplate:
+    """Lê o .docx uma única vez (caminho ou arquivo) e pré-compila as partes com texto."""
+    entries, parts = [], {}
+    with zipfile.ZipFile(template) as zf:
+        for info in zf.infolist():
+            data = zf.read(info.filename)
+            if TEXT_PART_RE.match(info.filename):
+                segments = _compile_part(data)
+                if segments is not None:
+                    parts[info.filename] = segments
+                    entries.append((info, None))
+                    continue
+            entries.append((info, data))
+    return CompiledTemplate(entries, parts)
+
+
+# --- Pool de processos ----------------------------------------------------
+# O template compilado é enviado uma vez para cada processo (initializer) e
+# as linhas da planilha trafegam em lotes via executor.map.
+
+_worker_template = None
+
+
+def _init_worker(compiled):
+    global _worker_template
+    _worker_template = compiled
+
+
+def _render_in_worker(record):
+    return _worker_template.render(record)
+
+
+def _safe_filename(value: str, fallback: str) -> str:
+    name = re.sub(r'[\\/:*?"<>|\x00-\x1f]+', '', str(value or '')).strip().replace(' ', '_')
+    return name[:120] or fallback
+
 
 class MailMergeService:
+
+    # Abaixo disso o custo de subir o pool supera o ganho
+    PARALLEL_MIN_ROWS = 20
+    MAX_WORKERS = 4
+
     @staticmethod
-    def _replace_text_in_paragraph(paragraph, replacements):
-        """
-        Substitui múltiplos placeholders em um parágrafo, preservando a formatação dominante.
-        Esta função foi corrigida para ser mais robusta e eficiente.
-        """
-        # 1. Constrói o texto completo do parágrafo
-        full_text = "".join(run.text for run in paragraph.runs)
-        
-        # 2. Verifica se há algo para substituir antes de fazer qualquer alteração
-        if not any(placeholder in full_text for placeholder in replacements.keys()):
+    def read_records(data_file) -> list:
+        import pandas as pd  # pesado: carregado só quando há planilha para ler
+
+        df = pd.read_excel(data_file)
+        df.columns = [str(c).strip() for c in df.columns]
+        return df.astype(str).to_dict('records')
+
+    @staticmethod
+    def pdf_converter_available() -> bool:
+        return MailMergeService._soffice_path() is not None
+
+    @staticmethod
+    def _soffice_path():
+        return shutil.which('soffice') or shutil.which('libreoffice')
+
+    @staticmethod
+    def _iter_rendered(compiled: CompiledTemplate, records: list):
+        workers = min(MailMergeService.MAX_WORKERS, os.cpu_count() or 1)
+        if len(records) < MailMergeService.PARALLEL_MIN_ROWS or workers < 2:
+            for record in records:
+                yield compiled.render(record)
             return
 
-        # 3. Salva a formatação do primeiro 'run' (que geralmente define o estilo da linha)
-        # e a formatação do parágrafo (alinhamento)
-        original_run = paragraph.runs[0] if paragraph.runs else None
-        p_format = paragraph.paragraph_format
-
-        # 4. Executa TODAS as substituições na string de texto
-        modified_text = full_text
-        for placeholder, value in replacements.items():
-            modified_text = modified_text.replace(placeholder, str(value))
-
-        # 5. Limpa os 'runs' antigos do parágrafo
-        for run in paragraph.runs:
-            p = run._element
-            p.getparent().remove(p)
-
-        # 6. Adiciona o texto modificado de volta em um novo 'run'
-        new_run = paragraph.add_run(modified_text)
-        
-        # 7. Reaplica a formatação salva ao novo 'run' e ao parágrafo
-        if original_run:
-            new_run.style = original_run.style
-            font = original_run.font
-            new_run.font.name = font.name
-            new_run.font.size = font.size
-            new_run.font.bold = font.bold
-            new_run.font.italic = font.italic
-            new_run.font.underline = font.underline
-            new_run.font.color.rgb = font.color.rgb
-        
-        paragraph.paragraph_format.alignment = p_format.alignment
+        chunksize = max(1, len(records) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(compiled,)) as pool:
+            yield from pool.map(_render_in_worker, records, chunksize=chunksize)
 
     @staticmethod
-    def generate_documents(template_file, data_file, output_format='docx'):
+    def generate_to_file(template_path, data_path, dest_path, output_format='docx', progress_callback=None):
         """
-        Gera documentos individuais, preservando formatação e orientação de página,
-        e os compacta em um arquivo ZIP.
+        Gera os documentos e grava o resultado em 'dest_path' (ZIP de .docx, ou um
+        único PDF mesclado quando output_format='pdf').
+        O template é compilado uma vez e as linhas são renderizadas em um pool
+        de processos; cada documento vai direto para o ZIP em disco.
+        'progress_callback(gerados, total)' é chamado periodicamente.
         """
-        try:
-            template_buffer = BytesIO(template_file.read())
-            df = pd.read_excel(data_file)
-            records = df.astype(str).to_dict('records')
-
-            zip_buffer = BytesIO()
-            with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
-                for index, record in enumerate(records):
-                    # Recarrega o template do buffer para cada novo documento.
-                    # Isso é crucial para preservar a estrutura original, incluindo orientações de página.
-                    template_buffer.seek(0)
-                    doc = Document(template_buffer)
-
-                    # Cria o dicionário de substituições para o registro atual
-                    replacements = {f"{{{{{key.strip()}}}}}": str(value) for key, value in record.items()}
-
-                    # Itera e substitui nos parágrafos e tabelas
-                    for p in doc.paragraphs:
-                        MailMergeService._replace_text_in_paragraph(p, replacements)
-                    
-                    for table in doc.tables:
-                        for row in table.rows:
-                            for cell in row.cells:
-                                for p in cell.paragraphs:
-                                    MailMergeService._replace_text_in_paragraph(p, replacements)
-
-                    # Salva o documento individual em memória
-                    doc_buffer = BytesIO()
-                    doc.save(doc_buffer)
-                    doc_buffer.seek(0)
-                    
-                    file_name_base = record.get('nome', f"documento_{index + 1}").strip().replace(" ", "_")
-                    filename = f"Certificado_{file_name_base}.docx"
-                    
-                    zf.writestr(filename, doc_buffer.getvalue())
-
-            zip_buffer.seek(0)
-            return zip_buffer, None
-            
-        except Exception as e:
-            error_message = f"Ocorreu um erro: {str(e)}. Verifique se os placeholders no seu template (ex: {{nome}}) correspondem às colunas da planilha."
-            return None, error_message
\ No newline at end of file
+        compiled = compile_template(template_path)
+        records = MailMergeService.read_records(data_path)
+        total = len(records)
+        if not total:
+            raise ValueError("A planilha de dados não possui linhas.")
+
+        if compiled.fields and not (compiled.fields & set(records[0].keys())):
+            raise ValueError(
+                "Nenhum placeholder do template (ex: {{nome}}) corresponde às colunas da planilha. "
+                f"Placeholders encontrados: {', '.join(sorted(compiled.fields))}."
+            )
+
+        step = max(1, total // 50)
+        used_names = set()
+
+        def unique_name(index, record):
+            base = f"Certificado_{_safe_filename(record.get('nome'), f'documento_{index + 1}')}"
+            name, n = base, 2
+            while name in used_names:
+                name, n = f"{base}_{n}", n + 1
+            used_names.add(name)
+            return name
+
+        if output_format == 'pdf':
+            return MailMergeService._generate_merged_pdf(compiled, records, dest_path, unique_name, progress_callback)
+
+        with zipfile.ZipFile(dest_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for index, (record, content) in enumerate(zip(records, MailMergeService._iter_rendered(compiled, records))):
+                # .docx já é comprimido: armazenar sem recomprimir economiza CPU
+                zf.writestr(f"{unique_name(index, record)}.docx", content, compress_type=zipfile.ZIP_STORED)
+                if progress_callback and ((index + 1) % step == 0 or index + 1 == total):
+                    progress_callback(index + 1, total)
+        return dest_path
+
+    @staticmethod
+    def _generate_merged_pdf(compiled, records, dest_path, unique_name, progress_callback=None):
+        """Converte os .docx gerados com o LibreOffice (headless) e mescla tudo em um único PDF."""
+        soffice = MailMergeService._soffice_path()
+        if not soffice:
+            raise RuntimeError("Conversão para PDF indisponível: LibreOffice (soffice) não está instalado no servidor.")
+
+        from pypdf import PdfWriter
+
+        total = len(records)
+        batch_size = 25
+        with tempfile.TemporaryDirectory(prefix='mailmerge_') as workdir:
+            docx_paths = []
+            for index, (record, content) in enumerate(zip(records, MailMergeService._iter_rendered(compiled, records))):
+                path = os.path.join(workdir, f"{index:05d}_{unique_name(index, record)}.docx")
+                with open(path, 'wb') as fh:
+                    fh.write(content)
+                docx_paths.append(path)
+
+            writer = PdfWriter()
+            for start in range(0, total, batch_size):
+                batch = docx_paths[start:start + batch_size]
+                subprocess.run(
+                    [soffice, '--headless', '--convert-to', 'pdf', '--outdir', workdir, *batch],
+                    check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=600
+                )
+                for path in batch:
+                    writer.append(os.path.splitext(path)[0] + '.pdf')
+                if progress_callback:
+                    progress_callback(min(start + batch_size, total), total)
+
+            with open(dest_path, 'wb') as fh:
+                writer.write(fh)
+            writer.close()
+        return dest_path
@@ -1,7 +1,10 @@
 # backend/services/notification_service.py
-from sqlalchemy import select, func, update
-from firebase_admin import messaging
+import json
+import uuid
+from sqlalchemy import select, func, update, insert
+from ..extensions import get_firebase_messaging
 from ..models.database import db
+from ..models.background_job import BackgroundJob
 from ..models.notification import Notification
 from ..models.user import User
 from ..models.user_school import UserSchool
@@ -16,14 +19,8 @@ dropdown_cache = TTLCache(maxsize=2000, ttl=21600)
 class NotificationService:
 
     @staticmethod
-    def _trigger_push_notification(user_id: int, title: str, body: str, url: str):
-        """Dispara notificações push via FCM para todas as inscrições de um usuário."""
-        subscriptions = db.session.query(PushSubscription).filter_by(user_id=user_id).all()
-        if not subscriptions:
-            return
-        
-        tokens = [sub.fcm_token for sub in subscriptions]
-
+    def _send_multicast(messaging, tokens: list, title: str, body: str, url: str) -> list:
+        """Envia um push para os tokens informados e retorna os tokens que falharam."""
         # Monta a notificação
         notification_payload = messaging.Notification(title=title, body=body)
         
@@ -34,26 +31,72 @@ class NotificationService:
             data={'url': url or '/'} # Envia a URL como dado adicional
         )
 
+        # Envia a mensagem
+        response = messaging.send_multicast(message)
+        # Opcional: Lidar com tokens que falharam ou que não são mais válidos
+        if response.failure_count > 0:
+            return [tokens[idx] for idx, resp in enumerate(response.responses) if not resp.success]
+        return []
+
+    @staticmethod
+    def _trigger_push_notification(user_id: int, title: str, body: str, url: str):
+        """Dispara notificações push via FCM para todas as inscrições de um usuário."""
+        subscriptions = db.session.query(PushSubscription).filter_by(user_id=user_id).all()
+        if not subscriptions:
+            return
+        
+        messaging = get_firebase_messaging()
+        if messaging is None:
+            return
+
+        tokens = [sub.fcm_token for sub in subscriptions]
+
         try:
-            # Envia a mensagem
-            response = messaging.send_multicast(message)
-            # Opcional: Lidar com tokens que falharam ou que não são mais válidos
-            if response.failure_count > 0:
-                responses = response.responses
-                failed_tokens = []
-                for idx, resp in enumerate(responses):
-                    if not resp.success:
-                        failed_tokens.append(tokens[idx])
-                
-                # Deleta os tokens inválidos do banco de dados
-                if failed_tokens:
-                    db.session.query(PushSubscription).filter(PushSubscription.fcm_token.in_(failed_tokens)).delete(synchronize_session=False)
-                    db.session.commit()
+            failed_tokens = NotificationService._send_multicast(messaging, tokens, title, body, url)
+            # Deleta os tokens inválidos do banco de dados
+            if failed_tokens:
+                db.session.query(PushSubscription).filter(PushSubscription.fcm_token.in_(failed_tokens)).delete(synchronize_session=False)
+                db.session.commit()
 
         except Exception as e:
             # Em um ambiente de produção, logar este erro é crucial
             print(f"Erro ao enviar notificação push para user_id {user_id}: {e}")
 
+    @staticmethod
+    def send_push_batch(itens, url: str = None, title: str = "Nova Notificação - EsFAS") -> int:
+        """
+        Pushes de um lote de notificações [(user_id, mensagem), ...]: as inscrições de
+        todos os usuários vêm numa consulta só e os tokens inválidos saem num único DELETE.
+        Retorna quantos usuários tinham inscrição.
+        """
+        mensagens = {int(user_id): message for user_id, message in itens if user_id}
+        if not mensagens:
+            return 0
+
+        tokens_por_usuario = {}
+        for user_id, token in db.session.execute(
+            select(PushSubscription.user_id, PushSubscription.fcm_token)
+            .where(PushSubscription.user_id.in_(list(mensagens)))
+        ):
+            tokens_por_usuario.setdefault(user_id, []).append(token)
+        if not tokens_por_usuario:
+            return 0
+
+        messaging = get_firebase_messaging()
+        if messaging is None:
+            return 0
+
+        failed_tokens = []
+        for user_id, tokens in tokens_por_usuario.items():
+            try:
+                failed_tokens += NotificationService._send_multicast(messaging, tokens, title, mensagens[user_id], url)
+            except Exception as e:
+                print(f"Erro ao enviar notificação push para user_id {user_id}: {e}")
+
+        if failed_tokens:
+            db.session.query(PushSubscription).filter(PushSubscription.fcm_token.in_(failed_tokens)).delete(synchronize_session=False)
+            db.session.commit()
+        return len(tokens_por_usuario)
 
     @staticmethod
     def create_notification(user_id: int, message: str, url: str = None):
@@ -71,6 +114,28 @@ class NotificationService:
             url=url
         )
 
+    @staticmethod
+    def create_notifications_bulk(itens, url: str = None):
+        """
+        Cria as notificações [(user_id, mensagem), ...] com um único INSERT e deixa os
+        pushes para o worker num só job (task 'push_notifications'), em vez de chamar o
+        FCM usuário a usuário durante a requisição. Não faz commit.
+        """
+        itens = [(int(user_id), message[:255]) for user_id, message in itens if user_id]
+        if not itens:
+            return None
+
+        db.session.execute(insert(Notification), [
+            {'user_id': user_id, 'message': message, 'url': url} for user_id, message in itens
+        ])
+        job = BackgroundJob(
+            id=str(uuid.uuid4()),
+            task_type='push_notifications',
+            meta_data=json.dumps({'url': url, 'itens': itens}, ensure_ascii=False)
+        )
+        db.session.add(job)
+        return job
+
     @staticmethod
     def create_notification_for_roles(school_id: int, roles: list[str], message: str, url: str = None):
         """Cria notificações para todos os usuários com certas funções em uma escola."""
@@ -0,0 +1,293 @@
+# backend/services/questao_similaridade_service.py
+
+import csv
+import html
+import re
+import unicodedata
+import zlib
+from functools import lru_cache
+from hashlib import blake2b
+
+from sqlalchemy import select, delete
+from sqlalchemy.orm import aliased
+
+from ..models.database import db
+from ..models.banco_questoes import QuestaoBanco, QuestaoBancoBanda
+from ..models.disciplina import Disciplina
+
+
+class QuestaoSimilaridadeService:
+    """
+    Detecção de questões quase duplicadas no banco via MinHash + LSH.
+
+    Cada enunciado é normalizado (minúsculas, sem acentos/pontuação) e quebrado
+    em shingles de caracteres; a assinatura MinHash (NUM_PERM inteiros) estima a
+    similaridade de Jaccard entre dois enunciados. A assinatura é dividida em
+    BANDS bandas de ROWS valores e o hash de cada banda vai para a tabela
+    questoes_banco_bandas: questões parecidas colidem em pelo menos uma banda,
+    então a busca de candidatas é uma consulta indexada, sem varrer o banco.
+    """
+
+    SHINGLE_SIZE = 5
+    NUM_PERM = 64
+    BANDS = 16
+    ROWS = 4               # BANDS * ROWS == NUM_PERM
+    LIMIAR_DUPLICATA = 0.8  # Jaccard estimado a partir do qual a questão é tratada como duplicata
+
+    _PRIMO = (1 << 61) - 1
+
+    # --- Assinaturas ------------------------------------------------------
+
+    @staticmethod
+    @lru_cache(maxsize=1)
+    def _coeficientes():
+        """(A, B) da família de hashes; numpy só é importado quando a primeira assinatura é calculada."""
+        import numpy as np
+
+        # Coeficientes fixos: a assinatura precisa ser a mesma em todos os processos e deploys
+        rng = np.random.RandomState(20260729)
+        a = rng.randint(1, 1 << 31, size=QuestaoSimilaridadeService.NUM_PERM).astype(np.uint64)
+        b = rng.randint(0, 1 << 31, size=QuestaoSimilaridadeService.NUM_PERM).astype(np.uint64)
+        return a, b
+
+    @staticmethod
+    def normalizar(texto: str) -> str:
+        # Os enunciados chegam escapados (markupsafe) da extração do texto colado
+        texto = html.unescape(texto or '')
+        texto = unicodedata.normalize('NFKD', texto)
+        texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+        texto = re.sub(r'[^a-z0-9]+', ' ', texto)
+        return texto.strip()
+
+    @staticmethod
+    def shingles(texto: str) -> set:
+        texto = QuestaoSimilaridadeService.normalizar(texto)
+        k = QuestaoSimilaridadeService.SHINGLE_SIZE
+        if len(texto) <= k:
+            return {texto}
+        return {texto[i:i + k] for i in range(len(texto) - k + 1)}
+
+    @staticmethod
+    def assinatura(texto: str) -> list:
+        """Assinatura MinHash do enunciado (lista de NUM_PERM inteiros)."""
+        import numpy as np
+
+        cls = QuestaoSimilaridadeService
+        coef_a, coef_b = cls._coeficientes()
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode('utf-8')) for s in cls.shingles(texto)), dtype=np.uint64
+        )
+        # a < 2^31 e h < 2^32: o produto cabe em uint64 sem estourar
+        valores = (np.outer(coef_a, hashes) + coef_b[:, None]) % np.uint64(cls._PRIMO)
+        return [int(v) for v in valores.min(axis=1)]
+
+    @staticmethod
+    def bandas(assinatura: list) -> list:
+        """Lista de (banda, hash) da assinatura; o hash é um inteiro de 64 bits com sinal (BigInteger)."""
+        rows = QuestaoSimilaridadeService.ROWS
+        resultado = []
+        for banda in range(QuestaoSimilaridadeService.BANDS):
+            trecho = ','.join(str(v) for v in assinatura[banda * rows:(banda + 1) * rows])
+            digest = blake2b(trecho.encode('ascii'), digest_size=8).digest()
+            resultado.append((banda, int.from_bytes(digest, 'big', signed=True)))
+        return resultado
+
+    @staticmethod
+    def similaridade(a: list, b: list) -> float:
+        """Jaccard estimado: fração de posições iguais entre as duas assinaturas."""
+        if not a or not b or len(a) != len(b):
+            return 0.0
+        return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+    # --- Índice -----------------------------------------------------------
+
+    @staticmethod
+    def indexar(questao: QuestaoBanco, assinatura: list = None):
+        """Grava a assinatura e as bandas LSH da questão (não faz commit)."""
+        assinatura = assinatura or QuestaoSimilaridadeService.assinatura(questao.enunciado)
+        questao.assinatura_minhash = assinatura
+        questao.bandas_lsh = [
+            QuestaoBancoBanda(disciplina_id=questao.disciplina_id, banda=banda, hash=valor)
+            for banda, valor in QuestaoSimilaridadeService.bandas(assinatura)
+        ]
+
+    @staticmethod
+    def buscar_similares(disciplina_id: int, assinaturas: list, limiar: float = None, incluir_inativas: bool = False) -> list:
+        """
+        Para cada assinatura, retorna as questões ativas da disciplina com
+        similaridade >= limiar, como lista de (questao_id, similaridade) em
+        ordem decrescente. Uma consulta para as bandas e outra para as
+        assinaturas das candidatas, independente do tamanho do banco.
+        Com 'incluir_inativas', considera também as removidas e as em revisão.
+        """
+        cls = QuestaoSimilaridadeService
+        limiar = cls.LIMIAR_DUPLICATA if limiar is None else limiar
+        bandas_por_item = [dict(cls.bandas(a)) for a in assinaturas]
+        todos_hashes = {h for bandas in bandas_por_item for h in bandas.values()}
+        if not todos_hashes:
+            return [[] for _ in assinaturas]
+
+        colisoes = db.session.execute(
+            select(QuestaoBancoBanda.questao_id, QuestaoBancoBanda.banda, QuestaoBancoBanda.hash)
+            .join(QuestaoBanco, QuestaoBanco.id == QuestaoBancoBanda.questao_id)
+            .where(
+                QuestaoBancoBanda.disciplina_id == disciplina_id,
+                QuestaoBancoBanda.hash.in_(todos_hashes),
+                *([] if incluir_inativas else [QuestaoBanco.ativo == True])
+            )
+        ).all()
+
+        candidatas_por_item = []
+        ids_candidatas = set()
+        for bandas in bandas_por_item:
+            ids = {qid for qid, banda, valor in colisoes if bandas.get(banda) == valor}
+            candidatas_por_item.append(ids)
+            ids_candidatas |= ids
+
+        assinaturas_db = dict(db.session.execute(
+            select(QuestaoBanco.id, QuestaoBanco.assinatura_minhash).where(QuestaoBanco.id.in_(ids_candidatas))
+        ).all()) if ids_candidatas else {}
+
+        resultado = []
+        for assinatura, ids in zip(assinaturas, candidatas_por_item):
+            similares = []
+            for qid in ids:
+                sim = cls.similaridade(assinatura, assinaturas_db.get(qid))
+                if sim >= limiar:
+                    similares.append((qid, sim))
+            similares.sort(key=lambda item: -item[1])
+            resultado.append(similares)
+        return resultado
+
+    @staticmethod
+    def indexar_pendentes(disciplina_ids: list = None, chunk_size: int = 500, progress_callback=None) -> int:
+        """
+        Calcula a assinatura das questões que ainda não têm (cadastradas antes do
+        índice existir), em lotes com commit por lote. Retorna quantas foram indexadas.
+        """
+        filtro = [QuestaoBanco.assinatura_minhash.is_(None)]
+        if disciplina_ids is not None:
+            filtro.append(QuestaoBanco.disciplina_id.in_(disciplina_ids))
+        total = db.session.scalar(select(db.func.count(QuestaoBanco.id)).where(*filtro)) or 0
+
+        feitas, ultimo_id = 0, 0
+        while True:
+            lote = db.session.scalars(
+                select(QuestaoBanco).where(*filtro, QuestaoBanco.id > ultimo_id)
+                .order_by(QuestaoBanco.id).limit(chunk_size)
+            ).all()
+            if not lote:
+                break
+            ids = [q.id for q in lote]
+            db.session.execute(delete(QuestaoBancoBanda).where(QuestaoBancoBanda.questao_id.in_(ids)))
+            for questao in lote:
+                QuestaoSimilaridadeService.indexar(questao)
+            db.session.commit()
+
+            feitas += len(lote)
+            ultimo_id = ids[-1]
+            if progress_callback:
+                progress_callback(feitas, total)
+        return feitas
+
+    # --- Agrupamento em lote ---------------------------------------------
+
+    @staticmethod
+    def agrupar_duplicatas(disciplina_id: int, limiar: float = None) -> list:
+        """
+        Agrupa as questões ativas da disciplina que são quase duplicatas entre si.
+        Os pares candidatos vêm de um self-join na tabela de bandas; cada par é
+        confirmado pela assinatura e os grupos são fechados com union-find.
+        Retorna uma lista de grupos (listas de IDs ordenadas), só com grupos de 2+.
+        """
+        cls = QuestaoSimilaridadeService
+        limiar = cls.LIMIAR_DUPLICATA if limiar is None else limiar
+        a = aliased(QuestaoBancoBanda)
+        b = aliased(QuestaoBancoBanda)
+        qa = aliased(QuestaoBanco)
+        qb = aliased(QuestaoBanco)
+
+        pares = db.session.execute(
+            select(a.questao_id, b.questao_id).distinct()
+            .join(b, (b.disciplina_id == a.disciplina_id) & (b.banda == a.banda)
+                  & (b.hash == a.hash) & (b.questao_id > a.questao_id))
+            .join(qa, qa.id == a.questao_id)
+            .join(qb, qb.id == b.questao_id)
+            .where(a.disciplina_id == disciplina_id, qa.ativo == True, qb.ativo == True)
+        ).all()
+        if not pares:
+            return []
+
+        ids = {qid for par in pares for qid in par}
+        assinaturas = dict(db.session.execute(
+            select(QuestaoBanco.id, QuestaoBanco.assinatura_minhash).where(QuestaoBanco.id.in_(ids))
+        ).all())
+
+        pai = {}
+
+        def raiz(x):
+            pai.setdefault(x, x)
+            while pai[x] != x:
+                pai[x] = pai[pai[x]]
+                x = pai[x]
+            return x
+
+        for x, y in pares:
+            if cls.similaridade(assinaturas.get(x), assinaturas.get(y)) >= limiar:
+                rx, ry = raiz(x), raiz(y)
+                if rx != ry:
+                    pai[max(rx, ry)] = min(rx, ry)
+
+        grupos = {}
+        for qid in pai:
+            grupos.setdefault(raiz(qid), []).append(qid)
+        return sorted((sorted(g) for g in grupos.values() if len(g) > 1), key=lambda g: g[0])
+
+    @staticmethod
+    def gerar_relatorio_duplicatas(escola_id: int, materia: str, dest_path: str, progress_callback=None) -> int:
+        """
+        Indexa o que faltar, agrupa as duplicatas de cada disciplina da matéria/escola
+        e grava um CSV para revisão (uma linha por questão, com o grupo e a similaridade
+        em relação à questão mais antiga do grupo). Retorna o número de grupos.
+        """
+        cls = QuestaoSimilaridadeService
+        disciplina_ids = db.session.scalars(
+            select(QuestaoBanco.disciplina_id).distinct()
+            .join(Disciplina, Disciplina.id == QuestaoBanco.disciplina_id)
+            .where(QuestaoBanco.escola_id == escola_id, Disciplina.materia == materia)
+        ).all()
+
+        if progress_callback:
+            progress_callback(0, 'Indexando questões sem assinatura')
+        cls.indexar_pendentes(disciplina_ids)
+
+        total_grupos = 0
+        with open(dest_path, 'w', newline='', encoding='utf-8-sig') as fh:
+            writer = csv.writer(fh, delimiter=';')
+            writer.writerow(['grupo', 'questao_id', 'similaridade', 'instrutor', 'criado_em', 'enunciado'])
+
+            for index, disciplina_id in enumerate(disciplina_ids, start=1):
+                grupos = cls.agrupar_duplicatas(disciplina_id)
+                ids = [qid for grupo in grupos for qid in grupo]
+                questoes = {
+                    q.id: q for q in db.session.scalars(select(QuestaoBanco).where(QuestaoBanco.id.in_(ids)))
+                } if ids else {}
+
+                for grupo in grupos:
+                    total_grupos += 1
+                    referencia = questoes[grupo[0]].assinatura_minhash
+                    for qid in grupo:
+                        q = questoes[qid]
+                        user = q.instrutor.user if q.instrutor else None
+                        writer.writerow([
+                            total_grupos,
+                            q.id,
+                            f"{cls.similaridade(referencia, q.assinatura_minhash):.2f}",
+                            (user.nome_de_guerra or user.nome_completo) if user else '',
+                            q.criado_em.strftime('%d/%m/%Y') if q.criado_em else '',
+                            html.unescape(q.enunciado),
+                        ])
+
+                if progress_callback:
+                    progress_callback(int(index * 100 / len(disciplina_ids)), f"{total_grupos} grupo(s) encontrado(s)")
+        return total_grupos
@@ -0,0 +1,181 @@
+# backend/services/questionario_service.py
+
+import csv
+import io
+from sqlalchemy import select, func, delete, insert, bindparam
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from ..models.database import db
+
+# Models
+from ..models.pergunta import Pergunta
+from ..models.resposta import Resposta
+from ..models.resultado_questionario import ResultadoQuestionario
+
+
+class QuestionarioService:
+    """
+    Resultados dos questionários a partir do resumo materializado
+    (ResultadoQuestionario) em vez de uma contagem por opção a cada visualização.
+    """
+
+    CABECALHO_EXPORTACAO = ['Pergunta', 'Tipo', 'Opção', 'Respostas', '% da pergunta']
+
+    @staticmethod
+    def contar_respostas(questionario_id: int) -> dict:
+        """{(pergunta_id, opcao_id): total} direto das respostas, num único GROUP BY."""
+        rows = db.session.execute(
+            select(Resposta.pergunta_id, Resposta.opcao_resposta_id, func.count(Resposta.id))
+            .where(Resposta.questionario_id == questionario_id, Resposta.opcao_resposta_id.isnot(None))
+            .group_by(Resposta.pergunta_id, Resposta.opcao_resposta_id)
+        ).all()
+        return {(pergunta_id, opcao_id): total for pergunta_id, opcao_id, total in rows}
+
+    @staticmethod
+    def recalcular_resumo(questionario_id: int) -> dict:
+        """Refaz o resumo do questionário a partir das respostas. Retorna a contagem (não faz commit)."""
+        contagem = QuestionarioService.contar_respostas(questionario_id)
+        db.session.execute(
+            delete(ResultadoQuestionario).where(ResultadoQuestionario.questionario_id == questionario_id)
+        )
+        if contagem:
+            db.session.execute(insert(ResultadoQuestionario), [
+                {'questionario_id': questionario_id, 'pergunta_id': pergunta_id,
+                 'opcao_resposta_id': opcao_id, 'total': total}
+                for (pergunta_id, opcao_id), total in contagem.items()
+            ])
+        return contagem
+
+    @staticmethod
+    def registrar_no_resumo(questionario_id: int, contagem: dict):
+        """
+        Soma ao resumo as opções de um envio ({(pergunta_id, opcao_id): n}): um UPDATE
+        total = total + n para as linhas existentes e um INSERT para as que faltam.
+        Não faz commit.
+        """
+        if not contagem:
+            return
+        existentes = {
+            (pergunta_id, opcao_id): rid for rid, pergunta_id, opcao_id in db.session.execute(
+                select(ResultadoQuestionario.id, ResultadoQuestionario.pergunta_id, ResultadoQuestionario.opcao_resposta_id)
+                .where(
+                    ResultadoQuestionario.questionario_id == questionario_id,
+                    ResultadoQuestionario.opcao_resposta_id.in_([opcao_id for _, opcao_id in contagem])
+                )
+            )
+        }
+        incrementos = [{'b_id': existentes[chave], 'b_n': n} for chave, n in contagem.items() if chave in existentes]
+        novas = [
+            {'questionario_id': questionario_id, 'pergunta_id': pergunta_id, 'opcao_resposta_id': opcao_id, 'total': n}
+            for (pergunta_id, opcao_id), n in contagem.items() if (pergunta_id, opcao_id) not in existentes
+        ]
+
+        if novas:
+            try:
+                # Savepoint: outro envio pode ter criado as mesmas linhas ao mesmo tempo
+                with db.session.begin_nested():
+                    db.session.execute(insert(ResultadoQuestionario), novas)
+            except IntegrityError:
+                for linha in novas:
+                    try:
+                        with db.session.begin_nested():
+                            db.session.execute(insert(ResultadoQuestionario), [linha])
+                    except IntegrityError:
+                        rid = db.session.scalar(select(ResultadoQuestionario.id).where(
+                            ResultadoQuestionario.pergunta_id == linha['pergunta_id'],
+                            ResultadoQuestionario.opcao_resposta_id == linha['opcao_resposta_id']
+                        ))
+                        incrementos.append({'b_id': rid, 'b_n': linha['total']})
+
+        if incrementos:
+            tabela = ResultadoQuestionario.__table__
+            db.session.execute(
+                tabela.update().where(tabela.c.id == bindparam('b_id')).values(total=tabela.c.total + bindparam('b_n')),
+                incrementos
+            )
+
+    @staticmethod
+    def resumo(questionario_id: int) -> dict:
+        """
+        {(pergunta_id, opcao_id): total} lido do resumo. Se a soma não bate com o número
+        de respostas (respostas apagadas junto com usuários, por exemplo), recalcula e grava.
+        """
+        cls = QuestionarioService
+        rows = db.session.execute(
+            select(ResultadoQuestionario.pergunta_id, ResultadoQuestionario.opcao_resposta_id, ResultadoQuestionario.total)
+            .where(ResultadoQuestionario.questionario_id == questionario_id)
+        ).all()
+        respostas = db.session.scalar(
+            select(func.count(Resposta.id))
+            .where(Resposta.questionario_id == questionario_id, Resposta.opcao_resposta_id.isnot(None))
+        ) or 0
+        if sum(total for _, _, total in rows) == respostas:
+            return {(pergunta_id, opcao_id): total for pergunta_id, opcao_id, total in rows}
+
+        contagem = cls.recalcular_resumo(questionario_id)
+        db.session.commit()
+        return contagem
+
+    @staticmethod
+    def resultados(questionario_id: int) -> list:
+        """
+        Perguntas do questionário (ordem de criação) com as opções e os totais do resumo:
+        [{'id', 'texto', 'tipo', 'total', 'opcoes': [{'id', 'texto', 'total'}]}].
+        """
+        contagem = QuestionarioService.resumo(questionario_id)
+        perguntas = db.session.scalars(
+            select(Pergunta).where(Pergunta.questionario_id == questionario_id)
+            .options(selectinload(Pergunta.opcoes)).order_by(Pergunta.id)
+        ).all()
+
+        resultado = []
+        for pergunta in perguntas:
+            opcoes = [
+                {'id': opcao.id, 'texto': opcao.texto, 'total': contagem.get((pergunta.id, opcao.id), 0)}
+                for opcao in sorted(pergunta.opcoes, key=lambda o: o.id)
+            ]
+            resultado.append({
+                'id': pergunta.id, 'texto': pergunta.texto, 'tipo': pergunta.tipo,
+                'total': sum(o['total'] for o in opcoes), 'opcoes': opcoes,
+            })
+        return resultado
+
+    @staticmethod
+    def respostas_texto(questionario_id: int) -> dict:
+        """{pergunta_id: [textos]} das perguntas de texto livre, numa consulta só."""
+        textos = {}
+        for pergunta_id, texto in db.session.execute(
+            select(Resposta.pergunta_id, Resposta.texto_livre)
+            .join(Pergunta, Pergunta.id == Resposta.pergunta_id)
+            .where(
+                Resposta.questionario_id == questionario_id,
+                Pergunta.tipo == 'texto_livre',
+                Resposta.texto_livre.isnot(None)
+            )
+            .order_by(Resposta.id)
+        ):
+            textos.setdefault(pergunta_id, []).append(texto)
+        return textos
+
+    @staticmethod
+    def linhas_exportacao(resultados: list) -> list:
+        """Linhas (pergunta, tipo, opção, respostas, % da pergunta) a partir de resultados()."""
+        linhas = []
+        for pergunta in resultados:
+            if pergunta['tipo'] == 'texto_livre':
+                continue
+            for opcao in pergunta['opcoes']:
+                percentual = round(opcao['total'] * 100 / pergunta['total'], 1) if pergunta['total'] else 0.0
+                linhas.append([pergunta['texto'], pergunta['tipo'], opcao['texto'], opcao['total'], percentual])
+        return linhas
+
+    @staticmethod
+    def exportar_csv(resultados: list) -> str:
+        """CSV (separado por ';', com BOM para o Excel) com os totais do resumo."""
+        out = io.StringIO()
+        out.write('\ufeff')
+        writer = csv.writer(out, delimiter=';')
+        writer.writerow(QuestionarioService.CABECALHO_EXPORTACAO)
+        for pergunta, tipo, opcao, total, percentual in QuestionarioService.linhas_exportacao(resultados):
+            writer.writerow([pergunta, tipo, opcao, total, f"{percentual:.1f}".replace('.', ',')])
+        return out.getvalue()
@@ -1,46 +1,9 @@
 from __future__ import annotations
-import os
-import json
-from io import BytesIO
 from typing import Any, Dict, List, Tuple
 from datetime import date, timedelta, datetime
 from sqlalchemy import select, or_, and_, outerjoin
 from sqlalchemy.orm import aliased
 
-# Importações seguras
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseUpload
-from googleapiclient.errors import HttpError
-
-SCOPES = ["https://www.googleapis.com/auth/drive.file"]
-GA_CREDENTIALS_JSON = os.environ.get("GA_CREDENTIALS_JSON")
-
-def _get_google_credentials() -> Credentials:
-    if not GA_CREDENTIALS_JSON:
-        raise RuntimeError("A variável de ambiente GA_CREDENTIALS_JSON não foi configurada.")
-    try:
-        info = json.loads(GA_CREDENTIALS_JSON)
-        return Credentials.from_service_account_info(info, scopes=SCOPES)
-    except Exception as e:
-        raise RuntimeError(f"Erro ao carregar credenciais do Google: {e}")
-
-def _upload_xlsx_and_convert_to_sheet(filename: str, xlsx_bytes: bytes) -> str | None:
-    try:
-        creds = _get_google_credentials()
-        service = build('drive', 'v3', credentials=creds)
-        file_metadata = {'name': filename, 'mimeType': 'application/vnd.google-apps.spreadsheet'}
-        media = MediaIoBaseUpload(BytesIO(xlsx_bytes), mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', resumable=True)
-        file = service.files().create(body=file_metadata, media_body=media, fields='id, webViewLink').execute()
-        permission = {'type': 'anyone', 'role': 'reader'}
-        service.permissions().create(fileId=file.get('id'), body=permission).execute()
-        return file.get('webViewLink')
-    except HttpError as error:
-        print(f"Ocorreu um erro na API do Google Drive: {error}")
-        return None
-    except Exception as e:
-        print(f"Ocorreu um erro inesperado durante o upload para o Google Drive: {e}")
-        return None
 
 class RelatorioService:
 
@@ -275,7 +238,9 @@ class RelatorioService:
 
     @staticmethod
     def export_to_google_sheets(contexto: Dict[str, Any]) -> Tuple[bool, str]:
+        """Gera o mapa em .xlsx e envia ao Drive como Google Sheets. Executado pelo worker (task 'export_google_sheets')."""
         from .xlsx_service import gerar_mapa_gratificacao_xlsx
+        from .google_drive_service import GoogleDriveService
         try:
             xlsx_bytes = gerar_mapa_gratificacao_xlsx(
                 dados=contexto.get("dados"),
@@ -295,7 +260,7 @@ class RelatorioService:
                 cidade_assinatura=contexto.get("cidade"),
             )
             nome_arquivo = f'Relatório Horas-Aula - {contexto.get("nome_mes_ano", "geral")}'
-            sheet_url = _upload_xlsx_and_convert_to_sheet(nome_arquivo, xlsx_bytes)
+            sheet_url = GoogleDriveService.upload_xlsx_as_sheet(nome_arquivo, xlsx_bytes)
             return (True, sheet_url) if sheet_url else (False, "Falha no upload do arquivo.")
         except Exception as e:
             return False, f"Erro ao exportar: {e}"
\ No newline at end of file
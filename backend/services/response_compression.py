@@ -0,0 +1,109 @@
+# backend/services/response_compression.py
+
+import gzip
+import hashlib
+from functools import wraps
+
+from flask import request, make_response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class ResponseCompression:
+    """
+    Compressão das respostas dinâmicas (HTML, JSON, CSV...) no after_request.
+
+    Só comprime corpos de texto acima de COMPRESS_MIN_SIZE, quando o cliente aceita
+    Brotli ou gzip e a resposta ainda não tem Content-Encoding (os estáticos já saem
+    pré-comprimidos por StaticAssetsService). Arquivos enviados com send_file
+    (direct_passthrough) e respostas em streaming passam direto.
+    """
+
+    MIMETYPES = (
+        'text/html', 'text/plain', 'text/css', 'text/csv', 'text/javascript',
+        'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+    )
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+        # Níveis rápidos: a resposta é comprimida a cada requisição
+        app.config.setdefault('COMPRESS_BR_QUALITY', 4)
+        app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+        app.after_request(self._after_request)
+        self.app = app
+
+    @staticmethod
+    def _choose_encoding():
+        aceitas = {}
+        for parte in request.headers.get('Accept-Encoding', '').split(','):
+            nome, _, params = parte.strip().partition(';')
+            q = 1.0
+            if params.strip().startswith('q='):
+                try:
+                    q = float(params.strip()[2:])
+                except ValueError:
+                    q = 0.0
+            if nome:
+                aceitas[nome.lower()] = q
+        if brotli is not None and aceitas.get('br', 0) > 0:
+            return 'br'
+        if aceitas.get('gzip', 0) > 0:
+            return 'gzip'
+        return None
+
+    def _after_request(self, response):
+        config = self.app.config
+        if (response.status_code < 200 or response.status_code in (204, 206, 304)
+                or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in self.MIMETYPES
+                or request.method == 'HEAD'):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = self._choose_encoding()
+        if encoding is None:
+            return response
+
+        data = response.get_data()
+        if len(data) < config['COMPRESS_MIN_SIZE']:
+            return response
+
+        if encoding == 'br':
+            compressed = brotli.compress(data, quality=config['COMPRESS_BR_QUALITY'])
+        else:
+            compressed = gzip.compress(data, compresslevel=config['COMPRESS_GZIP_LEVEL'])
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        # Uma ETag forte identifica bytes exatos: a versão comprimida passa a ser fraca
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+def etag_json(f):
+    """
+    Respostas JSON com ETag fraca calculada do corpo. O navegador guarda a resposta
+    (Cache-Control: private, no-cache) e revalida a cada uso: se nada mudou, volta
+    304 sem corpo. Para endpoints consultados em polling; páginas com dados
+    sensíveis continuam com no-store.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        response = make_response(f(*args, **kwargs))
+        if response.status_code != 200 or response.mimetype != 'application/json':
+            return response
+        response.set_etag(hashlib.sha1(response.get_data()).hexdigest(), weak=True)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+    return decorated_function
@@ -1,8 +1,11 @@
 # backend/services/semana_service.py
 
-from datetime import date
+import re
+import uuid
+from datetime import date, timedelta
 from flask import current_app
-from sqlalchemy import select, and_, delete, or_
+from sqlalchemy import select, and_, or_, delete, func, insert, literal, case, null, union_all
+from sqlalchemy.orm import aliased
 from ..models.database import db
 
 # Models
@@ -13,10 +16,31 @@ from ..models.disciplina import Disciplina
 from ..models.disciplina_turma import DisciplinaTurma
 from ..models.turma import Turma
 from ..models.historico_disciplina import HistoricoDisciplina 
+from ..models.instrutor import Instrutor
+from ..models.school import School
+from ..models.user import User
 
 from .user_service import UserService
+from .admin_tools_service import AdminToolsService
+from .deletion_planner import DeletionPlanner, DeletionBlockedError
 
 class SemanaService:
+
+    # Limite de semanas criadas por clonagem (um ciclo longo tem ~20)
+    MAX_CLONES = 52
+
+    # Colunas de configuração copiadas da semana de origem
+    _CONFIG_SEMANA = (
+        'mostrar_periodo_13', 'mostrar_periodo_14', 'mostrar_periodo_15',
+        'mostrar_sabado', 'periodos_sabado', 'mostrar_domingo', 'periodos_domingo',
+        'priority_active', 'priority_disciplines', 'priority_blocks', 'blocked_blocks',
+    )
+
+    # Colunas da aula copiadas como estão pelo INSERT ... SELECT
+    _COLUNAS_AULA = (
+        'pelotao', 'dia_semana', 'periodo', 'duracao', 'observacao',
+        'disciplina_id', 'instrutor_id', 'instrutor_id_2',
+    )
     
     @staticmethod
     def get_semana_selecionada(semana_id_str=None, ciclo_id=None, override_school_id=None, override_edicao_id=None):
@@ -154,6 +178,25 @@ class SemanaService:
             db.session.rollback()
             return False, f"Erro ao atualizar: {str(e)}"
 
+    @staticmethod
+    def _plano_exclusao_semana(semana_id: int) -> list:
+        return [
+            ('aulas', Horario, Horario.semana_id == semana_id),
+            ('semanas', Semana, Semana.id == semana_id),
+        ]
+
+    @staticmethod
+    def previa_exclusao_semana(semana_id: int):
+        """Dry-run de delete_semana: (sucesso, mensagem, {rótulo: linhas que seriam apagadas})."""
+        semana = db.session.get(Semana, semana_id)
+        if not semana: return False, 'Semana não encontrada.', None
+
+        active_school = UserService.get_current_school_id()
+        if active_school and semana.ciclo.school_id != active_school:
+            return False, "Permissão negada.", None
+
+        return True, 'OK', SemanaService._contar_exclusao(SemanaService._plano_exclusao_semana(semana_id))
+
     @staticmethod
     def delete_semana(semana_id: int):
         semana = db.session.get(Semana, semana_id)
@@ -164,92 +207,308 @@ class SemanaService:
             return False, "Permissão negada."
 
         try:
-            db.session.query(Horario).filter_by(semana_id=semana_id).delete()
-            db.session.delete(semana)
+            SemanaService._executar_exclusao(SemanaService._plano_exclusao_semana(semana_id))
             db.session.commit()
             return True, 'Semana deletada com sucesso.'
         except Exception as e:
             db.session.rollback()
             return False, f"Erro ao deletar: {str(e)}"
 
-    # --- DELETAR CICLO: MODO CASCATA TOTAL ---
+    # --- CLONAR SEMANA: CÓPIA EM LOTE ---
     @staticmethod
-    def deletar_ciclo(ciclo_id):
+    def _nome_clone(nome: str, deslocamento: int, data_inicio: date) -> str:
+        # "Semana 3" -> "Semana 4", "Semana 5"...; nomes sem número recebem a data de início
+        match = re.match(r'^(.*?)(\d+)\s*$', nome)
+        if match:
+            return f"{match.group(1)}{int(match.group(2)) + deslocamento}"
+        return f"{nome} - {data_inicio.strftime('%d/%m')}"
+
+    @staticmethod
+    def _alocacoes(nome: str):
+        """Uma linha por (aula, instrutor), com o user_id: o mesmo usuário tem um Instrutor por escola."""
+        def por_instrutor(coluna):
+            return (
+                select(
+                    Horario.id.label('horario_id'), Horario.semana_id, Horario.dia_semana,
+                    Horario.periodo, Horario.duracao, Horario.pelotao, Horario.disciplina_id,
+                    Instrutor.user_id
+                )
+                .join(Instrutor, Instrutor.id == coluna)
+            )
+        return union_all(por_instrutor(Horario.instrutor_id), por_instrutor(Horario.instrutor_id_2)).subquery(nome)
+
+    @staticmethod
+    def conflitos_instrutores(semana_ids: list) -> list:
         """
-        Deleta um ciclo e TODAS as suas dependências (Histórico, Semanas, Aulas, Disciplinas).
+        Aulas das semanas informadas cujo instrutor já está alocado, no mesmo dia e
+        período, em outra semana com as mesmas datas (outro ciclo ou outra escola).
+        Mesma regra do save_aula, numa consulta só para todas as semanas.
         """
-        ciclo = db.session.get(Ciclo, ciclo_id)
-        if not ciclo:
-            return False, "Ciclo não encontrado."
+        if not semana_ids:
+            return []
+        a = SemanaService._alocacoes('a')
+        b = SemanaService._alocacoes('b')
+        semana_a = aliased(Semana)
+        semana_b = aliased(Semana)
+
+        rows = db.session.execute(
+            select(
+                semana_a.nome.label('semana'), a.c.dia_semana, a.c.periodo, a.c.duracao, a.c.pelotao,
+                Disciplina.materia, User.nome_de_guerra, User.nome_completo,
+                b.c.pelotao.label('pelotao_conflito'), School.nome.label('escola')
+            )
+            .join(semana_a, semana_a.id == a.c.semana_id)
+            .join(semana_b, and_(
+                semana_b.data_inicio == semana_a.data_inicio,
+                semana_b.data_fim == semana_a.data_fim
+            ))
+            .join(b, and_(
+                b.c.semana_id == semana_b.id,
+                b.c.user_id == a.c.user_id,
+                b.c.dia_semana == a.c.dia_semana,
+                b.c.periodo <= a.c.periodo + a.c.duracao - 1,
+                b.c.periodo + b.c.duracao - 1 >= a.c.periodo
+            ))
+            .join(Ciclo, Ciclo.id == semana_b.ciclo_id)
+            .join(School, School.id == Ciclo.school_id)
+            .join(Disciplina, Disciplina.id == a.c.disciplina_id)
+            .join(User, User.id == a.c.user_id)
+            .where(a.c.semana_id.in_(semana_ids), b.c.semana_id.notin_(semana_ids))
+            .order_by(semana_a.data_inicio, a.c.pelotao, a.c.dia_semana, a.c.periodo)
+        ).all()
+
+        conflitos = []
+        for r in rows:
+            if r.materia and r.materia.strip().upper() == 'A DISPOSIÇÃO DO C AL /S ENS':
+                continue
+            conflitos.append({
+                'semana': r.semana,
+                'dia_semana': r.dia_semana,
+                'periodo': r.periodo,
+                'pelotao': r.pelotao,
+                'materia': r.materia,
+                'instrutor': r.nome_de_guerra or r.nome_completo or '',
+                'pelotao_conflito': r.pelotao_conflito,
+                'escola': r.escola,
+            })
+        return conflitos
+
+    @staticmethod
+    def clonar_semana(semana_id: int, quantidade: int, status: str = 'pendente'):
+        """
+        Cria 'quantidade' semanas consecutivas a partir da semana informada (datas
+        deslocadas de 7 em 7 dias, mesmas configurações) e copia as aulas com um
+        INSERT ... SELECT por semana criada. As cópias recebem o status informado e
+        um group_id novo por bloco (o group_id identifica a aula de vários períodos
+        ao editar/excluir, então não pode ser compartilhado entre semanas).
+        Retorna (sucesso, mensagem, relatorio) com as semanas criadas, o total de
+        aulas copiadas e os conflitos de instrutor com outras escolas/ciclos.
+        """
+        semana = db.session.get(Semana, semana_id)
+        if not semana:
+            return False, 'Semana não encontrada.', None
 
         active_school_id = UserService.get_current_school_id()
-        if active_school_id and ciclo.school_id != active_school_id:
-             return False, "Permissão negada para excluir este ciclo."
+        if active_school_id and semana.ciclo.school_id != active_school_id:
+            return False, 'Permissão negada: Semana pertence a outra escola.', None
 
         try:
-            # 1. IDENTIFICAR IDs RELACIONADOS
-            # Recupera IDs de todas as Disciplinas deste ciclo
-            subquery_disciplinas = select(Disciplina.id).where(Disciplina.ciclo_id == ciclo.id)
-            
-            # Recupera IDs de todas as Semanas deste ciclo
-            subquery_semanas = select(Semana.id).where(Semana.ciclo_id == ciclo.id)
+            quantidade = int(quantidade)
+        except (TypeError, ValueError):
+            return False, 'Quantidade de semanas inválida.', None
+        if not 1 <= quantidade <= SemanaService.MAX_CLONES:
+            return False, f'Informe de 1 a {SemanaService.MAX_CLONES} semanas.', None
+        if status not in ('pendente', 'confirmado'):
+            return False, 'Status inválido.', None
 
-            # 2. LIMPEZA PROFUNDA (ORDEM DE DEPENDÊNCIA)
-            
-            # A) Apagar HISTÓRICO DAS DISCIPLINAS (O culpado do erro anterior)
-            # Como o histórico aponta para disciplinas, deve ser apagado antes delas.
-            db.session.execute(
-                delete(HistoricoDisciplina).where(
-                    HistoricoDisciplina.disciplina_id.in_(subquery_disciplinas)
+        datas = [
+            (semana.data_inicio + timedelta(weeks=k), semana.data_fim + timedelta(weeks=k))
+            for k in range(1, quantidade + 1)
+        ]
+
+        conflitantes = db.session.scalars(
+            select(Semana).where(
+                Semana.ciclo_id == semana.ciclo_id,
+                Semana.data_inicio <= datas[-1][1],
+                Semana.data_fim >= datas[0][0]
+            ).order_by(Semana.data_inicio)
+        ).all()
+        if conflitantes:
+            nomes = ", ".join(f"'{s.nome}'" for s in conflitantes[:5])
+            return False, f"Conflito de datas com semana(s) já cadastrada(s): {nomes}.", None
+
+        try:
+            config = {campo: getattr(semana, campo) for campo in SemanaService._CONFIG_SEMANA}
+            novas = [
+                Semana(
+                    nome=SemanaService._nome_clone(semana.nome, k, inicio),
+                    data_inicio=inicio,
+                    data_fim=fim,
+                    ciclo_id=semana.ciclo_id,
+                    **config
                 )
-            )
+                for k, (inicio, fim) in enumerate(datas, start=1)
+            ]
+            db.session.add_all(novas)
+            db.session.flush()
+
+            grupos = db.session.scalars(
+                select(Horario.group_id).where(
+                    Horario.semana_id == semana.id,
+                    Horario.group_id.isnot(None)
+                ).distinct()
+            ).all()
 
-            # B) Apagar HORÁRIOS (Aulas)
-            # Ligados às disciplinas OU semanas do ciclo
-            db.session.execute(
-                delete(Horario).where(
-                    or_(
-                        Horario.semana_id.in_(subquery_semanas),
-                        Horario.disciplina_id.in_(subquery_disciplinas)
+            colunas = [getattr(Horario, c) for c in SemanaService._COLUNAS_AULA]
+            total_aulas = 0
+            for nova in novas:
+                if grupos:
+                    novo_grupo = case(
+                        {g: str(uuid.uuid4()) for g in grupos},
+                        value=Horario.group_id,
+                        else_=null()
+                    )
+                else:
+                    novo_grupo = null()
+                result = db.session.execute(
+                    insert(Horario).from_select(
+                        list(SemanaService._COLUNAS_AULA) + ['semana_id', 'status', 'group_id'],
+                        select(*colunas, literal(nova.id), literal(status), novo_grupo)
+                        .where(Horario.semana_id == semana.id)
                     )
                 )
-            )
+                total_aulas += result.rowcount or 0
 
-            # C) Apagar VÍNCULOS (DisciplinaTurma)
-            db.session.execute(
-                delete(DisciplinaTurma).where(
-                    DisciplinaTurma.disciplina_id.in_(subquery_disciplinas)
-                )
-            )
+            conflitos = SemanaService.conflitos_instrutores([n.id for n in novas])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Erro ao clonar semana {semana_id}: {e}")
+            return False, f"Erro ao clonar semana: {str(e)}", None
 
-            # D) Apagar SEMANAS do ciclo
-            db.session.execute(
-                delete(Semana).where(Semana.ciclo_id == ciclo.id)
-            )
+        relatorio = {
+            'semanas': [{'id': n.id, 'nome': n.nome, 'data_inicio': n.data_inicio, 'data_fim': n.data_fim} for n in novas],
+            'aulas_copiadas': total_aulas,
+            'conflitos': conflitos,
+        }
+        mensagem = f"{len(novas)} semana(s) criada(s) a partir de '{semana.nome}', com {total_aulas} aula(s) copiada(s)."
+        return True, mensagem, relatorio
 
-            # E) Apagar DISCIPLINAS do ciclo
-            # (Agora é seguro apagar, pois o histórico foi removido no passo A)
-            db.session.execute(
-                delete(Disciplina).where(Disciplina.ciclo_id == ciclo.id)
-            )
+    # --- DELETAR CICLO: MODO CASCATA TOTAL ---
 
-            # F) Apagar TURMAS do ciclo (Se o modelo Turma tiver ciclo_id)
-            if hasattr(Turma, 'ciclo_id'):
-                db.session.execute(
-                    delete(Turma).where(Turma.ciclo_id == ciclo.id)
-                )
+    # Rótulos da prévia (os mesmos da confirmação em gerenciar_semanas.html)
+    _ROTULOS_EXCLUSAO_CICLO = {
+        'frequencias_alunos': 'frequencias',
+        'diarios_classe': 'diarios',
+        'historico_disciplinas': 'historicos',
+        'horarios': 'aulas',
+        'disciplina_turmas': 'vinculos',
+        'semanas': 'semanas',
+        'disciplinas': 'disciplinas',
+        'ciclos': 'ciclos',
+    }
+
+    @staticmethod
+    def _planejador_exclusao_ciclo(ciclo_id: int) -> DeletionPlanner:
+        """
+        Disciplinas do ciclo primeiro, depois o ciclo, com as mesmas tabelas liberadas
+        para a limpeza da escola (opção 'Disciplinas', que arrasta Diários e Vínculos,
+        e opção 'Ciclos'). Questões do banco, delegações e provas de recurso de uma
+        disciplina do ciclo não são apagadas: elas impedem a exclusão.
+        """
+        cascatas = AdminToolsService.CLEAR_OPTION_CASCADES
+        planner = DeletionPlanner()
+        planner.add_root(Disciplina.__tablename__, Disciplina.ciclo_id == ciclo_id,
+                         cascatas['disciplinas'] + cascatas['vinculos'] + ['diarios_classe'] + cascatas['diarios'])
+        planner.add_root(Ciclo.__tablename__, Ciclo.id == ciclo_id, cascatas['ciclos'])
+        return planner
+
+    @staticmethod
+    def _plano_exclusao_ciclo(ciclo_id: int) -> list:
+        """
+        (rótulo, tabela, condição) das etapas do planejador, para a prévia numa única
+        consulta. Etapas de bloqueio saem como 'bloqueio_<tabela>'.
+        """
+        por_rotulo = {}
+        for etapa in SemanaService._planejador_exclusao_ciclo(ciclo_id).build():
+            tabela = etapa['table']
+            if etapa['action'] == 'delete':
+                rotulo = SemanaService._ROTULOS_EXCLUSAO_CICLO.get(tabela.name, tabela.name)
+            elif etapa['action'] == 'block':
+                rotulo = f"bloqueio_{tabela.name}"
+            else:
+                continue
+            por_rotulo.setdefault(rotulo, (tabela, []))[1].append(etapa['where'])
+        return [(rotulo, tabela, or_(*condicoes)) for rotulo, (tabela, condicoes) in por_rotulo.items()]
+
+    @staticmethod
+    def _contar_exclusao(plano: list) -> dict:
+        """Quantas linhas cada passo do plano apagaria, numa única consulta (subconsultas escalares)."""
+        contagens = db.session.execute(
+            select(*[
+                select(func.count()).select_from(modelo).where(condicao).scalar_subquery().label(rotulo)
+                for rotulo, modelo, condicao in plano
+            ])
+        ).one()
+        return dict(contagens._mapping)
 
-            # 3. FINALMENTE, APAGAR O CICLO
-            db.session.execute(
-                delete(Ciclo).where(Ciclo.id == ciclo.id)
+    @staticmethod
+    def _executar_exclusao(plano: list) -> dict:
+        """Executa o plano (sem commit). Retorna as linhas apagadas por passo."""
+        apagados = {}
+        for rotulo, modelo, condicao in plano:
+            result = db.session.execute(
+                delete(modelo).where(condicao).execution_options(synchronize_session=False)
             )
-            
-            # Limpa a sessão para garantir consistência
+            apagados[rotulo] = result.rowcount or 0
+        # Os objetos apagados em lote podem continuar no identity map
+        db.session.expire_all()
+        return apagados
+
+    @staticmethod
+    def previa_exclusao_ciclo(ciclo_id):
+        """Dry-run de deletar_ciclo: (sucesso, mensagem, {rótulo: linhas que seriam apagadas})."""
+        ciclo = db.session.get(Ciclo, ciclo_id)
+        if not ciclo:
+            return False, "Ciclo não encontrado.", None
+
+        active_school_id = UserService.get_current_school_id()
+        if active_school_id and ciclo.school_id != active_school_id:
+            return False, "Permissão negada para excluir este ciclo.", None
+
+        return True, 'OK', SemanaService._contar_exclusao(SemanaService._plano_exclusao_ciclo(ciclo.id))
+
+    @staticmethod
+    def deletar_ciclo(ciclo_id):
+        """
+        Deleta um ciclo e as suas dependências (Semanas, Aulas, Disciplinas, Históricos,
+        Diários e Vínculos) pelo DeletionPlanner, em lotes com commit por lote.
+        """
+        ciclo = db.session.get(Ciclo, ciclo_id)
+        if not ciclo:
+            return False, "Ciclo não encontrado."
+
+        active_school_id = UserService.get_current_school_id()
+        if active_school_id and ciclo.school_id != active_school_id:
+             return False, "Permissão negada para excluir este ciclo."
+
+        try:
+            apagados = SemanaService._planejador_exclusao_ciclo(ciclo.id).execute()
+            # Os objetos apagados em lote podem continuar no identity map
             db.session.expire_all()
-            
-            db.session.commit()
-            return True, "Ciclo Excluído! Todos os dados (incluindo notas e histórico) foram apagados."
-            
+            return True, (
+                f"Ciclo Excluído! Todos os dados (incluindo notas e histórico) foram apagados: "
+                f"{apagados.get('semanas', 0)} semana(s), {apagados.get('horarios', 0)} aula(s), "
+                f"{apagados.get('disciplinas', 0)} disciplina(s), {apagados.get('diarios_classe', 0)} diário(s)."
+            )
+
+        except DeletionBlockedError as e:
+            db.session.rollback()
+            return False, (
+                f"O ciclo não foi excluído. {str(e)} Remova antes as questões do banco, "
+                f"delegações e provas de recurso das disciplinas deste ciclo."
+            )
+
         except Exception as e:
             db.session.rollback()
             current_app.logger.error(f"Erro fatal ao excluir ciclo: {str(e)}")
@@ -188,6 +188,14 @@ class SiteConfigService:
         SiteConfigService._cache_time = now
         return final_configs
 
+    @staticmethod
+    def versao() -> float:
+        """
+        Muda sempre que get_all_configs() recarrega as configurações do banco neste
+        processo; os fragmentos de template em cache (TemplateCacheService) a usam na chave.
+        """
+        return SiteConfigService._cache_time
+
     @staticmethod
     def get_configs_by_category(category: str):
         all_configs = SiteConfigService.get_all_configs()
@@ -0,0 +1,216 @@
+# backend/services/sorteio_questoes_service.py
+
+import random
+import secrets
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from ..models.database import db
+from ..models.banco_questoes import QuestaoBanco, DelegacaoProva, RascunhoProva
+
+
+class SorteioQuestoesService:
+    """
+    Sorteio estratificado das questões de uma prova.
+
+    O banco devolve apenas (id, assunto, escola_id) das questões elegíveis; as
+    alternativas (JSON) só são carregadas para os IDs sorteados. Os estratos são
+    os pares (assunto, escola de origem) e as cotas saem por divisores (D'Hondt),
+    respeitando a capacidade de cada estrato. O sorteio usa um random.Random com
+    semente guardada no rascunho: com os mesmos parâmetros, a prova é refeita igual.
+    """
+
+    MODOS = ('proporcional', 'equilibrado')
+    # Questões usadas em rascunhos de outras delegações da disciplina nesse período ficam de fora
+    JANELA_RECENTES_DIAS = 180
+
+    @staticmethod
+    def nova_semente() -> int:
+        return secrets.randbits(31)
+
+    @staticmethod
+    def ids_recentes(delegacao: DelegacaoProva, dias: int = None) -> list:
+        """IDs usados nos rascunhos recentes das outras delegações da mesma disciplina."""
+        dias = SorteioQuestoesService.JANELA_RECENTES_DIAS if dias is None else dias
+        limite = datetime.utcnow() - timedelta(days=dias)
+        listas = db.session.scalars(
+            select(RascunhoProva.questoes_selecionadas)
+            .join(DelegacaoProva, DelegacaoProva.id == RascunhoProva.delegacao_id)
+            .where(
+                DelegacaoProva.disciplina_id == delegacao.disciplina_id,
+                DelegacaoProva.id != delegacao.id,
+                RascunhoProva.atualizado_em >= limite
+            )
+        ).all()
+        return sorted({qid for lista in listas for qid in (lista or [])})
+
+    @staticmethod
+    def _estratos(delegacao: DelegacaoProva) -> dict:
+        """(assunto, escola_id) -> lista ordenada de IDs elegíveis, sem carregar as questões."""
+        filtros = [QuestaoBanco.disciplina_id == delegacao.disciplina_id, QuestaoBanco.ativo == True]
+        if delegacao.escolas_fontes:
+            filtros.append(QuestaoBanco.escola_id.in_([int(e) for e in delegacao.escolas_fontes]))
+
+        estratos = {}
+        linhas = db.session.execute(
+            select(QuestaoBanco.id, QuestaoBanco.assunto, QuestaoBanco.escola_id)
+            .where(*filtros).order_by(QuestaoBanco.id)
+        )
+        for qid, assunto, escola_id in linhas:
+            estratos.setdefault((assunto or 'Geral', escola_id), []).append(qid)
+        return estratos
+
+    @staticmethod
+    def _distribuir(total: int, capacidades: dict, pesos: dict) -> dict:
+        """
+        Divide 'total' vagas entre as chaves pelo método de D'Hondt (peso / (vagas + 1)),
+        sem ultrapassar a capacidade de cada uma. Empates saem pela ordem das chaves.
+        """
+        cotas = {k: 0 for k in capacidades}
+        chaves = sorted(capacidades, key=str)
+        for _ in range(total):
+            livres = [k for k in chaves if cotas[k] < capacidades[k]]
+            if not livres:
+                break
+            escolhida = max(livres, key=lambda k: pesos[k] / (cotas[k] + 1))
+            cotas[escolhida] += 1
+        return cotas
+
+    @staticmethod
+    def calcular_cotas(estratos: dict, qtd: int, modo: str = 'proporcional', cotas_assunto: dict = None) -> dict:
+        """
+        Quantas questões sortear de cada estrato.
+        'proporcional' pesa cada estrato pelo seu tamanho; 'equilibrado' dá o mesmo
+        peso a todos. 'cotas_assunto' ({assunto: n}) fixa o total de alguns assuntos;
+        o restante da prova é distribuído entre os demais.
+        """
+        cls = SorteioQuestoesService
+        capacidades = {k: len(ids) for k, ids in estratos.items()}
+
+        def pesos(chaves):
+            return {k: (capacidades[k] if modo == 'proporcional' else 1) for k in chaves}
+
+        cotas = {}
+        restante = qtd
+        for assunto, n in (cotas_assunto or {}).items():
+            chaves = {k: capacidades[k] for k in capacidades if k[0] == assunto}
+            parcial = cls._distribuir(min(n, restante), chaves, pesos(chaves))
+            cotas.update(parcial)
+            restante -= sum(parcial.values())
+
+        livres = {k: c for k, c in capacidades.items() if k not in cotas}
+        cotas.update(cls._distribuir(restante, livres, pesos(livres)))
+        return cotas
+
+    @staticmethod
+    def sortear(delegacao: DelegacaoProva, qtd: int, semente: int, modo: str = 'proporcional',
+                cotas_assunto: dict = None, excluir_ids: list = None) -> list:
+        """
+        Retorna a lista de IDs sorteados (na ordem da prova).
+        Questões de 'excluir_ids' só entram se não houver outras suficientes.
+        Levanta ValueError se o banco não tiver questões para a quantidade pedida.
+        """
+        cls = SorteioQuestoesService
+        if modo not in cls.MODOS:
+            raise ValueError(f"Modo de distribuição inválido: {modo}.")
+
+        estratos = cls._estratos(delegacao)
+        disponiveis = sum(len(ids) for ids in estratos.values())
+        if disponiveis < qtd:
+            raise ValueError(
+                f"O banco possui apenas {disponiveis} questões cadastradas para esta matéria. "
+                "Peça aos instrutores para enviarem mais ou diminua a quantidade da prova."
+            )
+
+        excluir = set(excluir_ids or [])
+        ineditas = {k: [i for i in ids if i not in excluir] for k, ids in estratos.items()}
+        ineditas = {k: ids for k, ids in ineditas.items() if ids}
+        rng = random.Random(semente)
+
+        escolhidos = []
+        cotas = cls.calcular_cotas(ineditas, qtd, modo, cotas_assunto)
+        for chave in sorted(cotas, key=str):
+            if cotas[chave]:
+                escolhidos.extend(rng.sample(ineditas[chave], cotas[chave]))
+
+        # Faltou questão inédita: completa com as já usadas em rascunhos recentes
+        if len(escolhidos) < qtd:
+            ja_escolhidos = set(escolhidos)
+            reserva = sorted(i for ids in estratos.values() for i in ids if i not in ja_escolhidos)
+            escolhidos.extend(rng.sample(reserva, qtd - len(escolhidos)))
+
+        rng.shuffle(escolhidos)
+        return escolhidos
+
+    @staticmethod
+    def gerar_rascunho(delegacao: DelegacaoProva, qtd: int, modo: str = 'proporcional',
+                       cotas_assunto: dict = None, semente: int = None, evitar_recentes: bool = True) -> RascunhoProva:
+        """
+        Sorteia e grava (cria ou atualiza) o rascunho da delegação, guardando a semente
+        e os parâmetros usados, inclusive a lista de questões evitadas naquele momento.
+        Não faz commit.
+        """
+        cls = SorteioQuestoesService
+        semente = cls.nova_semente() if semente is None else int(semente)
+        excluir = cls.ids_recentes(delegacao) if evitar_recentes else []
+        parametros = {
+            'qtd': qtd,
+            'modo': modo,
+            'cotas_assunto': cotas_assunto or {},
+            'excluir_ids': excluir,
+        }
+        ids = cls.sortear(delegacao, qtd, semente, modo, cotas_assunto, excluir)
+        return cls._salvar(delegacao, ids, semente, parametros)
+
+    @staticmethod
+    def regerar_rascunho(delegacao: DelegacaoProva) -> RascunhoProva:
+        """Refaz o sorteio com a semente e os parâmetros guardados (mesmo resultado, se o banco não mudou)."""
+        rascunho = delegacao.rascunho
+        if not rascunho or rascunho.semente is None or not rascunho.parametros:
+            raise ValueError("Este rascunho não possui semente registrada para ser refeito.")
+        p = rascunho.parametros
+        ids = SorteioQuestoesService.sortear(
+            delegacao, p['qtd'], rascunho.semente, p.get('modo', 'proporcional'),
+            p.get('cotas_assunto'), p.get('excluir_ids')
+        )
+        return SorteioQuestoesService._salvar(delegacao, ids, rascunho.semente, p)
+
+    @staticmethod
+    def _salvar(delegacao, ids, semente, parametros) -> RascunhoProva:
+        rascunho = RascunhoProva.query.filter_by(delegacao_id=delegacao.id).first()
+        if rascunho is None:
+            rascunho = RascunhoProva(delegacao_id=delegacao.id)
+            db.session.add(rascunho)
+        rascunho.questoes_selecionadas = ids
+        rascunho.semente = semente
+        rascunho.parametros = parametros
+        return rascunho
+
+    @staticmethod
+    def carregar_questoes(ids: list) -> list:
+        """Carrega, em uma consulta, as questões ativas dos IDs informados, na ordem da lista."""
+        if not ids:
+            return []
+        por_id = {
+            q.id: q for q in db.session.scalars(
+                select(QuestaoBanco).where(QuestaoBanco.id.in_(ids), QuestaoBanco.ativo == True)
+            )
+        }
+        return [por_id[i] for i in ids if i in por_id]
+
+    @staticmethod
+    def interpretar_cotas(texto: str) -> dict:
+        """Converte 'Assunto A: 10; Assunto B: 5' (ou uma por linha) em {assunto: quantidade}."""
+        cotas = {}
+        for parte in (texto or '').replace('\n', ';').split(';'):
+            if not parte.strip():
+                continue
+            assunto, sep, valor = parte.rpartition(':')
+            if not sep or not assunto.strip():
+                raise ValueError(f"Cota inválida: '{parte.strip()}'. Use o formato 'Assunto: quantidade'.")
+            try:
+                cotas[assunto.strip()] = max(0, int(valor))
+            except ValueError:
+                raise ValueError(f"Quantidade inválida na cota '{parte.strip()}'.")
+        return cotas
@@ -0,0 +1,59 @@
+# backend/services/sql_expressions.py
+
+from sqlalchemy import case, cast, func, BigInteger, Date, Integer
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+# Deslocamento de cada dia da grade em relação a Semana.data_inicio (segunda-feira)
+DIAS_OFFSET = {'segunda': 0, 'terca': 1, 'quarta': 2, 'quinta': 3, 'sexta': 4, 'sabado': 5, 'domingo': 6}
+
+
+class somar_dias(FunctionElement):
+    """somar_dias(data, n) -> data + n dias, compilado conforme o banco (Postgres em produção, SQLite local)."""
+    type = Date()
+    inherit_cache = True
+    name = 'somar_dias'
+
+
+@compiles(somar_dias)
+def _somar_dias_default(element, compiler, **kw):
+    data, dias = list(element.clauses)
+    return f"({compiler.process(data, **kw)} + {compiler.process(dias, **kw)})"
+
+
+@compiles(somar_dias, 'sqlite')
+def _somar_dias_sqlite(element, compiler, **kw):
+    data, dias = list(element.clauses)
+    return f"date({compiler.process(data, **kw)}, ({compiler.process(dias, **kw)}) || ' days')"
+
+
+def offset_dia_semana(dia_semana_col):
+    """CASE que converte Horario.dia_semana no número de dias a partir do início da semana."""
+    return case(
+        *[(dia_semana_col == dia, offset) for dia, offset in DIAS_OFFSET.items()],
+        else_=0
+    ).cast(Integer)
+
+
+def data_da_aula(data_inicio_col, dia_semana_col):
+    """Data real da aula: Semana.data_inicio + deslocamento do dia da semana, calculada no banco."""
+    return somar_dias(data_inicio_col, offset_dia_semana(dia_semana_col))
+
+
+# Primo de Mersenne 2^31 - 1: os produtos intermediários cabem em BIGINT (Postgres e SQLite)
+HASH_MOD = 2147483647
+HASH_BASE = 1000003
+
+
+def hash_linha(*colunas):
+    """
+    Hash inteiro (0 <= h < 2^31 - 1) de colunas inteiras de uma linha, calculado no banco.
+    SUM(hash_linha(...)) serve de assinatura do conteúdo de um conjunto de linhas: ao
+    contrário de count/max/sum dos ids, muda quando uma linha é alterada no lugar (UPDATE).
+    O quadrado no fim impede que uma troca entre duas linhas (A->B e B->A) se anule na soma.
+    """
+    h = None
+    for coluna in colunas:
+        valor = cast(func.coalesce(coluna, -1), BigInteger) + 1
+        h = valor % HASH_MOD if h is None else (h * HASH_BASE + valor) % HASH_MOD
+    return (h * h) % HASH_MOD
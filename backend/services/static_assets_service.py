@@ -0,0 +1,203 @@
+# backend/services/static_assets_service.py
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+from flask import current_app, request, send_from_directory, url_for
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from zopfli import gzip as zopfli_gzip
+except ImportError:
+    zopfli_gzip = None
+
+
+class StaticAssetsService:
+    """
+    Pipeline dos arquivos de static/.
+
+    'flask build-static' (executado no deploy) calcula o hash do conteúdo de cada
+    arquivo e grava MANIFEST_NAME ({'css/style.css': 'css/style.<hash>.css'}), além
+    de irmãos pré-comprimidos .br (Brotli) e .gz (zopfli) para os tipos de texto.
+    Os templates usam static_url('css/style.css'), que aponta para o nome com hash:
+    esse nome é servido com cache imutável de um ano, e uma mudança no arquivo gera
+    uma nova URL. Nomes simples continuam funcionando, mas são revalidados (ETag).
+    O handler da rota 'static' escolhe o .br/.gz conforme o Accept-Encoding.
+    """
+
+    MANIFEST_NAME = 'assets-manifest.json'
+    HASH_LENGTH = 10
+    # Conteúdo do usuário e arquivos que precisam manter a URL estável (PWA, SEB)
+    EXCLUDED_DIRS = ('uploads', 'seb')
+    EXCLUDED_FILES = ('sw.js', 'manifest.json', 'SafeBrowser.html', MANIFEST_NAME)
+    COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.json', '.svg', '.html', '.txt', '.xml', '.map', '.webmanifest')
+    MIN_COMPRESS_SIZE = 1024
+    # (codificação, extensão do irmão pré-comprimido), em ordem de preferência
+    ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+    IMMUTABLE_MAX_AGE = 31536000
+    # Uploads têm nomes únicos (uuid ou sha256): podem ficar em cache por um ano
+    UPLOADS_MAX_AGE = 31536000
+
+    _manifest = {}
+    _reverse = {}
+
+    # --- Build ------------------------------------------------------------
+
+    @staticmethod
+    def _iter_files(static_folder: str):
+        cls = StaticAssetsService
+        for root, dirs, files in os.walk(static_folder):
+            rel_root = os.path.relpath(root, static_folder).replace(os.sep, '/')
+            if rel_root == '.':
+                dirs[:] = [d for d in dirs if d not in cls.EXCLUDED_DIRS]
+                rel_root = ''
+            for name in sorted(files):
+                if name.endswith(('.br', '.gz')) or (not rel_root and name in cls.EXCLUDED_FILES):
+                    continue
+                yield f"{rel_root}/{name}" if rel_root else name
+
+    @staticmethod
+    def fingerprint(filename: str, content: bytes) -> str:
+        digest = hashlib.sha256(content).hexdigest()[:StaticAssetsService.HASH_LENGTH]
+        stem, ext = os.path.splitext(filename)
+        return f"{stem}.{digest}{ext}"
+
+    @staticmethod
+    def _compress(path: str, content: bytes) -> int:
+        """Grava os irmãos .br/.gz se estiverem ausentes ou desatualizados. Retorna quantos gravou."""
+        mtime = os.path.getmtime(path)
+        written = 0
+        for encoding, suffix in StaticAssetsService.ENCODINGS:
+            target = path + suffix
+            if os.path.exists(target) and os.path.getmtime(target) >= mtime:
+                continue
+            if encoding == 'br':
+                if brotli is None:
+                    continue
+                data = brotli.compress(content, quality=11)
+            elif zopfli_gzip is not None:
+                data = zopfli_gzip.compress(content)
+            else:
+                data = gzip.compress(content, compresslevel=9, mtime=0)
+
+            if len(data) >= len(content):
+                # Não compensa: remove um irmão antigo para não servir versão desatualizada
+                if os.path.exists(target):
+                    os.remove(target)
+                continue
+            with open(target, 'wb') as f:
+                f.write(data)
+            written += 1
+        return written
+
+    @staticmethod
+    def build(static_folder: str, compress: bool = True) -> dict:
+        """Gera o manifesto (e os irmãos comprimidos) de static/. Retorna {'arquivos', 'comprimidos'}."""
+        cls = StaticAssetsService
+        manifest = {}
+        compressed = 0
+        for filename in cls._iter_files(static_folder):
+            path = os.path.join(static_folder, filename)
+            with open(path, 'rb') as f:
+                content = f.read()
+            manifest[filename] = cls.fingerprint(filename, content)
+            if compress and filename.endswith(cls.COMPRESSIBLE_EXTENSIONS) and len(content) >= cls.MIN_COMPRESS_SIZE:
+                compressed += cls._compress(path, content)
+
+        with open(os.path.join(static_folder, cls.MANIFEST_NAME), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=0, sort_keys=True)
+        cls._set_manifest(manifest)
+        return {'arquivos': len(manifest), 'comprimidos': compressed}
+
+    @staticmethod
+    def _set_manifest(manifest: dict):
+        StaticAssetsService._manifest = manifest
+        StaticAssetsService._reverse = {v: k for k, v in manifest.items()}
+
+    @staticmethod
+    def load_manifest(static_folder: str):
+        """Carrega o manifesto gerado no deploy; sem ele, calcula só os hashes (sem comprimir)."""
+        path = os.path.join(static_folder, StaticAssetsService.MANIFEST_NAME)
+        try:
+            with open(path, encoding='utf-8') as f:
+                StaticAssetsService._set_manifest(json.load(f))
+        except (OSError, ValueError):
+            manifest = {}
+            for filename in StaticAssetsService._iter_files(static_folder):
+                with open(os.path.join(static_folder, filename), 'rb') as f:
+                    manifest[filename] = StaticAssetsService.fingerprint(filename, f.read())
+            StaticAssetsService._set_manifest(manifest)
+
+    # --- Templates --------------------------------------------------------
+
+    @staticmethod
+    def static_url(filename: str, **values) -> str:
+        """url_for('static') com o nome versionado pelo conteúdo, quando o arquivo está no manifesto."""
+        return url_for('static', filename=StaticAssetsService._manifest.get(filename, filename), **values)
+
+    # --- Servidor ---------------------------------------------------------
+
+    @staticmethod
+    def _accepted_encodings() -> set:
+        aceitas = set()
+        for parte in request.headers.get('Accept-Encoding', '').split(','):
+            nome, _, params = parte.strip().partition(';')
+            if nome and params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+                aceitas.add(nome.lower())
+        return aceitas
+
+    @staticmethod
+    def send_static(filename: str):
+        """View da rota 'static': resolve o nome versionado, negocia .br/.gz e define o Cache-Control."""
+        cls = StaticAssetsService
+        static_folder = current_app.static_folder
+        original = cls._reverse.get(filename)
+        source = original or filename
+        source_path = safe_join(static_folder, source)
+        if source_path is None or not os.path.isfile(source_path):
+            raise NotFound()
+
+        served, encoding = source, None
+        compressible = source.endswith(cls.COMPRESSIBLE_EXTENSIONS)
+        if compressible:
+            aceitas = cls._accepted_encodings()
+            for nome, suffix in cls.ENCODINGS:
+                if nome in aceitas and os.path.isfile(source_path + suffix):
+                    served, encoding = source + suffix, nome
+                    break
+
+        mimetype = mimetypes.guess_type(source)[0] or 'application/octet-stream'
+        if original:
+            max_age = cls.IMMUTABLE_MAX_AGE
+        elif source.startswith('uploads/'):
+            max_age = cls.UPLOADS_MAX_AGE
+        else:
+            max_age = 0
+
+        response = send_from_directory(static_folder, served, mimetype=mimetype, max_age=max_age, conditional=True)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if compressible:
+            response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        if original:
+            response.cache_control.immutable = True
+        elif not max_age:
+            # Nome sem hash: o navegador pode guardar, mas revalida (304) a cada uso
+            response.cache_control.no_cache = True
+        return response
+
+    @staticmethod
+    def init_app(app):
+        StaticAssetsService.load_manifest(app.static_folder)
+        app.view_functions['static'] = StaticAssetsService.send_static
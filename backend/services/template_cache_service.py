@@ -0,0 +1,130 @@
+# backend/services/template_cache_service.py
+
+import os
+import stat
+import threading
+
+from cachetools import LRUCache
+from flask import current_app, g, session
+from flask_login import current_user
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+
+class FragmentCacheExtension(Extension):
+    """
+    Tag {% cache 'nome', chave1, chave2 %}...{% endcache %}: o HTML do bloco fica em
+    cache por processo, indexado pelo nome, pelas chaves e pela versão das
+    configurações do site. As chaves devem cobrir tudo o que o bloco lê (perfil do
+    usuário, escola, endpoint ativo); variáveis definidas dentro do bloco não vazam.
+    """
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_renderizar', [nodes.List(args)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _renderizar(self, chave, caller):
+        return TemplateCacheService.fragmento(tuple(chave), caller)
+
+
+class TemplateCacheService:
+    """
+    Cache de templates em duas camadas:
+
+    - bytecode do Jinja em disco (JINJA_BYTECODE_CACHE_DIR, padrão <instance>/jinja-cache),
+      compartilhado pelos workers do gunicorn: um worker reciclado por --max-requests carrega o
+      base.html compilado em vez de recompilar. A entrada é indexada pelo checksum
+      do fonte, então um template alterado no deploy é recompilado sozinho;
+    - fragmentos renderizados (menu lateral, marca) em memória, pela tag {% cache %}.
+      Desligado em modo debug, em que os templates são editados com o app rodando.
+    """
+
+    _fragmentos = LRUCache(maxsize=1024)
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _diretorio_seguro(diretorio: str):
+        """
+        Cria o diretório do cache só para o usuário do app (0700) e recusa um já
+        existente que seja link simbólico, de outro usuário ou gravável por outros:
+        o bytecode lido dali é executado, então ninguém mais pode escrever nele.
+        """
+        os.makedirs(diretorio, mode=0o700, exist_ok=True)
+        info = os.lstat(diretorio)
+        if not stat.S_ISDIR(info.st_mode):
+            raise OSError(f"{diretorio} não é um diretório")
+        if hasattr(os, 'getuid') and info.st_uid != os.getuid():
+            raise OSError(f"{diretorio} pertence a outro usuário")
+        if info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            raise OSError(f"{diretorio} pode ser alterado por outros usuários")
+
+    @staticmethod
+    def init_app(app):
+        diretorio = app.config.get('JINJA_BYTECODE_CACHE_DIR') or os.path.join(app.instance_path, 'jinja-cache')
+        try:
+            TemplateCacheService._diretorio_seguro(diretorio)
+            app.jinja_env.bytecode_cache = FileSystemBytecodeCache(diretorio, '%s.cache')
+        except OSError as e:
+            app.logger.warning(f"Cache de bytecode dos templates desativado ({diretorio}): {e}")
+
+        app.jinja_env.add_extension(FragmentCacheExtension)
+        app.jinja_env.globals.update(perfil_menu=TemplateCacheService.perfil_menu)
+
+    @staticmethod
+    def _ativo() -> bool:
+        return current_app.config.get('TEMPLATE_FRAGMENT_CACHE', True) and not current_app.debug
+
+    @staticmethod
+    def fragmento(chave: tuple, caller):
+        cls = TemplateCacheService
+        if not cls._ativo():
+            return caller()
+
+        from .site_config_service import SiteConfigService
+
+        chave = (SiteConfigService.versao(),) + chave
+        with cls._lock:
+            html = cls._fragmentos.get(chave)
+        if html is None:
+            html = caller()
+            with cls._lock:
+                cls._fragmentos[chave] = html
+        return html
+
+    @staticmethod
+    def perfil_menu() -> tuple:
+        """
+        Tudo o que o menu lateral do base.html consulta sobre o usuário e a sessão,
+        para usar como chave: usuários com o mesmo perfil na mesma escola
+        compartilham o fragmento.
+        """
+        if not current_user.is_authenticated:
+            return ('anonimo',)
+
+        sid = session.get('active_school_id')
+        sid = int(sid) if sid else None
+        papel = str(current_user.role).lower().strip()
+        aluno = papel == 'aluno' and bool(current_user.aluno_profile)
+        edicao = g.get('active_edicao')
+        return (
+            papel, sid,
+            bool(session.get('is_dec_mode')), bool(session.get('view_as_school_id')), bool(session.get('impersonator_id')),
+            current_user.is_staff_in_school(sid), current_user.is_instrutor_in_school(sid),
+            current_user.is_sens_in_school(sid), current_user.is_cal_in_school(sid),
+            current_user.is_admin_escola_in_school(sid),
+            aluno, aluno and current_user.is_chefe_turma,
+            (edicao.npccal_type if aluno and edicao else None),
+        )
+
+    @staticmethod
+    def invalidar():
+        with TemplateCacheService._lock:
+            TemplateCacheService._fragmentos.clear()
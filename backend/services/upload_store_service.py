@@ -0,0 +1,342 @@
+# backend/services/upload_store_service.py
+
+import hashlib
+import os
+import re
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, update, delete, func, case
+from sqlalchemy.exc import IntegrityError
+
+from ..models.database import db
+from ..models.upload_blob import UploadBlob
+from ..models.aluno import Aluno
+from ..models.instrutor import Instrutor
+from ..models.user import User
+from ..models.diario_classe import DiarioClasse
+from ..models.recurso import Recurso
+from ..models.chamado_suporte import ChamadoSuporte
+from utils.image_utils import get_file_hash
+
+
+class UploadStoreService:
+    """
+    Armazenamento de uploads endereçado por conteúdo.
+
+    Cada arquivo é gravado uma única vez em static/uploads/<bucket>/ab/cd/<sha256>.<ext>
+    e registrado em upload_blobs. Assinaturas padrão, fotos e anexos repetidos
+    passam a apontar para o mesmo arquivo em vez de gerar uma cópia por uso.
+    ref_count é mantido de forma incremental (acquire/release); o GC recalcula os
+    contadores a partir de REFERENCIAS antes de apagar qualquer coisa, então
+    referências copiadas ou apagadas sem passar por aqui não causam perda de arquivo.
+    """
+
+    BUCKET_ASSINATURAS = 'signatures'
+    BUCKET_FOTOS = 'profile_pics'
+    BUCKET_RECURSOS = 'recursos_anexos'
+    BUCKET_SUPORTE = 'suporte'
+
+    # (modelo, coluna, pasta base do valor relativa a static/, bucket de destino)
+    # Colunas com base '' guardam o caminho completo ("uploads/signatures/..."); as demais
+    # guardam o caminho relativo à base, que os templates concatenam.
+    REFERENCIAS = (
+        (DiarioClasse, 'assinatura_path', '', BUCKET_ASSINATURAS),
+        (Instrutor, 'assinatura_padrao_path', '', BUCKET_ASSINATURAS),
+        (User, 'assinatura_padrao_path', '', BUCKET_ASSINATURAS),
+        (Recurso, 'assinatura_aluno', '', BUCKET_ASSINATURAS),
+        (Recurso, 'assinatura_instrutor', '', BUCKET_ASSINATURAS),
+        (Recurso, 'assinatura_comandante', '', BUCKET_ASSINATURAS),
+        (Aluno, 'foto_perfil', 'uploads/profile_pics', BUCKET_FOTOS),
+        (Instrutor, 'foto_perfil', 'uploads/profile_pics', BUCKET_FOTOS),
+        (User, 'foto_perfil', 'uploads/profile_pics', BUCKET_FOTOS),
+        (Recurso, 'arquivo_anexo', 'uploads/recursos_anexos', BUCKET_RECURSOS),
+        (ChamadoSuporte, 'anexo_filename', 'uploads', BUCKET_SUPORTE),
+    )
+    # Valores que não são uploads (placeholders servidos como estão)
+    IGNORAR = {'default.png'}
+    CARENCIA_GC_HORAS = 24
+
+    _PADRAO_CAMINHO = re.compile(r'^uploads/[\w-]+/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.\w+$')
+
+    # --- Caminhos ---------------------------------------------------------
+
+    @staticmethod
+    def _static_root():
+        return current_app.static_folder
+
+    @staticmethod
+    def caminho(bucket: str, sha256: str, ext: str) -> str:
+        """Caminho do blob relativo a static/."""
+        return f"uploads/{bucket}/{sha256[:2]}/{sha256[2:4]}/{sha256}.{ext}"
+
+    @staticmethod
+    def is_blob_path(path: str) -> bool:
+        return bool(path) and bool(UploadStoreService._PADRAO_CAMINHO.match(path))
+
+    @staticmethod
+    def _completo(valor: str, base: str = '') -> str:
+        """Valor da coluna -> caminho relativo a static/."""
+        return f"{base}/{valor}" if base else valor
+
+    @staticmethod
+    def _relativo(path: str, base: str = '') -> str:
+        """Caminho relativo a static/ -> valor a gravar numa coluna com a base informada."""
+        return path[len(base) + 1:] if base else path
+
+    @staticmethod
+    def normalizar_ext(ext: str, padrao: str = 'bin') -> str:
+        ext = (ext or '').rsplit('.', 1)[-1].lower()
+        ext = re.sub(r'[^a-z0-9]', '', ext)[:10]
+        return 'jpg' if ext == 'jpeg' else (ext or padrao)
+
+    # --- Gravação e contadores --------------------------------------------
+
+    @staticmethod
+    def _ler(dados) -> bytes:
+        if isinstance(dados, (bytes, bytearray)):
+            return bytes(dados)
+        stream = getattr(dados, 'stream', None)
+        if stream is not None and hasattr(stream, 'seek'):
+            stream.seek(0)
+        return dados.read()
+
+    @staticmethod
+    def put(dados, ext: str, bucket: str) -> UploadBlob:
+        """
+        Grava o conteúdo (bytes, FileStorage ou CompressedFileProxy) se ele ainda não
+        existir no bucket e retorna o UploadBlob correspondente. Não altera ref_count
+        e não faz commit: se a transação for desfeita, o arquivo fica órfão e o GC o remove.
+        """
+        cls = UploadStoreService
+        conteudo = cls._ler(dados)
+        ext = cls.normalizar_ext(ext)
+        sha256 = hashlib.sha256(conteudo).hexdigest()
+        path = cls.caminho(bucket, sha256, ext)
+
+        destino = os.path.join(cls._static_root(), path)
+        if not os.path.exists(destino):
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            temporario = f"{destino}.{uuid.uuid4().hex[:8]}.tmp"
+            with open(temporario, 'wb') as f:
+                f.write(conteudo)
+            os.replace(temporario, destino)
+
+        blob = db.session.scalar(select(UploadBlob).where(UploadBlob.path == path))
+        if blob is None:
+            blob = UploadBlob(bucket=bucket, sha256=sha256, ext=ext, path=path, size=len(conteudo), ref_count=0)
+            try:
+                # Savepoint: outro processo pode ter registrado o mesmo conteúdo ao mesmo tempo
+                with db.session.begin_nested():
+                    db.session.add(blob)
+            except IntegrityError:
+                blob = db.session.scalar(select(UploadBlob).where(UploadBlob.path == path))
+                if blob is None:
+                    raise
+        return blob
+
+    @staticmethod
+    def acquire(valor: str, base: str = '', n: int = 1):
+        """Soma n referências ao blob (valores fora do armazenamento são ignorados)."""
+        path = UploadStoreService._completo(valor, base) if valor else None
+        if not n or not UploadStoreService.is_blob_path(path):
+            return
+        db.session.execute(
+            update(UploadBlob).where(UploadBlob.path == path)
+            .values(ref_count=UploadBlob.ref_count + n, released_at=None)
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def release(valor: str, base: str = '', n: int = 1):
+        """Subtrai n referências; ao chegar a zero marca released_at para o GC."""
+        path = UploadStoreService._completo(valor, base) if valor else None
+        if not n or not UploadStoreService.is_blob_path(path):
+            return
+        db.session.execute(
+            update(UploadBlob).where(UploadBlob.path == path)
+            .values(
+                ref_count=UploadBlob.ref_count - n,
+                released_at=case((UploadBlob.ref_count - n <= 0, datetime.utcnow()), else_=UploadBlob.released_at)
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def swap(antigo: str, novo: str, base: str = ''):
+        """Troca a referência de uma coluna: libera o valor antigo e adquire o novo."""
+        if antigo == novo:
+            return
+        UploadStoreService.release(antigo, base)
+        UploadStoreService.acquire(novo, base)
+
+    @staticmethod
+    def save(dados, ext: str, bucket: str, base: str = '', refs: int = 1) -> str:
+        """
+        put() + acquire(): grava o conteúdo, já conta 'refs' referências e retorna o
+        valor a ser gravado na coluna (relativo a 'base'). Não faz commit.
+        """
+        blob = UploadStoreService.put(dados, ext, bucket)
+        UploadStoreService.acquire(blob.path, n=refs)
+        return UploadStoreService._relativo(blob.path, base)
+
+    # --- Manutenção -------------------------------------------------------
+
+    @staticmethod
+    def contar_referencias() -> Counter:
+        """Caminho (relativo a static/) -> número de linhas que o referenciam, em todas as REFERENCIAS."""
+        contagem = Counter()
+        for modelo, coluna, base, _ in UploadStoreService.REFERENCIAS:
+            col = getattr(modelo, coluna)
+            for valor, total in db.session.execute(
+                select(col, func.count()).where(col.isnot(None), col != '').group_by(col)
+            ):
+                contagem[UploadStoreService._completo(valor, base)] += total
+        return contagem
+
+    @staticmethod
+    def recount() -> int:
+        """Recalcula ref_count de todos os blobs a partir das colunas. Retorna quantos mudaram (não faz commit)."""
+        contagem = UploadStoreService.contar_referencias()
+        agora = datetime.utcnow()
+        alteracoes = []
+        for blob_id, path, ref_count, released_at in db.session.execute(
+            select(UploadBlob.id, UploadBlob.path, UploadBlob.ref_count, UploadBlob.released_at)
+        ):
+            real = contagem.get(path, 0)
+            if real != ref_count:
+                alteracoes.append({
+                    'id': blob_id,
+                    'ref_count': real,
+                    'released_at': (released_at or agora) if real == 0 else None,
+                })
+        if alteracoes:
+            db.session.execute(update(UploadBlob), alteracoes)
+        return len(alteracoes)
+
+    @staticmethod
+    def migrar_legado(aplicar: bool = False, progress_callback=None) -> dict:
+        """
+        Move para o armazenamento os arquivos referenciados com nomes antigos (uuid,
+        sig_diario_*, *_padrao_*) e reescreve as colunas para o novo caminho. Arquivos
+        idênticos viram um só. Sem 'aplicar', apenas calcula o que seria feito.
+        Os arquivos antigos só são apagados depois do commit de todas as colunas.
+        """
+        cls = UploadStoreService
+        static_root = cls._static_root()
+        stats = {'referencias': 0, 'arquivos': 0, 'ausentes': 0, 'bytes_antes': 0, 'bytes_depois': 0}
+        hashes_vistos = set()
+        legados = set()
+
+        for index, (modelo, coluna, base, bucket) in enumerate(cls.REFERENCIAS, start=1):
+            col = getattr(modelo, coluna)
+            valores = db.session.scalars(select(col).distinct().where(col.isnot(None), col != '')).all()
+            for valor in valores:
+                path = cls._completo(valor, base)
+                if valor in cls.IGNORAR or cls.is_blob_path(path):
+                    continue
+                origem = os.path.join(static_root, path)
+                if not os.path.isfile(origem):
+                    stats['ausentes'] += 1
+                    continue
+
+                stats['referencias'] += 1
+                ext = cls.normalizar_ext(os.path.splitext(valor)[1])
+                if origem not in legados:
+                    legados.add(origem)
+                    stats['arquivos'] += 1
+                    stats['bytes_antes'] += os.path.getsize(origem)
+                chave = (bucket, get_file_hash(origem), ext)
+                if chave not in hashes_vistos:
+                    hashes_vistos.add(chave)
+                    stats['bytes_depois'] += os.path.getsize(origem)
+
+                if aplicar:
+                    with open(origem, 'rb') as f:
+                        blob = cls.put(f.read(), ext, bucket)
+                    db.session.execute(
+                        update(modelo).where(col == valor)
+                        .values({coluna: cls._relativo(blob.path, base)})
+                        .execution_options(synchronize_session=False)
+                    )
+
+            if aplicar:
+                db.session.commit()
+            if progress_callback:
+                progress_callback(index, len(cls.REFERENCIAS))
+
+        if aplicar:
+            cls.recount()
+            db.session.commit()
+            for origem in legados:
+                try:
+                    os.remove(origem)
+                except OSError as e:
+                    current_app.logger.warning(f"Não foi possível remover {origem}: {e}")
+        return stats
+
+    @staticmethod
+    def coletar_lixo(aplicar: bool = False, carencia_horas: int = None) -> dict:
+        """
+        Recalcula os contadores e remove: blobs sem referência há mais que a carência,
+        arquivos do armazenamento sem registro (uploads de transações desfeitas) e
+        arquivos antigos soltos nas pastas dos buckets que nenhuma coluna referencia.
+        A carência protege uploads em andamento. Sem 'aplicar', apenas conta.
+        """
+        cls = UploadStoreService
+        carencia_horas = cls.CARENCIA_GC_HORAS if carencia_horas is None else carencia_horas
+        limite = datetime.utcnow() - timedelta(hours=carencia_horas)
+        limite_mtime = time.time() - carencia_horas * 3600
+        static_root = cls._static_root()
+        stats = {'blobs': 0, 'orfaos': 0, 'legados': 0, 'bytes': 0}
+
+        cls.recount()
+        sem_referencia = db.session.execute(
+            select(UploadBlob.id, UploadBlob.path, UploadBlob.size).where(
+                UploadBlob.ref_count <= 0,
+                func.coalesce(UploadBlob.released_at, UploadBlob.created_at) < limite
+            )
+        ).all()
+        for blob_id, path, size in sem_referencia:
+            stats['blobs'] += 1
+            stats['bytes'] += size or 0
+            if aplicar:
+                arquivo = os.path.join(static_root, path)
+                if os.path.exists(arquivo):
+                    os.remove(arquivo)
+        if aplicar and sem_referencia:
+            db.session.execute(delete(UploadBlob).where(UploadBlob.id.in_([b[0] for b in sem_referencia])))
+        if aplicar:
+            db.session.commit()
+
+        registrados = set(db.session.scalars(select(UploadBlob.path)))
+        referenciados = set(cls.contar_referencias())
+        for bucket in sorted({ref[3] for ref in cls.REFERENCIAS}):
+            pasta = os.path.join(static_root, 'uploads', bucket)
+            for raiz, _, arquivos in os.walk(pasta):
+                for nome in arquivos:
+                    arquivo = os.path.join(raiz, nome)
+                    path = os.path.relpath(arquivo, static_root).replace(os.sep, '/')
+                    if nome in cls.IGNORAR or os.path.getmtime(arquivo) > limite_mtime:
+                        continue
+                    if raiz == pasta:
+                        # Arquivo do formato antigo: só sai se nenhuma coluna o referencia
+                        if path in referenciados:
+                            continue
+                        stats['legados'] += 1
+                    elif path in registrados:
+                        continue
+                    else:
+                        stats['orfaos'] += 1
+                    stats['bytes'] += os.path.getsize(arquivo)
+                    if aplicar:
+                        os.remove(arquivo)
+            if aplicar:
+                # Remove as pastas de shard que ficaram vazias
+                for raiz, subpastas, arquivos in os.walk(pasta, topdown=False):
+                    if raiz != pasta and not os.listdir(raiz):
+                        os.rmdir(raiz)
+        return stats
@@ -1,6 +1,6 @@
-from datetime import date, timedelta
+from datetime import date
 from flask import current_app
-from sqlalchemy import select, or_
+from sqlalchemy import select, update, exists, case, func, or_
 from sqlalchemy.orm import joinedload
 
 from ..models.database import db
@@ -12,6 +12,7 @@ from ..models.disciplina import Disciplina
 from ..models.horario import Horario
 from ..models.semana import Semana
 from ..models.diario_classe import DiarioClasse
+from .sql_expressions import data_da_aula
 
 
 class VinculoService:
@@ -132,62 +133,120 @@ class VinculoService:
             vinculo.instrutor_id_1 = instrutor_1 if instrutor_1 > 0 else None
             vinculo.instrutor_id_2 = instrutor_2 if instrutor_2 > 0 else None
 
-            # 2. REGRA AJUSTADA: Altera apenas os horários FUTUROS e SEM DIÁRIO para o novo instrutor.
-            # Garante absolutamente que aulas passadas (data_aula < hoje) ou que já foram ministradas/concluídas/assinadas permaneçam intocadas!
-            dias_map = {'segunda': 0, 'terca': 1, 'quarta': 2, 'quinta': 3, 'sexta': 4, 'sabado': 5, 'domingo': 6}
-            horarios_alvo = db.session.scalars(
-                select(Horario)
-                .join(Semana, Horario.semana_id == Semana.id)
-                .where(
-                    Horario.disciplina_id == old_disciplina_id,
-                    Horario.pelotao == old_pelotao
-                )
-            ).all()
-
-            hoje = date.today()
-            for horario in horarios_alvo:
-                if horario.status == 'concluido':
-                    continue
-
-                semana_obj = db.session.get(Semana, horario.semana_id)
-                if not semana_obj:
-                    continue
-
-                offset = dias_map.get(horario.dia_semana, 0)
-                data_aula = semana_obj.data_inicio + timedelta(days=offset)
-
-                # Se a aula já é do passado (data_aula < hoje), NUNCA atualizar o instrutor, independentemente de estar como pendente ou confirmado
-                if data_aula < hoje:
-                    continue
-
-                # Se existe diário de classe preenchido/assinado/concluído/validado para esta aula, NUNCA atualizar
-                diario_existente = db.session.scalar(
-                    select(DiarioClasse).where(
-                        DiarioClasse.data_aula == data_aula,
-                        DiarioClasse.disciplina_id == old_disciplina_id,
-                        DiarioClasse.status.in_(['assinado', 'concluido', 'validado']),
-                        DiarioClasse.is_deleted == False
-                    ).limit(1)
-                )
-                if diario_existente:
-                    continue
-
-                # Apenas aulas pendentes/confirmadas que ainda não aconteceram e não têm diário serão alteradas
-                horario.disciplina_id = disciplina_id
-                horario.pelotao = pelotao_nome
-                if instrutor_1 > 0:
-                    horario.instrutor_id = instrutor_1
-                elif instrutor_2 > 0:
-                    horario.instrutor_id = instrutor_2
-                horario.instrutor_id_2 = instrutor_2 if instrutor_2 > 0 else None
+            # 2. REGRA AJUSTADA: Altera apenas os horários FUTUROS e SEM DIÁRIO para o novo instrutor,
+            # em um único UPDATE (ver _reatribuir_horarios).
+            resultado = VinculoService._reatribuir_horarios(
+                old_disciplina_id, old_pelotao, int(disciplina_id), pelotao_nome, instrutor_1, instrutor_2
+            )
 
             db.session.commit()
-            return True, 'Vínculo atualizado! Os próximos agendamentos da disciplina já estão com o novo instrutor.'
+            message = 'Vínculo atualizado! Os próximos agendamentos da disciplina já estão com o novo instrutor.'
+            message += f" ({resultado['movidos']} aula(s) reatribuída(s)"
+            ignorados = sum(resultado['ignorados'].values())
+            if ignorados:
+                message += f"; {ignorados} mantida(s) por já terem ocorrido, estarem concluídas ou com diário assinado"
+            return True, message + ')'
         except Exception as e:
             db.session.rollback()
             current_app.logger.error(f"Erro ao editar vínculo: {e}")
             return False, f"Erro ao editar vínculo: {str(e)}"
 
+    # Motivos pelos quais um horário do vínculo NÃO é reatribuído
+    MOTIVOS_IGNORADOS = {
+        'concluida': 'Aula já concluída',
+        'passada': 'Aula com data anterior a hoje',
+        'com_diario': 'Diário de classe assinado/concluído/validado',
+    }
+
+    @staticmethod
+    def _filtro_horarios(old_disciplina_id: int, old_pelotao: str):
+        """
+        Expressões compartilhadas entre a prévia e o UPDATE: horários do vínculo antigo
+        (com a semana associada), a data real da aula e a existência de diário fechado.
+        """
+        data_aula = data_da_aula(Semana.data_inicio, Horario.dia_semana)
+        diario_fechado = exists().where(
+            DiarioClasse.data_aula == data_aula,
+            DiarioClasse.disciplina_id == old_disciplina_id,
+            DiarioClasse.status.in_(['assinado', 'concluido', 'validado']),
+            DiarioClasse.is_deleted == False
+        )
+        base = [
+            Horario.semana_id == Semana.id,
+            Horario.disciplina_id == old_disciplina_id,
+            Horario.pelotao == old_pelotao,
+        ]
+        return base, data_aula, diario_fechado
+
+    @staticmethod
+    def preview_reatribuicao(old_disciplina_id: int, old_pelotao: str, hoje: date = None) -> dict:
+        """
+        Dry-run da reatribuição: quantas aulas seriam movidas para o novo vínculo e
+        quantas ficariam como estão, por motivo. Uma única consulta agregada.
+        """
+        hoje = hoje or date.today()
+        base, data_aula, diario_fechado = VinculoService._filtro_horarios(old_disciplina_id, old_pelotao)
+        motivo = case(
+            (Horario.status == 'concluido', 'concluida'),
+            (data_aula < hoje, 'passada'),
+            (diario_fechado, 'com_diario'),
+            else_='mover'
+        ).label('motivo')
+
+        sub = select(motivo).select_from(Horario).join(Semana, Horario.semana_id == Semana.id).where(*base[1:]).subquery()
+        contagem = dict(db.session.execute(select(sub.c.motivo, func.count()).group_by(sub.c.motivo)).all())
+
+        return {
+            'movidos': contagem.pop('mover', 0),
+            'ignorados': {chave: contagem.get(chave, 0) for chave in VinculoService.MOTIVOS_IGNORADOS if contagem.get(chave)},
+        }
+
+    @staticmethod
+    def preview_edit_vinculo(vinculo_id: int) -> dict:
+        """Prévia da edição do vínculo: o efeito nos horários já agendados (nada é alterado)."""
+        vinculo = db.session.get(DisciplinaTurma, vinculo_id)
+        if not vinculo:
+            return None
+        return VinculoService.preview_reatribuicao(vinculo.disciplina_id, vinculo.pelotao)
+
+    @staticmethod
+    def _reatribuir_horarios(old_disciplina_id, old_pelotao, disciplina_id, pelotao_nome, instrutor_1, instrutor_2, hoje: date = None) -> dict:
+        """
+        Move para o novo vínculo, em um único UPDATE ... FROM semanas, apenas as aulas
+        que ainda não aconteceram, não estão concluídas e não têm diário fechado
+        (anti-join com diarios_classe). Não faz commit.
+        Retorna {'movidos': n, 'ignorados': {motivo: n}}.
+        """
+        hoje = hoje or date.today()
+        resultado = VinculoService.preview_reatribuicao(old_disciplina_id, old_pelotao, hoje)
+
+        valores = {
+            'disciplina_id': disciplina_id,
+            'pelotao': pelotao_nome,
+            'instrutor_id_2': instrutor_2 if instrutor_2 > 0 else None,
+        }
+        # Como no laço original: sem instrutor válido, o principal da aula fica como está
+        if instrutor_1 > 0:
+            valores['instrutor_id'] = instrutor_1
+        elif instrutor_2 > 0:
+            valores['instrutor_id'] = instrutor_2
+
+        base, data_aula, diario_fechado = VinculoService._filtro_horarios(old_disciplina_id, old_pelotao)
+        stmt = (
+            update(Horario)
+            .where(
+                *base,
+                # status NULL (dados antigos) também é movido: NULL != 'concluido' não é verdadeiro no SQL
+                or_(Horario.status.is_(None), Horario.status != 'concluido'),
+                data_aula >= hoje,
+                ~diario_fechado
+            )
+            .values(**valores)
+            .execution_options(synchronize_session=False)
+        )
+        resultado['movidos'] = db.session.execute(stmt).rowcount
+        return resultado
+
     @staticmethod
     def delete_vinculo(vinculo_id: int):
         vinculo = db.session.get(DisciplinaTurma, vinculo_id)
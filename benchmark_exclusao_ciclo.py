@@ -0,0 +1,254 @@
+"""
+Benchmark da exclusão de ciclos: cascata em lote (SemanaService.deletar_ciclo, alguns
+DELETE ... WHERE ... IN (SELECT ...)) contra a exclusão objeto a objeto pelo ORM
+(semana por semana, aula por aula, com as cascatas da Disciplina).
+
+Cada repetição gera um ciclo sintético completo numa escola própria do benchmark:
+semanas x pelotões x 5 dias x períodos aulas, disciplinas por pelotão com vínculo,
+um diário por disciplina/semana e a frequência de cada aluno do pelotão.
+
+Uso:
+    DATABASE_URL=sqlite:////tmp/bench.db python benchmark_exclusao_ciclo.py
+    python benchmark_exclusao_ciclo.py --semanas 20 --pelotoes 12 --alunos 30 --repeticoes 3
+
+Grava e apaga dados: em bancos que não sejam SQLite exige --confirmar (use uma cópia,
+nunca o banco de produção). Em SQLite as tabelas são criadas se não existirem.
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+from datetime import date, timedelta
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, RAIZ)
+
+DIAS = ('segunda', 'terca', 'quarta', 'quinta', 'sexta')
+
+
+def gerar_ciclo(db, modelos, escola_id, instrutor_user_id, instrutor_id, args, tag):
+    """Cria o ciclo sintético com inserts em lote. Retorna o id do ciclo."""
+    from sqlalchemy import insert, select
+
+    Ciclo, Semana, Turma, Disciplina, DisciplinaTurma, Horario, DiarioClasse, FrequenciaAluno, Aluno, User = modelos
+
+    ciclo = Ciclo(nome=f'Benchmark {tag}', school_id=escola_id)
+    db.session.add(ciclo)
+    db.session.flush()
+
+    inicio = date(2030, 1, 7)
+    db.session.execute(insert(Semana), [
+        {'nome': f'Semana {i + 1}', 'data_inicio': inicio + timedelta(weeks=i),
+         'data_fim': inicio + timedelta(weeks=i, days=4), 'ciclo_id': ciclo.id}
+        for i in range(args.semanas)
+    ])
+    semanas = db.session.execute(
+        select(Semana.id, Semana.data_inicio).where(Semana.ciclo_id == ciclo.id)
+    ).all()
+
+    turmas = []
+    for p in range(args.pelotoes):
+        turma = Turma(nome=f'BENCH-{tag}-{p + 1}', ano=str(inicio.year), school_id=escola_id)
+        db.session.add(turma)
+        turmas.append(turma)
+    db.session.flush()
+
+    disciplinas = []  # (id, turma)
+    for turma in turmas:
+        for d in range(args.disciplinas):
+            disciplina = Disciplina(materia=f'MATÉRIA {d + 1}', carga_horaria_prevista=40,
+                                    turma_id=turma.id, ciclo_id=ciclo.id)
+            db.session.add(disciplina)
+            disciplinas.append((disciplina, turma))
+    db.session.flush()
+
+    db.session.execute(insert(DisciplinaTurma), [
+        {'pelotao': turma.nome, 'disciplina_id': disc.id, 'instrutor_id_1': instrutor_id}
+        for disc, turma in disciplinas
+    ])
+
+    aulas = []
+    for semana_id, _ in semanas:
+        for idx, turma in enumerate(turmas):
+            discs_turma = [d for d, t in disciplinas if t is turma]
+            for dia_idx, dia in enumerate(DIAS):
+                for periodo in range(1, args.periodos + 1):
+                    disc = discs_turma[(dia_idx * args.periodos + periodo + idx) % len(discs_turma)]
+                    aulas.append({
+                        'pelotao': turma.nome, 'dia_semana': dia, 'periodo': periodo, 'duracao': 1,
+                        'semana_id': semana_id, 'disciplina_id': disc.id, 'instrutor_id': instrutor_id,
+                        'status': 'confirmado',
+                    })
+    for i in range(0, len(aulas), 5000):
+        db.session.execute(insert(Horario), aulas[i:i + 5000])
+
+    alunos_por_turma = {}
+    if args.alunos:
+        usuarios = [
+            {'matricula': f'b{tag}{t}{a}', 'role': 'aluno', 'is_active': False, 'must_change_password': False}
+            for t in range(len(turmas)) for a in range(args.alunos)
+        ]
+        db.session.execute(insert(User), usuarios)
+        user_ids = db.session.scalars(
+            select(User.id).where(User.matricula.in_([u['matricula'] for u in usuarios])).order_by(User.id)
+        ).all()
+        db.session.execute(insert(Aluno), [
+            {'user_id': uid, 'opm': 'BENCH', 'turma_id': turmas[i // args.alunos].id}
+            for i, uid in enumerate(user_ids)
+        ])
+        for aluno_id, turma_id in db.session.execute(
+            select(Aluno.id, Aluno.turma_id).where(Aluno.turma_id.in_([t.id for t in turmas]))
+        ):
+            alunos_por_turma.setdefault(turma_id, []).append(aluno_id)
+
+    for _, data_inicio in semanas:
+        db.session.execute(insert(DiarioClasse), [
+            {'data_aula': data_inicio, 'periodo': 1, 'turma_id': turma.id, 'disciplina_id': disc.id,
+             'responsavel_id': instrutor_user_id, 'status': 'assinado'}
+            for disc, turma in disciplinas
+        ])
+    if alunos_por_turma:
+        diarios = db.session.execute(
+            select(DiarioClasse.id, DiarioClasse.turma_id)
+            .where(DiarioClasse.disciplina_id.in_([d.id for d, _ in disciplinas]))
+        ).all()
+        frequencias = [
+            {'diario_id': diario_id, 'aluno_id': aluno_id, 'presente': True}
+            for diario_id, turma_id in diarios for aluno_id in alunos_por_turma.get(turma_id, [])
+        ]
+        for i in range(0, len(frequencias), 5000):
+            db.session.execute(insert(FrequenciaAluno), frequencias[i:i + 5000])
+
+    db.session.commit()
+    return ciclo.id
+
+
+def excluir_orm(db, modelos, ciclo_id):
+    """Exclusão como era feita antes: objetos carregados e apagados um a um pelo ORM."""
+    from sqlalchemy import select
+
+    Ciclo, Semana, Turma, Disciplina, DisciplinaTurma, Horario, DiarioClasse, FrequenciaAluno, Aluno, User = modelos
+    ciclo = db.session.get(Ciclo, ciclo_id)
+    for semana in db.session.scalars(select(Semana).where(Semana.ciclo_id == ciclo_id)).all():
+        for aula in db.session.scalars(select(Horario).where(Horario.semana_id == semana.id)).all():
+            db.session.delete(aula)
+        db.session.delete(semana)
+    for disciplina in db.session.scalars(select(Disciplina).where(Disciplina.ciclo_id == ciclo_id)).all():
+        db.session.delete(disciplina)  # cascata: diários/frequências, históricos, vínculos
+    db.session.delete(ciclo)
+    db.session.commit()
+
+
+def limpar_escola(db, modelos, escola_id):
+    from sqlalchemy import delete, select
+
+    Ciclo, Semana, Turma, Disciplina, DisciplinaTurma, Horario, DiarioClasse, FrequenciaAluno, Aluno, User = modelos
+    turmas = select(Turma.id).where(Turma.school_id == escola_id)
+    user_ids = select(Aluno.user_id).where(Aluno.turma_id.in_(turmas))
+    users = db.session.scalars(user_ids).all()
+    db.session.execute(delete(Aluno).where(Aluno.turma_id.in_(turmas)))
+    if users:
+        db.session.execute(delete(User).where(User.id.in_(users)))
+    db.session.execute(delete(Turma).where(Turma.school_id == escola_id))
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--semanas', type=int, default=20)
+    parser.add_argument('--pelotoes', type=int, default=10)
+    parser.add_argument('--disciplinas', type=int, default=8, help='Disciplinas por pelotão.')
+    parser.add_argument('--periodos', type=int, default=8, help='Períodos por dia.')
+    parser.add_argument('--alunos', type=int, default=20, help='Alunos por pelotão (frequências por diário).')
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--modo', choices=('lote', 'orm', 'ambos'), default='ambos')
+    parser.add_argument('--confirmar', action='store_true', help='Permite rodar em banco que não seja SQLite.')
+    args = parser.parse_args()
+
+    url = os.environ.get('DATABASE_URL')
+    if not url:
+        raise SystemExit("Defina DATABASE_URL (ex.: sqlite:////tmp/bench.db).")
+    if not url.startswith('sqlite') and not args.confirmar:
+        raise SystemExit("O benchmark grava e apaga dados: use --confirmar para rodar fora do SQLite (nunca em produção).")
+
+    from unittest import mock
+    from backend.app import create_app
+    from backend.models.database import db
+    from backend.models.school import School
+    from backend.models.user import User
+    from backend.models.instrutor import Instrutor
+    from backend.models.ciclo import Ciclo
+    from backend.models.semana import Semana
+    from backend.models.turma import Turma
+    from backend.models.disciplina import Disciplina
+    from backend.models.disciplina_turma import DisciplinaTurma
+    from backend.models.horario import Horario
+    from backend.models.diario_classe import DiarioClasse
+    from backend.models.frequencia import FrequenciaAluno
+    from backend.models.aluno import Aluno
+    from backend.services.semana_service import SemanaService
+    from backend.services.user_service import UserService
+
+    modelos = (Ciclo, Semana, Turma, Disciplina, DisciplinaTurma, Horario, DiarioClasse, FrequenciaAluno, Aluno, User)
+
+    app = create_app(slim=True)
+    with app.app_context():
+        if url.startswith('sqlite'):
+            db.create_all()
+
+        tag = uuid.uuid4().hex[:6]
+        escola = School(nome=f'BENCHMARK EXCLUSÃO {tag}')
+        instrutor_user = User(matricula=f'bi{tag}', role='instrutor')
+        db.session.add_all([escola, instrutor_user])
+        db.session.flush()
+        instrutor = Instrutor(user_id=instrutor_user.id, school_id=escola.id)
+        db.session.add(instrutor)
+        db.session.commit()
+
+        modos = ('lote', 'orm') if args.modo == 'ambos' else (args.modo,)
+        resultados = {modo: [] for modo in modos}
+        previa = []
+        contagens = None
+        try:
+            with mock.patch.object(UserService, 'get_current_school_id', return_value=escola.id):
+                for rep in range(args.repeticoes):
+                    for modo in modos:
+                        ciclo_id = gerar_ciclo(db, modelos, escola.id, instrutor_user.id, instrutor.id, args, f'{tag}{rep}{modo[0]}')
+                        db.session.expire_all()
+
+                        inicio = time.perf_counter()
+                        ok, msg, contagens = SemanaService.previa_exclusao_ciclo(ciclo_id)
+                        previa.append(time.perf_counter() - inicio)
+                        db.session.rollback()
+
+                        inicio = time.perf_counter()
+                        if modo == 'lote':
+                            ok, msg = SemanaService.deletar_ciclo(ciclo_id)
+                            if not ok:
+                                raise SystemExit(msg)
+                        else:
+                            excluir_orm(db, modelos, ciclo_id)
+                        resultados[modo].append(time.perf_counter() - inicio)
+                        db.session.expire_all()
+                        limpar_escola(db, modelos, escola.id)
+        finally:
+            db.session.rollback()
+            limpar_escola(db, modelos, escola.id)
+            db.session.delete(db.session.get(Instrutor, instrutor.id))
+            db.session.delete(db.session.get(User, instrutor_user.id))
+            db.session.delete(db.session.get(School, escola.id))
+            db.session.commit()
+
+        print(f"\nBanco: {db.engine.url.get_backend_name()}")
+        print("Registros por ciclo:", ", ".join(f"{k}={v}" for k, v in contagens.items() if v))
+        print(f"\n{'operação':<28}{'melhor (ms)':>12}{'média (ms)':>12}")
+        print(f"{'prévia (dry-run)':<28}{min(previa) * 1000:12.1f}{sum(previa) / len(previa) * 1000:12.1f}")
+        nomes = {'lote': 'deletar_ciclo (em lote)', 'orm': 'ORM objeto a objeto'}
+        for modo, tempos in resultados.items():
+            print(f"{nomes[modo]:<28}{min(tempos) * 1000:12.1f}{sum(tempos) / len(tempos) * 1000:12.1f}")
+
+
+if __name__ == '__main__':
+    main()
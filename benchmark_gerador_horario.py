@@ -0,0 +1,248 @@
+"""
+Benchmark do gerador automático de rascunho (GeradorHorarioService.gerar): tempo de
+solução e taxa de preenchimento numa edição sintética inteira.
+
+Cada escola sintética tem pelotões x disciplinas, um quadro de instrutores menor que o
+número de turmas (cada instrutor dá a mesma matéria em vários pelotões), bloqueios do
+administrador em parte dos pelotões e aulas já marcadas pelos mesmos instrutores numa
+segunda escola, na mesma semana. O gerador roda em modo prévia (nada é gravado) e a
+solução é conferida: sem choque de pelotão, de instrutor, de bloqueio ou de intervalo.
+
+Uso:
+    DATABASE_URL=sqlite:////tmp/bench.db python benchmark_gerador_horario.py
+    python benchmark_gerador_horario.py --pelotoes 30 --disciplinas 8 --instrutores 12 --completar
+
+Grava e apaga dados: em bancos que não sejam SQLite exige --confirmar (use uma cópia,
+nunca o banco de produção). Em SQLite as tabelas são criadas se não existirem.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import date, timedelta
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, RAIZ)
+
+DIAS = ('segunda', 'terca', 'quarta', 'quinta', 'sexta')
+
+
+def gerar_escolas(db, args, tag):
+    """Cria a escola do benchmark e a escola 'vizinha' que divide os instrutores. Retorna os ids."""
+    from sqlalchemy import insert, select
+    from backend.models.school import School
+    from backend.models.user import User
+    from backend.models.instrutor import Instrutor
+    from backend.models.ciclo import Ciclo
+    from backend.models.semana import Semana
+    from backend.models.turma import Turma
+    from backend.models.disciplina import Disciplina
+    from backend.models.disciplina_turma import DisciplinaTurma
+    from backend.models.horario import Horario
+
+    rnd = random.Random(args.semente)
+    escola = School(nome=f'BENCHMARK GERADOR {tag}')
+    vizinha = School(nome=f'BENCHMARK GERADOR VIZINHA {tag}')
+    db.session.add_all([escola, vizinha])
+    db.session.flush()
+
+    db.session.execute(insert(User), [
+        {'matricula': f'bg{tag}{k}', 'role': 'instrutor', 'is_active': False, 'must_change_password': False}
+        for k in range(args.instrutores)
+    ])
+    user_ids = db.session.scalars(
+        select(User.id).where(User.matricula.like(f'bg{tag}%')).order_by(User.id)
+    ).all()
+    db.session.execute(insert(Instrutor), [{'user_id': uid, 'school_id': e.id} for e in (escola, vizinha) for uid in user_ids])
+    instrutores = dict(db.session.execute(
+        select(Instrutor.user_id, Instrutor.id).where(Instrutor.school_id == escola.id)
+    ).all())
+    instrutores_vizinha = dict(db.session.execute(
+        select(Instrutor.user_id, Instrutor.id).where(Instrutor.school_id == vizinha.id)
+    ).all())
+
+    ciclo = Ciclo(nome=f'Benchmark {tag}', school_id=escola.id)
+    ciclo_vizinha = Ciclo(nome=f'Benchmark {tag}', school_id=vizinha.id)
+    db.session.add_all([ciclo, ciclo_vizinha])
+    db.session.flush()
+
+    inicio = date(2031, 2, 3)
+    semanas = [
+        Semana(nome=f'Semana {i + 1}', data_inicio=inicio + timedelta(weeks=i),
+               data_fim=inicio + timedelta(weeks=i, days=4), ciclo_id=ciclo.id)
+        for i in range(args.semanas)
+    ]
+    semana_vizinha = Semana(nome='Semana 1', data_inicio=inicio, data_fim=inicio + timedelta(days=4), ciclo_id=ciclo_vizinha.id)
+    db.session.add_all(semanas + [semana_vizinha])
+    db.session.flush()
+
+    turmas = [Turma(nome=f'BG-{tag}-{p + 1}', ano=inicio.year, school_id=escola.id) for p in range(args.pelotoes)]
+    turma_vizinha = Turma(nome=f'BGV-{tag}', ano=inicio.year, school_id=vizinha.id)
+    db.session.add_all(turmas + [turma_vizinha])
+    db.session.flush()
+
+    bloqueios = {}
+    vinculos = []
+    for p, turma in enumerate(turmas):
+        if rnd.random() < args.bloqueados:
+            dia = rnd.choice(DIAS)
+            bloqueios[turma.nome] = {dia: [str(x) for x in range(1, 5)]}
+        for d in range(args.disciplinas):
+            disciplina = Disciplina(materia=f'MATÉRIA {d + 1}', carga_horaria_prevista=rnd.choice((20, 30, 40, 60)),
+                                    turma_id=turma.id, ciclo_id=ciclo.id)
+            db.session.add(disciplina)
+            vinculos.append((turma.nome, disciplina, user_ids[(d + p * args.disciplinas) % len(user_ids)]))
+    semanas[0].blocked_blocks = json.dumps(bloqueios)
+    semanas[0].priority_active = True
+    semanas[0].priority_disciplines = json.dumps(['MATÉRIA 1'])
+    db.session.flush()
+
+    db.session.execute(insert(DisciplinaTurma), [
+        {'pelotao': nome, 'disciplina_id': disc.id, 'instrutor_id_1': instrutores[uid]} for nome, disc, uid in vinculos
+    ])
+
+    # Aulas dos mesmos instrutores na escola vizinha, mesma semana
+    disciplina_vizinha = Disciplina(materia='VIZINHA', carga_horaria_prevista=999, turma_id=turma_vizinha.id, ciclo_id=ciclo_vizinha.id)
+    db.session.add(disciplina_vizinha)
+    db.session.flush()
+    aulas_vizinha = []
+    for uid in user_ids:
+        for dia in rnd.sample(DIAS, 2):
+            aulas_vizinha.append({
+                'pelotao': turma_vizinha.nome, 'semana_id': semana_vizinha.id, 'dia_semana': dia,
+                'periodo': rnd.randint(1, 11), 'duracao': 2, 'disciplina_id': disciplina_vizinha.id,
+                'instrutor_id': instrutores_vizinha[uid], 'status': 'confirmado',
+            })
+    db.session.execute(insert(Horario), aulas_vizinha)
+    db.session.commit()
+    return escola.id, vizinha.id, semanas[0].id
+
+
+def conferir(db, semana_id, relatorio, intervalos):
+    """Confere a prévia contra a ocupação real da semana. Retorna a lista de problemas."""
+    from sqlalchemy import select
+    from backend.models.semana import Semana
+    from backend.models.instrutor import Instrutor
+    from backend.services.grade_ocupacao_service import GradeOcupacaoService, mascara
+
+    semana = db.session.get(Semana, semana_id)
+    ocupacao = GradeOcupacaoService.get(semana, semana.ciclo.school_id).copia()
+    user_por_instrutor = dict(db.session.execute(select(Instrutor.id, Instrutor.user_id)).all())
+    problemas = []
+
+    for aula in relatorio['aulas']:
+        fim = aula['periodo'] + aula['duracao'] - 1
+        bits = mascara(aula['dia_semana'], aula['periodo'], fim)
+        nome = aula['pelotao']
+        uids = [user_por_instrutor.get(aula['instrutor_id']), user_por_instrutor.get(aula['instrutor_id_2'])]
+        if ocupacao.pelotao(nome) & bits:
+            problemas.append(f'choque de pelotão: {aula}')
+        if ocupacao.instrutores_ocupados(uids) & bits:
+            problemas.append(f'choque de instrutor: {aula}')
+        if ocupacao.bloqueio(nome) & bits:
+            problemas.append(f'período bloqueado: {aula}')
+        if intervalos.intersection(range(aula['periodo'], fim)):
+            problemas.append(f'atravessa intervalo: {aula}')
+        ocupacao.ocupar(nome, aula['dia_semana'], aula['periodo'], fim, uids)
+    return problemas
+
+
+def limpar(db, escola_ids):
+    from sqlalchemy import delete, select
+    from backend.models.school import School
+    from backend.models.user import User
+    from backend.models.instrutor import Instrutor
+    from backend.models.ciclo import Ciclo
+    from backend.models.semana import Semana
+    from backend.models.turma import Turma
+    from backend.models.disciplina import Disciplina
+    from backend.models.disciplina_turma import DisciplinaTurma
+    from backend.models.horario import Horario
+
+    ciclos = select(Ciclo.id).where(Ciclo.school_id.in_(escola_ids))
+    disciplinas = select(Disciplina.id).where(Disciplina.ciclo_id.in_(ciclos))
+    user_ids = db.session.scalars(select(Instrutor.user_id).where(Instrutor.school_id.in_(escola_ids))).all()
+    db.session.execute(delete(Horario).where(Horario.semana_id.in_(select(Semana.id).where(Semana.ciclo_id.in_(ciclos)))))
+    db.session.execute(delete(DisciplinaTurma).where(DisciplinaTurma.disciplina_id.in_(disciplinas)))
+    db.session.execute(delete(Disciplina).where(Disciplina.ciclo_id.in_(ciclos)))
+    db.session.execute(delete(Semana).where(Semana.ciclo_id.in_(ciclos)))
+    db.session.execute(delete(Ciclo).where(Ciclo.school_id.in_(escola_ids)))
+    db.session.execute(delete(Turma).where(Turma.school_id.in_(escola_ids)))
+    db.session.execute(delete(Instrutor).where(Instrutor.school_id.in_(escola_ids)))
+    if user_ids:
+        db.session.execute(delete(User).where(User.id.in_(set(user_ids))))
+    db.session.execute(delete(School).where(School.id.in_(escola_ids)))
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pelotoes', type=int, default=20)
+    parser.add_argument('--disciplinas', type=int, default=8, help='Disciplinas por pelotão.')
+    parser.add_argument('--instrutores', type=int, default=15, help='Instrutores compartilhados entre os pelotões.')
+    parser.add_argument('--semanas', type=int, default=10, help='Semanas do ciclo (definem a cota semanal).')
+    parser.add_argument('--bloqueados', type=float, default=0.3, help='Fração de pelotões com uma manhã bloqueada.')
+    parser.add_argument('--completar', action='store_true', help='Tenta encaixar toda a carga restante, não só a cota da semana.')
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--confirmar', action='store_true', help='Permite rodar em banco que não seja SQLite.')
+    args = parser.parse_args()
+
+    url = os.environ.get('DATABASE_URL')
+    if not url:
+        raise SystemExit("Defina DATABASE_URL (ex.: sqlite:////tmp/bench.db).")
+    if not url.startswith('sqlite') and not args.confirmar:
+        raise SystemExit("O benchmark grava e apaga dados: use --confirmar para rodar fora do SQLite (nunca em produção).")
+
+    from unittest import mock
+    from backend.app import create_app
+    from backend.models.database import db
+    from backend.services.gerador_horario_service import GeradorHorarioService
+    from backend.services.user_service import UserService
+
+    app = create_app(slim=True)
+    with app.app_context():
+        if url.startswith('sqlite'):
+            db.create_all()
+
+        tag = uuid.uuid4().hex[:6]
+        escola_id, vizinha_id, semana_id = gerar_escolas(db, args, tag)
+        tempos = []
+        try:
+            with mock.patch.object(UserService, 'get_current_school_id', return_value=escola_id):
+                for _ in range(args.repeticoes):
+                    db.session.expire_all()
+                    inicio = time.perf_counter()
+                    ok, msg, relatorio = GeradorHorarioService.gerar(semana_id, completar=args.completar)
+                    tempos.append(time.perf_counter() - inicio)
+                    if not ok:
+                        raise SystemExit(msg)
+                # Escola nova: intervalos na posição padrão da configuração (3, 6 e 9)
+                problemas = conferir(db, semana_id, relatorio, {3, 6, 9})
+        finally:
+            db.session.rollback()
+            limpar(db, [escola_id, vizinha_id])
+
+        piores = sorted(relatorio['pelotoes'], key=lambda p: p['preenchimento'])[:3]
+        print(f"\nBanco: {db.engine.url.get_backend_name()}")
+        print(f"Pelotões: {args.pelotoes}  disciplinas/pelotão: {args.disciplinas}  instrutores: {args.instrutores}"
+              f"  modo: {'completar' if args.completar else 'cota semanal'}")
+        print(f"Aulas propostas: {len(relatorio['aulas'])}  horas: {relatorio['alocado']}/{relatorio['demanda']}"
+              f"  preenchimento: {relatorio['preenchimento'] * 100:.1f}%")
+        print("Pelotões com menor preenchimento:", ", ".join(f"{p['pelotao']} {p['preenchimento'] * 100:.0f}%" for p in piores))
+        print(f"\n{'operação':<28}{'melhor (ms)':>12}{'média (ms)':>12}")
+        print(f"{'gerar (prévia)':<28}{min(tempos) * 1000:12.1f}{sum(tempos) / len(tempos) * 1000:12.1f}")
+        if problemas:
+            print(f"\nSOLUÇÃO INVÁLIDA ({len(problemas)} problemas):")
+            for p in problemas[:10]:
+                print("  " + p)
+            raise SystemExit(1)
+        print("\nSolução conferida: sem choques de pelotão, instrutor, bloqueio ou intervalo.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+"""
+Micro-benchmark das checagens de ocupação da grade semanal: consultas ao banco
+(como o save_aula faz: colisão do pelotão, conflito de instrutor entre escolas,
+bloqueios decodificando o JSON da semana) contra os bitsets do GradeOcupacaoService.
+
+Gera uma semana sintética (duas escolas com as mesmas datas, pelotões e instrutores
+compartilhados, grade ~70% ocupada), sorteia checagens e confere que as duas
+abordagens dão a mesma resposta antes de medir.
+
+Uso:
+    DATABASE_URL=sqlite:////tmp/bench.db python benchmark_grade_ocupacao.py
+    python benchmark_grade_ocupacao.py --pelotoes 20 --instrutores 40 --checagens 2000
+
+Grava e apaga dados: fora do SQLite exige --confirmar (nunca use o banco de produção).
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import date
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, RAIZ)
+
+
+def medir(funcao, casos):
+    inicio = time.perf_counter()
+    for caso in casos:
+        funcao(*caso)
+    return (time.perf_counter() - inicio) / max(len(casos), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pelotoes', type=int, default=12)
+    parser.add_argument('--instrutores', type=int, default=25)
+    parser.add_argument('--ocupacao', type=float, default=0.7, help='Fração da grade de cada pelotão preenchida.')
+    parser.add_argument('--checagens', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--confirmar', action='store_true', help='Permite rodar em banco que não seja SQLite.')
+    args = parser.parse_args()
+
+    url = os.environ.get('DATABASE_URL')
+    if not url:
+        raise SystemExit("Defina DATABASE_URL (ex.: sqlite:////tmp/bench.db).")
+    if not url.startswith('sqlite') and not args.confirmar:
+        raise SystemExit("O benchmark grava e apaga dados: use --confirmar para rodar fora do SQLite (nunca em produção).")
+
+    from sqlalchemy import select, insert, delete, or_
+    from backend.app import create_app
+    from backend.models.database import db
+    from backend.models.school import School
+    from backend.models.user import User
+    from backend.models.instrutor import Instrutor
+    from backend.models.ciclo import Ciclo
+    from backend.models.semana import Semana
+    from backend.models.turma import Turma
+    from backend.models.disciplina import Disciplina
+    from backend.models.horario import Horario
+    from backend.services.grade_ocupacao_service import GradeOcupacaoService, DIAS
+
+    rnd = random.Random(args.seed)
+    dias_uteis = DIAS[:5]
+    app = create_app(slim=True)
+    with app.app_context():
+        if url.startswith('sqlite'):
+            db.create_all()
+
+        tag = uuid.uuid4().hex[:6]
+        escolas = [School(nome=f'BENCHMARK GRADE {tag} {i}') for i in (1, 2)]
+        db.session.add_all(escolas)
+        db.session.flush()
+        usuarios = [User(matricula=f'bg{tag}{i}', role='instrutor') for i in range(args.instrutores)]
+        db.session.add_all(usuarios)
+        db.session.flush()
+        # Cada usuário é instrutor nas duas escolas (o conflito é pelo user_id)
+        instrutores = {e.id: [Instrutor(user_id=u.id, school_id=e.id) for u in usuarios] for e in escolas}
+        db.session.add_all([i for lista in instrutores.values() for i in lista])
+
+        inicio_semana = date(2031, 3, 3)
+        semanas, pelotoes, disciplinas = {}, {}, {}
+        for escola in escolas:
+            ciclo = Ciclo(nome=f'Bench {tag}', school_id=escola.id)
+            db.session.add(ciclo)
+            db.session.flush()
+            semana = Semana(nome='Semana 1', data_inicio=inicio_semana, data_fim=date(2031, 3, 7), ciclo_id=ciclo.id,
+                            mostrar_periodo_13=True)
+            db.session.add(semana)
+            turmas = [Turma(nome=f'BG{tag}-{escola.id}-{p}', ano='2031', school_id=escola.id) for p in range(args.pelotoes)]
+            db.session.add_all(turmas)
+            db.session.flush()
+            semanas[escola.id] = semana
+            pelotoes[escola.id] = [t.nome for t in turmas]
+            discs = [Disciplina(materia='MATÉRIA', carga_horaria_prevista=999, turma_id=t.id, ciclo_id=ciclo.id) for t in turmas]
+            db.session.add_all(discs)
+            db.session.flush()
+            disciplinas[escola.id] = {t.nome: d.id for t, d in zip(turmas, discs)}
+
+        # Preenche a grade sem colisão de pelotão nem de instrutor (user) no mesmo slot
+        ocupado_user = set()
+        aulas = []
+        for escola in escolas:
+            for pelotao in pelotoes[escola.id]:
+                for dia in dias_uteis:
+                    for periodo in range(1, 13):
+                        if rnd.random() > args.ocupacao:
+                            continue
+                        for _ in range(5):
+                            idx = rnd.randrange(args.instrutores)
+                            if (idx, dia, periodo) not in ocupado_user:
+                                ocupado_user.add((idx, dia, periodo))
+                                aulas.append({
+                                    'pelotao': pelotao, 'dia_semana': dia, 'periodo': periodo, 'duracao': 1,
+                                    'semana_id': semanas[escola.id].id, 'disciplina_id': disciplinas[escola.id][pelotao],
+                                    'instrutor_id': instrutores[escola.id][idx].id, 'status': 'confirmado',
+                                })
+                                break
+        db.session.execute(insert(Horario), aulas)
+
+        escola = escolas[0]
+        semana = semanas[escola.id]
+        bloqueios = {p: {d: [str(x) for x in rnd.sample(range(1, 13), 3)] for d in dias_uteis} for p in pelotoes[escola.id][::2]}
+        semana.blocked_blocks = json.dumps(bloqueios)
+        db.session.commit()
+
+        # --- Checagens por consulta (como o save_aula fazia) ---
+        semanas_sobrepostas = select(Semana.id).join(Ciclo).where(
+            Semana.data_inicio == semana.data_inicio, Semana.data_fim == semana.data_fim, Ciclo.school_id == escola.id
+        )
+        semanas_globais = select(Semana.id).where(
+            Semana.data_inicio == semana.data_inicio, Semana.data_fim == semana.data_fim
+        )
+
+        def pelotao_query(pelotao, dia, p_ini, p_fim):
+            return db.session.scalar(select(Horario.id).where(
+                Horario.pelotao == pelotao, Horario.semana_id.in_(semanas_sobrepostas), Horario.dia_semana == dia,
+                Horario.periodo <= p_fim, (Horario.periodo + Horario.duracao - 1) >= p_ini
+            ).limit(1)) is not None
+
+        def instrutor_query(instrutor_id, dia, p_ini, p_fim):
+            user_ids = select(Instrutor.user_id).where(Instrutor.id == instrutor_id)
+            todos = select(Instrutor.id).where(Instrutor.user_id.in_(user_ids))
+            return db.session.scalar(select(Horario.id).where(
+                Horario.semana_id.in_(semanas_globais), Horario.dia_semana == dia,
+                Horario.periodo <= p_fim, (Horario.periodo + Horario.duracao - 1) >= p_ini,
+                or_(Horario.instrutor_id.in_(todos), Horario.instrutor_id_2.in_(todos))
+            ).limit(1)) is not None
+
+        def bloqueio_json(pelotao, dia, p_ini, p_fim):
+            blocked = {str(k).strip().upper(): v for k, v in json.loads(db.session.get(Semana, semana.id).blocked_blocks).items()}
+            periodos = [str(x) for x in blocked.get(pelotao.strip().upper(), {}).get(dia, [])]
+            return any(str(p) in periodos for p in range(p_ini, p_fim + 1))
+
+        def slots_query(pelotao, instrutor_id, duracao):
+            livres = []
+            for dia in dias_uteis:
+                for p in range(1, 15 - duracao):  # semana com 13º período, sem 14º/15º
+                    p_fim = p + duracao - 1
+                    if not bloqueio_json(pelotao, dia, p, p_fim) and not pelotao_query(pelotao, dia, p, p_fim) \
+                            and not instrutor_query(instrutor_id, dia, p, p_fim):
+                        livres.append((dia, p))
+            return livres
+
+        # --- Checagens por bitset ---
+        user_por_instrutor = {i.id: i.user_id for i in instrutores[escola.id]}
+
+        def pelotao_bits(pelotao, dia, p_ini, p_fim):
+            return GradeOcupacaoService.get(semana, escola.id).conflito_pelotao(pelotao, dia, p_ini, p_fim) != 0
+
+        def instrutor_bits(instrutor_id, dia, p_ini, p_fim):
+            ocupacao = GradeOcupacaoService.get(semana, escola.id)
+            return ocupacao.conflito_instrutores([user_por_instrutor[instrutor_id]], dia, p_ini, p_fim) != 0
+
+        def bloqueio_bits(pelotao, dia, p_ini, p_fim):
+            return bool(GradeOcupacaoService.get(semana, escola.id).periodos_bloqueados(pelotao, dia, p_ini, p_fim))
+
+        def slots_bits(pelotao, instrutor_id, duracao):
+            ocupacao = GradeOcupacaoService.get(semana, escola.id)
+            return ocupacao.slots_livres(pelotao, duracao, [user_por_instrutor[instrutor_id]])
+
+        def save_aula_query(pelotao, instrutor_id, dia, p_ini, p_fim):
+            return (bloqueio_json(pelotao, dia, p_ini, p_fim) or pelotao_query(pelotao, dia, p_ini, p_fim)
+                    or instrutor_query(instrutor_id, dia, p_ini, p_fim))
+
+        def save_aula_bits(pelotao, instrutor_id, dia, p_ini, p_fim):
+            # Uma obtenção da ocupação (validação do cache) para as três checagens
+            ocupacao = GradeOcupacaoService.get(semana, escola.id)
+            return (bool(ocupacao.periodos_bloqueados(pelotao, dia, p_ini, p_fim))
+                    or ocupacao.conflito_pelotao(pelotao, dia, p_ini, p_fim) != 0
+                    or ocupacao.conflito_instrutores([user_por_instrutor[instrutor_id]], dia, p_ini, p_fim) != 0)
+
+        def bits_em_memoria(pelotao, dia, p_ini, p_fim):
+            # Só a operação de bits, com a ocupação já obtida (ex.: dentro do gerador de grade)
+            return ocupacao_fixa.conflito_pelotao(pelotao, dia, p_ini, p_fim) != 0
+
+        casos_slot = []
+        for _ in range(args.checagens):
+            duracao = rnd.choice((1, 1, 2, 2, 3))
+            p_ini = rnd.randint(1, 13 - duracao)
+            casos_slot.append((rnd.choice(pelotoes[escola.id]), rnd.choice(dias_uteis), p_ini, p_ini + duracao - 1))
+        casos_instrutor = [(rnd.choice(instrutores[escola.id]).id,) + c[1:] for c in casos_slot]
+        casos_save = [(c[0], i[0]) + c[1:] for c, i in zip(casos_slot, casos_instrutor)]
+        casos_busca = [(rnd.choice(pelotoes[escola.id]), rnd.choice(instrutores[escola.id]).id, rnd.choice((1, 2, 3)))
+                       for _ in range(max(args.checagens // 50, 5))]
+
+        try:
+            # Mesmas respostas nas duas abordagens
+            ocupacao_fixa = GradeOcupacaoService.get(semana, escola.id)
+            for caso in casos_slot:
+                assert pelotao_query(*caso) == pelotao_bits(*caso), caso
+                assert bloqueio_json(*caso) == bloqueio_bits(*caso), caso
+            for caso in casos_instrutor:
+                assert instrutor_query(*caso) == instrutor_bits(*caso), caso
+            for caso in casos_save:
+                assert save_aula_query(*caso) == save_aula_bits(*caso), caso
+            for caso in casos_busca:
+                assert slots_query(*caso) == slots_bits(*caso), caso
+
+            resultados = [
+                ('colisão do pelotão', medir(pelotao_query, casos_slot), medir(pelotao_bits, casos_slot)),
+                ('conflito de instrutor', medir(instrutor_query, casos_instrutor), medir(instrutor_bits, casos_instrutor)),
+                ('período bloqueado', medir(bloqueio_json, casos_slot), medir(bloqueio_bits, casos_slot)),
+                ('as três (save_aula)', medir(save_aula_query, casos_save), medir(save_aula_bits, casos_save)),
+                ('busca de slots livres', medir(slots_query, casos_busca), medir(slots_bits, casos_busca)),
+            ]
+            t_memoria = medir(bits_em_memoria, casos_slot)
+
+            GradeOcupacaoService.invalidar()
+            inicio = time.perf_counter()
+            GradeOcupacaoService.get(semana, escola.id)
+            t_construcao = time.perf_counter() - inicio
+        finally:
+            db.session.rollback()
+            semana_ids = [s.id for s in semanas.values()]
+            db.session.execute(delete(Horario).where(Horario.semana_id.in_(semana_ids)))
+            db.session.execute(delete(Semana).where(Semana.id.in_(semana_ids)))
+            db.session.execute(delete(Disciplina).where(Disciplina.id.in_([d for m in disciplinas.values() for d in m.values()])))
+            db.session.execute(delete(Turma).where(Turma.school_id.in_([e.id for e in escolas])))
+            db.session.execute(delete(Ciclo).where(Ciclo.school_id.in_([e.id for e in escolas])))
+            db.session.execute(delete(Instrutor).where(Instrutor.school_id.in_([e.id for e in escolas])))
+            db.session.execute(delete(User).where(User.id.in_([u.id for u in usuarios])))
+            db.session.execute(delete(School).where(School.id.in_([e.id for e in escolas])))
+            db.session.commit()
+
+        print(f"\nBanco: {db.engine.url.get_backend_name()} | {len(aulas)} aulas em 2 escolas, "
+              f"{args.pelotoes} pelotões/escola, {args.instrutores} instrutores (respostas conferidas)")
+        print(f"Montagem dos bitsets da semana (cache frio): {t_construcao * 1000:.1f} ms")
+        print(f"\n{'checagem':<24}{'consulta (µs)':>15}{'bitset (µs)':>14}{'ganho':>9}")
+        for nome, t_query, t_bits in resultados:
+            print(f"{nome:<24}{t_query * 1e6:15.1f}{t_bits * 1e6:14.1f}{t_query / t_bits:8.1f}x")
+        print(f"{'só a operação de bits':<24}{'':>15}{t_memoria * 1e6:14.2f}")
+        print("\nO bitset inclui a validação do cache (uma consulta de agregação por chamada).")
+
+
+if __name__ == '__main__':
+    main()
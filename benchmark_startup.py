@@ -0,0 +1,100 @@
+"""
+Benchmark de inicialização: tempo de import por módulo (python -X importtime) e
+tempo total de create_app(), no modo completo (web) e no enxuto (worker/CLI).
+
+Uso:
+    python benchmark_startup.py                # web e slim, 25 módulos mais lentos
+    python benchmark_startup.py --modo slim --top 40
+    python benchmark_startup.py --pacotes      # agrupa por pacote de primeiro nível
+
+Cada medição roda num processo Python novo (import "frio", como após um deploy
+ou uma reciclagem do gunicorn por --max-requests). Requer DATABASE_URL definida
+(não é feita nenhuma consulta ao banco).
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+
+SCRIPT = """
+import sys, time
+sys.path.insert(0, {raiz!r})
+inicio = time.perf_counter()
+from backend.app import create_app
+importado = time.perf_counter()
+create_app(slim={slim})
+fim = time.perf_counter()
+print(f"TEMPOS {{importado - inicio:.6f}} {{fim - importado:.6f}}")
+"""
+
+
+def medir(slim: bool):
+    """Executa create_app num processo novo com -X importtime. Retorna (linhas, t_import, t_create_app)."""
+    env = dict(os.environ)
+    env.pop('SISGEN_SLIM_APP', None)
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', SCRIPT.format(raiz=RAIZ, slim=slim)],
+        capture_output=True, text=True, env=env, cwd=RAIZ
+    )
+    tempos = [l for l in proc.stdout.splitlines() if l.startswith('TEMPOS ')]
+    if proc.returncode != 0 or not tempos:
+        sys.stderr.write(proc.stderr[-4000:])
+        raise SystemExit(f"create_app(slim={slim}) falhou (código {proc.returncode}).")
+
+    linhas = []
+    for linha in proc.stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package"
+        if not linha.startswith('import time:') or 'self [us]' in linha:
+            continue
+        try:
+            proprio, cumulativo, modulo = linha[len('import time:'):].split('|')
+            nivel = (len(modulo) - len(modulo.lstrip(' '))) // 2
+            linhas.append((modulo.strip(), int(proprio), int(cumulativo), nivel))
+        except ValueError:
+            continue
+    t_import, t_create = (float(v) for v in tempos[-1].split()[1:])
+    return linhas, t_import, t_create
+
+
+def relatorio(nome: str, linhas: list, t_import: float, t_create: float, top: int, pacotes: bool):
+    print(f"\n=== {nome} ===")
+    print(f"import backend.app: {t_import * 1000:8.1f} ms")
+    print(f"create_app():       {t_create * 1000:8.1f} ms")
+    print(f"módulos importados: {len(linhas)}")
+
+    if pacotes:
+        por_pacote = defaultdict(int)
+        for modulo, proprio, _, _ in linhas:
+            por_pacote[modulo.split('.')[0]] += proprio
+        print(f"\n{'tempo próprio (ms)':>20}  pacote")
+        for pacote, us in sorted(por_pacote.items(), key=lambda x: -x[1])[:top]:
+            print(f"{us / 1000:20.1f}  {pacote}")
+    else:
+        # Cumulativo de cada módulo no nível mais alto em que foi importado
+        print(f"\n{'cumulativo (ms)':>16} {'próprio (ms)':>13}  módulo")
+        for modulo, proprio, cumulativo, nivel in sorted(linhas, key=lambda x: -x[2])[:top]:
+            print(f"{cumulativo / 1000:16.1f} {proprio / 1000:13.1f}  {'  ' * min(nivel, 6)}{modulo}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modo', choices=('web', 'slim', 'ambos'), default='ambos')
+    parser.add_argument('--top', type=int, default=25)
+    parser.add_argument('--pacotes', action='store_true', help='Soma o tempo próprio por pacote de primeiro nível.')
+    args = parser.parse_args()
+
+    if not os.environ.get('DATABASE_URL'):
+        raise SystemExit("Defina DATABASE_URL (ex.: sqlite:////tmp/bench.db) para montar a aplicação.")
+
+    modos = ('web', 'slim') if args.modo == 'ambos' else (args.modo,)
+    for modo in modos:
+        linhas, t_import, t_create = medir(slim=(modo == 'slim'))
+        relatorio(f"create_app({'slim=True' if modo == 'slim' else ''})", linhas, t_import, t_create, args.top, args.pacotes)
+
+
+if __name__ == '__main__':
+    main()
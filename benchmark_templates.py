@@ -0,0 +1,149 @@
+"""
+Benchmark dos templates: compilação do base.html (e de uma página que o estende) num
+ambiente Jinja novo, como após a reciclagem de um worker do gunicorn, sem e com o
+cache de bytecode em disco; e renderização de uma página completa para usuários
+logados, com e sem o cache de fragmentos do menu lateral ({% cache %}).
+
+Uso:
+    DATABASE_URL=sqlite:////tmp/bench.db python benchmark_templates.py
+    python benchmark_templates.py --repeticoes 200 --pagina questionario/index.html
+
+Grava e apaga um usuário e uma escola de teste: em bancos que não sejam SQLite exige
+--confirmar (use uma cópia, nunca o banco de produção). Em SQLite as tabelas são
+criadas se não existirem.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, RAIZ)
+
+PAGINA = '{% extends "base.html" %}{% block content %}<p>benchmark</p>{% endblock %}'
+
+
+def medir_compilacao(app, templates, repeticoes, bytecode_cache=None):
+    """Tempo de get_template() dos templates num ambiente Jinja recém-criado (cache em memória vazio)."""
+    from backend.services.template_cache_service import FragmentCacheExtension
+
+    tempos = []
+    for _ in range(repeticoes):
+        env = app.create_jinja_environment()
+        env.add_extension(FragmentCacheExtension)
+        env.bytecode_cache = bytecode_cache
+        inicio = time.perf_counter()
+        for nome in templates:
+            env.get_template(nome)
+        tempos.append(time.perf_counter() - inicio)
+    return tempos
+
+
+def medir_renderizacao(app, user, escola_id, pagina, repeticoes, endpoints):
+    """Tempo de render_template() da página, alternando entre os endpoints (link ativo do menu)."""
+    from flask import render_template, render_template_string, session, url_for
+    from flask_login import login_user
+
+    with app.test_request_context():
+        urls = [url_for(endpoint) for endpoint in endpoints]
+
+    tempos = []
+    for i in range(repeticoes):
+        with app.test_request_context(urls[i % len(urls)]):
+            session['active_school_id'] = escola_id
+            login_user(user)
+            user.temp_active_school_id = escola_id
+            app.preprocess_request()
+            inicio = time.perf_counter()
+            if pagina:
+                render_template(pagina)
+            else:
+                render_template_string(PAGINA)
+            tempos.append(time.perf_counter() - inicio)
+    return tempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticoes', type=int, default=100)
+    parser.add_argument('--compilacoes', type=int, default=10, help='Ambientes Jinja novos na medição de compilação.')
+    parser.add_argument('--pagina', default=None, help='Template a renderizar (padrão: página mínima que estende base.html).')
+    parser.add_argument('--confirmar', action='store_true', help='Permite rodar em banco que não seja SQLite.')
+    args = parser.parse_args()
+
+    url = os.environ.get('DATABASE_URL')
+    if not url:
+        raise SystemExit("Defina DATABASE_URL (ex.: sqlite:////tmp/bench.db).")
+    if not url.startswith('sqlite') and not args.confirmar:
+        raise SystemExit("O benchmark grava e apaga dados: use --confirmar para rodar fora do SQLite (nunca em produção).")
+
+    from jinja2 import FileSystemBytecodeCache
+    from backend.app import create_app
+    from backend.models.database import db
+    from backend.models.school import School
+    from backend.models.user import User
+    from backend.models.user_school import UserSchool
+    from backend.services.template_cache_service import TemplateCacheService
+
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    templates = ['base.html'] + ([args.pagina] if args.pagina else [])
+
+    # --- Compilação (worker novo) ---
+    diretorio = tempfile.mkdtemp(prefix='bench-jinja-')
+    try:
+        frio = medir_compilacao(app, templates, args.compilacoes)
+        cache = FileSystemBytecodeCache(diretorio, '%s.cache')
+        medir_compilacao(app, templates, 1, cache)  # grava o bytecode
+        quente = medir_compilacao(app, templates, args.compilacoes, cache)
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    # --- Renderização (usuário logado, menu completo) ---
+    with app.app_context():
+        if url.startswith('sqlite'):
+            db.create_all()
+
+        tag = uuid.uuid4().hex[:6]
+        escola = School(nome=f'BENCHMARK TEMPLATES {tag}')
+        user = User(matricula=f'bt{tag}', role='admin_escola', nome_completo='Benchmark Templates',
+                    is_active=True, must_change_password=False)
+        db.session.add_all([escola, user])
+        db.session.flush()
+        db.session.add(UserSchool(user_id=user.id, school_id=escola.id, role='admin_escola'))
+        db.session.commit()
+        escola_id, user_id = escola.id, user.id
+
+        endpoints = ['main.dashboard', 'aluno.listar_alunos', 'horario.index', 'justica.index', 'relatorios.index']
+        try:
+            app.config['TEMPLATE_FRAGMENT_CACHE'] = False
+            sem_cache = medir_renderizacao(app, user, escola_id, args.pagina, args.repeticoes, endpoints)
+            app.config['TEMPLATE_FRAGMENT_CACHE'] = True
+            TemplateCacheService.invalidar()
+            medir_renderizacao(app, user, escola_id, args.pagina, len(endpoints), endpoints)  # aquece
+            com_cache = medir_renderizacao(app, user, escola_id, args.pagina, args.repeticoes, endpoints)
+        finally:
+            db.session.rollback()
+            db.session.query(UserSchool).filter_by(user_id=user_id).delete()
+            db.session.query(User).filter_by(id=user_id).delete()
+            db.session.query(School).filter_by(id=escola_id).delete()
+            db.session.commit()
+
+        print(f"\nBanco: {db.engine.url.get_backend_name()} | templates: {', '.join(templates)}")
+        print(f"\n{'operação':<44}{'melhor (ms)':>12}{'média (ms)':>12}")
+        linhas = [
+            ('compilação, worker novo (sem bytecode)', frio),
+            ('compilação, worker novo (bytecode em disco)', quente),
+            ('render, sem cache de fragmentos', sem_cache),
+            ('render, com cache de fragmentos', com_cache),
+        ]
+        for nome, tempos in linhas:
+            print(f"{nome:<44}{min(tempos) * 1000:12.2f}{sum(tempos) / len(tempos) * 1000:12.2f}")
+
+
+if __name__ == '__main__':
+    main()
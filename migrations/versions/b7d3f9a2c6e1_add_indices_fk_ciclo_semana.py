@@ -0,0 +1,53 @@
+"""add indices nas chaves estrangeiras usadas na exclusao de ciclos e semanas
+
+Revision ID: b7d3f9a2c6e1
+Revises: a6c2e8f4b1d9
+Create Date: 2026-10-19 17:20:13.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d3f9a2c6e1'
+down_revision = 'a6c2e8f4b1d9'
+branch_labels = None
+depends_on = None
+
+
+# (tabela, coluna): sem índice, cada DELETE no pai faz uma varredura completa do filho
+INDICES = [
+    ('horarios', 'semana_id'),
+    ('horarios', 'disciplina_id'),
+    ('semanas', 'ciclo_id'),
+    ('disciplinas', 'ciclo_id'),
+    ('disciplina_turmas', 'disciplina_id'),
+    ('historico_disciplinas', 'disciplina_id'),
+    ('diarios_classe', 'disciplina_id'),
+    ('frequencias_alunos', 'diario_id'),
+]
+
+
+def _indexada(inspector, tabela, coluna):
+    # criar_indices_otimizados.py pode já ter criado um idx_fk_* equivalente no banco de produção
+    return any(ix['column_names'][:1] == [coluna] for ix in inspector.get_indexes(tabela))
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for tabela, coluna in INDICES:
+        if _indexada(inspector, tabela, coluna):
+            continue
+        with op.batch_alter_table(tabela, schema=None) as batch_op:
+            batch_op.create_index(batch_op.f(f'ix_{tabela}_{coluna}'), [coluna], unique=False)
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    for tabela, coluna in reversed(INDICES):
+        nome = f'ix_{tabela}_{coluna}'
+        if not any(ix['name'] == nome for ix in inspector.get_indexes(tabela)):
+            continue
+        with op.batch_alter_table(tabela, schema=None) as batch_op:
+            batch_op.drop_index(batch_op.f(nome))
@@ -0,0 +1,45 @@
+"""add indice de similaridade do banco de questoes
+
+Revision ID: c1a7d3e9f2b4
+Revises: b04a281525f8
+Create Date: 2026-10-19 09:12:31.418204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c1a7d3e9f2b4'
+down_revision = 'b04a281525f8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('questoes_banco', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('assinatura_minhash', sa.JSON(), nullable=True))
+
+    op.create_table('questoes_banco_bandas',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('questao_id', sa.Integer(), nullable=False),
+    sa.Column('disciplina_id', sa.Integer(), nullable=False),
+    sa.Column('banda', sa.SmallInteger(), nullable=False),
+    sa.Column('hash', sa.BigInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['questao_id'], ['questoes_banco.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('questoes_banco_bandas', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_questoes_banco_bandas_questao_id'), ['questao_id'], unique=False)
+        batch_op.create_index('ix_questoes_banco_bandas_busca', ['disciplina_id', 'hash', 'banda'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('questoes_banco_bandas', schema=None) as batch_op:
+        batch_op.drop_index('ix_questoes_banco_bandas_busca')
+        batch_op.drop_index(batch_op.f('ix_questoes_banco_bandas_questao_id'))
+
+    op.drop_table('questoes_banco_bandas')
+
+    with op.batch_alter_table('questoes_banco', schema=None) as batch_op:
+        batch_op.drop_column('assinatura_minhash')
@@ -0,0 +1,54 @@
+"""add resumo materializado dos resultados de questionarios
+
+Revision ID: c8e4a0b6d2f7
+Revises: b7d3f9a2c6e1
+Create Date: 2026-10-19 18:41:07.215934
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8e4a0b6d2f7'
+down_revision = 'b7d3f9a2c6e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('respostas', schema=None) as batch_op:
+        batch_op.create_index('ix_respostas_questionario_opcao', ['questionario_id', 'pergunta_id', 'opcao_resposta_id'], unique=False)
+
+    op.create_table('resultados_questionario',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('questionario_id', sa.Integer(), nullable=False),
+    sa.Column('pergunta_id', sa.Integer(), nullable=False),
+    sa.Column('opcao_resposta_id', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False, server_default='0'),
+    sa.ForeignKeyConstraint(['questionario_id'], ['questionarios.id'], ),
+    sa.ForeignKeyConstraint(['pergunta_id'], ['perguntas.id'], ),
+    sa.ForeignKeyConstraint(['opcao_resposta_id'], ['opcoes_respostas.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('pergunta_id', 'opcao_resposta_id', name='uq_resultados_questionario_opcao')
+    )
+    with op.batch_alter_table('resultados_questionario', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_resultados_questionario_questionario_id'), ['questionario_id'], unique=False)
+
+    # Resumo inicial a partir das respostas já gravadas (um único GROUP BY)
+    op.execute(
+        "INSERT INTO resultados_questionario (questionario_id, pergunta_id, opcao_resposta_id, total) "
+        "SELECT questionario_id, pergunta_id, opcao_resposta_id, COUNT(id) FROM respostas "
+        "WHERE opcao_resposta_id IS NOT NULL "
+        "GROUP BY questionario_id, pergunta_id, opcao_resposta_id"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('resultados_questionario', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_resultados_questionario_questionario_id'))
+
+    op.drop_table('resultados_questionario')
+
+    with op.batch_alter_table('respostas', schema=None) as batch_op:
+        batch_op.drop_index('ix_respostas_questionario_opcao')
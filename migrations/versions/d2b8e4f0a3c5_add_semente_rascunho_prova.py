@@ -0,0 +1,28 @@
+"""add semente e parametros ao rascunho de prova
+
+Revision ID: d2b8e4f0a3c5
+Revises: c1a7d3e9f2b4
+Create Date: 2026-10-19 10:41:07.553190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2b8e4f0a3c5'
+down_revision = 'c1a7d3e9f2b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('rascunhos_prova', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('semente', sa.BigInteger(), nullable=True))
+        batch_op.add_column(sa.Column('parametros', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('rascunhos_prova', schema=None) as batch_op:
+        batch_op.drop_column('parametros')
+        batch_op.drop_column('semente')
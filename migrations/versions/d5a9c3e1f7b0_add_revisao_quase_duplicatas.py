@@ -0,0 +1,30 @@
+"""add revisao de quase-duplicatas do banco de questoes
+
+Revision ID: d5a9c3e1f7b0
+Revises: c8e4a0b6d2f7
+Create Date: 2026-10-19 21:04:52.631877
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5a9c3e1f7b0'
+down_revision = 'c8e4a0b6d2f7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('questoes_banco', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('em_revisao', sa.Boolean(), server_default=sa.false(), nullable=False))
+        batch_op.add_column(sa.Column('similar_a_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_questoes_banco_similar_a_id', 'questoes_banco', ['similar_a_id'], ['id'], ondelete='SET NULL')
+
+
+def downgrade():
+    with op.batch_alter_table('questoes_banco', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_questoes_banco_similar_a_id', type_='foreignkey')
+        batch_op.drop_column('similar_a_id')
+        batch_op.drop_column('em_revisao')
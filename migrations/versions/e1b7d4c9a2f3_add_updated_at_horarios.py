@@ -0,0 +1,26 @@
+"""add updated_at em horarios
+
+Revision ID: e1b7d4c9a2f3
+Revises: d5a9c3e1f7b0
+Create Date: 2026-10-19 21:42:17.305114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1b7d4c9a2f3'
+down_revision = 'd5a9c3e1f7b0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('horarios', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('horarios', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,28 @@
+"""add derivados responsivos aos image assets
+
+Revision ID: e3c9f5a1b4d6
+Revises: d2b8e4f0a3c5
+Create Date: 2026-10-19 13:05:48.902117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3c9f5a1b4d6'
+down_revision = 'd2b8e4f0a3c5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('image_assets', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('variants', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('processing_status', sa.String(length=20), nullable=False, server_default='pending'))
+
+
+def downgrade():
+    with op.batch_alter_table('image_assets', schema=None) as batch_op:
+        batch_op.drop_column('processing_status')
+        batch_op.drop_column('variants')
@@ -1,31 +1,147 @@
-// ATUALIZADO: v7.3 - Força atualização da lógica de nome de escola
-const CACHE_NAME = 'esfas-app-v7.4';
+// ATUALIZADO: v8.1 - Páginas autenticadas nunca vão para o cache; offline usa só o JSON da semana
+const VERSAO = 'esfas-app-v8.1';
+const CACHE_SHELL = `${VERSAO}-shell`;
+const CACHE_HORARIO = `${VERSAO}-horario`;
 
+// App shell: pré-carregado na instalação (a página offline não depende de nada externo)
 const urlsToCache = [
-  '/',
+  '/offline.html',
   '/static/css/style.css',
   '/static/manifest.json',
   '/static/img/brasaoappcel.png',
   '/static/img/brasao.png',
-  '/offline.html'
+  '/static/img/app-icon.png'
 ];
 
+// Horário da semana atual (JSON): servido do cache na hora e revalidado em segundo plano.
+// É a única resposta autenticada guardada; a página offline monta a semana a partir dele.
+const MINHA_SEMANA = '/horario/api/minha-semana';
+
+// Quadro e painel do instrutor: sempre da rede (o HTML traz o token CSRF e os dados
+// do usuário logado); ao abri-los, o JSON da semana é atualizado para uso offline
+const PAGINAS_HORARIO = ['/horario/', '/horario/dashboard-instrutor'];
+
+// Troca de usuário: o horário em cache é de quem estava logado
+const ROTAS_SESSAO = ['/login', '/logout'];
+
 self.addEventListener('install', event => {
   event.waitUntil(
-    caches.open(CACHE_NAME)
+    caches.open(CACHE_SHELL)
       .then(cache => {
-        return cache.addAll(urlsToCache);
+        return cache.addAll(urlsToCache.map(url => new Request(url, { cache: 'reload' })));
       })
   );
 });
 
+function podeGuardar(response) {
+  return response && response.ok && !response.redirected && response.type === 'basic';
+}
+
+function limparHorario() {
+  return caches.delete(CACHE_HORARIO);
+}
+
+// Guarda a resposta do JSON da semana; redirecionamento (sessão expirada, outro perfil) descarta o guardado
+async function guardarSemana(response) {
+  const cache = await caches.open(CACHE_HORARIO);
+  if (podeGuardar(response)) {
+    await cache.put(MINHA_SEMANA, response.clone());
+  } else if (response.redirected || response.status === 401 || response.status === 403) {
+    await cache.delete(MINHA_SEMANA);
+  }
+  return response;
+}
+
+async function semanaStaleWhileRevalidate(event) {
+  const cache = await caches.open(CACHE_HORARIO);
+  const emCache = await cache.match(MINHA_SEMANA);
+  const rede = fetch(event.request).then(guardarSemana);
+
+  if (emCache) {
+    event.waitUntil(rede.catch(() => {}));
+    return emCache;
+  }
+  return rede;
+}
+
+async function paginaHorario(event) {
+  try {
+    const response = await fetch(event.request);
+    if (response.redirected) {
+      // Sessão expirada: o horário guardado era de uma sessão que não vale mais
+      event.waitUntil(limparHorario());
+    } else if (response.ok) {
+      event.waitUntil(
+        fetch(MINHA_SEMANA, { credentials: 'same-origin' }).then(guardarSemana).catch(() => {})
+      );
+    }
+    return response;
+  } catch (erro) {
+    return caches.match('/offline.html');
+  }
+}
+
+async function staleWhileRevalidateEstatico(event) {
+  const cache = await caches.open(CACHE_SHELL);
+  const emCache = await cache.match(event.request);
+  const rede = fetch(event.request).then(async response => {
+    if (podeGuardar(response)) {
+      await cache.put(event.request, response.clone());
+    }
+    return response;
+  });
+  if (emCache) {
+    event.waitUntil(rede.catch(() => {}));
+    return emCache;
+  }
+  return rede;
+}
+
 self.addEventListener('fetch', event => {
-  event.respondWith(
-    fetch(event.request)
-      .catch(() => {
-        return caches.match(event.request);
-      })
-  );
+  const request = event.request;
+  const url = new URL(request.url);
+
+  // CDNs e afins ficam com o cache HTTP do navegador (a CSP do worker não os libera)
+  if (url.origin !== self.location.origin) {
+    return;
+  }
+
+  if (request.method !== 'GET') {
+    // Aprovação, agendamento ou edição de aula: o horário em cache deixa de valer
+    if (url.pathname.startsWith('/horario/')) {
+      event.respondWith(fetch(request).then(async response => {
+        await limparHorario();
+        return response;
+      }));
+    }
+    return;
+  }
+
+  if (ROTAS_SESSAO.includes(url.pathname)) {
+    event.waitUntil(limparHorario());
+    return;
+  }
+
+  if (url.pathname === MINHA_SEMANA && !url.search) {
+    event.respondWith(semanaStaleWhileRevalidate(event));
+    return;
+  }
+
+  if (PAGINAS_HORARIO.includes(url.pathname) && request.mode === 'navigate') {
+    event.respondWith(paginaHorario(event));
+    return;
+  }
+
+  if (url.pathname.startsWith('/static/') && !url.pathname.startsWith('/static/uploads/')) {
+    event.respondWith(staleWhileRevalidateEstatico(event));
+    return;
+  }
+
+  if (request.mode === 'navigate') {
+    event.respondWith(
+      fetch(request).catch(() => caches.match('/offline.html'))
+    );
+  }
 });
 
 self.addEventListener('message', (event) => {
@@ -35,7 +151,7 @@ self.addEventListener('message', (event) => {
 });
 
 self.addEventListener('activate', event => {
-  const cacheWhitelist = [CACHE_NAME];
+  const cacheWhitelist = [CACHE_SHELL, CACHE_HORARIO];
   event.waitUntil(
     caches.keys().then(cacheNames => {
       return Promise.all(
@@ -49,4 +165,4 @@ self.addEventListener('activate', event => {
       return self.clients.claim();
     })
   );
-});
\ No newline at end of file
+});
@@ -105,14 +105,14 @@ def generate_unique_filename(filename):
     unique_id = str(uuid.uuid4())
     return f"{unique_id}.{ext}"
 
-def get_file_hash(file_path):
-    """Gera hash MD5 do arquivo para verificar duplicatas"""
-    hash_md5 = hashlib.md5()
+def get_file_hash(file_path, algorithm="sha256"):
+    """Gera o hash do arquivo (SHA-256 por padrão) para verificar duplicatas"""
+    file_hash = hashlib.new(algorithm)
     try:
         with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+            for chunk in iter(lambda: f.read(65536), b""):
+                file_hash.update(chunk)
+        return file_hash.hexdigest()
     except FileNotFoundError:
         return None
 
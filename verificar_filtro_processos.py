@@ -0,0 +1,289 @@
+"""
+Verificação da filtragem de processos disciplinares em SQL (JusticaService._filtrar_processos
+/ query_processos / contar_por_aba) contra a implementação anterior: o filtro por escola
+feito em Python em get_processos_para_usuario e as duas consultas montadas à mão no
+justica_controller.index (equipe e aluno).
+
+Gera duas escolas com duas edições cada, turmas com e sem edição, alunos sem turma e
+processos aleatórios em todos os status, e compara para cada combinação de escola,
+edição, pesquisa (nome, fato, matrícula, número) e conta de aluno:
+- o mesmo conjunto de processos, na mesma ordem da chave de ordenação (entre datas
+  iguais a ordem nova desempata por id, a antiga era indefinida);
+- os totais do GROUP BY de contar_por_aba;
+- a paginação do banco de get_processos_para_usuario.
+
+Uso:
+    DATABASE_URL=sqlite:////tmp/bench.db python verificar_filtro_processos.py
+    python verificar_filtro_processos.py --processos 2000 --seed 7
+
+Grava e apaga dados de teste: em bancos que não sejam SQLite exige --confirmar (use uma
+cópia, nunca o banco de produção). Em SQLite as tabelas são criadas se não existirem.
+Sai com código 1 se alguma comparação divergir.
+"""
+
+import argparse
+import os
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, RAIZ)
+
+BUSCAS = ('', 'joao', 'uniforme', 'm1', '17')
+BUSCAS_ALUNO = ('', 'atraso', '5')
+
+
+# --- Implementação anterior (referência) -------------------------------------
+
+def legado_processos_para_usuario(db, modelos, user, school_id_override=None):
+    """get_processos_para_usuario antes da mudança: carrega tudo e filtra a escola em Python."""
+    from sqlalchemy import select
+    from sqlalchemy.orm import joinedload
+
+    ProcessoDisciplina, Aluno, Turma, User = modelos
+    query = select(ProcessoDisciplina).join(ProcessoDisciplina.aluno).outerjoin(Aluno.turma)
+    if getattr(user, 'role', '') == 'aluno':
+        if not getattr(user, 'aluno_profile', None):
+            return []
+        query = query.where(ProcessoDisciplina.aluno_id == user.aluno_profile.id)
+    query = query.options(joinedload(ProcessoDisciplina.aluno).joinedload(Aluno.user), joinedload(ProcessoDisciplina.regra))
+    todos = db.session.scalars(query.order_by(ProcessoDisciplina.data_ocorrencia.desc())).all()
+    if school_id_override:
+        return [p for p in todos if (p.aluno.turma and p.aluno.turma.school_id == school_id_override) or not p.aluno.turma]
+    return todos
+
+
+def legado_controller_equipe(db, modelos, school_id, edicao_id, busca):
+    """Consultas do justica_controller.index para a equipe: (em andamento, finalizados)."""
+    from sqlalchemy import select, or_
+
+    ProcessoDisciplina, Aluno, Turma, User = modelos
+    edicao_filter = or_(Turma.edicao_id == edicao_id, Turma.edicao_id.is_(None)) if edicao_id else True
+    andamento = select(ProcessoDisciplina).join(Aluno).join(Turma).where(
+        Turma.school_id == school_id, edicao_filter,
+        ProcessoDisciplina.status != 'FINALIZADO', ProcessoDisciplina.status != 'ARQUIVADO'
+    ).order_by(ProcessoDisciplina.data_ocorrencia.desc())
+    finalizados = (
+        select(ProcessoDisciplina)
+        .join(Aluno, ProcessoDisciplina.aluno_id == Aluno.id)
+        .join(User, Aluno.user_id == User.id)
+        .join(Turma, Aluno.turma_id == Turma.id)
+        .where(Turma.school_id == school_id, edicao_filter,
+               or_(ProcessoDisciplina.status == 'FINALIZADO', ProcessoDisciplina.status == 'ARQUIVADO'))
+    )
+    if busca:
+        filtro = or_(User.nome_completo.ilike(f'%{busca}%'), ProcessoDisciplina.fato_constatado.ilike(f'%{busca}%'),
+                     User.matricula.ilike(f'%{busca}%'))
+        if busca.isdigit():
+            filtro = or_(filtro, ProcessoDisciplina.id == int(busca))
+        finalizados = finalizados.where(filtro)
+    finalizados = finalizados.order_by(ProcessoDisciplina.data_decisao.desc())
+    return db.session.scalars(andamento).all(), db.session.scalars(finalizados).all()
+
+
+def legado_controller_aluno(db, modelos, aluno_id, busca):
+    """Consultas do justica_controller.index para o aluno: (em andamento, finalizados)."""
+    from sqlalchemy import select, or_
+
+    ProcessoDisciplina = modelos[0]
+    andamento = select(ProcessoDisciplina).where(
+        ProcessoDisciplina.aluno_id == aluno_id,
+        ProcessoDisciplina.status != 'FINALIZADO', ProcessoDisciplina.status != 'ARQUIVADO'
+    ).order_by(ProcessoDisciplina.data_ocorrencia.desc())
+    finalizados = select(ProcessoDisciplina).where(
+        ProcessoDisciplina.aluno_id == aluno_id,
+        or_(ProcessoDisciplina.status == 'FINALIZADO', ProcessoDisciplina.status == 'ARQUIVADO')
+    )
+    if busca:
+        filtro = ProcessoDisciplina.fato_constatado.ilike(f'%{busca}%')
+        if busca.isdigit():
+            filtro = or_(filtro, ProcessoDisciplina.id == int(busca))
+        finalizados = finalizados.where(filtro)
+    finalizados = finalizados.order_by(ProcessoDisciplina.data_decisao.desc())
+    return db.session.scalars(andamento).all(), db.session.scalars(finalizados).all()
+
+
+# --- Comparação --------------------------------------------------------------
+
+def equivalentes(antigo, novo, chave, ids_teste=None) -> bool:
+    """Mesmos processos e mesma sequência da chave de ordenação (empates podem trocar de lugar)."""
+    if ids_teste is not None:
+        antigo = [p for p in antigo if p.id in ids_teste]
+        novo = [p for p in novo if p.id in ids_teste]
+    return ({p.id for p in antigo} == {p.id for p in novo}
+            and [getattr(p, chave) for p in antigo] == [getattr(p, chave) for p in novo])
+
+
+def gerar_dados(db, args, tag):
+    from backend.models.school import School
+    from backend.models.edicao import Edicao
+    from backend.models.turma import Turma
+    from backend.models.user import User
+    from backend.models.aluno import Aluno
+    from backend.models.processo_disciplina import ProcessoDisciplina, StatusProcesso
+
+    rnd = random.Random(args.seed)
+    escolas = [School(nome=f'VERIFICAÇÃO JUSTIÇA {tag} {k}') for k in range(2)]
+    relator = User(matricula=f'vr{tag}', role='admin_escola', nome_completo='Relator da Verificação')
+    db.session.add_all(escolas + [relator])
+    db.session.flush()
+
+    edicoes = {e.id: [Edicao(nome=f'Edição {k}', school_id=e.id) for k in range(2)] for e in escolas}
+    db.session.add_all([ed for lista in edicoes.values() for ed in lista])
+    db.session.flush()
+
+    turmas = []
+    for escola in escolas:
+        for k in range(3):
+            edicao = None if k == 0 else edicoes[escola.id][k - 1]
+            turmas.append(Turma(nome=f'V{tag}{escola.id}{k}', ano=2026, school_id=escola.id,
+                                edicao_id=edicao.id if edicao else None))
+    db.session.add_all(turmas)
+    db.session.flush()
+
+    alunos = []
+    for k in range(args.alunos):
+        user = User(matricula=f'm{k}{tag}', role='aluno', nome_completo=f"ALUNO {'JOAO' if k % 3 else 'MARIA'} {k}")
+        db.session.add(user)
+        db.session.flush()
+        # Um em cada sete alunos fica sem turma
+        aluno = Aluno(user_id=user.id, opm='VERIFICACAO', turma_id=None if k % 7 == 0 else rnd.choice(turmas).id)
+        db.session.add(aluno)
+        alunos.append((user, aluno))
+    db.session.flush()
+
+    status = [s.value for s in StatusProcesso]
+    base = datetime(2026, 1, 1)
+    for _ in range(args.processos):
+        _, aluno = rnd.choice(alunos)
+        db.session.add(ProcessoDisciplina(
+            aluno_id=aluno.id, relator_id=relator.id, status=rnd.choice(status),
+            fato_constatado=rnd.choice(['atraso', 'uniforme sujo', 'falta ao serviço']),
+            data_ocorrencia=base + timedelta(hours=rnd.randint(0, 5000)),
+            data_decisao=base + timedelta(hours=rnd.randint(0, 5000)),
+        ))
+    db.session.commit()
+    return escolas, edicoes, relator, alunos
+
+
+def limpar(db, escolas, relator, alunos):
+    from sqlalchemy import delete
+    from backend.models.edicao import Edicao
+    from backend.models.turma import Turma
+    from backend.models.user import User
+    from backend.models.aluno import Aluno
+    from backend.models.processo_disciplina import ProcessoDisciplina
+
+    escola_ids = [e.id for e in escolas]
+    aluno_ids = [a.id for _, a in alunos]
+    user_ids = [u.id for u, _ in alunos] + [relator.id]
+    db.session.execute(delete(ProcessoDisciplina).where(ProcessoDisciplina.aluno_id.in_(aluno_ids)))
+    db.session.execute(delete(Aluno).where(Aluno.id.in_(aluno_ids)))
+    db.session.execute(delete(User).where(User.id.in_(user_ids)))
+    db.session.execute(delete(Turma).where(Turma.school_id.in_(escola_ids)))
+    db.session.execute(delete(Edicao).where(Edicao.school_id.in_(escola_ids)))
+    for escola in escolas:
+        db.session.delete(escola)
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processos', type=int, default=400)
+    parser.add_argument('--alunos', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--confirmar', action='store_true', help='Permite rodar em banco que não seja SQLite.')
+    args = parser.parse_args()
+
+    url = os.environ.get('DATABASE_URL')
+    if not url:
+        raise SystemExit("Defina DATABASE_URL (ex.: sqlite:////tmp/bench.db).")
+    if not url.startswith('sqlite') and not args.confirmar:
+        raise SystemExit("A verificação grava e apaga dados: use --confirmar para rodar fora do SQLite (nunca em produção).")
+
+    from backend.app import create_app
+    from backend.models.database import db
+    from backend.models.aluno import Aluno
+    from backend.models.turma import Turma
+    from backend.models.user import User
+    from backend.models.processo_disciplina import ProcessoDisciplina
+    from backend.services.justica_service import JusticaService
+
+    modelos = (ProcessoDisciplina, Aluno, Turma, User)
+
+    app = create_app(slim=True)
+    with app.app_context():
+        if url.startswith('sqlite'):
+            db.create_all()
+
+        escolas, edicoes, relator, alunos = gerar_dados(db, args, uuid.uuid4().hex[:6])
+        ids_teste = set(db.session.scalars(
+            db.select(ProcessoDisciplina.id).where(ProcessoDisciplina.relator_id == relator.id)
+        ).all())
+        divergencias = []
+        comparacoes = 0
+
+        def conferir(ok, descricao):
+            nonlocal comparacoes
+            comparacoes += 1
+            if not ok:
+                divergencias.append(descricao)
+
+        try:
+            # get_processos_para_usuario: filtro por escola em Python x SQL (inclui alunos sem turma)
+            for override in (None,) + tuple(e.id for e in escolas):
+                antigo = legado_processos_para_usuario(db, modelos, relator, override)
+                novo = JusticaService.get_processos_para_usuario(relator, override)
+                conferir(equivalentes(antigo, novo, 'data_ocorrencia', ids_teste), f"lista da equipe, escola={override}")
+                pagina = JusticaService.get_processos_para_usuario(relator, override, page=2, per_page=50)
+                conferir([p.id for p in pagina.items] == [p.id for p in novo[50:100]] and pagina.total == len(novo),
+                         f"paginação da equipe, escola={override}")
+            for user, aluno in alunos[:10]:
+                for escola in escolas:
+                    antigo = legado_processos_para_usuario(db, modelos, user, escola.id)
+                    novo = JusticaService.get_processos_para_usuario(user, escola.id)
+                    conferir(equivalentes(antigo, novo, 'data_ocorrencia'), f"lista do aluno {user.matricula}, escola={escola.id}")
+
+            # justica_controller.index: abas, pesquisa e totais do GROUP BY
+            for escola in escolas:
+                for edicao_id in (None,) + tuple(ed.id for ed in edicoes[escola.id]):
+                    filtros = {'school_id': escola.id, 'edicao_id': edicao_id}
+                    contagens = JusticaService.contar_por_aba(relator, **filtros)
+                    for busca in BUSCAS:
+                        andamento, finalizados = legado_controller_equipe(db, modelos, escola.id, edicao_id, busca)
+                        novo_andamento = db.session.scalars(JusticaService.query_processos(relator, aba='andamento', **filtros)).all()
+                        novo_finalizados = db.session.scalars(
+                            JusticaService.query_processos(relator, aba='finalizados', busca=busca, **filtros)
+                        ).all()
+                        descricao = f"equipe, escola={escola.id}, edição={edicao_id}, busca={busca!r}"
+                        conferir(equivalentes(andamento, novo_andamento, 'data_ocorrencia'), f"{descricao}: em andamento")
+                        conferir(equivalentes(finalizados, novo_finalizados, 'data_decisao'), f"{descricao}: finalizados")
+                        conferir(contagens['andamento'] == len(andamento), f"{descricao}: total em andamento")
+                        if not busca:
+                            conferir(contagens['finalizados'] == len(finalizados), f"{descricao}: total finalizados")
+
+            for user, aluno in alunos[:10]:
+                contagens = JusticaService.contar_por_aba(user)
+                for busca in BUSCAS_ALUNO:
+                    andamento, finalizados = legado_controller_aluno(db, modelos, aluno.id, busca)
+                    novo_andamento = db.session.scalars(JusticaService.query_processos(user, aba='andamento')).all()
+                    novo_finalizados = db.session.scalars(JusticaService.query_processos(user, aba='finalizados', busca=busca)).all()
+                    descricao = f"aluno {user.matricula}, busca={busca!r}"
+                    conferir(equivalentes(andamento, novo_andamento, 'data_ocorrencia'), f"{descricao}: em andamento")
+                    conferir(equivalentes(finalizados, novo_finalizados, 'data_decisao'), f"{descricao}: finalizados")
+                    conferir(contagens['andamento'] == len(andamento), f"{descricao}: total em andamento")
+        finally:
+            db.session.rollback()
+            limpar(db, escolas, relator, alunos)
+
+        print(f"\nBanco: {db.engine.url.get_backend_name()} | {len(ids_teste)} processo(s), {len(alunos)} aluno(s)")
+        print(f"{comparacoes - len(divergencias)} de {comparacoes} comparação(ões) iguais.")
+        for descricao in divergencias:
+            print(f"  DIVERGE: {descricao}")
+        sys.exit(1 if divergencias else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Verificação da mala direta: monta pequenos .docx em memória, compila cada um com
+mail_merge_service.compile_template e confere o documento gerado (XML válido, textos
+esperados por parágrafo). Cobre placeholders quebrados em vários runs, cabeçalho,
+valores com quebra de linha e caracteres especiais, e documentos com chaves sem par,
+que não podem casar atravessando parágrafos nem corromper o documento.
+
+Uso:
+    python verificar_mala_direta.py
+
+Não acessa o banco. Sai com código 1 se algum caso falhar.
+"""
+
+import os
+import sys
+import zipfile
+from io import BytesIO
+
+from lxml import etree
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, RAIZ)
+
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+
+
+def run(texto: str) -> str:
+    return f'<w:r><w:t xml:space="preserve">{texto}</w:t></w:r>'
+
+
+def paragrafo(*runs: str) -> str:
+    return '<w:p>' + ''.join(run(r) for r in runs) + '</w:p>'
+
+
+def parte(*paragrafos: str, raiz: str = 'document') -> str:
+    corpo = ''.join(paragrafos)
+    if raiz == 'document':
+        corpo = f'<w:body>{corpo}</w:body>'
+    return f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><w:{raiz} xmlns:w="{W_NS}">{corpo}</w:{raiz}>'
+
+
+def montar_docx(documento: str, cabecalho: str = None) -> BytesIO:
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zf:
+        zf.writestr('[Content_Types].xml', CONTENT_TYPES)
+        zf.writestr('word/document.xml', documento)
+        if cabecalho:
+            zf.writestr('word/header1.xml', cabecalho)
+    buffer.seek(0)
+    return buffer
+
+
+def textos(docx: bytes, nome_parte: str = 'word/document.xml') -> list:
+    """Texto de cada parágrafo da parte (<w:br/> vira '\\n'); levanta erro se o XML for inválido."""
+    with zipfile.ZipFile(BytesIO(docx)) as zf:
+        root = etree.fromstring(zf.read(nome_parte))
+    resultado = []
+    for p in root.iter(f'{{{W_NS}}}p'):
+        partes = []
+        for el in p.iter(f'{{{W_NS}}}t', f'{{{W_NS}}}br'):
+            partes.append('\n' if el.tag.endswith('}br') else (el.text or ''))
+        resultado.append(''.join(partes))
+    return resultado
+
+
+CASOS = [
+    (
+        'placeholder quebrado em vários runs',
+        parte(paragrafo('Sr. {', '{no', 'me}', '} da turma {{turma}}')),
+        None,
+        {'nome': 'SILVA', 'turma': 'P1'},
+        {'word/document.xml': ['Sr. SILVA da turma P1']},
+    ),
+    (
+        'campo no cabeçalho e campo sem coluna',
+        parte(paragrafo('{{nome}} / {{inexistente}}')),
+        parte(paragrafo('Escola {{escola}}'), raiz='hdr'),
+        {'nome': 'SILVA', 'escola': 'ESFAS'},
+        {'word/document.xml': ['SILVA / {{inexistente}}'], 'word/header1.xml': ['Escola ESFAS']},
+    ),
+    (
+        'valor com quebra de linha e caracteres especiais',
+        parte(paragrafo('Obs: {{obs}}')),
+        None,
+        {'obs': 'a < b & "c"\nsegunda linha'},
+        {'word/document.xml': ['Obs: a < b & "c"\nsegunda linha']},
+    ),
+    (
+        'chave aberta sem fechamento antes de outro parágrafo',
+        parte(paragrafo('Início {{nome'), paragrafo('meio'), paragrafo('fim}} e {{turma}}')),
+        None,
+        {'nome': 'SILVA', 'turma': 'P1'},
+        {'word/document.xml': ['Início {{nome', 'meio', 'fim}} e P1']},
+    ),
+    (
+        'chaves sem par e chaves extras no mesmo parágrafo',
+        parte(paragrafo('{{{nome}}} e }} e {{ e {{turma}}'), paragrafo('{{')),
+        None,
+        {'nome': 'SILVA', 'turma': 'P1'},
+        {'word/document.xml': ['{SILVA} e }} e {{ e P1', '{{']},
+    ),
+]
+
+
+def main():
+    from backend.services.mail_merge_service import compile_template
+
+    falhas = 0
+    for nome, documento, cabecalho, registro, esperado in CASOS:
+        try:
+            docx = compile_template(montar_docx(documento, cabecalho)).render(registro)
+            obtido = {nome_parte: textos(docx, nome_parte) for nome_parte in esperado}
+            ok = obtido == esperado
+        except Exception as e:
+            obtido, ok = f'{type(e).__name__}: {e}', False
+        print(f"{'ok   ' if ok else 'FALHA'} {nome}")
+        if not ok:
+            falhas += 1
+            print(f"      esperado: {esperado!r}\n      obtido:   {obtido!r}")
+
+    print(f"\n{len(CASOS) - falhas} de {len(CASOS)} caso(s) ok.")
+    sys.exit(1 if falhas else 0)
+
+
+if __name__ == '__main__':
+    main()
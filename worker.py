@@ -2,7 +2,6 @@ import os
 import time
 import logging
 from datetime import datetime, timedelta
-from weasyprint import HTML
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -11,10 +10,13 @@ from backend.app import create_app
 from backend.models.database import db
 from backend.models.background_job import BackgroundJob
 
-app = create_app()
+# Modo enxuto: só configuração, banco e modelos (sem blueprints, login, Firebase...)
+app = create_app(slim=True)
 
 def process_pdf_job(job):
     """Gera o PDF usando Weasyprint a partir do HTML salvo no payload."""
+    from weasyprint import HTML
+
     downloads_dir = os.path.join(app.root_path, '..', 'static', 'downloads')
     os.makedirs(downloads_dir, exist_ok=True)
     
@@ -51,6 +53,166 @@ def process_pdf_job(job):
 
     return file_path
 
+def process_school_backup_job(job):
+    """
+    Exporta o backup da escola em ZIP (seções NDJSON) sem materializar as tabelas em memória.
+    O arquivo tem todos os dados da escola (inclusive hashes de senha): fica na pasta
+    instance, fora de /static, e só sai pelo /api/jobs/<id>/download.
+    """
+    from backend.services.backup_service import BackupService
+
+    backups_dir = os.path.join(app.instance_path, 'backups')
+    os.makedirs(backups_dir, mode=0o700, exist_ok=True)
+    file_path = os.path.join(backups_dir, f"backup_{job.id}.zip")
+
+    school_id = job.get_meta().get('school_id')
+    if not school_id:
+        raise ValueError("Job de backup sem school_id no meta_data.")
+
+    def report_progress(section, done, total):
+        # Chamado entre seções (sem cursor aberto), então o commit é seguro
+        job.update_meta(progress=int(done * 100 / total), progress_message=f"Seção '{section}' exportada")
+        db.session.commit()
+
+    logging.info(f"Gerando backup da escola {school_id} para job {job.id} em {file_path}")
+    BackupService.export_to_zip(int(school_id), file_path, progress_callback=report_progress)
+    return file_path
+
+def process_clear_school_data_job(job):
+    """Executa o reset da escola em lotes (commit por lote), reportando o progresso por etapa."""
+    from backend.services.admin_tools_service import AdminToolsService
+    from backend.services.log_service import LogService
+
+    meta = job.get_meta()
+    school_id = meta.get('school_id')
+    options = meta.get('options') or []
+    if not school_id or not options:
+        raise ValueError("Job de limpeza sem school_id ou opções no meta_data.")
+
+    def report_progress(step, total, table, rows):
+        job.update_meta(progress=int(step * 100 / total), progress_message=f"{table}: {rows} registro(s) processado(s)")
+        db.session.commit()
+
+    success, message = AdminToolsService.custom_clear_school_data(
+        int(school_id), options,
+        instructors_to_delete_ids=meta.get('instructors_to_delete_ids'),
+        progress_callback=report_progress
+    )
+    if not success:
+        raise RuntimeError(message)
+
+    # --- ESPIÃO: RESETOU DADOS ---
+    LogService.log(
+        action="Reset/Limpeza da Escola",
+        details=f"O administrador realizou a exclusão em massa dos seguintes dados: {', '.join(options)}. {message}",
+        user=job.user,
+        school_id=int(school_id)
+    )
+    # -----------------------------
+    job.update_meta(progress_message=message)
+
+def process_mail_merge_job(job):
+    """Gera os documentos da mala direta (ZIP de .docx ou PDF mesclado) a partir dos arquivos enviados."""
+    import shutil
+    from backend.services.mail_merge_service import MailMergeService
+
+    meta = job.get_meta()
+    output_format = meta.get('output_format', 'docx')
+    template_path = meta.get('template_path')
+    data_path = meta.get('data_path')
+    if not template_path or not data_path:
+        raise ValueError("Job de mala direta sem os arquivos de entrada no meta_data.")
+
+    downloads_dir = os.path.join(app.root_path, '..', 'static', 'downloads')
+    os.makedirs(downloads_dir, exist_ok=True)
+    extension = 'pdf' if output_format == 'pdf' else 'zip'
+    file_path = os.path.join(downloads_dir, f"mailmerge_{job.id}.{extension}")
+
+    def report_progress(done, total):
+        job.update_meta(progress=int(done * 100 / total), progress_message=f"{done} de {total} documento(s) gerado(s)")
+        db.session.commit()
+
+    try:
+        MailMergeService.generate_to_file(template_path, data_path, file_path, output_format, progress_callback=report_progress)
+    finally:
+        shutil.rmtree(os.path.dirname(template_path), ignore_errors=True)
+    return file_path
+
+def process_questoes_duplicadas_job(job):
+    """Indexa o que faltar e agrupa as questões quase duplicadas de uma matéria/escola em um CSV."""
+    from backend.services.questao_similaridade_service import QuestaoSimilaridadeService
+
+    meta = job.get_meta()
+    school_id = meta.get('school_id')
+    materia = meta.get('materia')
+    if not school_id or not materia:
+        raise ValueError("Job de duplicatas sem school_id ou matéria no meta_data.")
+
+    downloads_dir = os.path.join(app.root_path, '..', 'static', 'downloads')
+    os.makedirs(downloads_dir, exist_ok=True)
+    file_path = os.path.join(downloads_dir, f"duplicatas_{job.id}.csv")
+
+    def report_progress(progress, message):
+        job.update_meta(progress=progress, progress_message=message)
+        db.session.commit()
+
+    grupos = QuestaoSimilaridadeService.gerar_relatorio_duplicatas(int(school_id), materia, file_path, progress_callback=report_progress)
+    job.update_meta(progress_message=f"{grupos} grupo(s) de questões parecidas encontrado(s).")
+    return file_path
+
+def process_image_job(job):
+    """Gera os derivados responsivos (WebP + JPEG/PNG) de um asset recém-enviado."""
+    from backend.models.image_asset import ImageAsset
+    from backend.services.image_pipeline_service import ImagePipelineService
+
+    asset = db.session.get(ImageAsset, job.get_meta().get('asset_id'))
+    if not asset:
+        raise ValueError("Asset do job de imagem não encontrado (pode ter sido excluído).")
+
+    ImagePipelineService.process_asset(asset)
+    if asset.processing_status == 'failed':
+        raise RuntimeError(f"Não foi possível gerar os derivados de '{asset.original_filename}'.")
+    job.update_meta(progress=100, progress_message=f"Status: {asset.processing_status}")
+
+def process_reprocess_images_job(job):
+    """Reprocessa em lote os assets já existentes em static/uploads."""
+    from backend.services.image_pipeline_service import ImagePipelineService
+
+    def report_progress(done, total):
+        job.update_meta(progress=int(done * 100 / total), progress_message=f"{done} de {total} imagem(ns) processada(s)")
+        db.session.commit()
+
+    totals = ImagePipelineService.reprocess_all(only_pending=job.get_meta().get('only_pending', False), progress_callback=report_progress)
+    job.update_meta(progress_message=', '.join(f"{status}: {n}" for status, n in sorted(totals.items())) or 'Nenhuma imagem encontrada.')
+
+def process_google_sheets_job(job):
+    """Gera o mapa de horas-aula em .xlsx e envia ao Google Drive; a URL fica em meta_data['result_url']."""
+    from backend.services.relatorio_service import RelatorioService
+
+    contexto = job.get_meta().get('contexto')
+    if not contexto:
+        raise ValueError("Job de exportação para o Google Sheets sem contexto no meta_data.")
+    for campo in ('data_fim', 'data_emissao'):
+        if contexto.get(campo):
+            contexto[campo] = datetime.strptime(contexto[campo], '%Y-%m-%d').date()
+
+    job.update_meta(progress=10, progress_message="Enviando planilha ao Google Drive...")
+    db.session.commit()
+
+    success, result = RelatorioService.export_to_google_sheets(contexto)
+    if not success:
+        raise RuntimeError(result)
+    # O contexto (dados dos instrutores) não é mais necessário depois do upload
+    job.update_meta(contexto=None, progress=100, progress_message="Planilha criada no Google Drive.", result_url=result)
+
+def process_push_notifications_job(job):
+    """Envia os pushes de um lote de notificações já gravadas (NotificationService.create_notifications_bulk)."""
+    from backend.services.notification_service import NotificationService
+
+    meta = job.get_meta()
+    enviados = NotificationService.send_push_batch(meta.get('itens') or [], url=meta.get('url'))
+    job.update_meta(progress=100, progress_message=f"Push enviado para {enviados} usuário(s).")
+
 def cleanup_old_jobs():
     """Remove jobs e arquivos PDF mais velhos que 24 horas."""
     cutoff_time = datetime.utcnow() - timedelta(hours=24)
@@ -72,6 +234,27 @@ def cleanup_old_jobs():
             db.session.rollback()
             logging.error(f"Erro ao limpar jobs antigos: {e}")
 
+def send_pending_emails():
+    """Envia os e-mails prontos da fila email_outbox. Retorna quantas chamadas à API foram feitas."""
+    from backend.services.email_outbox_service import EmailOutboxService
+    try:
+        return EmailOutboxService.process_pending()['chamadas']
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Erro ao processar a fila de e-mails: {e}")
+        return 0
+
+def cleanup_sent_emails():
+    """Remove da fila os e-mails já enviados há mais de alguns dias."""
+    from backend.services.email_outbox_service import EmailOutboxService
+    try:
+        removed = EmailOutboxService.purge()
+        if removed:
+            logging.info(f"Limpeza de rotina: {removed} e-mails enviados removidos da fila.")
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Erro ao limpar a fila de e-mails: {e}")
+
 def run_worker():
     """Loop principal do worker."""
     logging.info("Iniciando Background Worker...")
@@ -84,8 +267,12 @@ def run_worker():
             # Executa a limpeza a cada 1 hora
             if (datetime.utcnow() - last_cleanup).total_seconds() > 3600:
                 cleanup_old_jobs()
+                cleanup_sent_emails()
                 last_cleanup = datetime.utcnow()
 
+            # Fila de e-mails: enviada antes dos jobs para não esperar um job longo
+            emails_sent = send_pending_emails()
+
             try:
                 # Busca o primeiro job pendente (FIFO)
                 job = BackgroundJob.query.filter_by(status='pending').order_by(BackgroundJob.created_at.asc()).first()
@@ -102,6 +289,22 @@ def run_worker():
                         if job.task_type == 'generate_pdf':
                             result_path = process_pdf_job(job)
                             job.result_path = result_path
+                        elif job.task_type == 'school_backup':
+                            job.result_path = process_school_backup_job(job)
+                        elif job.task_type == 'clear_school_data':
+                            process_clear_school_data_job(job)
+                        elif job.task_type == 'mail_merge':
+                            job.result_path = process_mail_merge_job(job)
+                        elif job.task_type == 'questoes_duplicadas':
+                            job.result_path = process_questoes_duplicadas_job(job)
+                        elif job.task_type == 'process_image':
+                            process_image_job(job)
+                        elif job.task_type == 'reprocess_images':
+                            process_reprocess_images_job(job)
+                        elif job.task_type == 'export_google_sheets':
+                            process_google_sheets_job(job)
+                        elif job.task_type == 'push_notifications':
+                            process_push_notifications_job(job)
                         else:
                             raise ValueError(f"Task type desconhecido: {job.task_type}")
                             
@@ -121,8 +324,8 @@ def run_worker():
                     # Salva o resultado
                     db.session.commit()
                     
-                else:
-                    # Se não tem job, dorme um pouco
+                elif not emails_sent:
+                    # Se não tem job nem e-mail, dorme um pouco
                     time.sleep(2)
             except Exception as e:
                 logging.error(f"Erro no loop principal do worker: {e}")